@@ -4,15 +4,19 @@ import asyncio
 import json
 import logging
 import re
+import time
 import uuid
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, cast
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import HttpUrl
 from temporalio.client import Client
+from temporalio.common import WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
 from temporalio.service import RPCError, RPCStatusCode
 
 from app.schemas.memory import (
@@ -21,13 +25,43 @@ from app.schemas.memory import (
     ClearMemoriesResponse,
     ListCategoriesRequest,
     ListCategoriesResponse,
+    MemorizeBatchItemResult,
+    MemorizeBatchRequest,
+    MemorizeBatchResponse,
     MemorizeRequest,
     MemorizeResponse,
+    RetrieveBatchItem,
+    RetrieveBatchRequest,
+    RetrieveBatchResponse,
+    RetrieveRequest,
+    TaskStatusBatchRequest,
+    TaskStatusBatchResponse,
     TaskStatusResponse,
 )
+from app.services.blob_store import BlobStore, create_blob_store
+from app.services.cache_invalidation import INVALIDATION_CHANNEL, apply_invalidation, publish_invalidation
+from app.services.chunking import CHARS_PER_TOKEN, needs_chunking
+from app.services.coalescing import conversation_messages
+from app.services.conversation_stream import ConversationStreamError, iter_messages, stream_format
+from app.services.embedding import install_embedding_cache, install_embedding_prefetch
+from app.services.embedding_cache import build_embedding_cache
+from app.services.idempotency import MAX_IDEMPOTENCY_KEY_LENGTH, ContentDigest, content_task_id, key_task_id
+from app.services.inline_conversation import encode_inline
+from app.services.llm_cache import close_llm_cache
 from app.services.memu import create_memory_service
+from app.services.notifications import PostgresListener
+from app.services.payload_codec import build_data_converter
+from app.services.rate_limit import close_rate_limiters
+from app.services.response_cache import GenerationTracker, ResponseCache
+from app.services.retrieve import apply_retrieve_options, retrieve_many, scope_filter
+from app.services.task_events import TASK_EVENTS_CHANNEL, EventBroker, stream_task_events
+from app.services.task_results import load_result
+from app.services.task_status import TERMINAL_STATUSES, TerminalStatusCache, WorkflowWaiters, describe_status
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
 from app.workers.memorize_workflow import MemorizeWorkflow
-from app.workers.worker import TASK_QUEUE
+from app.workers.task_queues import Priority, task_queue_for
+from config.memu import build_memu_retrieve_config
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
@@ -65,6 +99,7 @@ async def _get_temporal_client(app: FastAPI) -> Client:
         client = await Client.connect(
             settings.temporal_url,
             namespace=settings.TEMPORAL_NAMESPACE,
+            data_converter=build_data_converter(settings.TEMPORAL_PAYLOAD_COMPRESSION_MIN_BYTES),
         )
         app.state.temporal = client
         logger.info("Connected to Temporal at %s", settings.temporal_url)
@@ -74,114 +109,459 @@ async def _get_temporal_client(app: FastAPI) -> Client:
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
     """Initialise MemoryService on startup. Temporal connects lazily on first use."""
+    embedding_cache = None
+    _app.state.blob_store = create_blob_store(settings, root=storage_dir)
     try:
-        storage_dir.mkdir(parents=True, exist_ok=True)
-        _app.state.service = create_memory_service(settings)
+        if settings.STORAGE_BACKEND != "s3":
+            storage_dir.mkdir(parents=True, exist_ok=True)
+        _app.state.service = create_memory_service(
+            settings,
+            retrieve_config=build_memu_retrieve_config(settings),
+        )
+        embedding_cache = build_embedding_cache(settings)
+        if embedding_cache is not None:
+            install_embedding_cache(_app.state.service, embedding_cache)
+        install_embedding_prefetch(_app.state.service)
     except Exception as exc:
         msg = "Failed to initialize MemoryService during application startup"
         logger.exception(msg)
         raise RuntimeError(msg) from exc
-    yield
+    # Retrieve/categories cache; with Postgres notifications it is bypassed
+    # until the listener has subscribed.
+    postgres_notifications = settings.NOTIFICATIONS_BACKEND == "postgres"
+    _app.state.response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+    generations = GenerationTracker(available=not postgres_notifications, max_users=settings.RESPONSE_CACHE_SIZE)
+    _app.state.generations = generations
+    _app.state.retrieve_flights = SingleFlight("retrieve")
+    _app.state.status_cache = TerminalStatusCache(settings.MEMORIZE_STATUS_CACHE_SIZE)
+    _app.state.status_waiters = WorkflowWaiters(_app.state.status_cache)
+    _app.state.task_events = EventBroker(settings.TASK_EVENTS_QUEUE_SIZE)
+    listener = None
+    if postgres_notifications:
+        listener = PostgresListener(
+            settings.postgres_dsn,
+            {
+                INVALIDATION_CHANNEL: lambda payload: apply_invalidation(generations, payload),
+                TASK_EVENTS_CHANNEL: _app.state.task_events.publish_raw,
+            },
+            on_subscribed=generations.mark_available,
+            on_lost=generations.mark_unavailable,
+        )
+        listener.start()
+    try:
+        yield
+    finally:
+        _app.state.status_waiters.close()
+        if listener is not None:
+            await listener.stop()
+        if embedding_cache is not None:
+            embedding_cache.close()
+        await _app.state.blob_store.close()
+        await close_rate_limiters()
+        await close_llm_cache()
 
 
 app = FastAPI(title="memU Server", version="0.1.0", lifespan=lifespan)
 
 
-@app.post("/memorize")
-async def memorize(request: Request, body: MemorizeRequest):
-    """Submit an async memorization task via Temporal workflow."""
-    file_path: Path | None = None
-    workflow_started = False
+async def _submit_memorize(
+    temporal: Client,
+    store: BlobStore,
+    body: MemorizeRequest,
+    idempotency_key: str | None = None,
+    status_cache: TerminalStatusCache | None = None,
+) -> tuple[str, bool]:
+    """Persist one conversation and start its workflow.
+
+    Conversations up to MEMORIZE_INLINE_MAX_BYTES travel inline in the spec;
+    larger ones are written to the blob store. The conversation file is
+    removed again if the workflow could not be started, so failed submissions
+    do not leave orphans in storage.
+
+    With an ``idempotency_key`` (or MEMORIZE_DEDUPE_BY_CONTENT) the workflow
+    ID is derived from the key (or the content), and a submission matching a
+    running or completed task returns that task instead of starting one.
+
+    Returns:
+        The workflow ID, and whether it belongs to an earlier submission.
+    """
+    file_name: str | None = None
+    # The file name stays unique even for deterministic task IDs, so a
+    # duplicate never overwrites the input of the task it duplicates.
+    file_id = uuid.uuid4().hex
+    if idempotency_key is not None:
+        task_id, dedupe = key_task_id(body.user_id, idempotency_key), "key"
+    elif settings.MEMORIZE_DEDUPE_BY_CONTENT:
+        task_id = content_task_id(body.user_id, body.agent_id, body.conversation, body.override_config)
+        dedupe = "content"
+    else:
+        task_id, dedupe = file_id, None
     try:
-        # 1. Save conversation to local storage (offload sync I/O to threadpool)
-        task_id = uuid.uuid4().hex
-        file_path = storage_dir / f"conversation-{task_id}.json"
         data = json.dumps(body.conversation, ensure_ascii=False)
-        await asyncio.to_thread(file_path.write_text, data, "utf-8")
+        chunked = needs_chunking(body.conversation, settings.MEMORIZE_CHUNK_TOKENS)
+        # Chunked conversations are split into files that other workers read.
+        inline = not chunked and len(data.encode("utf-8")) <= settings.MEMORIZE_INLINE_MAX_BYTES
 
-        # 2. Build workflow spec
-        # Pass the filename only; the worker reconstructs the full path
-        # from its own STORAGE_PATH, so it works across containers/hosts.
-        spec = {
+        # 1. Build workflow spec
+        spec: dict[str, Any] = {
             "task_id": task_id,
-            "resource_url": file_path.name,
             "user_id": body.user_id,
             "agent_id": body.agent_id,
             "override_config": body.override_config,
         }
+        if inline:
+            spec["conversation"] = encode_inline(data, settings.MEMORIZE_INLINE_COMPRESS)
+            metrics.inc("memu_memorize_inline_submissions")
+        else:
+            # 2. Save conversation to the blob store
+            file_name = f"conversation-{file_id}.json"
+            await store.put_bytes(file_name, data.encode("utf-8"))
+            # Pass the name only; the worker reads it from its own blob
+            # store, so it works across containers/hosts.
+            spec["resource_url"] = file_name
+        if body.callback_url is not None:
+            spec["callback_url"] = str(body.callback_url)
+        if body.priority != "interactive":
+            spec["priority"] = body.priority
+        _route_spec(spec, chunked, conversation_messages(body.conversation) is not None)
+    except Exception:
+        await _remove_conversation(store, file_name)
+        raise
+
+    # 3. Start Temporal workflow
+    return await _start_memorize(temporal, store, spec, dedupe, file_name, status_cache)
+
+
+def _route_spec(spec: dict[str, Any], chunked: bool, mergeable: bool) -> None:
+    """Add chunking or coalescing options to a memorize spec."""
+    if chunked:
+        spec["chunking"] = {
+            "max_tokens": settings.MEMORIZE_CHUNK_TOKENS,
+            "max_parallel": settings.MEMORIZE_CHUNK_MAX_PARALLEL,
+        }
+    elif settings.MEMORIZE_COALESCE_WINDOW_SECONDS > 0 and mergeable:
+        spec["coalesce"] = {
+            "window_seconds": settings.MEMORIZE_COALESCE_WINDOW_SECONDS,
+            "max_items": settings.MEMORIZE_COALESCE_MAX_ITEMS,
+        }
 
-        # 3. Start Temporal workflow
-        temporal = await _get_temporal_client(request.app)
-        workflow_id = f"memorize-{task_id}"
 
-        await temporal.start_workflow(
-            MemorizeWorkflow.run,
-            spec,
-            id=workflow_id,
-            task_queue=TASK_QUEUE,
-        )
-        workflow_started = True
+async def _start_memorize(
+    temporal: Client,
+    store: BlobStore,
+    spec: dict[str, Any],
+    dedupe: str | None,
+    file_name: str | None,
+    status_cache: TerminalStatusCache | None = None,
+) -> tuple[str, bool]:
+    """Start the workflow of a memorize spec whose conversation is already stored.
+
+    The conversation file is removed if the workflow is a duplicate or could
+    not be started.
+
+    Returns:
+        The workflow ID, and whether it belongs to an earlier submission.
+    """
+    workflow_id = f"memorize-{spec['task_id']}"
+    task_queue = task_queue_for(spec.get("priority"))
+    try:
+        if dedupe is None:
+            await temporal.start_workflow(
+                MemorizeWorkflow.run,
+                spec,
+                id=workflow_id,
+                task_queue=task_queue,
+            )
+        else:
+            # Running and completed tasks reject the ID; failed ones may run again.
+            await temporal.start_workflow(
+                MemorizeWorkflow.run,
+                spec,
+                id=workflow_id,
+                task_queue=task_queue,
+                id_reuse_policy=WorkflowIDReusePolicy.ALLOW_DUPLICATE_FAILED_ONLY,
+            )
+            if status_cache is not None:
+                status_cache.discard(workflow_id)
+    except WorkflowAlreadyStartedError:
+        await _remove_conversation(store, file_name)
+        metrics.inc("memu_memorize_deduplicated", attributes={"source": dedupe or "none"})
+        logger.info("Duplicate memorize submission for %s", workflow_id)
+        return workflow_id, True
+    except Exception:
+        # Only clean up the conversation file if the workflow has NOT started,
+        # because a running workflow still needs its input file.
+        await _remove_conversation(store, file_name)
+        raise
+
+    metrics.inc("memu_memorize_submitted", attributes={"queue": task_queue})
+    logger.info("Memorize workflow started: %s", workflow_id)
+    return workflow_id, False
+
 
-        logger.info("Memorize workflow started: %s", workflow_id)
+async def _remove_conversation(store: BlobStore, file_name: str | None) -> None:
+    """Delete a conversation file no workflow will read; failures are only logged."""
+    if file_name is not None:
+        try:
+            await store.delete(file_name)
+        except Exception:
+            logger.warning("Failed to remove unused conversation file %s", file_name, exc_info=True)
+
+
+@app.post("/memorize")
+async def memorize(
+    request: Request,
+    body: MemorizeRequest,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
+    """Submit an async memorization task via Temporal workflow.
+
+    Resending a request with the same ``Idempotency-Key`` header returns the
+    original task while it is running or after it completed.
+    """
+    key = _idempotency_key(idempotency_key)
+    try:
+        temporal = await _get_temporal_client(request.app)
+        workflow_id, deduplicated = await _submit_memorize(
+            temporal,
+            request.app.state.blob_store,
+            body,
+            key,
+            request.app.state.status_cache,
+        )
 
         result = MemorizeResponse(
             task_id=workflow_id,
             status="PENDING",
-            message=f"Memorization task submitted for user {body.user_id}",
+            message=(
+                f"Memorization task already submitted for user {body.user_id}"
+                if deduplicated
+                else f"Memorization task submitted for user {body.user_id}"
+            ),
+            deduplicated=deduplicated,
         )
         return JSONResponse(content={"status": "success", "result": result.model_dump()})
     except Exception as exc:
-        # Only clean up the conversation file if the workflow has NOT started,
-        # because a running workflow still needs its input file.
-        if not workflow_started and file_path is not None and file_path.exists():
+        logger.exception("Failed to submit memorize task")
+        raise HTTPException(status_code=500, detail="Failed to submit memorization task") from exc
+
+
+def _idempotency_key(header: str | None) -> str | None:
+    if header is not None and not 0 < len(header.strip()) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters",
+        )
+    return header.strip() if header is not None else None
+
+
+@app.post("/memorize/batch")
+async def memorize_batch(request: Request, body: MemorizeBatchRequest):
+    """Submit many memorization tasks in one call.
+
+    Items are submitted concurrently (bounded by MEMORIZE_BATCH_CONCURRENCY)
+    over a single Temporal client. A failing item does not fail the batch;
+    its result carries status ERROR instead of a task ID.
+    """
+    if len(body.items) > settings.MEMORIZE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch may contain at most {settings.MEMORIZE_BATCH_MAX_ITEMS} items",
+        )
+    try:
+        temporal = await _get_temporal_client(request.app)
+    except Exception as exc:
+        logger.exception("Failed to connect to Temporal for batch submission")
+        raise HTTPException(status_code=500, detail="Failed to submit memorization tasks") from exc
+
+    semaphore = asyncio.Semaphore(settings.MEMORIZE_BATCH_CONCURRENCY)
+
+    async def _submit_one(index: int, item: MemorizeRequest) -> MemorizeBatchItemResult:
+        async with semaphore:
             try:
-                file_path.unlink(missing_ok=True)
+                workflow_id, deduplicated = await _submit_memorize(
+                    temporal, request.app.state.blob_store, item, None, request.app.state.status_cache
+                )
             except Exception:
-                logger.warning(
-                    "Failed to clean up conversation file %s during error handling",
-                    file_path,
-                    exc_info=True,
+                logger.exception("Failed to submit batch item %d", index)
+                return MemorizeBatchItemResult(
+                    index=index,
+                    status="ERROR",
+                    error="Failed to submit memorization task",
                 )
-        logger.exception("Failed to submit memorize task")
+        return MemorizeBatchItemResult(index=index, task_id=workflow_id, status="PENDING", deduplicated=deduplicated)
+
+    results = await asyncio.gather(*(_submit_one(i, item) for i, item in enumerate(body.items)))
+    submitted = sum(1 for r in results if r.task_id is not None)
+    response = MemorizeBatchResponse(
+        submitted=submitted,
+        failed=len(results) - submitted,
+        results=list(results),
+    )
+    return JSONResponse(content={"status": "success", "result": response.model_dump()})
+
+
+# Streamed conversations are written to the blob store in pieces of about this size.
+_STREAM_WRITE_BYTES = 64 * 1024
+
+
+@app.put("/memorize/stream")
+async def memorize_stream(
+    request: Request,
+    user_id: str,
+    agent_id: str = "",
+    callback_url: HttpUrl | None = None,
+    priority: Priority = "interactive",
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
+    """Submit a memorization task for a conversation streamed in the request body.
+
+    The body is a list of messages, as NDJSON (``application/x-ndjson``, one
+    message per line) or a JSON array (``application/json``); ``user_id``,
+    ``agent_id``, ``callback_url`` and ``priority`` are query parameters. Messages are
+    validated and written to the blob store as they arrive, so memory use
+    does not grow with the transcript. A malformed message fails the request
+    with 422 and nothing is stored.
+    """
+    fmt = stream_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send the conversation as application/x-ndjson or as a JSON array (application/json)",
+        )
+    user_id = user_id.strip()
+    if not user_id:
+        raise HTTPException(status_code=422, detail="user_id must not be empty")
+    key = _idempotency_key(idempotency_key)
+    try:
+        temporal = await _get_temporal_client(request.app)
+    except Exception as exc:
+        logger.exception("Failed to connect to Temporal for streamed submission")
         raise HTTPException(status_code=500, detail="Failed to submit memorization task") from exc
 
+    store: BlobStore = request.app.state.blob_store
+    file_id = uuid.uuid4().hex
+    file_name = f"conversation-{file_id}.json"
+    digest = ContentDigest(user_id, agent_id) if key is None and settings.MEMORIZE_DEDUPE_BY_CONTENT else None
+    messages = tokens = 0
+
+    async def _conversation_chunks() -> AsyncIterator[bytes]:
+        # Re-encoded the way POST /memorize stores conversations, so token
+        # estimates and worker-side splitting see the same JSON.
+        nonlocal messages, tokens
+        buffer = bytearray(b"[")
+        async for message in iter_messages(request.stream(), fmt, settings.MEMORIZE_STREAM_MAX_MESSAGE_BYTES):
+            text = json.dumps(message, ensure_ascii=False)
+            if messages:
+                buffer += b", "
+            buffer += text.encode("utf-8")
+            messages += 1
+            tokens += len(text) // CHARS_PER_TOKEN + 1
+            if digest is not None:
+                digest.update(message)
+            if len(buffer) >= _STREAM_WRITE_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+        yield bytes(buffer)
+
+    try:
+        size = await store.write(file_name, _conversation_chunks())
+    except ConversationStreamError as exc:
+        metrics.inc("memu_memorize_stream_rejected")
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except Exception as exc:
+        logger.exception("Failed to store streamed conversation")
+        raise HTTPException(status_code=500, detail="Failed to submit memorization task") from exc
+    if not messages:
+        await _remove_conversation(store, file_name)
+        raise HTTPException(status_code=422, detail="The conversation has no messages")
+    metrics.inc("memu_memorize_stream_bytes", size)
+
+    if key is not None:
+        task_id, dedupe = key_task_id(user_id, key), "key"
+    elif digest is not None:
+        task_id, dedupe = digest.task_id(), "content"
+    else:
+        task_id, dedupe = file_id, None
+    spec: dict[str, Any] = {
+        "task_id": task_id,
+        "user_id": user_id,
+        "agent_id": agent_id,
+        "override_config": None,
+        "resource_url": file_name,
+    }
+    if callback_url is not None:
+        spec["callback_url"] = str(callback_url)
+    if priority != "interactive":
+        spec["priority"] = priority
+    _route_spec(spec, 0 < settings.MEMORIZE_CHUNK_TOKENS < tokens, mergeable=True)
+    try:
+        workflow_id, deduplicated = await _start_memorize(
+            temporal, store, spec, dedupe, file_name, request.app.state.status_cache
+        )
+    except Exception as exc:
+        logger.exception("Failed to submit streamed memorize task")
+        raise HTTPException(status_code=500, detail="Failed to submit memorization task") from exc
+
+    result = MemorizeResponse(
+        task_id=workflow_id,
+        status="PENDING",
+        message=(
+            f"Memorization task already submitted for user {user_id}"
+            if deduplicated
+            else f"Memorization task submitted for user {user_id}"
+        ),
+        deduplicated=deduplicated,
+    )
+    return JSONResponse(content={"status": "success", "result": result.model_dump()})
+
 
 # Regex for valid memorize workflow IDs: memorize-<32 hex chars>
 _MEMORIZE_WORKFLOW_ID_RE = re.compile(r"^memorize-[0-9a-f]{32}$")
 
+# Long-poll durations: "30", "30s", "500ms" or "1m"
+_WAIT_RE = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m)?$")
+_WAIT_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0}
+
+
+def _parse_wait(wait: str | None) -> float:
+    """Parse the ``wait`` query parameter into seconds (0 when absent)."""
+    if wait is None:
+        return 0.0
+    match = _WAIT_RE.match(wait.strip())
+    if not match:
+        raise HTTPException(status_code=422, detail="wait must be a duration such as '30s', '500ms' or '1m'")
+    seconds = float(match.group(1)) * _WAIT_UNITS[match.group(2) or "s"]
+    if seconds > settings.MEMORIZE_STATUS_MAX_WAIT_SECONDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"wait must not exceed {settings.MEMORIZE_STATUS_MAX_WAIT_SECONDS:g}s",
+        )
+    return seconds
+
 
 @app.get("/memorize/status/{task_id}")
-async def get_memorize_status(request: Request, task_id: str):
-    """Get the status of a memorization task."""
+async def get_memorize_status(request: Request, task_id: str, wait: str | None = None):
+    """Get the status of a memorization task.
+
+    With ``wait`` (e.g. ``?wait=30s``) a non-terminal task is held open until
+    it reaches a terminal state or the wait elapses, whichever comes first.
+    Concurrent waiters for the same task share one Temporal long-poll.
+    """
     if not _MEMORIZE_WORKFLOW_ID_RE.match(task_id):
         raise HTTPException(
             status_code=422,
             detail="task_id must match the format 'memorize-<uuid4hex>' (e.g. memorize-abc123def456...)",
         )
+    wait_seconds = _parse_wait(wait)
     try:
         temporal = await _get_temporal_client(request.app)
-        handle = temporal.get_workflow_handle(task_id)
-
-        describe = await handle.describe()
-        status = describe.status.name if describe.status else "UNKNOWN"
-
-        detail = None
-        if status == "COMPLETED":
-            result = await handle.result()
-            if isinstance(result, dict):
-                detail = result.get("status", "SUCCESS")
-            elif result is not None:
-                detail = str(result)
-            else:
-                detail = "SUCCESS"
-        elif status == "FAILED":
-            detail = "Task execution failed"
-
-        task_status = TaskStatusResponse(
-            task_id=task_id,
-            status=status,
-            detail=detail,
-        )
+        task_status = await describe_status(temporal, task_id, request.app.state.status_cache)
+        if wait_seconds > 0 and task_status.status not in TERMINAL_STATUSES:
+            finished = await request.app.state.status_waiters.wait(temporal, task_id, wait_seconds)
+            if finished is not None:
+                task_status = finished
         return JSONResponse(content={"status": "success", "result": task_status.model_dump()})
     except RPCError as exc:
         if exc.status == RPCStatusCode.NOT_FOUND:
@@ -193,22 +573,249 @@ async def get_memorize_status(request: Request, task_id: str):
         raise HTTPException(status_code=500, detail="Internal server error") from exc
 
 
+@app.get("/memorize/result/{task_id}")
+async def get_memorize_result(request: Request, task_id: str):
+    """Get the full memu result of a completed memorization task.
+
+    Works for compact results (MEMORIZE_COMPACT_RESULTS), whose full result
+    is read from the blob store, and for full results carried by the workflow.
+    """
+    if not _MEMORIZE_WORKFLOW_ID_RE.match(task_id):
+        raise HTTPException(
+            status_code=422,
+            detail="task_id must match the format 'memorize-<uuid4hex>' (e.g. memorize-abc123def456...)",
+        )
+    try:
+        temporal = await _get_temporal_client(request.app)
+        task_status = await describe_status(temporal, task_id, request.app.state.status_cache)
+        if task_status.status != "COMPLETED":
+            raise HTTPException(status_code=409, detail=f"Task {task_id} is {task_status.status}, not COMPLETED")
+        outcome = await temporal.get_workflow_handle(task_id).result()
+        if isinstance(outcome, dict) and isinstance(outcome.get("result_ref"), str):
+            result = await load_result(request.app.state.blob_store, outcome["result_ref"])
+        elif isinstance(outcome, dict) and "result" in outcome:
+            result = outcome["result"]
+        else:
+            # e.g. chunked tasks, whose parts' results are not kept
+            raise HTTPException(status_code=404, detail=f"Task {task_id} has no stored result")
+        return JSONResponse(content={"status": "success", "result": {"task_id": task_id, "result": result}})
+    except HTTPException:
+        raise
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=410, detail=f"The result of task {task_id} is no longer stored") from exc
+    except RPCError as exc:
+        if exc.status == RPCStatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found") from exc
+        logger.exception("Temporal RPC error for task %s", task_id)
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
+    except Exception as exc:
+        logger.exception("Failed to get task result for %s", task_id)
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
+
+
+@app.get("/memorize/events")
+async def memorize_events(request: Request, user_id: str, agent_id: str | None = None):
+    """Stream a user's memorize task events as server-sent events.
+
+    One ``memorize.completed`` or ``memorize.failed`` event is sent per
+    finished task (optionally only for ``agent_id``), with the same JSON
+    payload as ``callback_url`` webhooks. Events are not replayed: after
+    reconnecting, use ``POST /memorize/status`` to catch up.
+    """
+    user_id = user_id.strip()
+    if not user_id:
+        raise HTTPException(status_code=422, detail="user_id must not be empty")
+    stream = stream_task_events(
+        request.app.state.task_events,
+        user_id,
+        agent_id,
+        request.is_disconnected,
+        settings.TASK_EVENTS_KEEPALIVE_SECONDS,
+    )
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/memorize/status")
+async def get_memorize_statuses(request: Request, body: TaskStatusBatchRequest):
+    """Look up the status of many memorization tasks in one call.
+
+    Task IDs are resolved concurrently (bounded by
+    MEMORIZE_STATUS_BATCH_CONCURRENCY); finished tasks are served from the
+    terminal-status cache. Unknown tasks are reported as NOT_FOUND and
+    lookup errors as ERROR, per task.
+    """
+    if len(body.task_ids) > settings.MEMORIZE_STATUS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.MEMORIZE_STATUS_BATCH_MAX_IDS} task IDs may be requested at once",
+        )
+    invalid = [t for t in body.task_ids if not _MEMORIZE_WORKFLOW_ID_RE.match(t)]
+    if invalid:
+        raise HTTPException(
+            status_code=422,
+            detail=f"task_ids must match the format 'memorize-<uuid4hex>'; invalid: {', '.join(invalid[:5])}",
+        )
+    try:
+        temporal = await _get_temporal_client(request.app)
+    except Exception as exc:
+        logger.exception("Failed to connect to Temporal for bulk status lookup")
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
+
+    cache: TerminalStatusCache = request.app.state.status_cache
+    semaphore = asyncio.Semaphore(settings.MEMORIZE_STATUS_BATCH_CONCURRENCY)
+
+    async def _lookup(task_id: str) -> TaskStatusResponse:
+        async with semaphore:
+            try:
+                return await describe_status(temporal, task_id, cache)
+            except RPCError as exc:
+                if exc.status == RPCStatusCode.NOT_FOUND:
+                    return TaskStatusResponse(task_id=task_id, status="NOT_FOUND", detail=f"Task {task_id} not found")
+                logger.exception("Temporal RPC error for task %s", task_id)
+            except Exception:
+                logger.exception("Failed to get task status for %s", task_id)
+            return TaskStatusResponse(task_id=task_id, status="ERROR", detail="Internal server error")
+
+    unique = list(dict.fromkeys(body.task_ids))
+    statuses = dict(zip(unique, await asyncio.gather(*(_lookup(t) for t in unique)), strict=True))
+    response = TaskStatusBatchResponse(results=[statuses[t] for t in body.task_ids])
+    return JSONResponse(content={"status": "success", "result": response.model_dump()})
+
+
+def _cache_key(app: FastAPI, kind: str, user_id: str, **parts: str | None) -> str | None:
+    """Return the response-cache key for this request, or None when caching is off or unsafe."""
+    cache: ResponseCache = app.state.response_cache
+    if cache.max_entries == 0:
+        return None
+    token = app.state.generations.token(user_id)
+    if token is None:
+        metrics.inc("memu_response_cache_bypassed", attributes={"kind": kind})
+        return None
+    return cache.key(kind, token, user_id=user_id, **parts)
+
+
+async def _invalidate(app: FastAPI, user_id: str | None) -> None:
+    """Invalidate cached results for ``user_id`` (all users if None) here and on other replicas."""
+    app.state.generations.bump(user_id)
+    if settings.NOTIFICATIONS_BACKEND != "postgres":
+        return
+    try:
+        await publish_invalidation(settings.postgres_dsn, user_id)
+    except Exception:
+        # Other replicas keep stale entries until RESPONSE_CACHE_TTL_SECONDS.
+        metrics.inc("memu_cache_invalidation_failures")
+        logger.exception("Failed to publish cache invalidation for user %s", user_id)
+
+
+def _resolve_top_k(top_k: int | None) -> int:
+    """Apply the server default to ``top_k`` and enforce RETRIEVE_MAX_TOP_K."""
+    top_k = top_k or settings.RETRIEVE_DEFAULT_TOP_K
+    if top_k > settings.RETRIEVE_MAX_TOP_K:
+        raise HTTPException(
+            status_code=422,
+            detail=f"top_k must not exceed {settings.RETRIEVE_MAX_TOP_K}",
+        )
+    return top_k
+
+
 @app.post("/retrieve")
-async def retrieve(request: Request, payload: dict[str, Any]):
-    if "query" not in payload:
-        raise HTTPException(status_code=400, detail="Missing 'query' in request body")
-    query = payload["query"]
-    if not isinstance(query, str) or not query.strip():
-        raise HTTPException(status_code=400, detail="'query' must be a non-empty string")
+async def retrieve(request: Request, body: RetrieveRequest):
+    """Retrieve memories for one user (and optionally one agent)."""
+    top_k = _resolve_top_k(body.top_k)
     try:
         service = request.app.state.service
-        result = await service.retrieve([query.strip()])
+        cache_key = _cache_key(request.app, "retrieve", body.user_id, agent_id=body.agent_id, query=body.query)
+        result = request.app.state.response_cache.get(cache_key, "retrieve") if cache_key else None
+        if result is None:
+
+            async def _search() -> dict:
+                started = time.perf_counter()
+                found: dict = await service.retrieve([body.query], where=scope_filter(body))
+                metrics.observe("memu_retrieve_seconds", time.perf_counter() - started)
+                if cache_key:
+                    request.app.state.response_cache.set(cache_key, found)
+                return found
+
+            token = request.app.state.generations.token(body.user_id)
+            if token is None:
+                # Invalidations may be missed, so a search started before a
+                # memorize finished can't be told from one started after it.
+                result = await _search()
+            else:
+                # Identical concurrent requests share one search. top_k/min_score
+                # are applied afterwards, so they are not part of the key.
+                flight_key = ResponseCache.key(
+                    "retrieve", token, user_id=body.user_id, agent_id=body.agent_id, query=body.query
+                )
+                result = await request.app.state.retrieve_flights.do(flight_key, _search)
+        result = apply_retrieve_options(result, top_k, body.min_score)
         return JSONResponse(content={"status": "success", "result": result})
     except Exception as exc:
         logger.exception("Retrieve request failed")
         raise HTTPException(status_code=500, detail="Internal server error") from exc
 
 
+@app.post("/retrieve/batch")
+async def retrieve_batch(request: Request, body: RetrieveBatchRequest):
+    """Run several retrieve queries for one user in a single call.
+
+    Queries with a cached result are answered from the response cache. All
+    other distinct queries are embedded with one embedding-provider call; the
+    searches then run concurrently and reuse those vectors. Unlike
+    ``/retrieve``, the searches skip memu-py's intention routing and
+    sufficiency checks, whose rewritten queries would each need another
+    embedding call. Results are returned in query order.
+    """
+    if len(body.queries) > settings.RETRIEVE_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch may contain at most {settings.RETRIEVE_BATCH_MAX_QUERIES} queries",
+        )
+    top_k = _resolve_top_k(body.top_k)
+    try:
+        service = request.app.state.service
+        response_cache: ResponseCache = request.app.state.response_cache
+        where = scope_filter(body)
+        started = time.perf_counter()
+
+        # Serve cached queries directly; embed and search only the rest
+        results: dict[str, dict] = {}
+        cache_keys: dict[str, str | None] = {}
+        for q in dict.fromkeys(body.queries):
+            key = cache_keys[q] = _cache_key(
+                request.app, "retrieve_batch", body.user_id, agent_id=body.agent_id, query=q
+            )
+            cached = response_cache.get(key, "retrieve_batch") if key else None
+            if cached is not None:
+                results[q] = cached
+        pending = [q for q in cache_keys if q not in results]
+
+        if pending:
+            fresh = await retrieve_many(service, pending, where)
+            for q, r in zip(pending, fresh, strict=True):
+                results[q] = r
+                key = cache_keys[q]
+                if key:
+                    response_cache.set(key, r)
+
+        metrics.observe("memu_retrieve_batch_seconds", time.perf_counter() - started)
+        metrics.inc("memu_retrieve_batch_queries", len(body.queries))
+        response = RetrieveBatchResponse(
+            results=[
+                RetrieveBatchItem(query=q, result=apply_retrieve_options(results[q], top_k, body.min_score))
+                for q in body.queries
+            ]
+        )
+        return JSONResponse(content={"status": "success", "result": response.model_dump()})
+    except Exception as exc:
+        logger.exception("Batch retrieve request failed")
+        raise HTTPException(status_code=500, detail="Internal server error") from exc
+
+
 @app.post("/clear")
 async def clear_memory(request: Request, body: ClearMemoriesRequest):
     """Clear memories for a user/agent."""
@@ -216,6 +823,7 @@ async def clear_memory(request: Request, body: ClearMemoriesRequest):
         service = request.app.state.service
         where = body.model_dump(exclude_none=True)
         result = await service.clear_memory(where=where)
+        await _invalidate(request.app, body.user_id)
 
         response = ClearMemoriesResponse(
             purged_categories=len(result.get("deleted_categories", [])),
@@ -232,28 +840,40 @@ async def clear_memory(request: Request, body: ClearMemoriesRequest):
 async def list_categories(request: Request, body: ListCategoriesRequest):
     """List all memory categories for a user."""
     try:
-        service = request.app.state.service
-        where = body.model_dump(exclude_none=True)
-        result = await service.list_memory_categories(where=where)
-
-        response = ListCategoriesResponse(
-            categories=[
-                CategoryObject(
-                    name=cat["name"],
-                    description=cat["description"],
-                    user_id=cat["user_id"],
-                    agent_id=cat["agent_id"],
-                    summary=cat.get("summary"),
-                )
-                for cat in result.get("categories", [])
-            ]
-        )
-        return JSONResponse(content={"status": "success", "result": response.model_dump()})
+        cache_key = _cache_key(request.app, "categories", body.user_id, agent_id=body.agent_id)
+        content = request.app.state.response_cache.get(cache_key, "categories") if cache_key else None
+        if content is None:
+            service = request.app.state.service
+            where = body.model_dump(exclude_none=True)
+            result = await service.list_memory_categories(where=where)
+
+            response = ListCategoriesResponse(
+                categories=[
+                    CategoryObject(
+                        name=cat["name"],
+                        description=cat["description"],
+                        user_id=cat["user_id"],
+                        agent_id=cat["agent_id"],
+                        summary=cat.get("summary"),
+                    )
+                    for cat in result.get("categories", [])
+                ]
+            )
+            content = {"status": "success", "result": response.model_dump()}
+            if cache_key:
+                request.app.state.response_cache.set(cache_key, content)
+        return JSONResponse(content=content)
     except Exception as exc:
         logger.exception("List categories request failed")
         raise HTTPException(status_code=500, detail="Internal server error") from exc
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Return this process's in-memory metrics as JSON."""
+    return {"status": "success", "result": metrics.snapshot()}
+
+
 @app.get("/")
 async def root():
     return {"message": "Hello MemU user!"}
@@ -1,6 +1,8 @@
 """Request/response schemas for memory endpoints."""
 
-from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Literal
+
+from pydantic import BaseModel, Field, HttpUrl, field_validator, model_validator
 
 
 # ── Memorize (async) ──
@@ -11,6 +13,14 @@ class MemorizeRequest(BaseModel):
     user_id: str = Field(..., min_length=1, description="User ID (non-empty)")
     agent_id: str = Field(default="", description="Agent ID")
     override_config: dict | None = Field(default=None, description="Override MemU config")
+    callback_url: HttpUrl | None = Field(
+        default=None,
+        description="http(s) URL that receives a signed POST when the task completes or fails",
+    )
+    priority: Literal["interactive", "bulk"] = Field(
+        default="interactive",
+        description="interactive for live users; bulk for backfills, which run on their own task queue",
+    )
 
     @field_validator("user_id", mode="before")
     @classmethod
@@ -27,6 +37,34 @@ class MemorizeResponse(BaseModel):
     task_id: str = Field(..., description="Task ID for tracking (Temporal workflow ID)")
     status: str = Field(default="PENDING", description="Initial task status")
     message: str = Field(default="Memorization task submitted", description="Response message")
+    deduplicated: bool = Field(
+        default=False,
+        description="True if an identical submission already started this task and no new task was created",
+    )
+
+
+class MemorizeBatchRequest(BaseModel):
+    """Request to memorize many conversations in one call."""
+
+    items: list[MemorizeRequest] = Field(..., min_length=1, description="Conversations to memorize")
+
+
+class MemorizeBatchItemResult(BaseModel):
+    """Submission outcome for a single item of a batch."""
+
+    index: int = Field(..., description="Position of the item in the request")
+    task_id: str | None = Field(default=None, description="Task ID, or null if submission failed")
+    status: str = Field(..., description="PENDING on success, ERROR on failure")
+    error: str | None = Field(default=None, description="Error message when submission failed")
+    deduplicated: bool = Field(default=False, description="True if the item matched an existing task")
+
+
+class MemorizeBatchResponse(BaseModel):
+    """Response after submitting a batch of memorize tasks."""
+
+    submitted: int = Field(default=0, description="Number of tasks started")
+    failed: int = Field(default=0, description="Number of items that could not be submitted")
+    results: list[MemorizeBatchItemResult] = Field(default_factory=list, description="Per-item results, in order")
 
 
 # ── Task Status ──
@@ -38,12 +76,121 @@ class TaskStatusResponse(BaseModel):
         ...,
         description=(
             "Task status from Temporal: RUNNING, COMPLETED, FAILED, UNKNOWN, CANCELED, TERMINATED. "
-            "PENDING is returned only by the initial POST /memorize response before Temporal picks up the task."
+            "PENDING is returned only by the initial POST /memorize response before Temporal picks up the task. "
+            "NOT_FOUND and ERROR are returned only per task by POST /memorize/status."
         ),
     )
     detail: str | None = Field(default=None, description="Status detail or error message")
 
 
+class TaskStatusBatchRequest(BaseModel):
+    """Request to look up the status of several tasks at once."""
+
+    task_ids: list[str] = Field(..., min_length=1, description="Task IDs returned by POST /memorize")
+
+
+class TaskStatusBatchResponse(BaseModel):
+    """Statuses for a bulk lookup, in request order."""
+
+    results: list[TaskStatusResponse] = Field(default_factory=list)
+
+
+# ── Retrieve ──
+class RetrieveRequest(BaseModel):
+    """Request to retrieve memories for a user (optionally scoped to an agent)."""
+
+    query: str = Field(..., min_length=1, description="Query text (non-empty)")
+    user_id: str = Field(..., min_length=1, description="User ID whose memories are searched (non-empty)")
+    agent_id: str | None = Field(default=None, description="Agent ID; restricts the search to this agent")
+    top_k: int | None = Field(
+        default=None,
+        ge=1,
+        description="Maximum hits per tier (categories, items, resources); server default when omitted",
+    )
+    min_score: float | None = Field(
+        default=None,
+        ge=-1.0,
+        le=1.0,
+        description="Drop hits whose similarity score is below this threshold",
+    )
+
+    @field_validator("query", "user_id", mode="before")
+    @classmethod
+    def strip_required(cls, v: str) -> str:
+        """Strip whitespace so blank values fail min_length."""
+        if isinstance(v, str):
+            return v.strip()
+        return v
+
+    @field_validator("agent_id", mode="before")
+    @classmethod
+    def strip_agent_id(cls, v: str | None) -> str | None:
+        """Strip whitespace; treat blank strings as None."""
+        if isinstance(v, str):
+            v = v.strip()
+            return v if v else None
+        return v
+
+
+class RetrieveBatchRequest(BaseModel):
+    """Request to run several retrieve queries for one user in a single call."""
+
+    queries: list[str] = Field(..., min_length=1, description="Query texts (each non-empty)")
+    user_id: str = Field(..., min_length=1, description="User ID whose memories are searched (non-empty)")
+    agent_id: str | None = Field(default=None, description="Agent ID; restricts the search to this agent")
+    top_k: int | None = Field(
+        default=None,
+        ge=1,
+        description="Maximum hits per tier for every query; server default when omitted",
+    )
+    min_score: float | None = Field(
+        default=None,
+        ge=-1.0,
+        le=1.0,
+        description="Drop hits whose similarity score is below this threshold",
+    )
+
+    @field_validator("queries", mode="after")
+    @classmethod
+    def strip_queries(cls, v: list[str]) -> list[str]:
+        """Strip whitespace and reject blank queries."""
+        stripped = [q.strip() for q in v]
+        if not all(stripped):
+            msg = "queries must not contain blank strings"
+            raise ValueError(msg)
+        return stripped
+
+    @field_validator("user_id", mode="before")
+    @classmethod
+    def strip_user_id(cls, v: str) -> str:
+        """Strip whitespace and reject blank user_id."""
+        if isinstance(v, str):
+            return v.strip()
+        return v
+
+    @field_validator("agent_id", mode="before")
+    @classmethod
+    def strip_agent_id(cls, v: str | None) -> str | None:
+        """Strip whitespace; treat blank strings as None."""
+        if isinstance(v, str):
+            v = v.strip()
+            return v if v else None
+        return v
+
+
+class RetrieveBatchItem(BaseModel):
+    """Result for one query of a batch retrieve."""
+
+    query: str = Field(..., description="The query, as searched")
+    result: dict = Field(..., description="Retrieve result, same shape as POST /retrieve")
+
+
+class RetrieveBatchResponse(BaseModel):
+    """Response with one result per query, in request order."""
+
+    results: list[RetrieveBatchItem] = Field(default_factory=list)
+
+
 class ClearMemoriesRequest(BaseModel):
     """Request to clear memories for a user/agent."""
 
@@ -0,0 +1,482 @@
+"""Blob storage for conversation files and stored results.
+
+Specs and results refer to blobs by bare name (``conversation-<id>.json``,
+``result-<id>.json``); STORAGE_BACKEND decides where they live:
+
+* ``local``: plain files in STORAGE_PATH (optionally sharded, see
+  ``app.services.storage``). API and workers must share the volume.
+* ``compressed``: content-addressed, gzip-compressed objects in STORAGE_PATH.
+  Each name is a small reference file holding ``sha256:<hex>``; identical
+  conversations are stored once. Plain files left from the ``local`` backend
+  are still read. Unreferenced objects are removed by the storage sweep.
+* ``s3``: objects in an S3-compatible bucket (AWS S3, MinIO, ...), so API and
+  worker replicas need no shared volume.
+
+Uploads and downloads are streamed in chunks: multipart uploads to S3 buffer
+at most one part, and workers download a blob to a temporary file only for
+the duration of a memorize call.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from app.services.s3 import S3Client
+from app.services.storage import (
+    ARCHIVE_SUFFIX,
+    SweepResult,
+    archive_file,
+    count_reclaimed,
+    expiry_reason,
+    locate,
+    remove_file,
+    storage_path,
+    sweep,
+)
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024
+# Worker-local directory blobs are downloaded to while they are memorized.
+_DOWNLOAD_DIR = Path(tempfile.gettempdir()) / "memu-blobs"
+_GZIP_WBITS = 31
+
+
+async def _once(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+class BlobStore(ABC):
+    """Named blobs with streamed reads and writes.
+
+    Subclasses implement the abstract :meth:`write`, :meth:`read`,
+    :meth:`delete` and :meth:`sweep`; the rest is built on those.
+    """
+
+    @abstractmethod
+    async def write(self, name: str, chunks: AsyncIterable[bytes]) -> int:
+        """Store the stream ``chunks`` as ``name``, replacing any previous blob.
+
+        Readers never see a partial blob. Returns the bytes written.
+        """
+
+    @abstractmethod
+    def read(self, name: str) -> AsyncIterator[bytes]:
+        """Stream the blob ``name``.
+
+        Raises:
+            FileNotFoundError: If there is no such blob.
+        """
+
+    @abstractmethod
+    async def delete(self, name: str) -> int | None:
+        """Remove the blob ``name``; returns its size, or None if it didn't exist."""
+
+    @abstractmethod
+    async def sweep(self, orphan_retention: float, archive_retention: float) -> SweepResult:
+        """Remove blobs past their retention (see ``app.services.storage.expiry_reason``)."""
+
+    async def close(self) -> None:  # noqa: B027 - optional hook, a no-op without connections
+        """Release connections."""
+
+    async def put_bytes(self, name: str, data: bytes) -> None:
+        await self.write(name, _once(data))
+
+    async def read_bytes(self, name: str) -> bytes:
+        return b"".join([chunk async for chunk in self.read(name)])
+
+    @asynccontextmanager
+    async def local_copy(self, name: str) -> AsyncIterator[Path]:
+        """Yield a local file with the blob's content, removed afterwards."""
+        directory = _DOWNLOAD_DIR / uuid.uuid4().hex
+        await asyncio.to_thread(directory.mkdir, parents=True, exist_ok=True)
+        try:
+            path = directory / name
+            handle = await asyncio.to_thread(path.open, "wb")
+            try:
+                async for chunk in self.read(name):
+                    await asyncio.to_thread(handle.write, chunk)
+            finally:
+                await asyncio.to_thread(handle.close)
+            yield path
+        finally:
+            await asyncio.to_thread(shutil.rmtree, directory, ignore_errors=True)
+
+    async def archive(self, name: str) -> int | None:
+        """Replace ``name`` by a gzip-compressed ``<name>.gz``.
+
+        Returns:
+            The bytes saved, or None if there was no such blob.
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, _GZIP_WBITS)
+        original = 0
+
+        async def _compressed() -> AsyncIterator[bytes]:
+            nonlocal original
+            async for chunk in self.read(name):
+                original += len(chunk)
+                if out := compressor.compress(chunk):
+                    yield out
+            yield compressor.flush()
+
+        try:
+            written = await self.write(name + ARCHIVE_SUFFIX, _compressed())
+        except FileNotFoundError:
+            return None
+        await self.delete(name)
+        return max(original - written, 0)
+
+
+class LocalBlobStore(BlobStore):
+    """Plain files in ``root``, optionally in hashed subdirectories."""
+
+    def __init__(self, root: Path, sharded: bool = False) -> None:
+        self.root = root
+        self.sharded = sharded
+
+    def _partial(self, target: Path) -> Path:
+        return target.with_name(f".{target.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+    async def write(self, name: str, chunks: AsyncIterable[bytes]) -> int:
+        target = await asyncio.to_thread(storage_path, self.root, name, self.sharded)
+        partial = self._partial(target)
+        handle = await asyncio.to_thread(partial.open, "wb")
+        written = 0
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                written += len(chunk)
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(os.replace, partial, target)
+        except BaseException:
+            handle.close()
+            partial.unlink(missing_ok=True)
+            raise
+        return written
+
+    async def put_bytes(self, name: str, data: bytes) -> None:
+        def _put() -> None:
+            target = storage_path(self.root, name, self.sharded)
+            partial = self._partial(target)
+            partial.write_bytes(data)
+            os.replace(partial, target)
+
+        await asyncio.to_thread(_put)
+
+    async def read(self, name: str) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(lambda: locate(self.root, name).open("rb"))
+        try:
+            while chunk := await asyncio.to_thread(handle.read, CHUNK_BYTES):
+                yield chunk
+        finally:
+            handle.close()
+
+    async def read_bytes(self, name: str) -> bytes:
+        return await asyncio.to_thread(lambda: locate(self.root, name).read_bytes())
+
+    @asynccontextmanager
+    async def local_copy(self, name: str) -> AsyncIterator[Path]:
+        # Memorized in place.
+        yield await asyncio.to_thread(locate, self.root, name)
+
+    async def delete(self, name: str) -> int | None:
+        return await asyncio.to_thread(lambda: remove_file(locate(self.root, name)))
+
+    async def archive(self, name: str) -> int | None:
+        return await asyncio.to_thread(lambda: archive_file(locate(self.root, name)))
+
+    async def sweep(self, orphan_retention: float, archive_retention: float) -> SweepResult:
+        return await asyncio.to_thread(sweep, self.root, orphan_retention, archive_retention)
+
+
+class CompressedBlobStore(BlobStore):
+    """Content-addressed, gzip-compressed blobs in ``root``.
+
+    Objects live in ``root/objects/<aa>/<bb>/<sha256>.gz``; each name is a
+    sharded reference file containing ``sha256:<hex>``. Deleting a name
+    removes its reference; :meth:`sweep` removes objects no reference points
+    to (after a grace period covering writes in progress).
+    """
+
+    REF_PREFIX = b"sha256:"
+    _REF_BYTES = len(REF_PREFIX) + 64
+    GC_GRACE_SECONDS = 3600.0
+
+    def __init__(self, root: Path, level: int = 6) -> None:
+        self.root = root
+        self.objects = root / "objects"
+        self.level = level
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:4] / f"{digest}.gz"
+
+    async def write(self, name: str, chunks: AsyncIterable[bytes]) -> int:
+        await asyncio.to_thread(self.objects.mkdir, parents=True, exist_ok=True)
+        partial = self.objects / f".obj-{os.getpid()}-{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _GZIP_WBITS)
+        handle = await asyncio.to_thread(partial.open, "wb")
+        written = 0
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                written += len(chunk)
+                await asyncio.to_thread(handle.write, compressor.compress(chunk))
+            tail = compressor.flush()
+            await asyncio.to_thread(self._commit, handle, tail, partial, digest.hexdigest(), name, written)
+        except BaseException:
+            handle.close()
+            partial.unlink(missing_ok=True)
+            raise
+        return written
+
+    def _commit(self, handle: BinaryIO, tail: bytes, partial: Path, digest: str, name: str, size: int) -> None:
+        handle.write(tail)
+        handle.close()
+        target = self._object_path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            partial.unlink()
+            # Fresh mtime keeps the object out of a concurrent sweep's reach.
+            os.utime(target)
+            metrics.inc("memu_storage_bytes_deduplicated", size)
+        else:
+            os.replace(partial, target)
+        ref = storage_path(self.root, name, sharded=True)
+        partial_ref = ref.with_name(f".{name}.{os.getpid()}.tmp")
+        partial_ref.write_bytes(self.REF_PREFIX + digest.encode("ascii"))
+        os.replace(partial_ref, ref)
+
+    def _resolve(self, name: str) -> tuple[Path, bool]:
+        """The file holding ``name``'s content, and whether it is a compressed object."""
+        ref = locate(self.root, name)
+        with ref.open("rb") as handle:
+            head = handle.read(self._REF_BYTES + 1)
+        if len(head) == self._REF_BYTES and head.startswith(self.REF_PREFIX):
+            return self._object_path(head[len(self.REF_PREFIX) :].decode("ascii")), True
+        return ref, False
+
+    async def read(self, name: str) -> AsyncIterator[bytes]:
+        path, compressed = await asyncio.to_thread(self._resolve, name)
+        handle = await asyncio.to_thread(path.open, "rb")
+        decompressor = zlib.decompressobj(_GZIP_WBITS) if compressed else None
+        try:
+            while raw := await asyncio.to_thread(handle.read, CHUNK_BYTES):
+                chunk = decompressor.decompress(raw) if decompressor else raw
+                if chunk:
+                    yield chunk
+            if decompressor and (tail := decompressor.flush()):
+                yield tail
+        finally:
+            handle.close()
+
+    async def delete(self, name: str) -> int | None:
+        return await asyncio.to_thread(lambda: remove_file(locate(self.root, name)))
+
+    async def archive(self, name: str) -> int | None:
+        # Already compressed: rename the reference so archive retention applies.
+        def _rename() -> int | None:
+            ref = locate(self.root, name)
+            if not ref.exists():
+                return None
+            os.replace(ref, storage_path(self.root, name + ARCHIVE_SUFFIX, sharded=True))
+            return 0
+
+        return await asyncio.to_thread(_rename)
+
+    async def sweep(self, orphan_retention: float, archive_retention: float) -> SweepResult:
+        def _sweep() -> SweepResult:
+            result = sweep(self.root, orphan_retention, archive_retention, skip=self.objects)
+            result.bytes_reclaimed += self._collect_garbage()
+            return result
+
+        return await asyncio.to_thread(_sweep)
+
+    def _collect_garbage(self) -> int:
+        """Remove objects (and abandoned partial writes) no reference points to."""
+        live: set[str] = set()
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if Path(dirpath) / d != self.objects]
+            for filename in filenames:
+                try:
+                    with (Path(dirpath) / filename).open("rb") as handle:
+                        head = handle.read(self._REF_BYTES + 1)
+                except OSError:
+                    continue
+                if len(head) == self._REF_BYTES and head.startswith(self.REF_PREFIX):
+                    live.add(head[len(self.REF_PREFIX) :].decode("ascii"))
+        reclaimed = 0
+        now = time.time()
+        for dirpath, _dirnames, filenames in os.walk(self.objects):
+            for filename in filenames:
+                if filename.removesuffix(".gz") in live:
+                    continue
+                path = Path(dirpath) / filename
+                try:
+                    if now - path.stat().st_mtime <= self.GC_GRACE_SECONDS:
+                        continue
+                except FileNotFoundError:
+                    continue
+                size = remove_file(path) or 0
+                count_reclaimed("unreferenced", size)
+                reclaimed += size
+        return reclaimed
+
+
+class S3BlobStore(BlobStore):
+    """Objects ``<prefix><name>`` in an S3-compatible bucket."""
+
+    def __init__(self, client: S3Client, prefix: str = "", part_bytes: int = 8 * 1024 * 1024) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.part_bytes = part_bytes
+
+    async def write(self, name: str, chunks: AsyncIterable[bytes]) -> int:
+        return await self.client.upload(self.prefix + name, chunks, self.part_bytes)
+
+    async def put_bytes(self, name: str, data: bytes) -> None:
+        if len(data) < self.part_bytes:
+            await self.client.put_object(self.prefix + name, data)
+        else:
+            await super().put_bytes(name, data)
+
+    async def read(self, name: str) -> AsyncIterator[bytes]:
+        async for chunk in self.client.get_object(self.prefix + name):
+            yield chunk
+
+    async def delete(self, name: str) -> int | None:
+        size = await self.client.head_object(self.prefix + name)
+        if size is not None:
+            await self.client.delete_object(self.prefix + name)
+        return size
+
+    async def sweep(self, orphan_retention: float, archive_retention: float) -> SweepResult:
+        result = SweepResult()
+        now = time.time()
+        async for obj in self.client.list_objects(self.prefix):
+            name = obj.key[len(self.prefix) :]
+            reason = expiry_reason(name, now - obj.last_modified, orphan_retention, archive_retention)
+            if reason is None:
+                continue
+            await self.client.delete_object(obj.key)
+            count_reclaimed(reason, obj.size)
+            result.bytes_reclaimed += obj.size
+            if reason == "orphan":
+                result.orphans += 1
+            else:
+                result.archives += 1
+        return result
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_blob_store(settings: Settings, root: Path | None = None) -> BlobStore:
+    """Build the STORAGE_BACKEND store; ``root`` overrides STORAGE_PATH for disk backends.
+
+    Raises:
+        ValueError: If the S3 backend is selected without an endpoint or bucket.
+    """
+    root = root if root is not None else Path(settings.STORAGE_PATH).resolve()
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.STORAGE_S3_ENDPOINT_URL or not settings.STORAGE_S3_BUCKET:
+            raise ValueError("STORAGE_S3_ENDPOINT_URL and STORAGE_S3_BUCKET must be set for STORAGE_BACKEND=s3")
+        client = S3Client(
+            settings.STORAGE_S3_ENDPOINT_URL,
+            settings.STORAGE_S3_BUCKET,
+            settings.STORAGE_S3_ACCESS_KEY_ID,
+            settings.STORAGE_S3_SECRET_ACCESS_KEY,
+            region=settings.STORAGE_S3_REGION,
+        )
+        return S3BlobStore(client, settings.STORAGE_S3_PREFIX, settings.STORAGE_S3_PART_BYTES)
+    if settings.STORAGE_BACKEND == "compressed":
+        return CompressedBlobStore(root)
+    return LocalBlobStore(root, settings.STORAGE_SHARDING)
+
+
+# Per-process S3 stores, which hold a connection pool; disk stores are cheap to build.
+_shared_stores: dict[tuple[str, ...], BlobStore] = {}
+
+
+def get_blob_store(settings: Settings) -> BlobStore:
+    """The process's store for ``settings`` (S3 stores are reused across calls)."""
+    if settings.STORAGE_BACKEND != "s3":
+        return create_blob_store(settings)
+    key = (
+        settings.STORAGE_S3_ENDPOINT_URL,
+        settings.STORAGE_S3_BUCKET,
+        settings.STORAGE_S3_PREFIX,
+        settings.STORAGE_S3_ACCESS_KEY_ID,
+    )
+    store = _shared_stores.get(key)
+    if store is None:
+        store = _shared_stores[key] = create_blob_store(settings)
+    return store
+
+
+async def close_blob_stores() -> None:
+    """Close the stores :func:`get_blob_store` shared (called on worker shutdown)."""
+    stores = list(_shared_stores.values())
+    _shared_stores.clear()
+    for store in stores:
+        await store.close()
+
+
+async def release_files(store: BlobStore, names: Iterable[str], mode: str) -> int:
+    """Delete (``mode="delete"``) or archive (``"archive"``) finished task files.
+
+    ``"keep"`` leaves them alone. Missing files and names with path
+    components are skipped.
+
+    Returns:
+        Bytes reclaimed.
+    """
+    if mode == "keep":
+        return 0
+    reclaimed = 0
+    for name in names:
+        if not name or Path(name).name != name:
+            continue
+        if mode == "archive":
+            saved = await store.archive(name)
+            if saved is not None:
+                metrics.inc("memu_storage_files_archived")
+                metrics.inc("memu_storage_bytes_reclaimed", saved, attributes={"reason": "archived"})
+                reclaimed += saved
+        else:
+            size = await store.delete(name)
+            if size is not None:
+                count_reclaimed("completed", size)
+                reclaimed += size
+    return reclaimed
+
+
+async def run_sweeper(store: BlobStore, orphan_retention: float, archive_retention: float, interval: float) -> None:
+    """Sweep ``store`` every ``interval`` seconds until cancelled."""
+    while True:
+        try:
+            swept = await store.sweep(orphan_retention, archive_retention)
+        except Exception:
+            logger.exception("Storage sweep failed")
+        else:
+            if swept.orphans or swept.archives or swept.bytes_reclaimed:
+                logger.info(
+                    "Storage sweep removed %d orphaned and %d archived files (%d bytes reclaimed)",
+                    swept.orphans,
+                    swept.archives,
+                    swept.bytes_reclaimed,
+                )
+        await asyncio.sleep(interval)
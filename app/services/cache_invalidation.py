@@ -0,0 +1,35 @@
+"""Cross-replica cache invalidation over Postgres LISTEN/NOTIFY.
+
+Whoever changes a user's memories (the worker after ``task_memorize``, or the
+API server handling ``/clear``) calls :func:`publish_invalidation`. Every API
+replica subscribes to :data:`INVALIDATION_CHANNEL` through its
+:class:`~app.services.notifications.PostgresListener` and applies the
+payloads to its :class:`~app.services.response_cache.GenerationTracker` with
+:func:`apply_invalidation`.
+"""
+
+import json
+
+from app.services.notifications import notify
+from app.services.response_cache import GenerationTracker
+
+INVALIDATION_CHANNEL = "memu_cache_invalidate"
+
+
+def parse_invalidation(payload: str) -> str | None:
+    """Return the user_id in a notification payload; None (invalidate all) if unreadable."""
+    try:
+        user_id = json.loads(payload).get("user_id")
+    except (ValueError, AttributeError):
+        return None
+    return user_id if isinstance(user_id, str) else None
+
+
+def apply_invalidation(tracker: GenerationTracker, payload: str) -> None:
+    """Bump the generation named by an invalidation payload."""
+    tracker.bump(parse_invalidation(payload))
+
+
+async def publish_invalidation(dsn: str, user_id: str | None) -> None:
+    """Notify every listening replica that ``user_id`` (or, if None, everyone) changed."""
+    await notify(dsn, INVALIDATION_CHANNEL, json.dumps({"user_id": user_id}))
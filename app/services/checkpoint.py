@@ -0,0 +1,252 @@
+"""Heartbeats and resumable checkpoints for memorize activities.
+
+A memorize call runs memu's ``memorize`` pipeline (ingest, preprocess,
+extract, dedupe, categorize, persist, respond). Extraction is the expensive
+LLM step and categorization writes the items to the database, so progress is
+checkpointed after each of them:
+
+* ``extracted`` — the extracted memories and captions; a retry skips
+  straight to categorization instead of calling the LLM again.
+* ``persisted`` — the items are stored; a retry only rewrites the category
+  summaries and rebuilds the response, so no duplicate items are created.
+
+A resumed attempt always reads its own copy of the conversation, never a
+path from the checkpoint: inline and merged conversations live in a
+temporary file per attempt, which is gone by the time the next one starts.
+
+Checkpoints travel as Temporal heartbeat details, which the server hands to
+the next attempt of the same activity. The activity also heartbeats on a
+timer while a step is running, so a worker that dies is noticed within the
+heartbeat timeout instead of the full start-to-close timeout.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import Callable, Mapping
+from datetime import timedelta
+from typing import Any
+
+from memu.app import MemoryService
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Heartbeat timeout of the memorize activities; a worker that has not
+# heartbeated for this long is presumed dead and the attempt is retried.
+HEARTBEAT_TIMEOUT = timedelta(seconds=30)
+
+STAGE_EXTRACTED = "extracted"
+STAGE_PERSISTED = "persisted"
+
+# First step re-run when resuming from an ``extracted`` checkpoint.
+_RESUME_STEP = "dedupe_merge"
+
+# Heartbeat details larger than this carry progress only (no resume data);
+# Temporal rejects payloads over a few MB.
+MAX_CHECKPOINT_BYTES = 1_000_000
+
+
+class MemorizeCheckpointer:
+    """Workflow-step interceptor that records and heartbeats a memorize call's progress.
+
+    memu interceptors are registered per service and the service is shared by
+    concurrent activities, so steps are matched to this call by resource URL.
+    """
+
+    def __init__(
+        self,
+        service: MemoryService,
+        resource_url: str,
+        heartbeat: Callable[..., None] | None,
+        checkpoint: Mapping[str, Any] | None = None,
+        max_bytes: int = MAX_CHECKPOINT_BYTES,
+    ) -> None:
+        self._service = service
+        self._resource_url = resource_url
+        self._heartbeat = heartbeat
+        self._max_bytes = max_bytes
+        # Keep re-sending the previous attempt's checkpoint until this one passes it.
+        self._checkpoint: dict[str, Any] | None = dict(checkpoint) if checkpoint else None
+        self.details: dict[str, Any] = dict(checkpoint) if checkpoint else {}
+
+    def after_step(self, step_context: Any, state: Mapping[str, Any]) -> None:
+        if step_context.workflow_name != "memorize" or state.get("resource_url") != self._resource_url:
+            return
+        if step_context.step_id == "extract_items":
+            self._checkpoint = {
+                "stage": STAGE_EXTRACTED,
+                # Segment text is not needed after extraction and dominates the
+                # size; segment URLs are rebuilt from the resuming attempt's file.
+                "resource_plans": [
+                    {k: v for k, v in plan.items() if k not in ("text", "resource_url")}
+                    for plan in state.get("resource_plans", [])
+                ],
+            }
+        elif step_context.step_id == "categorize_items":
+            dump = self._service._model_dump_without_embeddings
+            self._checkpoint = {
+                "stage": STAGE_PERSISTED,
+                "category_updates": state.get("category_updates", {}),
+                "resources": [dump(r) for r in state.get("resources", [])],
+                "items": [dump(i) for i in state.get("items", [])],
+                "relations": [r.model_dump() for r in state.get("relations", [])],
+            }
+        details: dict[str, Any] = {"step": step_context.step_id}
+        if self._checkpoint is not None:
+            encoded = json.dumps(self._checkpoint, default=str)
+            if len(encoded) <= self._max_bytes:
+                details.update(json.loads(encoded))
+            else:
+                logger.warning(
+                    "Memorize checkpoint for %s is %d bytes; not resumable", self._resource_url, len(encoded)
+                )
+        self.details = details
+        self.beat()
+
+    def beat(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat(self.details)
+
+
+async def memorize_with_checkpoints(
+    service: MemoryService,
+    *,
+    resource_url: str,
+    user: dict[str, Any],
+    checkpoint: Mapping[str, Any] | None = None,
+    heartbeat: Callable[..., None] | None = None,
+    heartbeat_interval: float = 10.0,
+    update_summaries: bool = True,
+) -> dict[str, Any]:
+    """Run ``service.memorize``, heartbeating progress and resuming from ``checkpoint``.
+
+    Args:
+        service: The memu MemoryService.
+        resource_url: Local path of the conversation.
+        user: The memu user scope.
+        checkpoint: Heartbeat details of the previous attempt, if any.
+        heartbeat: ``activity.heartbeat`` (None outside an activity).
+        heartbeat_interval: Seconds between timer heartbeats.
+        update_summaries: Whether resuming after persisted items rewrites the
+            category summaries (False for chunk parts, which leave them to
+            the consolidation step).
+
+    Returns:
+        The memorize response.
+    """
+    if not isinstance(checkpoint, Mapping) or checkpoint.get("stage") not in (STAGE_EXTRACTED, STAGE_PERSISTED):
+        checkpoint = None
+    stage = checkpoint.get("stage") if checkpoint else None
+    checkpointer = MemorizeCheckpointer(service, resource_url, heartbeat, checkpoint)
+    handle = service.intercept_after_workflow_step(checkpointer.after_step, name="memu-server-checkpoint")
+    checkpointer.beat()
+    ticker = asyncio.create_task(_tick(checkpointer, heartbeat_interval)) if heartbeat else None
+    try:
+        if stage == STAGE_PERSISTED:
+            metrics.inc("memu_memorize_resumed", attributes={"stage": STAGE_PERSISTED})
+            logger.info("Resuming memorize of %s after persisted items", resource_url)
+            return await _resume_persisted(service, user, checkpoint or {}, update_summaries=update_summaries)
+        if stage == STAGE_EXTRACTED:
+            metrics.inc("memu_memorize_resumed", attributes={"stage": STAGE_EXTRACTED})
+            logger.info("Resuming memorize of %s after extraction", resource_url)
+            return await _resume_extracted(service, resource_url, user, checkpoint or {})
+        response: dict[str, Any] = await service.memorize(resource_url=resource_url, modality="conversation", user=user)
+        return response
+    finally:
+        if ticker is not None:
+            ticker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await ticker
+        handle.dispose()
+
+
+async def _tick(checkpointer: MemorizeCheckpointer, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        checkpointer.beat()
+
+
+async def _resume_extracted(
+    service: MemoryService, resource_url: str, user: dict[str, Any], checkpoint: Mapping[str, Any]
+) -> dict[str, Any]:
+    """Run the memorize pipeline from dedupe onwards with the checkpointed plans.
+
+    Mirrors ``MemoryService.memorize`` but seeds the state with what the
+    ingest and extract steps produced, ingesting this attempt's
+    ``resource_url`` again (a file copy, no LLM call).
+    """
+    ctx = service._get_context()
+    store = service._get_database()
+    user_scope = service.user_model(**user).model_dump()
+    await service._ensure_categories_ready(ctx, store, user_scope)
+    local_path, _ = await service.fs.fetch(resource_url, "conversation")
+    plans = list(checkpoint.get("resource_plans") or [])
+    state = {
+        "resource_url": resource_url,
+        "modality": "conversation",
+        "memory_types": service._resolve_memory_types(),
+        "categories_prompt_str": service._category_prompt_str,
+        "ctx": ctx,
+        "store": store,
+        "category_ids": list(ctx.category_ids),
+        "user": user_scope,
+        "local_path": local_path,
+        "resource_plans": [
+            {**plan, "resource_url": service._segment_resource_url(resource_url, index, len(plans))}
+            for index, plan in enumerate(plans)
+        ],
+    }
+    steps = service._pipelines.build("memorize")
+    start = next(i for i, step in enumerate(steps) if step.step_id == _RESUME_STEP)
+    result = await service._workflow_runner.run(
+        "memorize",
+        steps[start:],
+        state,
+        {"workflow_name": "memorize"},
+        interceptor_registry=service._workflow_interceptors,
+    )
+    response = result.get("response")
+    if not isinstance(response, dict):
+        raise RuntimeError("Memorize workflow failed to produce a response")
+    return response
+
+
+async def _resume_persisted(
+    service: MemoryService, user: dict[str, Any], checkpoint: Mapping[str, Any], *, update_summaries: bool = True
+) -> dict[str, Any]:
+    """Rewrite the category summaries for already-stored items and rebuild the response.
+
+    Rewriting a summary that the previous attempt already updated folds the
+    same memories in again, which the summary prompt tolerates far better than
+    duplicate items.
+    """
+    ctx = service._get_context()
+    store = service._get_database()
+    user_scope = service.user_model(**user).model_dump()
+    await service._ensure_categories_ready(ctx, store, user_scope)
+    if update_summaries:
+        await service._update_category_summaries(
+            dict(checkpoint.get("category_updates") or {}),
+            ctx=ctx,
+            store=store,
+            llm_client=service._get_llm_client(service.memorize_config.category_update_llm_profile),
+        )
+    categories = [
+        service._model_dump_without_embeddings(store.memory_category_repo.categories[c])
+        for c in ctx.category_ids
+        if c in store.memory_category_repo.categories
+    ]
+    resources = list(checkpoint.get("resources") or [])
+    response: dict[str, Any] = {
+        "items": list(checkpoint.get("items") or []),
+        "categories": categories,
+        "relations": list(checkpoint.get("relations") or []),
+    }
+    if len(resources) == 1:
+        response["resource"] = resources[0]
+    else:
+        response["resources"] = resources
+    return response
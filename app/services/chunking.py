@@ -0,0 +1,134 @@
+"""Splitting long conversations for parallel memorization.
+
+With MEMORIZE_CHUNK_TOKENS set, a conversation whose estimated size exceeds
+the limit is split at message boundaries into parts of at most that many
+tokens. Each part is memorized by its own activity (so parts run in parallel
+on any worker) with a service whose memorize pipeline leaves the category
+summaries alone (see :func:`skip_category_summaries`); the final step then
+summarizes every touched category once, with the new memories of all parts,
+instead of each part racing to rewrite it from what it saw.
+
+Token counts are estimated from the message text (about four characters per
+token), which is close enough for sizing work without a tokenizer.
+"""
+
+import asyncio
+import json
+from collections.abc import Mapping
+from typing import Any
+
+from memu.app import MemoryService
+from memu.workflow import WorkflowStep
+
+from app.services.coalescing import conversation_messages
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(message: Any) -> int:
+    """Rough token count of one message (its JSON form, roles and timestamps included)."""
+    return len(json.dumps(message, ensure_ascii=False)) // CHARS_PER_TOKEN + 1
+
+
+def split_messages(messages: list[dict], max_tokens: int) -> list[list[dict]]:
+    """Split ``messages`` into consecutive parts of at most ``max_tokens`` (estimated).
+
+    A single message larger than the limit becomes a part of its own.
+    """
+    parts: list[list[dict]] = []
+    current: list[dict] = []
+    current_tokens = 0
+    for message in messages:
+        tokens = estimate_tokens(message)
+        if current and current_tokens + tokens > max_tokens:
+            parts.append(current)
+            current, current_tokens = [], 0
+        current.append(message)
+        current_tokens += tokens
+    if current:
+        parts.append(current)
+    return parts
+
+
+def needs_chunking(conversation: Any, max_tokens: int) -> bool:
+    """Whether ``conversation`` is a message list estimated at more than ``max_tokens``."""
+    if max_tokens <= 0:
+        return False
+    messages = conversation_messages(conversation)
+    if messages is None:
+        return False
+    return sum(estimate_tokens(m) for m in messages) > max_tokens
+
+
+def category_updates(result: Any) -> dict[str, list[str]]:
+    """Map category ID to the summaries of the items a memorize result added to it."""
+    if not isinstance(result, Mapping):
+        return {}
+    summaries = {item.get("id"): item.get("summary") for item in result.get("items") or [] if isinstance(item, dict)}
+    updates: dict[str, list[str]] = {}
+    for relation in result.get("relations") or []:
+        if not isinstance(relation, dict):
+            continue
+        summary = summaries.get(relation.get("item_id"))
+        category_id = relation.get("category_id")
+        if isinstance(summary, str) and summary.strip() and isinstance(category_id, str):
+            updates.setdefault(category_id, []).append(summary)
+    return updates
+
+
+def merge_category_updates(updates: list[Mapping[str, list[str]]]) -> dict[str, list[str]]:
+    merged: dict[str, list[str]] = {}
+    for part in updates:
+        for category_id, summaries in part.items():
+            merged.setdefault(category_id, []).extend(summaries)
+    return merged
+
+
+def _keep_state(state: dict[str, Any], step_context: Any) -> dict[str, Any]:
+    return state
+
+
+def skip_category_summaries(service: MemoryService) -> MemoryService:
+    """Replace ``service``'s category summary step with one that only passes the state on.
+
+    Used for the services of chunk parts, whose summaries are written once by
+    :func:`consolidate_categories`. The service must not be shared with other
+    tasks, since the change applies to every memorize call it makes.
+    """
+    service.replace_step(
+        target_step_id="persist_index",
+        new_step=WorkflowStep(
+            step_id="persist_index",
+            role="persist",
+            handler=_keep_state,
+            requires={"category_updates"},
+            produces={"categories"},
+        ),
+    )
+    return service
+
+
+async def consolidate_categories(service: MemoryService, user_id: str, updates: Mapping[str, list[str]]) -> int:
+    """Summarize each category in ``updates`` from its current summary plus all new memories.
+
+    The user's categories are reloaded from the database first, since the
+    parts may have been memorized by other workers.
+
+    Returns:
+        The number of categories updated.
+    """
+    if not updates:
+        return 0
+    # A private memu method (memu-py is pinned to 1.2.x); fail clearly if it goes away.
+    update_summaries = getattr(service, "_update_category_summaries", None)
+    if update_summaries is None:
+        raise RuntimeError("This memu-py version has no MemoryService._update_category_summaries")
+    store = service._get_database()
+    await asyncio.to_thread(store.memory_category_repo.list_categories, {"user_id": user_id})
+    await update_summaries(
+        dict(updates),
+        ctx=service._get_context(),
+        store=store,
+        llm_client=service._get_llm_client(service.memorize_config.category_update_llm_profile),
+    )
+    return sum(1 for cid in updates if cid in store.memory_category_repo.categories)
@@ -0,0 +1,65 @@
+"""Helpers for coalescing a user's memorize tasks into merged batches.
+
+With MEMORIZE_COALESCE_WINDOW_SECONDS set, each submitted task still gets its
+own ``MemorizeWorkflow`` (and so its own task ID and status), but instead of
+memorizing on its own it enqueues itself with the user's
+``MemorizeCoalesceWorkflow``. That workflow collects tasks for up to the
+window (or until MEMORIZE_COALESCE_MAX_ITEMS are pending), memorizes each
+group of compatible tasks with one ``service.memorize`` call and reports the
+outcome back to every task.
+"""
+
+import hashlib
+import json
+from typing import Any
+
+COALESCE_WORKFLOW_PREFIX = "memorize-coalesce-"
+
+
+def conversation_messages(conversation: Any) -> list[dict] | None:
+    """Return the message list of a conversation, or None if it is not in a mergeable form.
+
+    memu-py accepts a JSON list of messages or a dict with a ``content`` list.
+    """
+    if isinstance(conversation, list):
+        messages = conversation
+    elif isinstance(conversation, dict) and isinstance(conversation.get("content"), list):
+        messages = conversation["content"]
+    else:
+        return None
+    if not all(isinstance(m, dict) for m in messages):
+        return None
+    return messages
+
+
+def merge_conversations(conversations: list[Any]) -> list[dict] | None:
+    """Concatenate conversations in order, or return None if any cannot be merged."""
+    merged: list[dict] = []
+    for conversation in conversations:
+        messages = conversation_messages(conversation)
+        if messages is None:
+            return None
+        merged.extend(messages)
+    return merged
+
+
+def coalesce_workflow_id(user_id: str, priority: str | None = None) -> str:
+    """Return the ID of the coalescing workflow for ``user_id``.
+
+    Bulk tasks get a coalescer of their own, on their own task queue, so
+    they are never merged into (and never hold up) a user's interactive ones.
+    """
+    digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+    if priority not in (None, "interactive"):
+        return f"{COALESCE_WORKFLOW_PREFIX}{priority}-{digest}"
+    return COALESCE_WORKFLOW_PREFIX + digest
+
+
+def coalesce_group_key(spec: dict) -> str:
+    """Key of the tasks that may be memorized together (same agent and config override)."""
+    return json.dumps(
+        [spec.get("agent_id", ""), spec.get("override_config") or {}],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
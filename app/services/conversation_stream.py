@@ -0,0 +1,223 @@
+"""Incremental parsing of conversations uploaded to PUT /memorize/stream.
+
+A streamed conversation is a list of messages sent either as NDJSON (one
+message object per line) or as one JSON array. The splitters below cut the
+request body into single messages as chunks arrive, so only the message
+being read is ever buffered; each message is then decoded and checked on its
+own, and rejected uploads fail at the first bad message rather than after the
+whole body was read.
+"""
+
+import json
+import re
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+NDJSON = "ndjson"
+JSON_ARRAY = "json"
+
+_WHITESPACE = b" \t\r\n"
+# Outside strings, only quotes and braces matter for finding where a message
+# object ends; inside strings, only quotes and escapes.
+_STRUCTURE = re.compile(rb'["{}]')
+_STRING = re.compile(rb'["\\]')
+
+# Array splitter states.
+_START, _FIRST, _NEXT, _MESSAGE, _AFTER, _DONE = range(6)
+
+
+class ConversationStreamError(ValueError):
+    """A streamed conversation is malformed.
+
+    Attributes:
+        index: Position of the offending message (0-based), if any.
+    """
+
+    def __init__(self, message: str, index: int | None = None) -> None:
+        super().__init__(message)
+        self.index = index
+
+
+def stream_format(content_type: str | None) -> str | None:
+    """Upload format for a ``Content-Type`` header, or None if unsupported."""
+    media_type = (content_type or "application/json").split(";", 1)[0].strip().lower()
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"):
+        return NDJSON
+    if media_type == "application/json":
+        return JSON_ARRAY
+    return None
+
+
+def validate_message(message: Any, index: int) -> dict:
+    """Check that ``message`` has the shape memu expects of a conversation message."""
+    if not isinstance(message, dict):
+        raise ConversationStreamError(f"message {index} must be a JSON object", index)
+    role = message.get("role")
+    if not isinstance(role, str) or not role.strip():
+        raise ConversationStreamError(f"message {index} needs a non-empty string 'role'", index)
+    if not isinstance(message.get("content"), str | dict):
+        raise ConversationStreamError(f"message {index} needs a 'content' string or object", index)
+    return message
+
+
+class NdjsonSplitter:
+    """Cuts an NDJSON body into lines; blank lines are skipped."""
+
+    def __init__(self, max_message_bytes: int) -> None:
+        self.max_message_bytes = max_message_bytes
+        self._buffer = bytearray()
+        self._count = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        messages: list[bytes] = []
+        start = 0
+        while (end := data.find(b"\n", start)) != -1:
+            self._buffer += data[start:end]
+            self._emit(messages)
+            start = end + 1
+        self._buffer += data[start:]
+        self._check_size()
+        return messages
+
+    def close(self) -> list[bytes]:
+        messages: list[bytes] = []
+        self._emit(messages)
+        return messages
+
+    def _emit(self, messages: list[bytes]) -> None:
+        self._check_size()
+        line = bytes(self._buffer).strip()
+        self._buffer.clear()
+        if line:
+            messages.append(line)
+            self._count += 1
+
+    def _check_size(self) -> None:
+        if len(self._buffer) > self.max_message_bytes:
+            raise ConversationStreamError(f"message {self._count} exceeds {self.max_message_bytes} bytes", self._count)
+
+
+class JsonArraySplitter:
+    """Cuts a JSON array of objects into its elements.
+
+    Only finds element boundaries (string- and escape-aware brace matching);
+    the elements themselves are validated when they are decoded.
+    """
+
+    def __init__(self, max_message_bytes: int) -> None:
+        self.max_message_bytes = max_message_bytes
+        self._state = _START
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._message = bytearray()
+        self._count = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        messages: list[bytes] = []
+        i, n = 0, len(data)
+        while i < n:
+            if self._state == _MESSAGE:
+                i = self._scan_message(data, i, messages)
+                continue
+            byte = data[i]
+            if byte in _WHITESPACE:
+                i += 1
+            elif self._state == _START:
+                if byte != ord("["):
+                    raise ConversationStreamError("body must be a JSON array of messages")
+                self._state = _FIRST
+                i += 1
+            elif self._state in (_FIRST, _NEXT):
+                if byte == ord("]") and self._state == _FIRST:
+                    self._state = _DONE
+                    i += 1
+                elif byte == ord("{"):
+                    self._state = _MESSAGE
+                else:
+                    raise ConversationStreamError(f"message {self._count} must be a JSON object", self._count)
+            elif self._state == _AFTER:
+                if byte == ord(","):
+                    self._state = _NEXT
+                elif byte == ord("]"):
+                    self._state = _DONE
+                else:
+                    raise ConversationStreamError(f"expected ',' or ']' after message {self._count - 1}")
+                i += 1
+            else:
+                raise ConversationStreamError("unexpected data after the end of the array")
+        return messages
+
+    def close(self) -> list[bytes]:
+        if self._state != _DONE:
+            raise ConversationStreamError("body ended before the end of the JSON array")
+        return []
+
+    def _scan_message(self, data: bytes, i: int, messages: list[bytes]) -> int:
+        start, n = i, len(data)
+        complete = False
+        while i < n:
+            if self._escape:
+                self._escape = False
+                i += 1
+            elif self._in_string:
+                match = _STRING.search(data, i)
+                if match is None:
+                    i = n
+                    break
+                i = match.end()
+                if match.group() == b"\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+            else:
+                match = _STRUCTURE.search(data, i)
+                if match is None:
+                    i = n
+                    break
+                i = match.end()
+                token = match.group()
+                if token == b'"':
+                    self._in_string = True
+                elif token == b"{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        complete = True
+                        break
+        self._message += data[start:i]
+        if len(self._message) > self.max_message_bytes:
+            raise ConversationStreamError(f"message {self._count} exceeds {self.max_message_bytes} bytes", self._count)
+        if complete:
+            messages.append(bytes(self._message))
+            self._message.clear()
+            self._count += 1
+            self._state = _AFTER
+        return i
+
+
+async def iter_messages(chunks: AsyncIterable[bytes], fmt: str, max_message_bytes: int) -> AsyncIterator[dict]:
+    """Yield the validated messages of a streamed conversation as its chunks arrive.
+
+    Raises:
+        ConversationStreamError: At the first malformed message, or if the
+            body is not a complete NDJSON stream or JSON array.
+    """
+    splitter = NdjsonSplitter(max_message_bytes) if fmt == NDJSON else JsonArraySplitter(max_message_bytes)
+    index = 0
+    async for chunk in chunks:
+        for raw in splitter.feed(chunk):
+            yield _decode(raw, index)
+            index += 1
+    for raw in splitter.close():
+        yield _decode(raw, index)
+        index += 1
+
+
+def _decode(raw: bytes, index: int) -> dict:
+    try:
+        message = json.loads(raw)
+    except ValueError as exc:
+        raise ConversationStreamError(f"message {index} is not valid JSON: {exc}", index) from exc
+    return validate_message(message, index)
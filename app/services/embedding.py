@@ -0,0 +1,243 @@
+"""Embedding helpers layered over memu-py's LLM clients.
+
+memu-py embeds the query inside ``service.retrieve()``, one call per query.
+To serve several queries with a single provider round trip, the API server
+embeds them up front with :func:`embed_texts` and publishes the vectors via
+:func:`prefetched_embeddings`. :class:`PrefetchingEmbeddingClient`, installed
+as the service's embedding client by :func:`install_embedding_prefetch`,
+answers from those vectors and only forwards texts it has not seen.
+
+:class:`CachingEmbeddingClient` (installed by :func:`install_embedding_cache`)
+sits underneath and serves repeated texts from an
+:class:`~app.services.embedding_cache.EmbeddingCache`.
+
+Each memorize activity embeds its own handful of items.
+:class:`BatchingEmbeddingClient` (installed by
+:func:`install_embedding_batching`) hands those calls to a process-wide
+:class:`EmbeddingBatcher`, which gathers the texts of all in-flight
+activities for a few milliseconds and embeds them with one provider request.
+"""
+
+import asyncio
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from memu.app import MemoryService
+
+from app.services.embedding_cache import EmbeddingCache, cache_key
+from app.utils.metrics import metrics
+
+EMBEDDING_PROFILE = "embedding"
+
+_prefetched: ContextVar[Mapping[str, list[float]] | None] = ContextVar("memu_prefetched_embeddings", default=None)
+
+
+def _split_embed_result(result: Any) -> tuple[list[list[float]], Any]:
+    """Normalize a base client's embed() result to ``(vectors, raw_response)``."""
+    if isinstance(result, tuple) and len(result) == 2:
+        return list(result[0]), result[1]
+    return list(result), None
+
+
+class PrefetchingEmbeddingClient:
+    """Base-client wrapper that serves embeddings published for the current context.
+
+    Everything other than ``embed`` is delegated to the wrapped client, so
+    memu-py's interceptors and usage tracking keep working unchanged.
+    """
+
+    def __init__(self, inner: Any) -> None:
+        self._inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    async def embed(self, inputs: list[str]) -> tuple[list[list[float]], Any]:
+        prefetched = _prefetched.get()
+        if not prefetched:
+            return _split_embed_result(await self._inner.embed(inputs))
+
+        missing = [text for text in inputs if text not in prefetched]
+        metrics.inc("memu_embedding_prefetch_hits", len(inputs) - len(missing))
+        if not missing:
+            return [prefetched[text] for text in inputs], None
+
+        metrics.inc("memu_embedding_prefetch_misses", len(missing))
+        vectors, raw = _split_embed_result(await self._inner.embed(missing))
+        fetched = dict(zip(missing, vectors, strict=True))
+        return [prefetched[text] if text in prefetched else fetched[text] for text in inputs], raw
+
+
+class CachingEmbeddingClient:
+    """Base-client wrapper that serves repeated texts from an :class:`EmbeddingCache`.
+
+    Only cache misses (deduplicated) reach the wrapped client.
+    """
+
+    def __init__(self, inner: Any, cache: EmbeddingCache, embed_model: str, base_url: str) -> None:
+        self._inner = inner
+        self._cache = cache
+        self._embed_model = embed_model
+        self._base_url = base_url
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    async def embed(self, inputs: list[str]) -> tuple[list[list[float]], Any]:
+        keys = [cache_key(self._embed_model, self._base_url, text) for text in inputs]
+        cached = await self._cache.get_many(list(dict.fromkeys(keys)))
+        if len(cached) == len(set(keys)):
+            return [cached[key] for key in keys], None
+
+        # Embed each missing key once, using the first text that produced it
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, inputs, strict=True):
+            if key not in cached:
+                missing.setdefault(key, text)
+        vectors, raw = _split_embed_result(await self._inner.embed(list(missing.values())))
+        fetched = dict(zip(missing, vectors, strict=True))
+        await self._cache.set_many(fetched)
+        return [cached[key] if key in cached else fetched[key] for key in keys], raw
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent ``embed`` calls into provider requests of up to ``max_batch`` texts.
+
+    A call waits at most ``window_seconds`` for others to join it; a batch
+    that reaches ``max_batch`` texts is sent at once. Texts requested by
+    several callers are embedded once. If the request fails, every call in
+    the batch fails with its error.
+    """
+
+    def __init__(self, inner: Any, max_batch: int, window_seconds: float) -> None:
+        self._inner = inner
+        self.max_batch = max(max_batch, 1)
+        self.window_seconds = window_seconds
+        self._pending: list[tuple[list[str], asyncio.Future[list[list[float]]]]] = []
+        self._pending_texts = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def embed(self, inputs: list[str]) -> list[list[float]]:
+        if not inputs:
+            return []
+        future: asyncio.Future[list[list[float]]] = asyncio.get_running_loop().create_future()
+        self._pending.append((inputs, future))
+        self._pending_texts += len(inputs)
+        if self._pending_texts >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[list[str], asyncio.Future[list[list[float]]]]]) -> None:
+        texts = list(dict.fromkeys(text for inputs, _ in batch for text in inputs))
+        requests = [texts[i : i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+        metrics.inc("memu_embedding_batched_calls", len(batch))
+        for request in requests:
+            metrics.observe("memu_embedding_batch_size", len(request))
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(self._inner.embed(request) for request in requests))
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            metrics.observe("memu_embedding_batch_seconds", time.perf_counter() - started)
+        vectors: dict[str, list[float]] = {}
+        for request, result in zip(requests, results, strict=True):
+            vectors.update(zip(request, _split_embed_result(result)[0], strict=True))
+        for inputs, future in batch:
+            if not future.done():
+                future.set_result([vectors[text] for text in inputs])
+
+
+class BatchingEmbeddingClient:
+    """Base-client wrapper that embeds through a shared :class:`EmbeddingBatcher`.
+
+    The provider's raw response covers the whole batch, so none is passed on
+    and memu records no per-call usage for batched embeddings.
+    """
+
+    def __init__(self, inner: Any, batcher: EmbeddingBatcher) -> None:
+        self._inner = inner
+        self.batcher = batcher
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    async def embed(self, inputs: list[str]) -> tuple[list[list[float]], Any]:
+        return await self.batcher.embed(inputs), None
+
+
+_batchers: dict[tuple[str, str], EmbeddingBatcher] = {}
+
+
+def install_embedding_batching(
+    service: MemoryService, max_batch: int, window_seconds: float, profile: str = EMBEDDING_PROFILE
+) -> None:
+    """Route the service's embedding calls through the process-wide batcher of its model.
+
+    Every MemoryService of the process embedding with the same model and
+    endpoint shares one batcher, so calls from all activities are coalesced.
+    """
+    cfg = service.llm_profiles.profiles[profile]
+    base = service._get_llm_base_client(profile)
+    if isinstance(base, BatchingEmbeddingClient):
+        return
+    key = (cfg.base_url, cfg.embed_model)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        batcher = _batchers[key] = EmbeddingBatcher(base, max_batch, window_seconds)
+    service._llm_clients[profile] = BatchingEmbeddingClient(base, batcher)
+
+
+def install_embedding_cache(service: MemoryService, cache: EmbeddingCache, profile: str = EMBEDDING_PROFILE) -> None:
+    """Wrap the service's embedding client so repeated texts are served from ``cache``.
+
+    Install this before :func:`install_embedding_prefetch`, which wraps
+    whatever client is in place.
+    """
+    cfg = service.llm_profiles.profiles[profile]
+    base = service._get_llm_base_client(profile)
+    if not isinstance(base, CachingEmbeddingClient):
+        service._llm_clients[profile] = CachingEmbeddingClient(base, cache, cfg.embed_model, cfg.base_url)
+
+
+def install_embedding_prefetch(service: MemoryService, profile: str = EMBEDDING_PROFILE) -> None:
+    """Wrap the service's embedding client so it honours :func:`prefetched_embeddings`."""
+    base = service._get_llm_base_client(profile)
+    if not isinstance(base, PrefetchingEmbeddingClient):
+        service._llm_clients[profile] = PrefetchingEmbeddingClient(base)
+
+
+async def embed_texts(service: MemoryService, texts: list[str], profile: str = EMBEDDING_PROFILE) -> list[list[float]]:
+    """Embed ``texts`` with one provider call (the client may still split very large inputs)."""
+    client = service._get_llm_client(profile)
+    vectors = await client.embed(texts)
+    return list(vectors)
+
+
+@contextmanager
+def prefetched_embeddings(vectors: Mapping[str, list[float]]) -> Iterator[None]:
+    """Serve ``vectors`` to embedding calls made in this context (and tasks it spawns)."""
+    token = _prefetched.set(vectors)
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
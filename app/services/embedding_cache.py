@@ -0,0 +1,211 @@
+"""Query-embedding cache.
+
+Vectors are keyed by ``(embed_model, base_url, normalized text)`` so a change
+of embedding model or provider never serves stale vectors. Two tiers:
+
+* a per-process LRU bounded by entry count, with a TTL, holding vectors as
+  packed ``array('d')`` (8 bytes per dimension rather than a list of floats);
+* an optional SQLite file shared by every worker process on the host (e.g.
+  gunicorn workers pointed at the same ``EMBEDDING_CACHE_SHARED_PATH``), with
+  the same TTL and oldest-first trimming once it exceeds its entry limit.
+
+A hit in the shared tier is copied into the local tier.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a query for cache lookup: NFC, trimmed, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(embed_model: str, base_url: str, text: str) -> str:
+    """Return the cache key for ``text`` embedded by ``embed_model`` at ``base_url``."""
+    raw = "\x00".join((embed_model, base_url.rstrip("/"), normalize_text(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SqliteEmbeddingStore:
+    """Embedding store in a SQLite file, safe to share between processes on one host."""
+
+    def __init__(self, path: str | Path, max_entries: int) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)")
+
+    def get_many(self, keys: list[str], now: float) -> dict[str, array]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            # Only "?" placeholders are interpolated; the keys are bound as parameters.
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND expires_at > ?",  # nosec B608
+                (*keys, now),
+            ).fetchall()
+        found: dict[str, array] = {}
+        for key, blob in rows:
+            vec = array("d")
+            vec.frombytes(blob)
+            found[key] = vec
+        return found
+
+    def set_many(self, items: dict[str, array], expires_at: float, now: float) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, vec.tobytes(), expires_at, now) for key, vec in items.items()],
+                )
+                self._conn.execute("DELETE FROM embeddings WHERE expires_at <= ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU plus an optional shared store.
+
+    Args:
+        max_entries: Vectors kept in the in-process LRU; 0 disables that tier.
+        ttl_seconds: Lifetime of a cached vector; 0 or less means no expiry.
+        shared: Optional store shared between processes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, shared: SqliteEmbeddingStore | None = None) -> None:
+        if max_entries < 0:
+            msg = "max_entries must be >= 0"
+            raise ValueError(msg)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._local: OrderedDict[str, tuple[float, array]] = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._local)
+
+    def _expiry(self, now: float) -> float:
+        return now + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+
+    def _get_local(self, keys: Iterable[str], now: float) -> dict[str, array]:
+        found: dict[str, array] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key)
+                if entry is None:
+                    continue
+                expires_at, vec = entry
+                if expires_at <= now:
+                    del self._local[key]
+                    continue
+                self._local.move_to_end(key)
+                found[key] = vec
+        return found
+
+    def _set_local(self, items: dict[str, array], expires_at: float) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._local[key] = (expires_at, vec)
+                self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                metrics.inc("memu_embedding_cache_evictions")
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return cached vectors for whichever of ``keys`` are present."""
+        now = time.time()
+        found = self._get_local(keys, now)
+        if found:
+            metrics.inc("memu_embedding_cache_hits", len(found), {"tier": "local"})
+
+        missing = [k for k in keys if k not in found]
+        if missing and self.shared is not None:
+            try:
+                shared_hits = await asyncio.to_thread(self.shared.get_many, missing, now)
+            except Exception:
+                logger.warning("Shared embedding cache lookup failed", exc_info=True)
+                shared_hits = {}
+            if shared_hits:
+                metrics.inc("memu_embedding_cache_hits", len(shared_hits), {"tier": "shared"})
+                self._set_local(shared_hits, self._expiry(now))
+                found.update(shared_hits)
+                missing = [k for k in missing if k not in shared_hits]
+
+        if missing:
+            metrics.inc("memu_embedding_cache_misses", len(missing))
+        return {key: vec.tolist() for key, vec in found.items()}
+
+    async def set_many(self, items: dict[str, list[float]]) -> None:
+        """Store freshly computed vectors in every tier."""
+        if not items:
+            return
+        now = time.time()
+        expires_at = self._expiry(now)
+        packed = {key: array("d", vec) for key, vec in items.items()}
+        self._set_local(packed, expires_at)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.set_many, packed, min(expires_at, 2**53), now)
+            except Exception:
+                logger.warning("Shared embedding cache write failed", exc_info=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._local.clear()
+        if self.shared is not None:
+            self.shared.close()
+
+
+def build_embedding_cache(settings: Settings) -> EmbeddingCache | None:
+    """Build the cache described by ``EMBEDDING_CACHE_*`` settings, or None if disabled."""
+    shared_path = settings.EMBEDDING_CACHE_SHARED_PATH.strip()
+    if settings.EMBEDDING_CACHE_SIZE <= 0 and not shared_path:
+        return None
+    shared = SqliteEmbeddingStore(shared_path, settings.EMBEDDING_CACHE_SHARED_MAX_ENTRIES) if shared_path else None
+    return EmbeddingCache(
+        max_entries=max(settings.EMBEDDING_CACHE_SIZE, 0),
+        ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+        shared=shared,
+    )
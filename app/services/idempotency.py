@@ -0,0 +1,58 @@
+"""Deterministic task IDs for idempotent memorize submissions.
+
+A submission with an ``Idempotency-Key`` header, or any submission when
+MEMORIZE_DEDUPE_BY_CONTENT is on, gets a workflow ID derived from the key or
+the content instead of a random one. Temporal refuses to start a second
+workflow with the ID of a running or completed one, so a duplicate returns the
+existing task; only a failed (or canceled, terminated, timed out) task is run
+again.
+"""
+
+import hashlib
+import json
+from typing import Any
+
+# Longest Idempotency-Key header accepted.
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _digest(parts: list[Any]) -> str:
+    return hashlib.sha256(_canonical(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def content_task_id(user_id: str, agent_id: str, conversation: Any, override_config: dict | None) -> str:
+    """Task ID (32 hex chars) of a conversation, independent of its key order and whitespace."""
+    return _digest(["content", user_id, agent_id, override_config or {}, conversation])
+
+
+def key_task_id(user_id: str, key: str) -> str:
+    """Task ID (32 hex chars) of a client-supplied idempotency key, scoped to the user."""
+    return _digest(["key", user_id, key])
+
+
+class ContentDigest:
+    """``content_task_id`` of a message list, computed one message at a time.
+
+    Used for streamed uploads, whose conversation is never held in memory;
+    the result equals ``content_task_id`` of the complete list.
+    """
+
+    def __init__(self, user_id: str, agent_id: str, override_config: dict | None = None) -> None:
+        head = _canonical(["content", user_id, agent_id, override_config or {}])
+        # Reopen the outer list and start the conversation list inside it.
+        self._hash = hashlib.sha256((head[:-1] + ",[").encode("utf-8"))
+        self._empty = True
+
+    def update(self, message: Any) -> None:
+        text = _canonical(message) if self._empty else "," + _canonical(message)
+        self._hash.update(text.encode("utf-8"))
+        self._empty = False
+
+    def task_id(self) -> str:
+        final = self._hash.copy()
+        final.update(b"]]")
+        return final.hexdigest()[:32]
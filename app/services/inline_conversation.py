@@ -0,0 +1,48 @@
+"""Carrying small conversations inline in the workflow spec.
+
+With MEMORIZE_INLINE_MAX_BYTES set, a conversation whose JSON is at most that
+many bytes is not written to STORAGE_PATH; it travels in the spec's
+``conversation`` field instead (``{"encoding": ..., "data": ...}``), so the
+API and workers do not need a shared volume for it. Larger conversations, and
+any that will be chunked, still go through STORAGE_PATH.
+"""
+
+import base64
+import json
+import zlib
+from collections.abc import Mapping
+from typing import Any
+
+ENCODING_JSON = "json"
+ENCODING_ZLIB = "zlib+base64"
+
+
+def encode_inline(data: str, compress: bool = False) -> dict[str, str]:
+    """Wrap a conversation's JSON text for the spec, zlib-compressed if ``compress``."""
+    if compress:
+        packed = base64.b64encode(zlib.compress(data.encode("utf-8"))).decode("ascii")
+        return {"encoding": ENCODING_ZLIB, "data": packed}
+    return {"encoding": ENCODING_JSON, "data": data}
+
+
+def decode_inline(payload: Mapping[str, Any]) -> str:
+    """Return the conversation JSON text of an inline payload.
+
+    Raises:
+        ValueError: If the payload is malformed or uses an unknown encoding.
+    """
+    encoding = payload.get("encoding")
+    data = payload.get("data")
+    if not isinstance(data, str):
+        raise ValueError("Inline conversation has no data")
+    if encoding == ENCODING_JSON:
+        text = data
+    elif encoding == ENCODING_ZLIB:
+        try:
+            text = zlib.decompress(base64.b64decode(data, validate=True)).decode("utf-8")
+        except (ValueError, zlib.error) as exc:
+            raise ValueError("Inline conversation is not valid zlib+base64") from exc
+    else:
+        raise ValueError(f"Unknown inline conversation encoding: {encoding!r}")
+    json.loads(text)
+    return text
@@ -0,0 +1,368 @@
+"""Cache of LLM completions for replayed memorization.
+
+Re-running memorization over conversations it has seen before (reprocessing,
+retries after a database failure, staging replays of production traffic)
+sends the same prompts to the chat model again. With LLM_CACHE_ENABLED,
+:class:`CachingLLMClient` (installed by :func:`install_llm_cache`) answers a
+prompt it has seen from a response store and only calls the provider for new
+ones.
+
+Responses are keyed by ``(model, base_url, temperature, prompt)`` where the
+prompt covers the call kind, system prompt, text, ``max_tokens`` and, for
+vision, the image's contents. The store is a SQLite file on local disk
+(:class:`SqliteResponseStore`) or a Postgres table shared by every worker
+(:class:`PostgresResponseStore`). Both keep a running total of their size and,
+once it passes LLM_CACHE_MAX_BYTES, evict the least recently used responses
+down to 90% of it.
+
+A cached completion is replayed verbatim, including at temperatures above 0,
+so the cache is meant for replays and test environments; keep it disabled
+where every run should sample afresh.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import psycopg
+from memu.app import MemoryService
+
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+CHAT_PROFILE = "default"
+
+# memu's clients do not take a temperature; each backend sends a fixed one.
+_BACKEND_TEMPERATURES = {"sdk": 1.0, "httpx": 0.2}
+
+# Eviction frees space down to this share of LLM_CACHE_MAX_BYTES, so a
+# full cache evicts once per tenth of the budget rather than on every write.
+_EVICT_TO = 0.9
+# Least recently used entries read (through the used_at index) per eviction round.
+_EVICT_BATCH = 100
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS memu_llm_cache (
+    key text PRIMARY KEY,
+    response text NOT NULL,
+    size bigint NOT NULL,
+    used_at double precision NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memu_llm_cache_used_at ON memu_llm_cache (used_at);
+CREATE TABLE IF NOT EXISTS memu_llm_cache_total (id int PRIMARY KEY CHECK (id = 0), total bigint NOT NULL);
+INSERT INTO memu_llm_cache_total SELECT 0, COALESCE(SUM(size), 0) FROM memu_llm_cache ON CONFLICT DO NOTHING
+"""
+_PG_GET = """
+UPDATE memu_llm_cache SET used_at = extract(epoch FROM clock_timestamp())
+WHERE key = %s
+RETURNING response
+"""
+_PG_SET = """
+INSERT INTO memu_llm_cache (key, response, size, used_at)
+VALUES (%s, %s, %s, extract(epoch FROM clock_timestamp()))
+ON CONFLICT (key) DO UPDATE SET response = EXCLUDED.response, size = EXCLUDED.size, used_at = EXCLUDED.used_at
+"""
+
+
+def response_key(model: str, base_url: str, temperature: float, prompt: dict[str, Any]) -> str:
+    """Return the cache key of ``prompt`` sent to ``model`` at ``base_url``."""
+    prompt_hash = hashlib.sha256(json.dumps(prompt, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    raw = "\x00".join((model, base_url.rstrip("/"), repr(float(temperature)), prompt_hash))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_size(key: str, response: str) -> int:
+    return len(key) + len(response.encode("utf-8"))
+
+
+def _oldest_over(rows: list[tuple[str, int]], total: int, target: int) -> tuple[list[str], int]:
+    """Keys of the leading ``rows`` (oldest first) to delete to bring ``total`` to ``target``, and the new total."""
+    victims = []
+    for key, size in rows:
+        if total <= target:
+            break
+        victims.append(key)
+        total -= size
+    return victims, total
+
+
+class SqliteResponseStore:
+    """Response store in a SQLite file on local disk, safe to share between processes on one host."""
+
+    def __init__(self, path: str | Path, max_bytes: int) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_used_at ON llm_responses (used_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses_total"
+            " (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO llm_responses_total SELECT 0, COALESCE(SUM(size), 0) FROM llm_responses"
+        )
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE llm_responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return str(row[0])
+
+    def _set(self, key: str, response: str) -> int:
+        size = _entry_size(key, response)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, size, used_at) VALUES (?, ?, ?, ?)",
+                    (key, response, size, time.time()),
+                )
+                self._conn.execute("UPDATE llm_responses_total SET total = total + ?", (size - (row[0] if row else 0),))
+                (total,) = self._conn.execute("SELECT total FROM llm_responses_total").fetchone()
+                evicted = self._evict(total) if total > self.max_bytes else 0
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def _evict(self, total: int) -> int:
+        """Delete the least recently used entries until ``total`` is back under the eviction target."""
+        target = int(self.max_bytes * _EVICT_TO)
+        evicted = 0
+        while total > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_responses ORDER BY used_at LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                total = 0
+                break
+            victims, total = _oldest_over(rows, total, target)
+            self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", [(victim,) for victim in victims])
+            evicted += len(victims)
+        self._conn.execute("UPDATE llm_responses_total SET total = ?", (total,))
+        return evicted
+
+    async def get(self, key: str) -> str | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, response: str) -> int:
+        """Store ``response``; returns how many entries were evicted to make room."""
+        return await asyncio.to_thread(self._set, key, response)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresResponseStore:
+    """Response store in a Postgres table, shared by every process using the database."""
+
+    def __init__(self, dsn: str, max_bytes: int) -> None:
+        self.dsn = dsn
+        self.max_bytes = max_bytes
+        self._conn: psycopg.AsyncConnection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> psycopg.AsyncConnection:
+        if self._conn is None or self._conn.closed:
+            self._conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+            await self._conn.execute(_CREATE_TABLE)
+        return self._conn
+
+    async def get(self, key: str) -> str | None:
+        async with self._lock:
+            try:
+                cursor = await (await self._connection()).execute(_PG_GET, (key,))
+                row = await cursor.fetchone()
+            except psycopg.OperationalError:
+                # Reconnect on the next call.
+                await self.close()
+                raise
+        return None if row is None else str(row[0])
+
+    async def set(self, key: str, response: str) -> int:
+        """Store ``response``; returns how many entries were evicted to make room."""
+        size = _entry_size(key, response)
+        async with self._lock:
+            try:
+                conn = await self._connection()
+                async with conn.transaction():
+                    cursor = await conn.execute("SELECT size FROM memu_llm_cache WHERE key = %s", (key,))
+                    row = await cursor.fetchone()
+                    await conn.execute(_PG_SET, (key, response, size))
+                    cursor = await conn.execute(
+                        "UPDATE memu_llm_cache_total SET total = total + %s RETURNING total",
+                        (size - (row[0] if row else 0),),
+                    )
+                    (total,) = await cursor.fetchone() or (0,)
+                    return await self._evict(conn) if total > self.max_bytes else 0
+            except psycopg.OperationalError:
+                await self.close()
+                raise
+
+    async def _evict(self, conn: psycopg.AsyncConnection) -> int:
+        """Delete the least recently used entries until the cache is back under the eviction target.
+
+        Workers storing the same new key at once each count its size, so the
+        running total is recomputed before evicting.
+        """
+        cursor = await conn.execute("SELECT COALESCE(SUM(size), 0) FROM memu_llm_cache")
+        (total,) = await cursor.fetchone() or (0,)
+        target = int(self.max_bytes * _EVICT_TO)
+        evicted = 0
+        while total > target:
+            cursor = await conn.execute(
+                "SELECT key, size FROM memu_llm_cache ORDER BY used_at LIMIT %s FOR UPDATE SKIP LOCKED",
+                (_EVICT_BATCH,),
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                break
+            victims, total = _oldest_over(rows, total, target)
+            await conn.execute("DELETE FROM memu_llm_cache WHERE key = ANY(%s)", (victims,))
+            evicted += len(victims)
+        await conn.execute("UPDATE memu_llm_cache_total SET total = %s", (total,))
+        return evicted
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            try:
+                await conn.close()
+            except Exception:
+                logger.debug("Failed to close LLM cache connection", exc_info=True)
+
+
+ResponseStore = SqliteResponseStore | PostgresResponseStore
+
+
+def _read_bytes(path: str) -> bytes:
+    return Path(path).read_bytes()
+
+
+class CachingLLMClient:
+    """Base-client wrapper that answers repeated ``summarize``/``vision`` prompts from a store.
+
+    A hit returns the cached text with no raw response, so memu records no
+    token usage for it. If the store fails, the call goes to the provider.
+    """
+
+    def __init__(self, inner: Any, store: ResponseStore, model: str, base_url: str, temperature: float) -> None:
+        self._inner = inner
+        self.store = store
+        self._model = model
+        self._base_url = base_url
+        self._temperature = temperature
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    async def _cached(self, kind: str, prompt: dict[str, Any], call: Any) -> Any:
+        key = response_key(self._model, self._base_url, self._temperature, {"kind": kind, **prompt})
+        try:
+            cached = await self.store.get(key)
+        except Exception:
+            logger.warning("LLM cache lookup failed", exc_info=True)
+            cached = None
+        if cached is not None:
+            metrics.inc("memu_llm_cache_hits", attributes={"kind": kind})
+            return cached, None
+
+        metrics.inc("memu_llm_cache_misses", attributes={"kind": kind})
+        result = await call()
+        text = result[0] if isinstance(result, tuple) and len(result) == 2 else result
+        if isinstance(text, str) and text:
+            try:
+                evicted = await self.store.set(key, text)
+            except Exception:
+                logger.warning("LLM cache write failed", exc_info=True)
+            else:
+                if evicted:
+                    metrics.inc("memu_llm_cache_evictions", evicted)
+        return result
+
+    async def summarize(
+        self, text: str, *, max_tokens: int | None = None, system_prompt: str | None = None, **kwargs: Any
+    ) -> Any:
+        prompt = {"system_prompt": system_prompt, "text": text, "max_tokens": max_tokens, **kwargs}
+        return await self._cached(
+            "summarize",
+            prompt,
+            lambda: self._inner.summarize(text, max_tokens=max_tokens, system_prompt=system_prompt, **kwargs),
+        )
+
+    async def vision(
+        self,
+        prompt: str,
+        image_path: str,
+        *,
+        max_tokens: int | None = None,
+        system_prompt: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        image = hashlib.sha256(await asyncio.to_thread(_read_bytes, image_path)).hexdigest()
+        request = {"system_prompt": system_prompt, "text": prompt, "image": image, "max_tokens": max_tokens, **kwargs}
+        return await self._cached(
+            "vision",
+            request,
+            lambda: self._inner.vision(
+                prompt, image_path, max_tokens=max_tokens, system_prompt=system_prompt, **kwargs
+            ),
+        )
+
+
+_store: ResponseStore | None = None
+
+
+def get_llm_cache_store(settings: Settings) -> ResponseStore | None:
+    """The process-wide response store, or None if the cache is disabled."""
+    global _store
+    if not settings.LLM_CACHE_ENABLED or settings.LLM_CACHE_MAX_BYTES <= 0:
+        return None
+    if _store is None:
+        if settings.LLM_CACHE_BACKEND == "postgres":
+            _store = PostgresResponseStore(settings.postgres_dsn, settings.LLM_CACHE_MAX_BYTES)
+        else:
+            _store = SqliteResponseStore(settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_BYTES)
+    return _store
+
+
+def install_llm_cache(service: MemoryService, settings: Settings, profile: str = CHAT_PROFILE) -> None:
+    """Wrap the service's chat client with the response cache when LLM_CACHE_ENABLED is set."""
+    store = get_llm_cache_store(settings)
+    if store is None:
+        return
+    base = service._get_llm_base_client(profile)
+    if isinstance(base, CachingLLMClient):
+        return
+    cfg = service.llm_profiles.profiles[profile]
+    temperature = _BACKEND_TEMPERATURES.get(cfg.client_backend, 1.0)
+    service._llm_clients[profile] = CachingLLMClient(base, store, cfg.chat_model, cfg.base_url, temperature)
+
+
+async def close_llm_cache() -> None:
+    """Close the process-wide response store."""
+    global _store
+    if _store is not None:
+        store, _store = _store, None
+        await store.close()
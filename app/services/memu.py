@@ -1,12 +1,31 @@
 """MemU service factory for creating MemoryService instances."""
 
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing import Any
 
 from memu.app import MemoryService
+from memu.app.service import Context
 
+from app.services.embedding import install_embedding_batching
+from app.services.llm_cache import install_llm_cache
+from app.services.rate_limit import install_rate_limits
+from app.utils.metrics import metrics
 from config.memu import build_memu_config
 from config.settings import Settings
 
+logger = logging.getLogger(__name__)
+
+# Category context of the current MemoryServiceCache lease, if any. A context
+# variable, so concurrent activities leasing one service each see their own.
+_lease_context: ContextVar[Context | None] = ContextVar("memu_lease_context", default=None)
+
 
 def create_memory_service(
     settings: Settings | None = None,
@@ -34,4 +53,119 @@ def create_memory_service(
     if retrieve_config:
         kwargs["retrieve_config"] = retrieve_config
 
-    return MemoryService(**kwargs)
+    service = MemoryService(**kwargs)
+    install_lease_context(service)
+    install_rate_limits(service, settings)
+    if settings.EMBEDDING_BATCH_WINDOW_MS > 0:
+        # Over the rate limiter, so a batch is one request against the limits.
+        window = settings.EMBEDDING_BATCH_WINDOW_MS / 1000
+        install_embedding_batching(service, settings.EMBEDDING_BATCH_MAX_SIZE, window)
+    # Outermost, so cached prompts neither wait for nor use up rate limit budget.
+    install_llm_cache(service, settings)
+    return service
+
+
+def install_lease_context(service: MemoryService) -> None:
+    """Make ``service`` use the category context of the current lease.
+
+    memu keeps one context per service and fills its category IDs for the
+    first user whose memorize initializes them; every later call would map
+    its memories onto that user's categories. Within a lease the service
+    uses the fresh context the lease set up instead, so each activity
+    initializes its own user's categories.
+    """
+    shared = service._get_context
+
+    def _get_context() -> Context:
+        context = _lease_context.get()
+        return shared() if context is None else context
+
+    service._get_context = _get_context  # type: ignore[method-assign]
+
+
+def config_cache_key(config: dict[str, Any] | None) -> str:
+    """Return a stable hash of a config override (None and {} hash the same)."""
+    canonical = json.dumps(config or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def close_memory_service(service: Any) -> None:
+    """Release the database engine held by a MemoryService."""
+    database = getattr(service, "database", None)
+    if database is None:
+        return
+    try:
+        database.close()
+    except Exception:
+        logger.warning("Failed to close MemoryService database", exc_info=True)
+
+
+@dataclass
+class _CacheEntry:
+    service: Any
+    leases: int = 0
+    evicted: bool = False
+
+
+class MemoryServiceCache:
+    """LRU cache of MemoryService instances keyed by a config hash.
+
+    Building a MemoryService opens a Postgres engine and runs the schema
+    check, so workers reuse one warm instance per distinct override_config.
+    Services are handed out as leases; an evicted service is only closed
+    once its last lease is released, so in-flight activities keep working.
+    Each lease gets a fresh category context (see :func:`install_lease_context`),
+    so a service shared by several users never maps one user's memories onto
+    another's categories.
+    """
+
+    def __init__(self, max_size: int = 8) -> None:
+        if max_size < 1:
+            msg = "max_size must be >= 1"
+            raise ValueError(msg)
+        self.max_size = max_size
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @contextmanager
+    def lease(self, key: str, factory: Callable[[], Any]) -> Iterator[Any]:
+        """Yield the cached service for ``key``, building it with ``factory`` on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics.inc("memu_service_cache_misses")
+            entry = _CacheEntry(service=factory())
+            self._entries[key] = entry
+            self._evict_overflow()
+        else:
+            metrics.inc("memu_service_cache_hits")
+            self._entries.move_to_end(key)
+        entry.leases += 1
+        token = _lease_context.set(Context(categories_ready=not getattr(entry.service, "category_configs", None)))
+        try:
+            yield entry.service
+        finally:
+            _lease_context.reset(token)
+            entry.leases -= 1
+            if entry.evicted and entry.leases == 0:
+                close_memory_service(entry.service)
+
+    def close(self) -> None:
+        """Evict every entry; idle services are closed immediately."""
+        while self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._retire(entry)
+
+    def _evict_overflow(self) -> None:
+        while len(self._entries) > self.max_size:
+            key, entry = self._entries.popitem(last=False)
+            metrics.inc("memu_service_cache_evictions")
+            logger.info("Evicting cached MemoryService %s", key[:12])
+            self._retire(entry)
+
+    @staticmethod
+    def _retire(entry: _CacheEntry) -> None:
+        entry.evicted = True
+        if entry.leases == 0:
+            close_memory_service(entry.service)
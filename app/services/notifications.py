@@ -0,0 +1,93 @@
+"""Postgres LISTEN/NOTIFY plumbing shared by cross-process notifications.
+
+Workers and API replicas publish small JSON payloads with :func:`notify`;
+every API replica runs one :class:`PostgresListener` that dispatches them
+to per-channel handlers (cache invalidation, task events, ...).
+"""
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable, Mapping
+
+import psycopg
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def notify(dsn: str, channel: str, payload: str) -> None:
+    """Send ``payload`` to everyone listening on ``channel``."""
+    async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+        await conn.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+    metrics.inc("memu_notifications_published", attributes={"channel": channel})
+
+
+class PostgresListener:
+    """Background task dispatching notifications on several channels.
+
+    ``on_subscribed`` runs each time the subscription is (re-)established and
+    ``on_lost`` each time it drops, so callers can account for notifications
+    that were missed in between. The connection is retried with backoff.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        handlers: Mapping[str, Callable[[str], None]],
+        on_subscribed: Callable[[], None] | None = None,
+        on_lost: Callable[[], None] | None = None,
+        retry_seconds: float = 1.0,
+    ) -> None:
+        self.dsn = dsn
+        self.handlers = dict(handlers)
+        self.on_subscribed = on_subscribed
+        self.on_lost = on_lost
+        self.retry_seconds = retry_seconds
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="memu-postgres-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.on_lost is not None:
+            self.on_lost()
+
+    async def _run(self) -> None:
+        delay = self.retry_seconds
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+                    for channel in self.handlers:
+                        await conn.execute(f"LISTEN {channel}")
+                    if self.on_subscribed is not None:
+                        self.on_subscribed()
+                    logger.info("Listening for notifications on %s", ", ".join(self.handlers))
+                    delay = self.retry_seconds
+                    async for notification in conn.notifies():
+                        self._dispatch(notification.channel, notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Notification listener disconnected; retrying in %.1fs", delay, exc_info=True)
+            if self.on_lost is not None:
+                self.on_lost()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        handler = self.handlers.get(channel)
+        if handler is None:
+            return
+        metrics.inc("memu_notifications_received", attributes={"channel": channel})
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("Notification handler for %s failed", channel)
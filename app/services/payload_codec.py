@@ -0,0 +1,67 @@
+"""Compressing Temporal payload codec.
+
+Workflow inputs, activity results and signals are recorded in Temporal
+history. With TEMPORAL_PAYLOAD_COMPRESSION_MIN_BYTES set, every payload of at
+least that many bytes is zlib-compressed on the way out (when that actually
+makes it smaller) and marked with the ``binary/zlib`` encoding.
+
+Decoding is always on and only touches payloads with that marker, so clients
+and workers read both histories recorded before compression was enabled and
+payloads from processes that compress, whatever their own setting.
+"""
+
+import dataclasses
+import zlib
+from collections.abc import Sequence
+
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter, PayloadCodec
+
+from app.utils.metrics import metrics
+
+ENCODING = b"binary/zlib"
+
+
+class CompressionCodec(PayloadCodec):
+    """zlib payload codec.
+
+    Args:
+        min_bytes: Payloads smaller than this are left as they are; 0 turns
+            compression off (decoding still works).
+        level: zlib compression level.
+    """
+
+    def __init__(self, min_bytes: int, level: int = 6) -> None:
+        self.min_bytes = max(min_bytes, 0)
+        self.level = level
+
+    async def encode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._encode_one(p) for p in payloads]
+
+    async def decode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._decode_one(p) for p in payloads]
+
+    def _encode_one(self, payload: Payload) -> Payload:
+        if self.min_bytes == 0:
+            return payload
+        raw = payload.SerializeToString()
+        if len(raw) < self.min_bytes:
+            return payload
+        compressed = zlib.compress(raw, self.level)
+        if len(compressed) >= len(raw):
+            return payload
+        metrics.inc("memu_payloads_compressed")
+        metrics.inc("memu_payload_bytes_saved", len(raw) - len(compressed))
+        return Payload(metadata={"encoding": ENCODING}, data=compressed)
+
+    @staticmethod
+    def _decode_one(payload: Payload) -> Payload:
+        if payload.metadata.get("encoding") != ENCODING:
+            return payload
+        return Payload.FromString(zlib.decompress(payload.data))
+
+
+def build_data_converter(min_bytes: int) -> DataConverter:
+    """Temporal's default data converter with :class:`CompressionCodec` installed."""
+    return dataclasses.replace(temporalio.converter.default(), payload_codec=CompressionCodec(min_bytes))
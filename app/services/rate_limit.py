@@ -0,0 +1,389 @@
+"""Requests- and tokens-per-minute limits on memu's LLM and embedding calls.
+
+Every concurrent memorize activity (and retrieve request) calls the provider
+through memu's per-profile clients. :class:`RateLimitedClient`, installed on
+those clients by :func:`install_rate_limits`, makes each call first reserve
+one request and its estimated tokens from the profile's
+:class:`RateLimiter`. Reservations are taken in arrival order and the caller
+sleeps until the buckets cover them, so a burst of activities queues up
+instead of tripping the provider's 429s. Once a call returns, the estimate is
+corrected with the token usage the provider reported.
+
+Buckets live in each process, or with RATE_LIMIT_BACKEND=postgres in a table
+all workers and API replicas share (:class:`PostgresBuckets`). If the
+provider still answers 429, the limiter pauses the profile for Retry-After
+(or an exponential backoff), halves its rate until calls succeed again, and
+retries the call.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import psycopg
+from memu.app import MemoryService
+
+from app.utils.metrics import metrics
+from config.memu import build_memu_rate_limits
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Buckets hold this many seconds' worth of budget, the largest burst allowed.
+BURST_SECONDS = 10.0
+# Token estimate for an image sent to the vision endpoint.
+IMAGE_TOKENS = 1000
+INITIAL_BACKOFF_SECONDS = 1.0
+# After a 429 the rate is halved; each successful call restores a tenth of it.
+_RECOVERY_FACTOR = 1.1
+_MIN_RATE_FACTOR = 0.1
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS memu_rate_limits (
+    name text PRIMARY KEY,
+    rate double precision NOT NULL,
+    capacity double precision NOT NULL,
+    level double precision NOT NULL,
+    updated_at double precision NOT NULL,
+    blocked_until double precision NOT NULL DEFAULT 0
+)
+"""
+# Refill each bucket for the time since its last use, take the amount, and
+# return how long the caller has to wait, all in one atomic upsert.
+_RESERVE = """
+INSERT INTO memu_rate_limits AS b (name, rate, capacity, level, updated_at)
+SELECT r.name, r.rate, r.capacity, r.capacity - r.amount, extract(epoch FROM clock_timestamp())
+FROM unnest(%s::text[], %s::float8[], %s::float8[], %s::float8[]) AS r(name, rate, capacity, amount)
+ON CONFLICT (name) DO UPDATE SET
+    rate = EXCLUDED.rate,
+    capacity = EXCLUDED.capacity,
+    level = LEAST(EXCLUDED.capacity, b.level + (EXCLUDED.updated_at - b.updated_at) * EXCLUDED.rate)
+        - (EXCLUDED.capacity - EXCLUDED.level),
+    updated_at = EXCLUDED.updated_at
+RETURNING GREATEST(-b.level / b.rate, b.blocked_until - b.updated_at, 0)
+"""
+_ADJUST = "UPDATE memu_rate_limits SET level = level - %s WHERE name = %s"
+_BLOCK = """
+UPDATE memu_rate_limits
+SET blocked_until = GREATEST(blocked_until, extract(epoch FROM clock_timestamp()) + %s)
+WHERE name = ANY(%s)
+"""
+
+
+@dataclass
+class RateLimit:
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+
+class TokenBucket:
+    """A bucket refilled at ``rate`` per second, holding at most ``capacity``.
+
+    Reservations are taken immediately and may overdraw the bucket; the
+    caller then waits until the refill covers the debt. Waiters are thus
+    served in arrival order without anyone holding a lock while asleep.
+    """
+
+    def __init__(self, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = capacity
+        self.level = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def reserve(self, amount: float, rate: float) -> float:
+        """Take ``amount`` and return the seconds until the bucket covers it."""
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * rate) - amount
+        self._updated = now
+        return max(-self.level / rate, 0.0)
+
+    def adjust(self, amount: float) -> None:
+        """Take ``amount`` more (or give back a negative amount) without waiting."""
+        self.level -= amount
+
+
+class PostgresBuckets:
+    """Token buckets in a Postgres table, shared by every process using the database."""
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._conn: psycopg.AsyncConnection | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> psycopg.AsyncConnection:
+        if self._conn is None or self._conn.closed:
+            self._conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+            await self._conn.execute(_CREATE_TABLE)
+        return self._conn
+
+    async def _execute(self, query: str, params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        async with self._lock:
+            try:
+                cursor = await (await self._connection()).execute(query, params)
+                return await cursor.fetchall() if cursor.description else []
+            except psycopg.OperationalError:
+                # Reconnect on the next call.
+                await self.close()
+                raise
+
+    async def reserve(self, reservations: list[tuple[str, float, float, float]]) -> float:
+        """Take ``(name, amount, rate, capacity)`` from each bucket; returns the seconds to wait."""
+        names, amounts, rates, capacities = (list(column) for column in zip(*reservations, strict=True))
+        rows = await self._execute(_RESERVE, (names, rates, capacities, amounts))
+        return max((float(row[0]) for row in rows), default=0.0)
+
+    async def adjust(self, name: str, amount: float) -> None:
+        await self._execute(_ADJUST, (amount, name))
+
+    async def block(self, names: list[str], seconds: float) -> None:
+        await self._execute(_BLOCK, (seconds, names))
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            try:
+                await conn.close()
+            except Exception:
+                logger.debug("Failed to close rate limit connection", exc_info=True)
+
+
+class RateLimiter:
+    """Requests- and tokens-per-minute budget of one LLM profile.
+
+    Args:
+        name: Profile name, used in bucket names and metric attributes.
+        limit: Per-minute limits; a limit of 0 is not enforced.
+        shared: Postgres buckets shared across processes. While they are
+            unreachable the limiter falls back to its local buckets.
+        max_backoff: Longest pause after a 429.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: RateLimit,
+        shared: PostgresBuckets | None = None,
+        max_backoff: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.shared = shared
+        self.max_backoff = max_backoff
+        self.rate_factor = 1.0
+        self._clock = clock
+        self._buckets = {
+            kind: TokenBucket(per_minute / 60 * BURST_SECONDS, clock)
+            for kind, per_minute in (("requests", limit.requests_per_minute), ("tokens", limit.tokens_per_minute))
+            if per_minute > 0
+        }
+        self._blocked_until = 0.0
+        self._backoff = INITIAL_BACKOFF_SECONDS
+
+    def _rate(self, kind: str) -> float:
+        per_minute = self.limit.requests_per_minute if kind == "requests" else self.limit.tokens_per_minute
+        return per_minute / 60 * self.rate_factor
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until one request of about ``tokens`` tokens is within the limits.
+
+        Returns:
+            Seconds waited.
+        """
+        amounts = {"requests": 1, "tokens": tokens}
+        wait = None
+        if self.shared is not None:
+            try:
+                wait = await self.shared.reserve(
+                    [
+                        (f"{self.name}:{kind}", amounts[kind], self._rate(kind), bucket.capacity)
+                        for kind, bucket in self._buckets.items()
+                    ]
+                )
+            except Exception:
+                logger.warning("Shared rate limit unavailable for %s; limiting in-process", self.name, exc_info=True)
+        if wait is None:
+            wait = max(
+                (bucket.reserve(amounts[kind], self._rate(kind)) for kind, bucket in self._buckets.items()),
+                default=0.0,
+            )
+        wait = max(wait, self._blocked_until - self._clock())
+        metrics.observe("memu_llm_rate_limit_wait_seconds", wait, attributes={"profile": self.name})
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    async def settle(self, estimated: int, used: int | None) -> None:
+        """Correct a reservation's token estimate with the usage the provider reported."""
+        bucket = self._buckets.get("tokens")
+        if bucket is None or used is None or used == estimated:
+            return
+        if self.shared is not None:
+            try:
+                await self.shared.adjust(f"{self.name}:tokens", used - estimated)
+                return
+            except Exception:
+                logger.debug("Failed to settle shared token usage for %s", self.name, exc_info=True)
+        bucket.adjust(used - estimated)
+
+    async def penalize(self, retry_after: float | None) -> float:
+        """Pause the profile after a 429 and halve its rate.
+
+        Returns:
+            The pause in seconds: ``retry_after`` if the provider sent one,
+            otherwise a backoff that doubles with each consecutive 429.
+        """
+        delay = min(retry_after if retry_after else self._backoff, self.max_backoff)
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+        self.rate_factor = max(self.rate_factor / 2, _MIN_RATE_FACTOR)
+        self._blocked_until = max(self._blocked_until, self._clock() + delay)
+        metrics.inc("memu_llm_rate_limited", attributes={"profile": self.name})
+        if self.shared is not None and self._buckets:
+            try:
+                await self.shared.block([f"{self.name}:{kind}" for kind in self._buckets], delay)
+            except Exception:
+                logger.debug("Failed to share rate limit pause for %s", self.name, exc_info=True)
+        return delay
+
+    def succeeded(self) -> None:
+        self._backoff = INITIAL_BACKOFF_SECONDS
+        self.rate_factor = min(self.rate_factor * _RECOVERY_FACTOR, 1.0)
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Whether ``exc`` is a provider's 429 (openai SDK or httpx)."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds from a 429's Retry-After header, if it has a numeric one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is None:
+        return None
+    try:
+        return max(float(headers.get("retry-after", "")), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _used_tokens(result: Any) -> int | None:
+    raw = result[1] if isinstance(result, tuple) and len(result) == 2 else None
+    usage = raw.get("usage") if isinstance(raw, Mapping) else getattr(raw, "usage", None)
+    total = usage.get("total_tokens") if isinstance(usage, Mapping) else getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else None
+
+
+def _text_tokens(*texts: str | None) -> int:
+    return sum(len(text or "") for text in texts) // 4 + 1
+
+
+class RateLimitedClient:
+    """Base-client wrapper that runs every call through a :class:`RateLimiter`.
+
+    Everything other than the provider calls is delegated to the wrapped
+    client, so memu-py's interceptors and usage tracking keep working.
+    """
+
+    def __init__(self, inner: Any, limiter: RateLimiter, max_retries: int = 3) -> None:
+        self._inner = inner
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    async def _call(self, tokens: int, call: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(tokens)
+            try:
+                result = await call()
+            except Exception as exc:
+                if not is_rate_limited(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = await self.limiter.penalize(retry_after(exc))
+                logger.warning(
+                    "Rate limited by the %s provider; retrying in %.1fs (attempt %d/%d)",
+                    self.limiter.name,
+                    delay,
+                    attempt,
+                    self.max_retries,
+                )
+                continue
+            self.limiter.succeeded()
+            await self.limiter.settle(tokens, _used_tokens(result))
+            return result
+
+    async def summarize(
+        self, text: str, *, max_tokens: int | None = None, system_prompt: str | None = None, **kwargs: Any
+    ) -> Any:
+        return await self._call(
+            _text_tokens(text, system_prompt) + (max_tokens or 0),
+            lambda: self._inner.summarize(text, max_tokens=max_tokens, system_prompt=system_prompt, **kwargs),
+        )
+
+    async def vision(
+        self,
+        prompt: str,
+        image_path: str,
+        *,
+        max_tokens: int | None = None,
+        system_prompt: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        return await self._call(
+            _text_tokens(prompt, system_prompt) + IMAGE_TOKENS + (max_tokens or 0),
+            lambda: self._inner.vision(
+                prompt, image_path, max_tokens=max_tokens, system_prompt=system_prompt, **kwargs
+            ),
+        )
+
+    async def embed(self, inputs: list[str]) -> Any:
+        return await self._call(_text_tokens(*inputs), lambda: self._inner.embed(inputs))
+
+    async def transcribe(self, audio_path: str, **kwargs: Any) -> Any:
+        return await self._call(0, lambda: self._inner.transcribe(audio_path, **kwargs))
+
+
+_limiters: dict[str, RateLimiter] = {}
+_shared: PostgresBuckets | None = None
+
+
+def get_rate_limiter(settings: Settings, profile: str, limit: RateLimit) -> RateLimiter:
+    """The process-wide limiter of ``profile``, shared by every MemoryService."""
+    global _shared
+    limiter = _limiters.get(profile)
+    if limiter is None or limiter.limit != limit:
+        shared = None
+        if settings.RATE_LIMIT_BACKEND == "postgres":
+            if _shared is None:
+                _shared = PostgresBuckets(settings.postgres_dsn)
+            shared = _shared
+        limiter = RateLimiter(profile, limit, shared, settings.RATE_LIMIT_MAX_BACKOFF_SECONDS)
+        _limiters[profile] = limiter
+    return limiter
+
+
+def install_rate_limits(service: MemoryService, settings: Settings) -> None:
+    """Wrap the service's clients of every profile with a configured limit."""
+    for profile, limit in build_memu_rate_limits(settings).items():
+        base = service._get_llm_base_client(profile)
+        if not isinstance(base, RateLimitedClient):
+            limiter = get_rate_limiter(settings, profile, RateLimit(**limit))
+            service._llm_clients[profile] = RateLimitedClient(base, limiter, settings.RATE_LIMIT_MAX_RETRIES)
+
+
+async def close_rate_limiters() -> None:
+    """Close the shared buckets' connection and forget all limiters."""
+    global _shared
+    _limiters.clear()
+    if _shared is not None:
+        shared, _shared = _shared, None
+        await shared.close()
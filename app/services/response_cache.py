@@ -0,0 +1,140 @@
+"""Server-side cache for /retrieve and /categories results.
+
+Entries are keyed by the request (kind, user_id, agent_id, query) plus a
+*generation token* from :class:`GenerationTracker`. Writes never touch the
+cache directly: finishing a memorize task or clearing memories bumps the
+affected user's generation (or the global generation, for clears that are
+not scoped to a user). Lookups then build a different key, so stale entries
+simply stop being reachable and age out of the LRU.
+
+Across API replicas the bumps are delivered by Postgres LISTEN/NOTIFY (see
+:mod:`app.services.cache_invalidation`). While a replica is not subscribed it
+cannot know what it missed, so :meth:`GenerationTracker.token` returns None
+and callers bypass the cache until the subscription is re-established.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.utils.metrics import metrics
+
+GenerationToken = tuple[int, int]
+
+
+class GenerationTracker:
+    """Per-user and global generation counters for cache invalidation.
+
+    At most ``max_users`` counters are kept, least recently used first out.
+    A user without a counter reads as the *floor*, which is raised to the
+    counter of every evicted user, so a user's generation never goes back
+    to a value that cached entries were stored under before a bump.
+
+    Args:
+        available: Whether tokens are handed out from the start. Replicas
+            that rely on a Postgres subscription start unavailable and are
+            marked available once subscribed.
+        max_users: Per-user counters kept.
+    """
+
+    def __init__(self, available: bool = True, max_users: int = 10_000) -> None:
+        self._lock = threading.Lock()
+        self._global = 0
+        self._floor = 0
+        self._users: OrderedDict[str, int] = OrderedDict()
+        self._available = available
+        self.max_users = max(max_users, 1)
+
+    @property
+    def available(self) -> bool:
+        return self._available
+
+    def token(self, user_id: str) -> GenerationToken | None:
+        """Return the current generation for ``user_id``, or None if caching is unsafe."""
+        with self._lock:
+            if not self._available:
+                return None
+            generation = self._users.get(user_id)
+            if generation is None:
+                return self._global, self._floor
+            self._users.move_to_end(user_id)
+            return self._global, generation
+
+    def bump(self, user_id: str | None) -> None:
+        """Invalidate one user's entries, or every entry when ``user_id`` is None."""
+        with self._lock:
+            if user_id is None:
+                self._global += 1
+                return
+            self._users[user_id] = self._users.get(user_id, self._floor) + 1
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                _, generation = self._users.popitem(last=False)
+                self._floor = max(self._floor, generation)
+
+    def mark_available(self) -> None:
+        """Resume handing out tokens, invalidating anything cached before."""
+        with self._lock:
+            self._global += 1
+            self._available = True
+
+    def mark_unavailable(self) -> None:
+        """Stop handing out tokens (invalidations may be missed)."""
+        with self._lock:
+            self._available = False
+
+
+class ResponseCache:
+    """Thread-safe LRU of response payloads with a TTL.
+
+    Args:
+        max_entries: Maximum entries kept; 0 disables the cache.
+        ttl_seconds: Lifetime of an entry; 0 or less means no expiry.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def key(kind: str, token: GenerationToken | None, **parts: Any) -> str:
+        """Build a cache key from the request kind, generation token and request parts."""
+        return json.dumps([kind, token, parts], sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, key: str, kind: str) -> Any | None:
+        """Return the cached payload for ``key`` or None, counting hits and misses per ``kind``."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            metrics.inc("memu_response_cache_misses", attributes={"kind": kind})
+            return None
+        metrics.inc("memu_response_cache_hits", attributes={"kind": kind})
+        return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_entries == 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,78 @@
+"""Helpers for scoping, batching and post-processing retrieve results."""
+
+import asyncio
+import copy
+from typing import Any
+
+from memu.app import MemoryService
+
+from app.schemas.memory import RetrieveBatchRequest, RetrieveRequest
+from app.services.embedding import embed_texts, prefetched_embeddings
+
+# Result keys produced by memu-py retrieve that hold ranked hits.
+_HIT_TIERS = ("categories", "items", "resources")
+
+# memu-py retrieve steps that ask the chat model whether to search and
+# rewrite the query, so the text actually embedded is only known at run time.
+_BATCH_RETRIEVE_OVERRIDES = {"route_intention": False, "sufficiency_check": False}
+
+
+def scope_filter(body: RetrieveRequest | RetrieveBatchRequest) -> dict[str, Any]:
+    """Build the memu-py ``where`` filter that restricts a search to one tenant."""
+    where: dict[str, Any] = {"user_id": body.user_id}
+    if body.agent_id is not None:
+        where["agent_id"] = body.agent_id
+    return where
+
+
+def apply_retrieve_options(result: dict[str, Any], top_k: int, min_score: float | None) -> dict[str, Any]:
+    """Trim each hit tier to ``top_k`` entries scoring at least ``min_score``.
+
+    memu-py returns hits in descending score order, so truncation keeps the
+    best matches. The input dict is not modified.
+    """
+    if not isinstance(result, dict):
+        return result
+    trimmed = dict(result)
+    for tier in _HIT_TIERS:
+        hits = result.get(tier)
+        if not isinstance(hits, list):
+            continue
+        if min_score is not None:
+            hits = [h for h in hits if not isinstance(h, dict) or h.get("score", 0.0) >= min_score]
+        trimmed[tier] = hits[:top_k]
+    return trimmed
+
+
+def batch_retrieve_service(service: MemoryService) -> MemoryService:
+    """A view of ``service`` whose retrieve skips intention routing and sufficiency checks.
+
+    The view shares the service's clients, database and pipelines; only its
+    retrieve config differs, so every search embeds exactly the query text.
+    """
+    view = copy.copy(service)
+    view.retrieve_config = service.retrieve_config.model_copy(update=_BATCH_RETRIEVE_OVERRIDES)
+    return view
+
+
+def category_summaries(service: MemoryService, where: dict[str, Any]) -> list[str]:
+    """Summaries of the categories in scope, which retrieve embeds to rank categories."""
+    if not service.retrieve_config.category.enabled:
+        return []
+    categories = service.database.memory_category_repo.list_categories(where)
+    return [category.summary for category in categories.values() if category.summary]
+
+
+async def retrieve_many(service: MemoryService, queries: list[str], where: dict[str, Any]) -> list[dict[str, Any]]:
+    """Search each of ``queries`` (distinct) concurrently with one embedding-provider call.
+
+    The queries and the category summaries in scope are embedded together up
+    front and served to the searches of :func:`batch_retrieve_service` through
+    :func:`~app.services.embedding.prefetched_embeddings`.
+    """
+    view = batch_retrieve_service(service)
+    texts = list(dict.fromkeys([*queries, *category_summaries(view, where)]))
+    vectors = await embed_texts(service, texts)
+    with prefetched_embeddings(dict(zip(texts, vectors, strict=True))):
+        results = await asyncio.gather(*(view.retrieve([query], where=where) for query in queries))
+    return list(results)
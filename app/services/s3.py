@@ -0,0 +1,279 @@
+"""Minimal client for S3-compatible object stores (AWS S3, MinIO, Ceph, R2).
+
+Only what the blob store needs: put (single or multipart), streamed get,
+head, delete and list, over httpx with AWS Signature Version 4. Requests use
+path-style URLs (``<endpoint>/<bucket>/<key>``), which every S3-compatible
+server accepts, and unsigned payloads, so bodies are never hashed or held in
+memory just to be signed.
+"""
+
+import hashlib
+import hmac
+import xml.etree.ElementTree as ET
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from urllib.parse import quote
+
+import httpx
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# S3 rejects multipart parts below 5 MiB (except the last).
+MIN_PART_BYTES = 5 * 1024 * 1024
+
+_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class S3Error(Exception):
+    """An S3 request failed.
+
+    Attributes:
+        status: HTTP status of the response.
+    """
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class S3Object:
+    key: str
+    size: int
+    last_modified: float
+
+
+def _parse_xml(content: bytes) -> ET.Element:
+    # Responses come from the configured endpoint, not from users.
+    return ET.fromstring(content)  # nosec B314
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_request(
+    method: str,
+    url: httpx.URL,
+    headers: dict[str, str],
+    *,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: datetime,
+    service: str = "s3",
+) -> str:
+    """Return the SigV4 ``Authorization`` header for a request.
+
+    ``headers`` must already hold ``host``, ``x-amz-date`` and
+    ``x-amz-content-sha256``; all of them are signed.
+    """
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now:%Y%m%d}/{region}/{service}/aws4_request"
+    canonical_headers = {name.lower(): " ".join(value.split()) for name, value in headers.items()}
+    signed_headers = ";".join(sorted(canonical_headers))
+    query = sorted(
+        (quote(k, safe="-_.~"), quote(v, safe="-_.~")) for k, v in httpx.QueryParams(url.query).multi_items()
+    )
+    canonical_request = "\n".join(
+        [
+            method,
+            quote(url.path, safe="/-_.~"),
+            "&".join(f"{k}={v}" for k, v in query),
+            "".join(f"{name}:{canonical_headers[name]}\n" for name in sorted(canonical_headers)),
+            signed_headers,
+            canonical_headers["x-amz-content-sha256"],
+        ]
+    )
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()]
+    )
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), f"{now:%Y%m%d}")
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={signed_headers}, Signature={signature}"
+
+
+class S3Client:
+    """One bucket of an S3-compatible store.
+
+    Args:
+        endpoint_url: e.g. ``https://s3.eu-west-1.amazonaws.com`` or
+            ``http://minio:9000``.
+        bucket: Bucket name.
+        access_key: Access key ID.
+        secret_key: Secret access key.
+        region: Signing region (MinIO accepts any, usually ``us-east-1``).
+        transport: httpx transport override (tests).
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        timeout: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._client = httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def _request(
+        self,
+        method: str,
+        key: str = "",
+        params: dict[str, str] | None = None,
+        content: bytes | None = None,
+    ) -> httpx.Request:
+        url = httpx.URL(f"{self.base_url}/{quote(key, safe='/-_.~')}", params=params)
+        headers = {
+            "host": url.netloc.decode("ascii"),
+            "x-amz-content-sha256": UNSIGNED_PAYLOAD,
+            "x-amz-date": datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ"),
+        }
+        now = datetime.strptime(headers["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=UTC)
+        headers["authorization"] = sign_request(
+            method,
+            url,
+            headers,
+            access_key=self.access_key,
+            secret_key=self.secret_key,
+            region=self.region,
+            now=now,
+        )
+        return self._client.build_request(method, url, headers=headers, content=content)
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        response = await self._client.send(request)
+        if response.status_code >= 300:
+            detail = response.text[:200]
+            raise S3Error(
+                f"S3 {request.method} {request.url.path} failed with HTTP {response.status_code}: {detail}",
+                response.status_code,
+            )
+        return response
+
+    async def put_object(self, key: str, data: bytes) -> None:
+        await self._send(self._request("PUT", key, content=data))
+
+    async def upload(self, key: str, chunks: AsyncIterable[bytes], part_bytes: int) -> int:
+        """Upload a stream, buffering at most ``part_bytes`` at a time.
+
+        Streams that fit in one part are sent with a single PUT; longer ones
+        as a multipart upload, aborted if anything fails.
+
+        Returns:
+            Bytes uploaded.
+        """
+        part_bytes = max(part_bytes, MIN_PART_BYTES)
+        buffer = bytearray()
+        upload_id: str | None = None
+        etags: list[str] = []
+        total = 0
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                total += len(chunk)
+                while len(buffer) >= part_bytes:
+                    if upload_id is None:
+                        upload_id = await self._create_multipart(key)
+                    etags.append(await self._upload_part(key, upload_id, len(etags) + 1, bytes(buffer[:part_bytes])))
+                    del buffer[:part_bytes]
+            if upload_id is None:
+                await self.put_object(key, bytes(buffer))
+                return total
+            if buffer or not etags:
+                etags.append(await self._upload_part(key, upload_id, len(etags) + 1, bytes(buffer)))
+            await self._complete_multipart(key, upload_id, etags)
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self._send(self._request("DELETE", key, {"uploadId": upload_id}))
+                except (S3Error, httpx.HTTPError):
+                    pass
+            raise
+        return total
+
+    async def _create_multipart(self, key: str) -> str:
+        response = await self._send(self._request("POST", key, {"uploads": ""}))
+        upload_id = _parse_xml(response.content).findtext(f"{_NS}UploadId")
+        if not upload_id:
+            raise S3Error(f"S3 returned no UploadId for {key}", response.status_code)
+        return upload_id
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        response = await self._send(
+            self._request("PUT", key, {"partNumber": str(number), "uploadId": upload_id}, content=data)
+        )
+        return str(response.headers.get("etag", ""))
+
+    async def _complete_multipart(self, key: str, upload_id: str, etags: list[str]) -> None:
+        root = ET.Element("CompleteMultipartUpload", xmlns=_NS[1:-1])
+        for number, etag in enumerate(etags, start=1):
+            part = ET.SubElement(root, "Part")
+            ET.SubElement(part, "PartNumber").text = str(number)
+            ET.SubElement(part, "ETag").text = etag
+        response = await self._send(
+            self._request("POST", key, {"uploadId": upload_id}, content=ET.tostring(root, encoding="utf-8"))
+        )
+        # Completion can fail after a 200 status; the error is in the body.
+        if b"<Error>" in response.content:
+            raise S3Error(f"S3 multipart completion failed for {key}: {response.text[:200]}", response.status_code)
+
+    async def get_object(self, key: str) -> AsyncIterator[bytes]:
+        """Stream an object's body.
+
+        Raises:
+            FileNotFoundError: If there is no such object.
+        """
+        response = await self._client.send(self._request("GET", key), stream=True)
+        try:
+            if response.status_code == 404:
+                raise FileNotFoundError(key)
+            if response.status_code >= 300:
+                await response.aread()
+                raise S3Error(f"S3 GET {key} failed with HTTP {response.status_code}", response.status_code)
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def head_object(self, key: str) -> int | None:
+        """Size of an object, or None if it doesn't exist."""
+        response = await self._client.send(self._request("HEAD", key))
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 300:
+            raise S3Error(f"S3 HEAD {key} failed with HTTP {response.status_code}", response.status_code)
+        return int(response.headers.get("content-length", 0))
+
+    async def delete_object(self, key: str) -> None:
+        await self._send(self._request("DELETE", key))
+
+    async def list_objects(self, prefix: str) -> AsyncIterator[S3Object]:
+        """List the objects under ``prefix`` (ListObjectsV2, all pages)."""
+        token: str | None = None
+        while True:
+            params = {"list-type": "2", "prefix": prefix}
+            if token:
+                params["continuation-token"] = token
+            root = _parse_xml((await self._send(self._request("GET", "", params))).content)
+            for item in root.iter(f"{_NS}Contents"):
+                modified = item.findtext(f"{_NS}LastModified") or ""
+                yield S3Object(
+                    key=item.findtext(f"{_NS}Key") or "",
+                    size=int(item.findtext(f"{_NS}Size") or 0),
+                    last_modified=datetime.fromisoformat(modified.replace("Z", "+00:00")).timestamp(),
+                )
+            if root.findtext(f"{_NS}IsTruncated") != "true":
+                return
+            token = root.findtext(f"{_NS}NextContinuationToken")
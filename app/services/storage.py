@@ -0,0 +1,155 @@
+"""Layout and lifecycle of the files in STORAGE_PATH.
+
+Layout: specs and results refer to files by bare name (``conversation-<id>.json``,
+``result-<id>.json``). With STORAGE_SHARDING on, new files are written to
+``<aa>/<bb>/<name>`` where ``aabb`` are the first hex digits of the name's
+SHA-256, so no directory grows beyond a few hundred entries. Lookups try the
+sharded location and then the flat one, so files written before sharding was
+enabled (or by a process with it off) are still found.
+
+Lifecycle: once a memorize workflow reaches a terminal state its conversation
+files are deleted or, with STORAGE_RETENTION_MODE=archive, gzip-compressed in
+place (``<name>.gz``). A periodic sweep removes files that no workflow cleaned
+up (canceled or terminated tasks, crashed submissions) once they are older
+than STORAGE_ORPHAN_RETENTION_SECONDS, and archives older than
+STORAGE_ARCHIVE_RETENTION_SECONDS.
+
+These are the filesystem primitives; ``app.services.blob_store`` builds the
+storage backends on them.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.utils.metrics import metrics
+
+ARCHIVE_SUFFIX = ".gz"
+# Files the sweeper may remove; anything else in STORAGE_PATH is left alone.
+_MANAGED_PREFIXES = ("conversation-", "result-", ".conversation-", ".result-")
+
+
+def shard_dir(root: Path, name: str) -> Path:
+    """Directory a sharded file named ``name`` lives in."""
+    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    return root / digest[:2] / digest[2:4]
+
+
+def storage_path(root: Path, name: str, sharded: bool) -> Path:
+    """Path to write a new file named ``name`` to (its directory is created)."""
+    directory = shard_dir(root, name) if sharded else root
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / name
+
+
+def locate(root: Path, name: str) -> Path:
+    """Path of an existing file named ``name``, sharded or flat.
+
+    Returns the flat path if neither exists, so reading it raises
+    FileNotFoundError as before.
+    """
+    sharded = shard_dir(root, name) / name
+    if sharded.exists():
+        return sharded
+    return root / name
+
+
+def remove_file(path: Path) -> int | None:
+    """Delete ``path`` and return its size (None if it was already gone)."""
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except FileNotFoundError:
+        return None
+    return size
+
+
+def archive_file(path: Path) -> int | None:
+    """Replace ``path`` by a gzip-compressed ``<name>.gz``.
+
+    Returns:
+        The bytes saved, or None if ``path`` didn't exist.
+    """
+    target = path.with_name(path.name + ARCHIVE_SUFFIX)
+    partial = path.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        size = path.stat().st_size
+        with path.open("rb") as src, gzip.open(partial, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    except FileNotFoundError:
+        partial.unlink(missing_ok=True)
+        return None
+    os.replace(partial, target)
+    path.unlink(missing_ok=True)
+    return max(size - target.stat().st_size, 0)
+
+
+def count_reclaimed(reason: str, size: int) -> None:
+    """Record one removed file of ``size`` bytes in the storage metrics."""
+    metrics.inc("memu_storage_files_removed", attributes={"reason": reason})
+    metrics.inc("memu_storage_bytes_reclaimed", size, attributes={"reason": reason})
+
+
+@dataclass
+class SweepResult:
+    orphans: int = 0
+    archives: int = 0
+    bytes_reclaimed: int = 0
+
+
+def expiry_reason(name: str, age: float, orphan_retention: float, archive_retention: float) -> str | None:
+    """Why the sweep removes a file ``name`` last modified ``age`` seconds ago, or None to keep it.
+
+    Args:
+        orphan_retention: Remove conversation and result files older than
+            this many seconds (0 keeps them). Must exceed the longest a task
+            can run, including coalescing.
+        archive_retention: Remove archived files older than this many
+            seconds (0 keeps them).
+    """
+    if not name.startswith(_MANAGED_PREFIXES):
+        return None
+    if name.endswith(ARCHIVE_SUFFIX):
+        return "expired_archive" if 0 < archive_retention < age else None
+    return "orphan" if 0 < orphan_retention < age else None
+
+
+def sweep(
+    root: Path,
+    orphan_retention: float,
+    archive_retention: float,
+    now: float | None = None,
+    skip: Path | None = None,
+) -> SweepResult:
+    """Remove stale files under ``root`` (see :func:`expiry_reason`).
+
+    Args:
+        skip: A directory under ``root`` not to descend into.
+        now: Current time (for tests).
+    """
+    now = time.time() if now is None else now
+    result = SweepResult()
+    for dirpath, dirnames, filenames in os.walk(root):
+        if skip is not None:
+            dirnames[:] = [d for d in dirnames if Path(dirpath) / d != skip]
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            try:
+                age = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            reason = expiry_reason(filename, age, orphan_retention, archive_retention)
+            if reason is None:
+                continue
+            size = remove_file(path) or 0
+            count_reclaimed(reason, size)
+            result.bytes_reclaimed += size
+            if reason == "orphan":
+                result.orphans += 1
+            else:
+                result.archives += 1
+    return result
@@ -0,0 +1,141 @@
+"""Memorize task events: publication, in-process fan-out and SSE framing.
+
+When a memorize workflow finishes, the worker publishes one event on
+:data:`TASK_EVENTS_CHANNEL` (see :func:`publish_task_event`). Each API
+replica's Postgres listener hands it to an :class:`EventBroker`, which fans it
+out to the ``GET /memorize/events`` streams open for that user.
+
+Delivery over SSE is best effort: events published while a client (or the
+replica's subscription) is disconnected are not replayed. Clients reconcile
+with ``POST /memorize/status`` after reconnecting.
+"""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from app.services.notifications import notify
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_CHANNEL = "memu_task_events"
+
+EVENT_COMPLETED = "memorize.completed"
+EVENT_FAILED = "memorize.failed"
+
+
+def build_task_event(
+    task_id: str,
+    spec: dict,
+    status: str,
+    detail: str | None,
+    finished_at: str,
+) -> dict[str, Any]:
+    """Build the event payload shared by SSE streams and webhooks."""
+    return {
+        "event": EVENT_COMPLETED if status == "COMPLETED" else EVENT_FAILED,
+        "task_id": task_id,
+        "user_id": spec.get("user_id"),
+        "agent_id": spec.get("agent_id", ""),
+        "status": status,
+        "detail": detail,
+        "finished_at": finished_at,
+    }
+
+
+async def publish_task_event(dsn: str, event: dict[str, Any]) -> None:
+    """Publish ``event`` to every API replica."""
+    await notify(dsn, TASK_EVENTS_CHANNEL, json.dumps(event, ensure_ascii=False))
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    """Frame ``event`` as one server-sent event."""
+    data = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event.get('event', 'message')}\nid: {event.get('task_id', '')}\ndata: {data}\n\n"
+
+
+class EventBroker:
+    """Fans task events out to per-user subscriber queues.
+
+    Args:
+        queue_size: Events buffered per subscriber. A subscriber that falls
+            further behind loses its oldest events.
+    """
+
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = max(queue_size, 1)
+        self._subscribers: dict[str, set[asyncio.Queue[dict[str, Any]]]] = {}
+
+    def subscriber_count(self, user_id: str | None = None) -> int:
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id: str) -> asyncio.Queue[dict[str, Any]]:
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        metrics.set_gauge("memu_task_event_subscribers", self.subscriber_count())
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue[dict[str, Any]]) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+        metrics.set_gauge("memu_task_event_subscribers", self.subscriber_count())
+
+    def publish(self, event: dict[str, Any]) -> None:
+        """Deliver ``event`` to every subscriber of its user."""
+        user_id = event.get("user_id")
+        if not isinstance(user_id, str):
+            return
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                metrics.inc("memu_task_events_dropped")
+            queue.put_nowait(event)
+        metrics.inc("memu_task_events_published")
+
+    def publish_raw(self, payload: str) -> None:
+        """Deliver a JSON payload received from :data:`TASK_EVENTS_CHANNEL`."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed task event: %r", payload[:200])
+            return
+        if isinstance(event, dict):
+            self.publish(event)
+
+
+async def stream_task_events(
+    broker: EventBroker,
+    user_id: str,
+    agent_id: str | None,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    keepalive_seconds: float,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for ``user_id``'s task events until the client goes away.
+
+    With ``agent_id``, only that agent's events are sent. A comment line is
+    sent every ``keepalive_seconds`` so proxies keep the connection open.
+    """
+    queue = broker.subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive_seconds)
+            except TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if agent_id is not None and event.get("agent_id") != agent_id:
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(user_id, queue)
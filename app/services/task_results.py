@@ -0,0 +1,56 @@
+"""Offloading full memorize results out of Temporal history.
+
+With MEMORIZE_COMPACT_RESULTS on, memorize activities return only counts, a
+duration and a ``result_ref``; the full memu result is written to
+``result-<id>.json`` in the blob store and served by
+``GET /memorize/result/{task_id}``. Workflow results, and therefore status
+polls, stay a few hundred bytes no matter how much a conversation produced.
+"""
+
+import json
+import re
+from collections.abc import Mapping
+from typing import Any
+
+from app.services.blob_store import BlobStore
+
+_RESULT_REF_RE = re.compile(r"^result-[A-Za-z0-9_-]+\.json$")
+
+
+def result_filename(result_id: str) -> str:
+    """Name of the stored result for a task (or merged batch) ID."""
+    ref = f"result-{result_id}.json"
+    if not _RESULT_REF_RE.match(ref):
+        raise ValueError(f"Invalid result ID: {result_id!r}")
+    return ref
+
+
+def summarize_result(result: Any) -> dict[str, int]:
+    """Count the items, categories and resources of a memu memorize result."""
+    if not isinstance(result, Mapping):
+        return {"items": 0, "categories": 0, "resources": 0}
+    resources = result.get("resources")
+    return {
+        "items": len(result.get("items") or []),
+        "categories": len(result.get("categories") or []),
+        "resources": len(resources) if isinstance(resources, list) else int(result.get("resource") is not None),
+    }
+
+
+async def store_result(store: BlobStore, result_id: str, result: Any) -> str:
+    """Write ``result`` as JSON to the blob store and return its reference."""
+    ref = result_filename(result_id)
+    await store.put_bytes(ref, json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+    return ref
+
+
+async def load_result(store: BlobStore, ref: str) -> Any:
+    """Read a stored result.
+
+    Raises:
+        ValueError: If ``ref`` is not a result reference.
+        FileNotFoundError: If the result is gone.
+    """
+    if not _RESULT_REF_RE.match(ref):
+        raise ValueError(f"Invalid result reference: {ref!r}")
+    return json.loads(await store.read_bytes(ref))
@@ -0,0 +1,200 @@
+"""Resolving memorize task status from Temporal, with shared long-poll waiters.
+
+Terminal statuses never change, so they are kept in a
+:class:`TerminalStatusCache`; repeated lookups of finished tasks make no
+Temporal RPCs. Failed-like statuses are only kept briefly, as an idempotent
+task that failed can be submitted and run again under the same ID.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from temporalio.client import Client, WorkflowFailureError
+
+from app.schemas.memory import TaskStatusResponse
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Workflow statuses that never change once reached
+TERMINAL_STATUSES = frozenset({"COMPLETED", "FAILED", "CANCELED", "TERMINATED", "TIMED_OUT"})
+# Terminal statuses whose workflow ID a resubmission may start again (key- or
+# content-derived IDs of idempotent tasks; see app.services.idempotency).
+RESTARTABLE_STATUSES = TERMINAL_STATUSES - {"COMPLETED"}
+# Seconds a restartable status is cached; only the replica that restarts a
+# task forgets its entry, so other replicas must see the new run soon.
+RESTARTABLE_STATUS_TTL_SECONDS = 5.0
+
+
+def completed_detail(result: Any) -> str:
+    """Summarize a completed workflow's result for the ``detail`` field."""
+    if isinstance(result, dict):
+        return str(result.get("status", "SUCCESS"))
+    if result is not None:
+        return str(result)
+    return "SUCCESS"
+
+
+class TerminalStatusCache:
+    """Thread-safe LRU of terminal task statuses.
+
+    COMPLETED is kept until evicted. Statuses in RESTARTABLE_STATUSES expire
+    after RESTARTABLE_STATUS_TTL_SECONDS, because resubmitting an idempotent
+    task runs its workflow ID again.
+
+    Args:
+        max_entries: Maximum statuses kept; 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(max_entries, 0)
+        self._lock = threading.Lock()
+        # task_id -> (status, monotonic expiry or None)
+        self._entries: OrderedDict[str, tuple[TaskStatusResponse, float | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, task_id: str) -> TaskStatusResponse | None:
+        status: TaskStatusResponse | None = None
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is not None:
+                if entry[1] is not None and entry[1] <= time.monotonic():
+                    del self._entries[task_id]
+                else:
+                    status = entry[0]
+                    self._entries.move_to_end(task_id)
+        metrics.inc("memu_task_status_cache_hits" if status is not None else "memu_task_status_cache_misses")
+        return status
+
+    def discard(self, task_id: str) -> None:
+        """Forget ``task_id``; used when a failed idempotent task is started again on this replica."""
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def put(self, status: TaskStatusResponse) -> None:
+        """Remember ``status`` if it is terminal (non-terminal statuses are ignored)."""
+        if self.max_entries == 0 or status.status not in TERMINAL_STATUSES:
+            return
+        expires = time.monotonic() + RESTARTABLE_STATUS_TTL_SECONDS if status.status in RESTARTABLE_STATUSES else None
+        with self._lock:
+            self._entries[status.task_id] = (status, expires)
+            self._entries.move_to_end(status.task_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+async def describe_status(
+    temporal: Client,
+    task_id: str,
+    cache: TerminalStatusCache | None = None,
+) -> TaskStatusResponse:
+    """Look up a task's current status (``describe()``, plus ``result()`` once completed).
+
+    With ``cache``, a known terminal status is returned without any RPC and
+    newly observed terminal statuses are stored.
+
+    Raises:
+        RPCError: From Temporal, e.g. NOT_FOUND for unknown task IDs.
+    """
+    if cache is not None:
+        cached = cache.get(task_id)
+        if cached is not None:
+            return cached
+
+    handle = temporal.get_workflow_handle(task_id)
+    describe = await handle.describe()
+    status = describe.status.name if describe.status else "UNKNOWN"
+
+    detail = None
+    if status == "COMPLETED":
+        detail = completed_detail(await handle.result())
+    elif status == "FAILED":
+        detail = "Task execution failed"
+    task_status = TaskStatusResponse(task_id=task_id, status=status, detail=detail)
+    if cache is not None:
+        cache.put(task_status)
+    return task_status
+
+
+class _Waiter:
+    def __init__(self, task: asyncio.Task[TaskStatusResponse]) -> None:
+        self.task = task
+        self.callers = 0
+
+
+class WorkflowWaiters:
+    """One shared long-poll per workflow for callers waiting on its outcome.
+
+    The first caller for a task ID starts a background ``handle.result()``
+    (a single long-polling history request in Temporal); later callers wait
+    on the same task. When the last caller gives up before the workflow
+    finishes, the long-poll is cancelled.
+    """
+
+    def __init__(self, cache: TerminalStatusCache | None = None) -> None:
+        self._waiters: dict[str, _Waiter] = {}
+        self._cache = cache
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    async def wait(self, temporal: Client, task_id: str, timeout: float) -> TaskStatusResponse | None:
+        """Wait up to ``timeout`` seconds for ``task_id`` to finish.
+
+        Returns:
+            The terminal status, or None if the timeout passed first.
+        """
+        waiter = self._waiters.get(task_id)
+        if waiter is None:
+            waiter = _Waiter(asyncio.ensure_future(self._await_outcome(temporal, task_id, self._cache)))
+            self._waiters[task_id] = waiter
+            waiter.task.add_done_callback(lambda _t: self._discard(task_id, waiter))
+            metrics.inc("memu_status_waiters_started")
+        else:
+            metrics.inc("memu_status_waiters_shared")
+
+        waiter.callers += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.task), timeout)
+        except TimeoutError:
+            return None
+        finally:
+            metrics.observe("memu_status_wait_seconds", time.perf_counter() - started)
+            waiter.callers -= 1
+            if waiter.callers == 0 and not waiter.task.done():
+                waiter.task.cancel()
+                self._discard(task_id, waiter)
+
+    def _discard(self, task_id: str, waiter: _Waiter) -> None:
+        if self._waiters.get(task_id) is waiter:
+            del self._waiters[task_id]
+
+    def close(self) -> None:
+        for waiter in list(self._waiters.values()):
+            waiter.task.cancel()
+        self._waiters.clear()
+
+    @staticmethod
+    async def _await_outcome(
+        temporal: Client,
+        task_id: str,
+        cache: TerminalStatusCache | None,
+    ) -> TaskStatusResponse:
+        handle = temporal.get_workflow_handle(task_id)
+        try:
+            result = await handle.result()
+        except WorkflowFailureError:
+            # Failed, cancelled, terminated or timed out: describe() tells which
+            return await describe_status(temporal, task_id, cache)
+        task_status = TaskStatusResponse(task_id=task_id, status="COMPLETED", detail=completed_detail(result))
+        if cache is not None:
+            cache.put(task_status)
+        return task_status
@@ -0,0 +1,134 @@
+"""Signed delivery of task events to ``callback_url`` webhooks.
+
+Each delivery is a JSON ``POST`` with these headers:
+
+* ``X-Memu-Event``: the event name, e.g. ``memorize.completed``;
+* ``X-Memu-Delivery``: the task ID, stable across retries so receivers can
+  drop duplicates;
+* ``X-Memu-Timestamp``: Unix time of this attempt;
+* ``X-Memu-Signature``: ``sha256=<hex>``, the HMAC-SHA256 of
+  ``"<timestamp>.<body>"`` under WEBHOOK_SIGNING_SECRET (only when set).
+
+``callback_url`` is caller-supplied, so before each attempt the host is
+resolved and the delivery refused if any address is not globally routable
+(private, loopback, link-local such as the 169.254.169.254 cloud metadata
+endpoint, shared, reserved or multicast). The request then connects to the
+checked address, so the name cannot re-resolve elsewhere in between. Hosts in
+WEBHOOK_ALLOWED_HOSTS skip the check, for receivers inside the network.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+from collections.abc import Collection
+from typing import Any
+
+import httpx
+
+# Client errors worth retrying; any other 4xx means the request won't succeed as sent
+RETRYABLE_CLIENT_STATUSES = frozenset({408, 425, 429})
+
+
+class WebhookDeliveryError(Exception):
+    """A delivery attempt failed.
+
+    Attributes:
+        retryable: Whether a later attempt may succeed.
+    """
+
+    def __init__(self, message: str, retryable: bool) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_public_address(address: str) -> bool:
+    """Whether ``address`` (an IP literal) is a globally routable unicast address."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def _public_address(host: str, port: int) -> str:
+    """Resolve ``host`` and return its first address, refusing hosts with any non-public address."""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as exc:
+        raise WebhookDeliveryError(f"Webhook host {host} did not resolve: {exc}", retryable=True) from exc
+    addresses = [str(info[4][0]) for info in infos]
+    blocked = [address for address in addresses if not is_public_address(address)]
+    if blocked or not addresses:
+        msg = f"Webhook host {host} resolves to a non-public address {', '.join(blocked)}"
+        raise WebhookDeliveryError(msg, retryable=False)
+    return addresses[0]
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """Return the ``X-Memu-Signature`` value for ``body`` sent at ``timestamp``."""
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str) -> bool:
+    """Check a received ``X-Memu-Signature`` (for receivers and tests)."""
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+
+async def deliver_webhook(
+    url: str,
+    event: dict[str, Any],
+    secret: str = "",
+    timeout: float = 10.0,
+    transport: httpx.AsyncBaseTransport | None = None,
+    allowed_hosts: Collection[str] = (),
+) -> int:
+    """POST ``event`` to ``url`` and return the response status.
+
+    Args:
+        allowed_hosts: Lower-cased host names delivered to without the
+            public-address check.
+
+    Raises:
+        WebhookDeliveryError: On network errors, a non-2xx response or, not
+            retryable, a host resolving to a non-public address.
+    """
+    body = json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "memu-server-webhook",
+        "X-Memu-Event": str(event.get("event", "")),
+        "X-Memu-Delivery": str(event.get("task_id", "")),
+        "X-Memu-Timestamp": timestamp,
+    }
+    if secret:
+        headers["X-Memu-Signature"] = sign_payload(secret, timestamp, body)
+
+    target = httpx.URL(url)
+    if target.scheme not in ("http", "https") or not target.host:
+        raise WebhookDeliveryError(f"Webhook URL {url} is not an http(s) URL", retryable=False)
+    extensions: dict[str, Any] = {}
+    if target.host.lower() not in allowed_hosts:
+        # Connect to the checked address, keeping the name for Host and TLS.
+        address = await _public_address(target.host, target.port or (443 if target.scheme == "https" else 80))
+        headers["Host"] = target.netloc.decode("ascii")
+        if target.scheme == "https":
+            extensions["sni_hostname"] = target.host
+        target = target.copy_with(host=address)
+
+    try:
+        async with httpx.AsyncClient(timeout=timeout, transport=transport) as client:
+            response = await client.post(target, content=body, headers=headers, extensions=extensions)
+    except httpx.HTTPError as exc:
+        msg = f"Webhook request to {url} failed: {exc.__class__.__name__}"
+        raise WebhookDeliveryError(msg, retryable=True) from exc
+
+    if response.is_success:
+        return response.status_code
+    retryable = response.status_code >= 500 or response.status_code in RETRYABLE_CLIENT_STATUSES
+    msg = f"Webhook {url} answered HTTP {response.status_code}"
+    raise WebhookDeliveryError(msg, retryable=retryable)
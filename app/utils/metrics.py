@@ -0,0 +1,142 @@
+"""Lightweight in-process metrics registry.
+
+Counters and timing summaries are kept in memory so they can be read back
+(by ``GET /metrics`` on the API server, or by tests). When a Temporal metric
+meter is attached via :meth:`MetricsRegistry.attach_meter` (the worker does
+this when ``WORKER_METRICS_BIND_ADDRESS`` is set), every observation is also
+forwarded to it and exported through Temporal's Prometheus endpoint.
+"""
+
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from temporalio.common import MetricMeter
+
+Attributes = Mapping[str, str]
+
+
+@dataclass
+class TimingSummary:
+    """Running count/sum/min/max of observed values (seconds)."""
+
+    count: int = 0
+    total: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        if self.count == 0:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.count += 1
+        self.total += value
+
+    def as_dict(self) -> dict[str, float]:
+        avg = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "sum": self.total, "min": self.min, "max": self.max, "avg": avg}
+
+
+def _series_key(name: str, attributes: Attributes | None) -> str:
+    if not attributes:
+        return name
+    labels = ",".join(f"{k}={v}" for k, v in sorted(attributes.items()))
+    return f"{name}{{{labels}}}"
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and timing summaries."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._timings: dict[str, TimingSummary] = {}
+        self._meter: MetricMeter | None = None
+        self._instruments: dict[str, Any] = {}
+
+    def attach_meter(self, meter: MetricMeter | None) -> None:
+        """Forward future observations to a Temporal metric meter (or stop, if None)."""
+        with self._lock:
+            self._meter = meter
+            self._instruments.clear()
+
+    def inc(self, name: str, value: float = 1, attributes: Attributes | None = None) -> None:
+        """Increment a counter."""
+        key = _series_key(name, attributes)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            instrument = self._instrument("counter", name)
+        if instrument is not None:
+            instrument.add(int(value), attributes or {})
+
+    def set_gauge(self, name: str, value: float, attributes: Attributes | None = None) -> None:
+        """Set a gauge to an absolute value."""
+        key = _series_key(name, attributes)
+        with self._lock:
+            self._gauges[key] = value
+            instrument = self._instrument("gauge", name)
+        if instrument is not None:
+            instrument.set(value, attributes or {})
+
+    def observe(self, name: str, seconds: float, attributes: Attributes | None = None) -> None:
+        """Record a duration in seconds."""
+        key = _series_key(name, attributes)
+        with self._lock:
+            self._timings.setdefault(key, TimingSummary()).observe(seconds)
+            instrument = self._instrument("histogram", name)
+        if instrument is not None:
+            instrument.record(seconds, attributes or {})
+
+    def counter(self, name: str, attributes: Attributes | None = None) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(_series_key(name, attributes), 0)
+
+    def gauge(self, name: str, attributes: Attributes | None = None) -> float | None:
+        """Return the current value of a gauge, or None if never set."""
+        with self._lock:
+            return self._gauges.get(_series_key(name, attributes))
+
+    def timing(self, name: str, attributes: Attributes | None = None) -> TimingSummary:
+        """Return a copy of a timing summary (empty if never observed)."""
+        with self._lock:
+            summary = self._timings.get(_series_key(name, attributes), TimingSummary())
+            return TimingSummary(summary.count, summary.total, summary.min, summary.max)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {k: v.as_dict() for k, v in self._timings.items()},
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded values (used by tests)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+    def _instrument(self, kind: str, name: str) -> Any:
+        # Caller holds self._lock.
+        if self._meter is None:
+            return None
+        instrument = self._instruments.get(name)
+        if instrument is None:
+            if kind == "counter":
+                instrument = self._meter.create_counter(name)
+            elif kind == "gauge":
+                instrument = self._meter.create_gauge_float(name)
+            else:
+                instrument = self._meter.create_histogram_float(name, unit="s")
+            self._instruments[name] = instrument
+        return instrument
+
+
+metrics = MetricsRegistry()
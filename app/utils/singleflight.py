@@ -0,0 +1,42 @@
+"""Coalescing of identical concurrent async calls ("single flight")."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.utils.metrics import metrics
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome.
+
+    The call runs in its own task, so a caller that is cancelled (e.g. the
+    client disconnected) does not cancel it for the others waiting on it.
+    Must be used from a single event loop.
+
+    Args:
+        name: Value of the ``kind`` attribute on the ``memu_coalesced_requests``
+            counter, incremented for every caller that joined an in-flight call.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: dict[str, asyncio.Task[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await fn()``, or the result of the in-flight call for ``key``."""
+        task = self._calls.get(key)
+        if task is not None:
+            metrics.inc("memu_coalesced_requests", attributes={"kind": self.name})
+        else:
+
+            async def _run() -> Any:
+                return await fn()
+
+            task = asyncio.ensure_future(_run())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t: self._calls.pop(key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,55 @@
+"""Temporal activity handing memorize tasks to the user's coalescing workflow."""
+
+import logging
+
+from temporalio import activity
+from temporalio.client import WorkflowQueryFailedError
+from temporalio.service import RPCError
+
+from app.services.coalescing import coalesce_workflow_id
+
+logger = logging.getLogger(__name__)
+
+
+async def _batch_reported(task_workflow_id: str) -> bool:
+    """Whether the task's workflow has already received its batch outcome."""
+    try:
+        reported = await activity.client().get_workflow_handle(task_workflow_id).query("batch_reported")
+    except (RPCError, WorkflowQueryFailedError):
+        # The coalescer's own dedupe still applies.
+        logger.warning("Could not query %s for its batch outcome", task_workflow_id, exc_info=True)
+        return False
+    return bool(reported)
+
+
+@activity.defn(name="task_enqueue_coalesced")
+async def task_enqueue_coalesced(item: dict) -> str:
+    """Add a task to its user's ``MemorizeCoalesceWorkflow``, starting it if needed.
+
+    Uses signal-with-start, so concurrent tasks of one user always reach the
+    same running coalescer. Retries are safe: the coalescer ignores task IDs
+    it has recently accepted, and a retry whose task has already been
+    reported (its batch done, perhaps by a coalescer run that has since
+    exited) is not queued again.
+
+    Args:
+        item: Task spec plus ``workflow_id`` of the task's own workflow.
+
+    Returns:
+        The coalescing workflow ID.
+    """
+    info = activity.info()
+    workflow_id = coalesce_workflow_id(item["user_id"], item.get("priority"))
+    if info.attempt > 1 and await _batch_reported(item["workflow_id"]):
+        logger.info("Task %s was already memorized by %s", item["workflow_id"], workflow_id)
+        return workflow_id
+    await activity.client().start_workflow(
+        "MemorizeCoalesceWorkflow",
+        {},
+        id=workflow_id,
+        task_queue=info.task_queue,
+        start_signal="enqueue",
+        start_signal_args=[item],
+    )
+    logger.info("Queued task %s with %s", item.get("workflow_id"), workflow_id)
+    return workflow_id
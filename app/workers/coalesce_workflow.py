@@ -0,0 +1,118 @@
+"""Temporal workflow merging a user's queued memorize tasks."""
+
+import asyncio
+from datetime import timedelta
+from typing import Any
+
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, FailureError
+
+with workflow.unsafe.imports_passed_through():
+    from app.services.checkpoint import HEARTBEAT_TIMEOUT
+    from app.services.coalescing import coalesce_group_key
+    from app.workers.memorize_activity import task_memorize_merged
+
+# The coalescer exits after this long without new tasks; the next task starts a new one.
+IDLE_TIMEOUT = timedelta(minutes=1)
+# Batches per run before continuing as new, to keep the history short.
+MAX_BATCHES_PER_RUN = 100
+# Most recent task workflow IDs carried over by continue-as-new, so a retried
+# enqueue of an already batched task is still recognised by the next run.
+MAX_SEEN_CARRIED = 2000
+
+
+@workflow.defn(name="MemorizeCoalesceWorkflow")
+class MemorizeCoalesceWorkflow:
+    """Per-user workflow collecting memorize tasks into merged batches.
+
+    Tasks arrive through the ``enqueue`` signal (see
+    ``task_enqueue_coalesced``). Once a task is pending, the workflow waits
+    for the task's window or until ``max_items`` tasks are pending, then
+    memorizes each group of tasks sharing agent_id and override_config with
+    one ``task_memorize_merged`` activity. Every task workflow is sent a
+    ``batch_finished`` signal with its own result or error.
+    """
+
+    @workflow.init
+    def __init__(self, state: dict) -> None:
+        # Task workflow IDs in arrival order (a dict keeps insertion order).
+        self._seen: dict[str, None] = dict.fromkeys(state.get("seen", []))
+        self._pending: list[dict] = list(state.get("pending", []))
+        self._seen.update(dict.fromkeys(item["workflow_id"] for item in self._pending))
+
+    @workflow.signal
+    def enqueue(self, item: dict) -> None:
+        if item["workflow_id"] in self._seen:
+            return
+        self._seen[item["workflow_id"]] = None
+        self._pending.append(item)
+
+    @workflow.run
+    async def run(self, state: dict) -> None:
+        """Run batches until idle for IDLE_TIMEOUT.
+
+        Args:
+            state: ``{"pending": [...], "seen": [...]}`` carried over by
+                continue-as-new: the queued tasks, and the most recent
+                MAX_SEEN_CARRIED task workflow IDs already accepted.
+        """
+        batches = 0
+        while True:
+            try:
+                await workflow.wait_condition(lambda: bool(self._pending), timeout=IDLE_TIMEOUT)
+            except TimeoutError:
+                return
+            window = self._pending[0]["coalesce"]
+            max_items = max(int(window["max_items"]), 1)
+            try:
+                await workflow.wait_condition(
+                    lambda: len(self._pending) >= max_items,  # noqa: B023 - awaited within the iteration
+                    timeout=timedelta(seconds=float(window["window_seconds"])),
+                )
+            except TimeoutError:
+                pass
+            batch, self._pending = self._pending[:max_items], self._pending[max_items:]
+            await self._memorize(batch)
+            batches += 1
+            if batches >= MAX_BATCHES_PER_RUN or workflow.info().is_continue_as_new_suggested():
+                workflow.continue_as_new({"pending": self._pending, "seen": list(self._seen)[-MAX_SEEN_CARRIED:]})
+
+    async def _memorize(self, batch: list[dict]) -> None:
+        groups: dict[str, list[dict]] = {}
+        for item in batch:
+            groups.setdefault(coalesce_group_key(item), []).append(item)
+        await asyncio.gather(*(self._memorize_group(items) for items in groups.values()))
+
+    async def _memorize_group(self, items: list[dict]) -> None:
+        try:
+            merged = await workflow.execute_activity(
+                task_memorize_merged,
+                items,
+                start_to_close_timeout=timedelta(minutes=10),
+                heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                retry_policy=RetryPolicy(maximum_attempts=3),
+            )
+        except ActivityError:
+            workflow.logger.warning("Merged memorize failed for %d tasks", len(items))
+            outcomes: list[dict[str, Any]] = [{"error": "Task execution failed"} for _ in items]
+        else:
+            outcomes = [
+                {
+                    "result": {
+                        "task_id": item.get("task_id"),
+                        "status": merged["status"],
+                        "finished_at": merged["finished_at"],
+                        "coalesced_tasks": len(items),
+                        "resource_url": merged["resource_url"],
+                        **({"result_ref": merged["result_ref"]} if "result_ref" in merged else {}),
+                    }
+                }
+                for item in items
+            ]
+        for item, outcome in zip(items, outcomes, strict=True):
+            try:
+                await workflow.get_external_workflow_handle(item["workflow_id"]).signal("batch_finished", outcome)
+            except FailureError:
+                # The task workflow is gone (e.g. terminated); nothing to report to.
+                workflow.logger.warning("Could not report batch outcome to %s", item["workflow_id"])
@@ -0,0 +1,24 @@
+"""Temporal activity publishing retrieve-cache invalidations."""
+
+import logging
+
+from temporalio import activity
+
+from app.services.cache_invalidation import publish_invalidation
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@activity.defn(name="task_invalidate_cache")
+async def task_invalidate_cache(user_id: str) -> None:
+    """Tell every API replica that ``user_id``'s memories changed.
+
+    Runs after ``task_memorize`` so cached /retrieve and /categories results
+    for the user are dropped. Failures raise and are retried by Temporal.
+    """
+    settings = Settings()
+    if settings.NOTIFICATIONS_BACKEND != "postgres":
+        return
+    await publish_invalidation(settings.postgres_dsn, user_id)
+    logger.info("Published cache invalidation for user %s", user_id)
@@ -1,7 +1,13 @@
-"""Temporal activity for memorize task execution."""
+"""Temporal activities for memorize task execution."""
 
+import asyncio
 import json
 import logging
+import tempfile
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import AbstractContextManager, asynccontextmanager
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
@@ -9,20 +15,50 @@ from typing import Any
 from temporalio import activity
 from temporalio.exceptions import ApplicationError
 
-from app.services.memu import create_memory_service
+from app.services.blob_store import BlobStore, get_blob_store
+from app.services.checkpoint import memorize_with_checkpoints
+from app.services.chunking import category_updates, consolidate_categories, skip_category_summaries, split_messages
+from app.services.coalescing import conversation_messages, merge_conversations
+from app.services.inline_conversation import decode_inline
+from app.services.memu import MemoryServiceCache, config_cache_key, create_memory_service
+from app.services.task_results import store_result, summarize_result
+from app.utils.metrics import metrics
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 _REQUIRED_FIELDS = ("resource_url", "user_id")
 
+# Worker-local directory for inline conversations while they are memorized.
+_INLINE_DIR = Path(tempfile.gettempdir()) / "memu-inline"
+
+# Per-worker cache of warm MemoryService instances, created on first use.
+_service_cache: MemoryServiceCache | None = None
+
+
+def get_service_cache(settings: Settings) -> MemoryServiceCache:
+    """Return the worker's MemoryService cache, creating it on first use."""
+    global _service_cache
+    if _service_cache is None:
+        _service_cache = MemoryServiceCache(max_size=settings.MEMU_SERVICE_CACHE_SIZE)
+    return _service_cache
+
+
+def close_service_cache() -> None:
+    """Close all cached MemoryService instances (called on worker shutdown)."""
+    global _service_cache
+    if _service_cache is not None:
+        _service_cache.close()
+        _service_cache = None
+
 
 @activity.defn(name="task_memorize")
 async def task_memorize(spec: dict) -> dict[str, Any]:
     """Execute memorization via memu-py MemoryService.
 
     Args:
-        spec: Dict containing task_id, resource_url, user_id, agent_id, etc.
+        spec: Dict containing task_id, resource_url (or an inline
+            ``conversation``), user_id, agent_id, etc.
 
     Returns:
         Dict with finished_at timestamp and status.
@@ -42,7 +78,7 @@ async def task_memorize(spec: dict) -> dict[str, Any]:
 
     # Validate required fields up front (must be present, string, and non-empty)
     missing: list[str] = []
-    for field in _REQUIRED_FIELDS:
+    for field in _required_fields(spec):
         value = spec.get(field)
         if not isinstance(value, str) or not value.strip():
             missing.append(field)
@@ -51,6 +87,7 @@ async def task_memorize(spec: dict) -> dict[str, Any]:
         raise ApplicationError(msg, non_retryable=True)
 
     logger.info("Starting memorize activity for task %s", task_id)
+    started = time.perf_counter()
 
     try:
         settings = Settings()
@@ -63,44 +100,18 @@ async def task_memorize(spec: dict) -> dict[str, Any]:
 
         # Validate and resolve resource_url BEFORE building the service so
         # invalid specs fail fast without opening DB connections or other resources.
-        raw_url = spec["resource_url"]
-        candidate = Path(raw_url)
-        # Reject absolute paths, path traversal, and any directory components.
-        # candidate.name != raw_url catches inputs like "subdir/file.json".
-        if candidate.is_absolute() or ".." in candidate.parts or candidate.name != raw_url:
-            raise ApplicationError(
-                "Invalid resource_url: must be a bare filename without path separators",
-                non_retryable=True,
-            )
-        resource_url = str(Path(settings.STORAGE_PATH).resolve() / candidate.name)
-
-        # Build MemoryService with optional config override
-        if override_config:
-            service = create_memory_service(
-                settings=settings,
-                memorize_config=override_config,
-            )
-        else:
-            service = create_memory_service(settings=settings)
-
-        # Execute memorization
-        result = await service.memorize(
-            resource_url=resource_url,
-            modality="conversation",
-            user={
-                "user_id": spec["user_id"],
-                "agent_id": spec.get("agent_id", ""),
-            },
-        )
+        async with _conversation_file(settings, spec) as path:
+            result = await _memorize_resource(settings, spec, str(path), started, task_id)
 
         finished_at = datetime.now(UTC).isoformat()
+        payload = await _result_payload(settings, get_blob_store(settings), str(task_id), result, started)
         logger.info("Memorize activity completed for task %s", task_id)
 
         return {
             "task_id": task_id,
             "status": "SUCCESS",
             "finished_at": finished_at,
-            "result": _safe_serialize(result),
+            **payload,
         }
 
     except ApplicationError:
@@ -111,6 +122,313 @@ async def task_memorize(spec: dict) -> dict[str, Any]:
         raise ApplicationError(f"Memorize activity failed for task {task_id}") from e
 
 
+@activity.defn(name="task_memorize_merged")
+async def task_memorize_merged(specs: list[dict]) -> dict[str, Any]:
+    """Memorize several conversations of one user/agent as a single resource.
+
+    Used by coalescing mode: the conversations are concatenated in order into
+    one blob, which is memorized with one ``service.memorize`` call (one
+    extraction pass and one round of category updates).
+
+    Args:
+        specs: Task specs sharing user_id, agent_id and override_config.
+
+    Returns:
+        Dict with the merged task IDs, finished_at timestamp and status.
+
+    Raises:
+        ApplicationError: If the specs are invalid or disagree (non-retryable).
+        ApplicationError: If memorization fails.
+    """
+    if not specs:
+        raise ApplicationError("specs must not be empty", non_retryable=True)
+    first = specs[0]
+    group = (first.get("user_id"), first.get("agent_id", ""), config_cache_key(first.get("override_config")))
+    for spec in specs:
+        missing = [f for f in _required_fields(spec) if not isinstance(spec.get(f), str) or not spec[f].strip()]
+        if missing:
+            msg = f"Missing or empty required field(s) in spec: {', '.join(missing)}"
+            raise ApplicationError(msg, non_retryable=True)
+        if (spec["user_id"], spec.get("agent_id", ""), config_cache_key(spec.get("override_config"))) != group:
+            msg = "Merged specs must share user_id, agent_id and override_config"
+            raise ApplicationError(msg, non_retryable=True)
+
+    task_ids = [str(spec.get("task_id", "unknown")) for spec in specs]
+    logger.info("Starting merged memorize activity for %d tasks: %s", len(specs), ", ".join(task_ids))
+    started = time.perf_counter()
+    merged_id = uuid.uuid4().hex
+    merged_name = f"conversation-merged-{merged_id}.json"
+    try:
+        settings = Settings()
+        store = get_blob_store(settings)
+        conversations = [json.loads(await _read_conversation(store, spec)) for spec in specs]
+        merged = merge_conversations(conversations)
+        if merged is None:
+            raise ApplicationError("Conversations cannot be merged", non_retryable=True)
+        await store.put_bytes(merged_name, json.dumps(merged, ensure_ascii=False).encode("utf-8"))
+        try:
+            async with store.local_copy(merged_name) as merged_path:
+                result = await _memorize_resource(settings, first, str(merged_path), started, merged_id)
+            payload = await _result_payload(settings, store, f"merged-{merged_id}", result, started)
+        finally:
+            if settings.STORAGE_RETENTION_MODE != "keep":
+                # A copy of the tasks' own files, which are retained or archived themselves.
+                await store.delete(merged_name)
+    except ApplicationError:
+        raise
+    except Exception as e:
+        logger.exception("Merged memorize activity failed for tasks %s: %r", task_ids, e)
+        raise ApplicationError(f"Merged memorize activity failed for {len(specs)} tasks") from e
+
+    metrics.inc("memu_memorize_coalesced_batches")
+    metrics.inc("memu_memorize_coalesced_tasks", len(specs))
+    logger.info("Merged memorize activity completed for %d tasks", len(specs))
+    return {
+        "task_ids": task_ids,
+        "status": "SUCCESS",
+        "finished_at": datetime.now(UTC).isoformat(),
+        "resource_url": merged_name,
+        **payload,
+    }
+
+
+@activity.defn(name="task_split_conversation")
+async def task_split_conversation(spec: dict) -> list[str]:
+    """Split a task's conversation into parts of at most ``spec["chunking"]["max_tokens"]``.
+
+    Each part is stored as ``<name>-part-<n>.json``.
+
+    Returns:
+        The part filenames, or an empty list if the conversation fits in
+        one part (or is not a message list) and should be memorized whole.
+    """
+    task_id = spec.get("task_id", "unknown")
+    max_tokens = int(spec.get("chunking", {}).get("max_tokens", 0))
+    if max_tokens <= 0:
+        return []
+    if "conversation" in spec:
+        # Inline conversations are small; parts must be files other workers can read.
+        return []
+    name = _resource_name(spec.get("resource_url", ""))
+    store = get_blob_store(Settings())
+
+    async def _split() -> list[str]:
+        messages = conversation_messages(json.loads(await store.read_bytes(name)))
+        if messages is None:
+            return []
+        parts = split_messages(messages, max_tokens)
+        if len(parts) <= 1:
+            return []
+        names = [f"{Path(name).stem}-part-{index:03d}.json" for index in range(len(parts))]
+        for part_name, part in zip(names, parts, strict=True):
+            await store.put_bytes(part_name, json.dumps(part, ensure_ascii=False).encode("utf-8"))
+        return names
+
+    try:
+        names = await _split()
+    except FileNotFoundError as e:
+        raise ApplicationError(f"Conversation file for task {task_id} not found", non_retryable=True) from e
+    if names:
+        metrics.observe("memu_memorize_chunks", len(names))
+        logger.info("Split task %s into %d parts", task_id, len(names))
+    return names
+
+
+@activity.defn(name="task_memorize_chunk")
+async def task_memorize_chunk(spec: dict) -> dict[str, Any]:
+    """Memorize one part of a chunked conversation.
+
+    Returns:
+        Dict with the task ID, status, number of items created and the
+        ``category_updates`` (category ID to new item summaries) that
+        ``task_consolidate_categories`` needs.
+    """
+    task_id = spec.get("task_id", "unknown")
+    started = time.perf_counter()
+    try:
+        settings = Settings()
+        async with _conversation_file(settings, spec) as path:
+            result = await _memorize_resource(settings, spec, str(path), started, task_id, chunk_part=True)
+    except ApplicationError:
+        raise
+    except Exception as e:
+        logger.exception("Memorize chunk failed for %s: %r", task_id, e)
+        raise ApplicationError(f"Memorize activity failed for task {task_id}") from e
+    metrics.observe("memu_memorize_chunk_seconds", time.perf_counter() - started)
+    return {
+        "task_id": task_id,
+        "status": "SUCCESS",
+        "items": len(result.get("items") or []) if isinstance(result, dict) else 0,
+        "category_updates": category_updates(result),
+    }
+
+
+@activity.defn(name="task_consolidate_categories")
+async def task_consolidate_categories(spec: dict, updates: dict[str, list[str]]) -> int:
+    """Rewrite the summaries of categories touched by a chunked task's parts.
+
+    Returns:
+        The number of categories updated.
+    """
+    task_id = spec.get("task_id", "unknown")
+    try:
+        settings = Settings()
+        with _lease_service(settings, spec.get("override_config")) as service:
+            updated = await consolidate_categories(service, spec["user_id"], updates)
+    except Exception as e:
+        logger.exception("Category consolidation failed for task %s: %r", task_id, e)
+        raise ApplicationError(f"Category consolidation failed for task {task_id}") from e
+    logger.info("Consolidated %d categories for task %s", updated, task_id)
+    return updated
+
+
+def _required_fields(spec: dict) -> tuple[str, ...]:
+    """Fields a spec must have; inline specs carry the conversation instead of resource_url."""
+    return ("user_id",) if "conversation" in spec else _REQUIRED_FIELDS
+
+
+def _inline_text(spec: dict) -> str:
+    try:
+        return decode_inline(spec["conversation"] if isinstance(spec["conversation"], dict) else {})
+    except ValueError as e:
+        raise ApplicationError(f"Invalid inline conversation: {e}", non_retryable=True) from e
+
+
+async def _read_conversation(store: BlobStore, spec: dict) -> str:
+    """Return the JSON text of a spec's conversation, inline or from the blob store."""
+    if "conversation" in spec:
+        return _inline_text(spec)
+    return (await store.read_bytes(_resource_name(spec["resource_url"]))).decode("utf-8")
+
+
+@asynccontextmanager
+async def _conversation_file(settings: Settings, spec: dict) -> AsyncIterator[Path]:
+    """Yield a local file holding the spec's conversation.
+
+    memu ingests resources from a path. Stored conversations are used in
+    place on local disk and downloaded from other backends; inline ones are
+    written to a worker-local temporary file. Temporary files are removed
+    afterwards.
+    """
+    if "conversation" not in spec:
+        name = _resource_name(spec["resource_url"])
+        async with get_blob_store(settings).local_copy(name) as path:
+            yield path
+        return
+    text = _inline_text(spec)
+    path = _INLINE_DIR / f"conversation-inline-{uuid.uuid4().hex}.json"
+
+    def _write() -> None:
+        _INLINE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, "utf-8")
+
+    await asyncio.to_thread(_write)
+    try:
+        yield path
+    finally:
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+
+
+def _resource_name(raw_url: str) -> str:
+    """Validate a spec's resource_url, which must be a bare blob name."""
+    candidate = Path(raw_url)
+    # Reject absolute paths, path traversal, and any directory components.
+    # candidate.name != raw_url catches inputs like "subdir/file.json".
+    if candidate.is_absolute() or ".." in candidate.parts or candidate.name != raw_url:
+        raise ApplicationError(
+            "Invalid resource_url: must be a bare filename without path separators",
+            non_retryable=True,
+        )
+    return candidate.name
+
+
+async def _memorize_resource(
+    settings: Settings,
+    spec: dict,
+    resource_url: str,
+    started: float,
+    task_id: str,
+    *,
+    chunk_part: bool = False,
+) -> Any:
+    """Memorize ``resource_url`` for the spec's user with a warm MemoryService.
+
+    A ``chunk_part`` leaves the category summaries to ``task_consolidate_categories``.
+    """
+    with _lease_service(settings, spec.get("override_config"), chunk_part=chunk_part) as service:
+        setup_seconds = time.perf_counter() - started
+        metrics.observe("memu_memorize_setup_seconds", setup_seconds)
+        logger.info("Memorize setup for task %s took %.3fs", task_id, setup_seconds)
+
+        # Execute memorization, resuming from the previous attempt's checkpoint
+        return await memorize_with_checkpoints(
+            service,
+            resource_url=resource_url,
+            user={
+                "user_id": spec["user_id"],
+                "agent_id": spec.get("agent_id", ""),
+            },
+            checkpoint=_last_checkpoint(),
+            heartbeat=activity.heartbeat if activity.in_activity() else None,
+            heartbeat_interval=settings.MEMORIZE_HEARTBEAT_INTERVAL_SECONDS,
+            update_summaries=not chunk_part,
+        )
+
+
+def _last_checkpoint() -> dict | None:
+    """Return the checkpoint the previous attempt of this activity heartbeated, if any."""
+    if not activity.in_activity():
+        return None
+    details = activity.info().heartbeat_details
+    if details and isinstance(details[-1], dict):
+        return details[-1]
+    return None
+
+
+def _lease_service(
+    settings: Settings, override_config: dict | None, *, chunk_part: bool = False
+) -> AbstractContextManager[Any]:
+    """Lease a warm MemoryService for this override_config (one per distinct config).
+
+    Chunk parts get services of their own, whose memorize pipeline skips the
+    category summaries.
+    """
+
+    def _build_service():
+        if override_config:
+            service = create_memory_service(
+                settings=settings,
+                memorize_config=override_config,
+            )
+        else:
+            service = create_memory_service(settings=settings)
+        return skip_category_summaries(service) if chunk_part else service
+
+    key = config_cache_key(override_config)
+    return get_service_cache(settings).lease(f"{key}:chunk-part" if chunk_part else key, _build_service)
+
+
+async def _result_payload(
+    settings: Settings, store: BlobStore, result_id: str, result: Any, started: float
+) -> dict[str, Any]:
+    """The result fields of an activity's return value.
+
+    The full memu result by default; with MEMORIZE_COMPACT_RESULTS, counts,
+    the duration and a reference to the full result in the blob store.
+    """
+    if not settings.MEMORIZE_COMPACT_RESULTS:
+        return {"result": _safe_serialize(result)}
+    try:
+        ref = await store_result(store, result_id, result)
+    except ValueError:
+        ref = await store_result(store, uuid.uuid4().hex, result)
+    return {
+        "summary": summarize_result(result),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "result_ref": ref,
+    }
+
+
 def _safe_serialize(obj: Any) -> Any:
     """Safely serialize result to JSON-compatible format."""
     try:
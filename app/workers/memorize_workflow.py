@@ -1,20 +1,63 @@
 """Temporal workflow for memorize tasks."""
 
+import asyncio
 from datetime import timedelta
 
 from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, ApplicationError, WorkflowAlreadyStartedError
+from temporalio.workflow import ParentClosePolicy
 
 with workflow.unsafe.imports_passed_through():
-    from app.workers.memorize_activity import task_memorize
+    from app.services.checkpoint import HEARTBEAT_TIMEOUT
+    from app.services.chunking import merge_category_updates
+    from app.services.task_events import build_task_event
+    from app.services.task_status import completed_detail
+    from app.workers.coalesce_activity import task_enqueue_coalesced
+    from app.workers.invalidation_activity import task_invalidate_cache
+    from app.workers.memorize_activity import (
+        task_consolidate_categories,
+        task_memorize,
+        task_memorize_chunk,
+        task_split_conversation,
+    )
+    from app.workers.notification_activity import task_publish_event
+    from app.workers.storage_activity import task_release_storage
+    from app.workers.webhook_workflow import WebhookDeliveryWorkflow
+
+# How long a coalesced task waits for its batch before giving up.
+COALESCED_TASK_TIMEOUT = timedelta(hours=2)
 
 
 @workflow.defn(name="MemorizeWorkflow")
 class MemorizeWorkflow:
     """Workflow that orchestrates a memorize task via Temporal.
 
-    Receives a spec dict and delegates to the task_memorize activity.
+    Receives a spec dict and delegates to the task_memorize activity (or,
+    when the spec has a ``chunking`` limit, to parallel task_memorize_chunk
+    activities followed by category consolidation; or, when it has a
+    ``coalesce`` window, to the user's ``MemorizeCoalesceWorkflow``), then
+    invalidates the user's cached retrieve results and announces the outcome
+    (task event, plus a webhook when the spec has a ``callback_url``).
+    Finally the task's conversation files are released (deleted or archived,
+    per the worker's STORAGE_RETENTION_MODE).
     """
 
+    def __init__(self) -> None:
+        self._batch_outcome: dict | None = None
+        self._parts: list[str] = []
+
+    @workflow.signal
+    def batch_finished(self, outcome: dict) -> None:
+        """Receive this task's outcome from the coalescing workflow; later duplicates are ignored."""
+        if self._batch_outcome is None:
+            self._batch_outcome = outcome
+
+    @workflow.query
+    def batch_reported(self) -> bool:
+        """Whether the coalescing workflow has reported this task's outcome."""
+        return self._batch_outcome is not None
+
     @workflow.run
     async def run(self, spec: dict) -> dict:
         """Execute the memorize workflow.
@@ -25,8 +68,151 @@ class MemorizeWorkflow:
         Returns:
             Dict with task result from the activity.
         """
-        return await workflow.execute_activity(
-            task_memorize,
+        try:
+            result: dict
+            if spec.get("chunking"):
+                result = await self._memorize_chunked(spec)
+            elif spec.get("coalesce"):
+                result = await self._memorize_coalesced(spec)
+            else:
+                result = await workflow.execute_activity(
+                    task_memorize,
+                    spec,
+                    start_to_close_timeout=timedelta(minutes=10),
+                    heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                )
+        except (ActivityError, ApplicationError):
+            if workflow.patched("notify-completion"):
+                await self._notify(spec, "FAILED", "Task execution failed")
+            if workflow.patched("release-storage"):
+                await self._release_storage(spec)
+            raise
+        # Guarded so histories recorded before this step replay unchanged.
+        if workflow.patched("invalidate-response-cache"):
+            try:
+                await workflow.execute_activity(
+                    task_invalidate_cache,
+                    spec["user_id"],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=5),
+                )
+            except ActivityError:
+                # The memories are stored; stale cache entries still expire
+                # after RESPONSE_CACHE_TTL_SECONDS, so don't fail the task.
+                workflow.logger.warning("Cache invalidation failed for task %s", spec.get("task_id"))
+        if workflow.patched("notify-completion"):
+            await self._notify(spec, "COMPLETED", completed_detail(result))
+        if workflow.patched("release-storage"):
+            await self._release_storage(spec)
+        return result
+
+    async def _memorize_chunked(self, spec: dict) -> dict:
+        """Memorize the conversation's parts in parallel, then consolidate categories."""
+        parts: list[str] = await workflow.execute_activity(
+            task_split_conversation,
             spec,
+            start_to_close_timeout=timedelta(minutes=2),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+        )
+        self._parts = parts
+        if not parts:
+            whole: dict = await workflow.execute_activity(
+                task_memorize,
+                spec,
+                start_to_close_timeout=timedelta(minutes=10),
+                heartbeat_timeout=HEARTBEAT_TIMEOUT,
+            )
+            return whole
+
+        slots = asyncio.Semaphore(max(int(spec["chunking"].get("max_parallel", len(parts))), 1))
+
+        async def _memorize_part(index: int, resource_url: str) -> dict:
+            async with slots:
+                part: dict = await workflow.execute_activity(
+                    task_memorize_chunk,
+                    {**spec, "resource_url": resource_url, "task_id": f"{spec.get('task_id')}-part-{index:03d}"},
+                    start_to_close_timeout=timedelta(minutes=10),
+                    heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                )
+                return part
+
+        outcomes = await asyncio.gather(*(_memorize_part(i, name) for i, name in enumerate(parts)))
+        updates = merge_category_updates([o.get("category_updates", {}) for o in outcomes])
+        await workflow.execute_activity(
+            task_consolidate_categories,
+            args=[spec, updates],
             start_to_close_timeout=timedelta(minutes=10),
+            retry_policy=RetryPolicy(maximum_attempts=5),
+        )
+        return {
+            "task_id": spec.get("task_id"),
+            "status": "SUCCESS",
+            "finished_at": workflow.now().isoformat(),
+            "chunks": len(parts),
+            "items": sum(int(o.get("items", 0)) for o in outcomes),
+            "categories_consolidated": len(updates),
+        }
+
+    async def _memorize_coalesced(self, spec: dict) -> dict:
+        """Queue this task with the user's coalescer and wait for its batch."""
+        await workflow.execute_activity(
+            task_enqueue_coalesced,
+            {**spec, "workflow_id": workflow.info().workflow_id},
+            start_to_close_timeout=timedelta(seconds=30),
+            schedule_to_close_timeout=timedelta(minutes=10),
         )
+        try:
+            await workflow.wait_condition(lambda: self._batch_outcome is not None, timeout=COALESCED_TASK_TIMEOUT)
+        except TimeoutError as exc:
+            raise ApplicationError("Coalesced memorize did not finish in time") from exc
+        outcome = self._batch_outcome or {}
+        if "result" not in outcome:
+            raise ApplicationError(str(outcome.get("error", "Task execution failed")))
+        result: dict = outcome["result"]
+        return result
+
+    async def _release_storage(self, spec: dict) -> None:
+        """Release the task's conversation file and chunk parts; failures never fail the task."""
+        names = [*([spec["resource_url"]] if isinstance(spec.get("resource_url"), str) else []), *self._parts]
+        if not names:
+            return
+        try:
+            await workflow.execute_activity(
+                task_release_storage,
+                names,
+                start_to_close_timeout=timedelta(minutes=2),
+                retry_policy=RetryPolicy(maximum_attempts=3),
+            )
+        except ActivityError:
+            # The orphan sweep removes whatever is left behind.
+            workflow.logger.warning("Releasing storage failed for task %s", spec.get("task_id"))
+
+    async def _notify(self, spec: dict, status: str, detail: str | None) -> None:
+        """Publish the task event and start the webhook delivery; failures never fail the task."""
+        event = build_task_event(workflow.info().workflow_id, spec, status, detail, workflow.now().isoformat())
+        notifications = [
+            workflow.execute_activity(
+                task_publish_event,
+                event,
+                start_to_close_timeout=timedelta(seconds=30),
+                retry_policy=RetryPolicy(maximum_attempts=5),
+            )
+        ]
+        callback_url = spec.get("callback_url")
+        if callback_url:
+            # Delivered by an abandoned child, so a slow or dead callback
+            # never keeps the task running.
+            try:
+                await workflow.start_child_workflow(
+                    WebhookDeliveryWorkflow.run,
+                    args=[event, callback_url],
+                    id=f"{workflow.info().workflow_id}-webhook-{workflow.info().run_id}",
+                    parent_close_policy=ParentClosePolicy.ABANDON,
+                )
+            except WorkflowAlreadyStartedError:
+                workflow.logger.warning("Webhook for task %s is already being delivered", spec.get("task_id"))
+        for outcome in await asyncio.gather(*notifications, return_exceptions=True):
+            if isinstance(outcome, ActivityError):
+                workflow.logger.warning("Notification for task %s failed: %s", spec.get("task_id"), outcome.cause)
+            elif isinstance(outcome, BaseException):
+                raise outcome
@@ -0,0 +1,55 @@
+"""Temporal activities announcing finished memorize tasks."""
+
+import logging
+
+from temporalio import activity
+from temporalio.exceptions import ApplicationError
+
+from app.services.task_events import publish_task_event
+from app.services.webhooks import WebhookDeliveryError, deliver_webhook
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@activity.defn(name="task_publish_event")
+async def task_publish_event(event: dict) -> None:
+    """Publish a task event to the API replicas' ``GET /memorize/events`` streams.
+
+    A no-op unless NOTIFICATIONS_BACKEND is "postgres".
+    """
+    settings = Settings()
+    if settings.NOTIFICATIONS_BACKEND != "postgres":
+        return
+    await publish_task_event(settings.postgres_dsn, event)
+
+
+@activity.defn(name="task_deliver_webhook")
+async def task_deliver_webhook(event: dict, callback_url: str) -> int:
+    """POST a task event to the task's ``callback_url``.
+
+    Network errors, 5xx, 408, 425 and 429 responses raise and are retried by
+    Temporal with backoff; any other 4xx, or a host resolving to a non-public
+    address (unless in WEBHOOK_ALLOWED_HOSTS), fails the delivery without retries.
+
+    Returns:
+        The receiver's HTTP status code.
+    """
+    settings = Settings()
+    attempt = activity.info().attempt
+    try:
+        status_code = await deliver_webhook(
+            callback_url,
+            event,
+            secret=settings.WEBHOOK_SIGNING_SECRET,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            allowed_hosts=settings.webhook_allowed_hosts,
+        )
+    except WebhookDeliveryError as exc:
+        metrics.inc("memu_webhook_failures", attributes={"retryable": str(exc.retryable).lower()})
+        logger.warning("Webhook delivery for %s failed (attempt %d): %s", event.get("task_id"), attempt, exc)
+        raise ApplicationError(str(exc), type="WebhookDeliveryError", non_retryable=not exc.retryable) from exc
+    metrics.inc("memu_webhook_deliveries")
+    logger.info("Delivered %s webhook for %s (attempt %d)", event.get("event"), event.get("task_id"), attempt)
+    return status_code
@@ -0,0 +1,28 @@
+"""Temporal activity releasing a finished task's files from the blob store."""
+
+import logging
+
+from temporalio import activity
+
+from app.services.blob_store import get_blob_store, release_files
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@activity.defn(name="task_release_storage")
+async def task_release_storage(names: list[str]) -> int:
+    """Delete or archive a finished task's conversation files.
+
+    Runs once ``MemorizeWorkflow`` completes or fails, with the task's
+    conversation file and any chunk parts. What happens to them is the
+    worker's STORAGE_RETENTION_MODE; ``keep`` leaves them in place.
+
+    Returns:
+        Bytes reclaimed.
+    """
+    settings = Settings()
+    reclaimed = await release_files(get_blob_store(settings), names, settings.STORAGE_RETENTION_MODE)
+    if reclaimed:
+        logger.info("Released %d task files (%d bytes reclaimed)", len(names), reclaimed)
+    return reclaimed
@@ -0,0 +1,134 @@
+"""Supervisor running several worker processes in one container.
+
+A worker is one asyncio process, so CPU-bound parts of memorization (JSON
+handling, memu's preprocessing, payload compression) share a single core.
+With WORKER_PROCESSES above 1 the worker entrypoint starts that many worker
+processes instead and keeps them running: each polls the same task queue
+under its own identity, a process that exits is restarted (with a growing
+delay if it keeps crashing), and SIGINT/SIGTERM stop them all.
+"""
+
+import logging
+import multiprocessing
+import signal
+import time
+from collections.abc import Callable
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from types import FrameType
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# A process that exits sooner than this after starting is restarted after a
+# delay that doubles with each such exit, up to the maximum.
+MIN_UPTIME_SECONDS = 30.0
+MAX_RESTART_DELAY_SECONDS = 60.0
+
+
+class WorkerSupervisor:
+    """Runs ``processes`` copies of ``target(index)`` and restarts any that exit.
+
+    Args:
+        target: Entry point of one worker process, called with its index
+            (0 to processes - 1). Must be a module-level function.
+        processes: Number of worker processes.
+        stop_timeout: Seconds processes get to exit after SIGTERM before
+            they are killed.
+        start_method: multiprocessing start method. ``spawn`` starts every
+            worker from a fresh interpreter, so none inherits the
+            supervisor's state.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[int], None],
+        processes: int,
+        stop_timeout: float = 30.0,
+        start_method: str = "spawn",
+    ) -> None:
+        self.target = target
+        self.processes = processes
+        self.stop_timeout = stop_timeout
+        # Any: the concrete context types declare Process, BaseContext does not.
+        self._context: Any = multiprocessing.get_context(start_method)
+        self._children: dict[int, BaseProcess] = {}
+        self._started_at: dict[int, float] = {}
+        self._quick_exits: dict[int, int] = {}
+        self._restart_at: dict[int, float] = {}
+        self._stopping = False
+
+    @property
+    def children(self) -> dict[int, BaseProcess]:
+        return dict(self._children)
+
+    def start(self) -> None:
+        for index in range(self.processes):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=self.target, args=(index,), name=f"memu-worker-{index}")
+        process.start()
+        self._children[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info("Started worker process %d (pid %s)", index, process.pid)
+
+    def check(self) -> None:
+        """Restart worker processes that have exited, once their restart delay is over."""
+        now = time.monotonic()
+        for index, process in list(self._children.items()):
+            if process.is_alive():
+                continue
+            if index not in self._restart_at:
+                uptime = now - self._started_at[index]
+                quick_exits = self._quick_exits.get(index, 0) + 1 if uptime < MIN_UPTIME_SECONDS else 0
+                self._quick_exits[index] = quick_exits
+                delay = min(2.0**quick_exits - 1, MAX_RESTART_DELAY_SECONDS)
+                logger.warning(
+                    "Worker process %d (pid %s) exited with code %s; restarting in %.0fs",
+                    index,
+                    process.pid,
+                    process.exitcode,
+                    delay,
+                )
+                self._restart_at[index] = now + delay
+            if now >= self._restart_at[index]:
+                del self._restart_at[index]
+                self._spawn(index)
+
+    def stop(self) -> None:
+        """SIGTERM every worker process, and kill those still running after ``stop_timeout``."""
+        self._stopping = True
+        for process in self._children.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for index, process in self._children.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning("Worker process %d (pid %s) did not stop in time; killing it", index, process.pid)
+                process.kill()
+                process.join()
+        logger.info("All worker processes stopped")
+
+    def run(self, poll_interval: float = 1.0) -> None:
+        """Start the worker processes and supervise them until SIGINT or SIGTERM."""
+
+        def _request_stop(signum: int, _frame: FrameType | None) -> None:
+            logger.info("Received %s, stopping worker processes...", signal.Signals(signum).name)
+            self._stopping = True
+
+        signal.signal(signal.SIGINT, _request_stop)
+        signal.signal(signal.SIGTERM, _request_stop)
+        self.start()
+        try:
+            while not self._stopping:
+                # Processes waiting out a restart delay have no live sentinel.
+                wait(
+                    [p.sentinel for i, p in self._children.items() if i not in self._restart_at],
+                    timeout=poll_interval,
+                )
+                if not self._stopping:
+                    self.check()
+        finally:
+            self.stop()
@@ -0,0 +1,101 @@
+"""Task queues of interactive and bulk memorization, and their metrics.
+
+Memorize requests carry a ``priority``: "interactive" tasks (the default,
+live users whose memories should update within seconds) run on
+``TASK_QUEUE`` and "bulk" ones (backfills, reprocessing) on
+``BULK_TASK_QUEUE``. A workflow's activities run on its own queue, so a bulk
+backlog never delays interactive tasks beyond the slots the worker gives it.
+
+:class:`TaskQueueMetricsInterceptor` records per queue how long activities
+waited to start and how long they ran; :func:`run_backlog_monitor`
+periodically samples each queue's backlog from the Temporal server.
+"""
+
+import asyncio
+import logging
+from datetime import UTC, datetime
+from typing import Any, Literal
+
+from temporalio import activity
+from temporalio.api.enums.v1 import TaskQueueType
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.api.workflowservice.v1 import DescribeTaskQueueRequest
+from temporalio.client import Client
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Priority = Literal["interactive", "bulk"]
+
+TASK_QUEUE = "memu-worker"
+BULK_TASK_QUEUE = "memu-worker-bulk"
+
+TASK_QUEUES: dict[str, str] = {"interactive": TASK_QUEUE, "bulk": BULK_TASK_QUEUE}
+
+_QUEUE_TYPES = {
+    "workflow": TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW,
+    "activity": TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY,
+}
+
+
+def task_queue_for(priority: str | None) -> str:
+    """Task queue of a memorize task with ``priority`` (interactive if unset)."""
+    return TASK_QUEUES[priority or "interactive"]
+
+
+class _ActivityMetrics(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        attributes = {"queue": info.task_queue, "activity": info.activity_type}
+        started = datetime.now(UTC)
+        metrics.observe(
+            "memu_task_queue_schedule_to_start_seconds",
+            max((started - info.current_attempt_scheduled_time).total_seconds(), 0.0),
+            attributes,
+        )
+        try:
+            return await self.next.execute_activity(input)
+        finally:
+            metrics.observe(
+                "memu_task_queue_activity_seconds", (datetime.now(UTC) - started).total_seconds(), attributes
+            )
+
+
+class TaskQueueMetricsInterceptor(Interceptor):
+    """Worker interceptor recording activity queueing and run time per task queue."""
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityMetrics(next)
+
+
+async def sample_backlog(client: Client, queue: str) -> None:
+    """Record the approximate backlog (tasks and age of the oldest) of ``queue``."""
+    for queue_type, value in _QUEUE_TYPES.items():
+        response = await client.workflow_service.describe_task_queue(
+            DescribeTaskQueueRequest(
+                namespace=client.namespace,
+                task_queue=TaskQueue(name=queue),
+                task_queue_type=value,
+                report_stats=True,
+            )
+        )
+        attributes = {"queue": queue, "type": queue_type}
+        metrics.set_gauge("memu_task_queue_backlog", response.stats.approximate_backlog_count, attributes)
+        metrics.set_gauge(
+            "memu_task_queue_backlog_age_seconds",
+            response.stats.approximate_backlog_age.ToTimedelta().total_seconds(),
+            attributes,
+        )
+
+
+async def run_backlog_monitor(client: Client, queues: list[str], interval_seconds: float) -> None:
+    """Sample the backlog of ``queues`` every ``interval_seconds`` until cancelled."""
+    while True:
+        for queue in queues:
+            try:
+                await sample_backlog(client, queue)
+            except Exception:
+                logger.warning("Failed to sample the backlog of task queue %s", queue, exc_info=True)
+        await asyncio.sleep(interval_seconds)
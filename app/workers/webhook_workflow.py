@@ -0,0 +1,42 @@
+"""Temporal workflow delivering a task's completion webhook."""
+
+from datetime import timedelta
+
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError
+
+with workflow.unsafe.imports_passed_through():
+    from app.workers.notification_activity import task_deliver_webhook
+
+# Webhook retries back off 1s, 2s, 4s, ... up to 5 minutes between attempts.
+# Permanent failures are marked non-retryable by the activity itself.
+WEBHOOK_RETRY_POLICY = RetryPolicy(
+    initial_interval=timedelta(seconds=1),
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(minutes=5),
+    maximum_attempts=10,
+)
+
+
+@workflow.defn(name="WebhookDeliveryWorkflow")
+class WebhookDeliveryWorkflow:
+    """Workflow retrying a task event's delivery to its ``callback_url``.
+
+    ``MemorizeWorkflow`` starts it as an abandoned child, so the task
+    completes as soon as its memories are stored, however long the
+    callback takes to accept the event.
+    """
+
+    @workflow.run
+    async def run(self, event: dict, callback_url: str) -> None:
+        """Deliver ``event``; a delivery that keeps failing is logged, not raised."""
+        try:
+            await workflow.execute_activity(
+                task_deliver_webhook,
+                args=[event, callback_url],
+                start_to_close_timeout=timedelta(seconds=60),
+                retry_policy=WEBHOOK_RETRY_POLICY,
+            )
+        except ActivityError as exc:
+            workflow.logger.warning("Webhook for task %s failed: %s", event.get("task_id"), exc.cause)
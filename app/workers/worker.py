@@ -4,60 +4,221 @@ import asyncio
 import logging
 import os
 import platform
+import signal
+from contextlib import AsyncExitStack
+from datetime import timedelta
+from typing import Any
 
 from temporalio.client import Client
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
 from temporalio.worker import Worker
 
-from app.workers.memorize_activity import task_memorize
+from app.services.blob_store import close_blob_stores, get_blob_store, run_sweeper
+from app.services.llm_cache import close_llm_cache
+from app.services.payload_codec import build_data_converter
+from app.services.rate_limit import close_rate_limiters
+from app.utils.metrics import metrics
+from app.workers.coalesce_activity import task_enqueue_coalesced
+from app.workers.coalesce_workflow import MemorizeCoalesceWorkflow
+from app.workers.invalidation_activity import task_invalidate_cache
+from app.workers.memorize_activity import (
+    close_service_cache,
+    task_consolidate_categories,
+    task_memorize,
+    task_memorize_chunk,
+    task_memorize_merged,
+    task_split_conversation,
+)
 from app.workers.memorize_workflow import MemorizeWorkflow
+from app.workers.notification_activity import task_deliver_webhook, task_publish_event
+from app.workers.storage_activity import task_release_storage
+from app.workers.supervisor import WorkerSupervisor
+from app.workers.task_queues import BULK_TASK_QUEUE, TASK_QUEUE, TaskQueueMetricsInterceptor, run_backlog_monitor
+from app.workers.webhook_workflow import WebhookDeliveryWorkflow
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
-TASK_QUEUE = "memu-worker"
+# SDK defaults of the limits split between task queues, and the least each
+# queue gets (workflow task slots and pollers must be at least 2 while
+# workflows are cached).
+_SPLIT_LIMITS = {
+    "max_concurrent_activities": (100, 1),
+    "max_concurrent_workflow_tasks": (100, 2),
+    "max_concurrent_activity_task_polls": (5, 1),
+    "max_concurrent_workflow_task_polls": (5, 2),
+    "max_cached_workflows": (1000, 1),
+}
 
 
-def _worker_identity() -> str:
+def _worker_identity(task_queue: str = TASK_QUEUE) -> str:
     """Build a unique worker identity from hostname and PID."""
-    return f"{TASK_QUEUE}@{platform.node()}-{os.getpid()}"
+    return f"{task_queue}@{platform.node()}-{os.getpid()}"
 
 
-async def create_temporal_client(settings: Settings) -> Client:
+def worker_tuning(settings: Settings) -> dict[str, Any]:
+    """``Worker`` keyword arguments for the configured slot and poller limits.
+
+    Limits left at 0 are omitted, so the SDK defaults apply.
+    """
+    limits = {
+        "max_concurrent_activities": settings.WORKER_MAX_CONCURRENT_ACTIVITIES,
+        "max_concurrent_workflow_tasks": settings.WORKER_MAX_CONCURRENT_WORKFLOW_TASKS,
+        "max_concurrent_activity_task_polls": settings.WORKER_MAX_ACTIVITY_TASK_POLLS,
+        "max_concurrent_workflow_task_polls": settings.WORKER_MAX_WORKFLOW_TASK_POLLS,
+        "max_cached_workflows": settings.WORKER_MAX_CACHED_WORKFLOWS,
+    }
+    tuning: dict[str, Any] = {name: value for name, value in limits.items() if value > 0}
+    if settings.WORKER_GRACEFUL_SHUTDOWN_SECONDS > 0:
+        tuning["graceful_shutdown_timeout"] = timedelta(seconds=settings.WORKER_GRACEFUL_SHUTDOWN_SECONDS)
+    return tuning
+
+
+def queue_tuning(settings: Settings) -> dict[str, dict[str, Any]]:
+    """``Worker`` keyword arguments of each task queue this process polls.
+
+    Queues with a WORKER_*_QUEUE_WEIGHT of 0 are not polled. When both are,
+    the process's slot and poller limits (configured, or the SDK defaults)
+    are split between them in proportion to their weights, so bulk tasks
+    can never take the slots reserved for interactive ones.
+    """
+    weights = {
+        queue: weight
+        for queue, weight in (
+            (TASK_QUEUE, settings.WORKER_INTERACTIVE_QUEUE_WEIGHT),
+            (BULK_TASK_QUEUE, settings.WORKER_BULK_QUEUE_WEIGHT),
+        )
+        if weight > 0
+    }
+    if not weights:
+        msg = "WORKER_INTERACTIVE_QUEUE_WEIGHT or WORKER_BULK_QUEUE_WEIGHT must be above 0"
+        raise ValueError(msg)
+    tuning = worker_tuning(settings)
+    if len(weights) == 1:
+        return {queue: dict(tuning) for queue in weights}
+    total = sum(weights.values())
+    per_queue: dict[str, dict[str, Any]] = {}
+    for queue, weight in weights.items():
+        kwargs = dict(tuning)
+        for name, (default, minimum) in _SPLIT_LIMITS.items():
+            kwargs[name] = max(round(tuning.get(name, default) * weight / total), minimum)
+        per_queue[queue] = kwargs
+    return per_queue
+
+
+def metrics_bind_address(address: str, process_index: int) -> str:
+    """Metrics address of one supervised worker process: the configured port plus its index."""
+    address = address.strip()
+    if not address or process_index == 0:
+        return address
+    host, _, port = address.rpartition(":")
+    return f"{host}:{int(port) + process_index}"
+
+
+def create_metrics_runtime(settings: Settings, process_index: int = 0) -> Runtime | None:
+    """Build a Temporal runtime exporting Prometheus metrics, if configured.
+
+    SDK metrics and everything recorded through ``app.utils.metrics`` are
+    served on WORKER_METRICS_BIND_ADDRESS (its port offset by
+    ``process_index`` under the supervisor). Returns None when it is unset.
+    """
+    bind_address = metrics_bind_address(settings.WORKER_METRICS_BIND_ADDRESS, process_index)
+    if not bind_address:
+        return None
+    runtime = Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=bind_address)))
+    metrics.attach_meter(runtime.metric_meter)
+    logger.info("Serving worker metrics on %s", bind_address)
+    return runtime
+
+
+async def create_temporal_client(settings: Settings, runtime: Runtime | None = None) -> Client:
     """Create and return a Temporal client."""
     temporal_url = settings.temporal_url
     namespace = settings.TEMPORAL_NAMESPACE
     logger.info("Connecting to Temporal at %s (namespace=%s)", temporal_url, namespace)
 
+    kwargs: dict[str, Any] = {"runtime": runtime} if runtime is not None else {}
     client = await Client.connect(
         temporal_url,
         namespace=namespace,
+        data_converter=build_data_converter(settings.TEMPORAL_PAYLOAD_COMPRESSION_MIN_BYTES),
+        **kwargs,
     )
     logger.info("Connected to Temporal successfully")
     return client
 
 
-async def run_worker(client: Client) -> None:
-    """Run the Temporal worker with memorize workflow and activities."""
-    worker = Worker(
-        client=client,
-        task_queue=TASK_QUEUE,
-        workflows=[MemorizeWorkflow],
-        activities=[task_memorize],
-        identity=_worker_identity(),
+def start_storage_sweeper(settings: Settings) -> "asyncio.Task[None] | None":
+    """Start the periodic storage sweep, if there is anything for it to remove.
+
+    That is files past a configured retention, and for the compressed
+    backend also objects no longer referenced.
+    """
+    retention = settings.STORAGE_ORPHAN_RETENTION_SECONDS > 0 or settings.STORAGE_ARCHIVE_RETENTION_SECONDS > 0
+    if not retention and settings.STORAGE_BACKEND != "compressed":
+        return None
+    logger.info("Sweeping %s storage every %.0fs", settings.STORAGE_BACKEND, settings.STORAGE_SWEEP_INTERVAL_SECONDS)
+    return asyncio.create_task(
+        run_sweeper(
+            get_blob_store(settings),
+            settings.STORAGE_ORPHAN_RETENTION_SECONDS,
+            settings.STORAGE_ARCHIVE_RETENTION_SECONDS,
+            max(settings.STORAGE_SWEEP_INTERVAL_SECONDS, 1.0),
+        )
     )
 
-    logger.info("Starting Temporal worker on task queue: %s", TASK_QUEUE)
 
-    async with worker:
-        logger.info("Temporal worker is running. Press Ctrl+C to stop.")
-        await asyncio.Future()  # Run forever
+def start_backlog_monitor(client: Client, settings: Settings) -> "asyncio.Task[None] | None":
+    """Start sampling the backlog of both task queues, if enabled."""
+    if settings.TASK_QUEUE_BACKLOG_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(
+        run_backlog_monitor(client, [TASK_QUEUE, BULK_TASK_QUEUE], settings.TASK_QUEUE_BACKLOG_INTERVAL_SECONDS)
+    )
 
 
-async def async_main() -> None:
-    """Async entrypoint for worker."""
-    logging.basicConfig(level=logging.INFO)
-    settings = Settings()
+async def run_worker(client: Client, settings: Settings | None = None) -> None:
+    """Run a Temporal worker with memorize workflow and activities on each polled task queue."""
+    workers = []
+    for task_queue, tuning in queue_tuning(settings or Settings()).items():
+        workers.append(
+            Worker(
+                client=client,
+                task_queue=task_queue,
+                workflows=[MemorizeWorkflow, MemorizeCoalesceWorkflow, WebhookDeliveryWorkflow],
+                activities=[
+                    task_memorize,
+                    task_memorize_merged,
+                    task_split_conversation,
+                    task_memorize_chunk,
+                    task_consolidate_categories,
+                    task_enqueue_coalesced,
+                    task_invalidate_cache,
+                    task_publish_event,
+                    task_deliver_webhook,
+                    task_release_storage,
+                ],
+                identity=_worker_identity(task_queue),
+                interceptors=[TaskQueueMetricsInterceptor()],
+                **tuning,
+            )
+        )
+        logger.info("Starting Temporal worker on task queue: %s %s", task_queue, tuning or "(SDK default limits)")
+
+    try:
+        async with AsyncExitStack() as stack:
+            for worker in workers:
+                await stack.enter_async_context(worker)
+            logger.info("Temporal worker is running. Press Ctrl+C to stop.")
+            await asyncio.Future()  # Run forever
+    finally:
+        close_service_cache()
+        await close_blob_stores()
+        await close_rate_limiters()
+        await close_llm_cache()
+
 
+def _require_openai_key(settings: Settings) -> None:
     # Fail fast if OPENAI_API_KEY is missing (required by MemoryService in activities)
     if not settings.OPENAI_API_KEY or not settings.OPENAI_API_KEY.strip():
         raise SystemExit(
@@ -65,16 +226,64 @@ async def async_main() -> None:
             "Set OPENAI_API_KEY to a valid OpenAI API key before starting the worker."
         )
 
-    client = await create_temporal_client(settings)
+
+async def async_main(process_index: int = 0) -> None:
+    """Async entrypoint for worker.
+
+    ``process_index`` is set by the supervisor; only process 0 sweeps
+    storage and samples the task queue backlogs.
+    """
+    logging.basicConfig(level=logging.INFO)
+    settings = Settings()
+    _require_openai_key(settings)
+
+    # SIGTERM (docker stop, the supervisor) shuts the worker down like Ctrl+C,
+    # letting running activities finish within WORKER_GRACEFUL_SHUTDOWN_SECONDS.
+    main_task = asyncio.current_task()
+    if main_task is not None:
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+        except NotImplementedError:  # Windows
+            pass
+
+    client = await create_temporal_client(settings, runtime=create_metrics_runtime(settings, process_index))
+    background = (
+        [start_storage_sweeper(settings), start_backlog_monitor(client, settings)] if process_index == 0 else []
+    )
     try:
-        await run_worker(client)
+        await run_worker(client, settings)
     except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("Received shutdown signal, stopping worker...")
+    finally:
+        for task in background:
+            if task is not None:
+                task.cancel()
+
+
+def run_worker_process(process_index: int) -> None:
+    """Entrypoint of one worker process started by the supervisor."""
+    asyncio.run(async_main(process_index))
 
 
 def main() -> None:
-    """Sync entrypoint for worker."""
-    asyncio.run(async_main())
+    """Sync entrypoint for worker.
+
+    Runs the worker in this process, or with WORKER_PROCESSES above 1 that
+    many worker processes under a supervisor.
+    """
+    settings = Settings()
+    if settings.WORKER_PROCESSES <= 1:
+        asyncio.run(async_main())
+        return
+    logging.basicConfig(level=logging.INFO)
+    _require_openai_key(settings)
+    logger.info("Starting %d worker processes", settings.WORKER_PROCESSES)
+    WorkerSupervisor(
+        run_worker_process,
+        settings.WORKER_PROCESSES,
+        # Running activities get the graceful shutdown period, plus time to disconnect.
+        stop_timeout=settings.WORKER_GRACEFUL_SHUTDOWN_SECONDS + 10.0,
+    ).run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""Benchmark embedding throughput with and without cross-activity batching.
+
+Runs ``--activities`` concurrent callers, each embedding ``--calls`` small
+lists of texts (what memorize does per extracted item, category summary and
+retrieve query), against a fake provider that answers one request in
+``--request-ms`` plus ``--per-text-ms`` per text and serves at most
+``--concurrency`` requests at a time (the connection pool / provider limit).
+Unbatched, every call is its own request; batched, calls go through
+``EmbeddingBatcher`` with each ``--window-ms``.
+
+Reports embeddings per second and the latency a call sees on top of its own
+provider time: the p50/p99 of (call duration - time its request alone would
+take), which is queueing for the provider unbatched and the batch window plus
+the larger request batched.
+
+Usage:
+    uv run python -m benchmarks.bench_embedding_batching [--activities 64] [--calls 20] [--window-ms 2,5,10]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from app.services.embedding import EmbeddingBatcher  # noqa: E402
+
+
+class FakeProvider:
+    """Embedding endpoint with fixed per-request and per-text cost and bounded concurrency."""
+
+    def __init__(self, request_ms: float, per_text_ms: float, concurrency: int) -> None:
+        self.request_seconds = request_ms / 1000
+        self.per_text_seconds = per_text_ms / 1000
+        self._slots = asyncio.Semaphore(concurrency)
+        self.requests = 0
+
+    def cost(self, texts: int) -> float:
+        return self.request_seconds + self.per_text_seconds * texts
+
+    async def embed(self, inputs: list[str]) -> tuple[list[list[float]], None]:
+        async with self._slots:
+            self.requests += 1
+            await asyncio.sleep(self.cost(len(inputs)))
+        return [[float(len(text))] for text in inputs], None
+
+
+async def _activity(embed, provider: FakeProvider, index: int, calls: int, texts: int, added: list[float]) -> None:
+    for call in range(calls):
+        inputs = [f"activity {index} call {call} text {i}" for i in range(texts)]
+        started = time.perf_counter()
+        await embed(inputs)
+        added.append(time.perf_counter() - started - provider.cost(texts))
+
+
+async def _measure(args: argparse.Namespace, window_ms: float | None) -> tuple[float, list[float], int]:
+    provider = FakeProvider(args.request_ms, args.per_text_ms, args.concurrency)
+    if window_ms is None:
+
+        async def embed(inputs: list[str]) -> list[list[float]]:
+            vectors, _ = await provider.embed(inputs)
+            return vectors
+
+    else:
+        embed = EmbeddingBatcher(provider, args.max_batch, window_ms / 1000).embed
+    added: list[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_activity(embed, provider, i, args.calls, args.texts, added) for i in range(args.activities))
+    )
+    elapsed = time.perf_counter() - started
+    return args.activities * args.calls * args.texts / elapsed, added, provider.requests
+
+
+def _percentile(values: list[float], pct: int) -> float:
+    return statistics.quantiles(values, n=100)[pct - 1]
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=64, help="concurrent activities")
+    parser.add_argument("--calls", type=int, default=20, help="embed calls per activity")
+    parser.add_argument("--texts", type=int, default=2, help="texts per embed call")
+    parser.add_argument("--request-ms", type=float, default=40.0, help="provider time per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.2, help="provider time per text")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests the provider serves at once")
+    parser.add_argument("--max-batch", type=int, default=128, help="EMBEDDING_BATCH_MAX_SIZE")
+    parser.add_argument("--window-ms", default="2,5,10", help="comma-separated EMBEDDING_BATCH_WINDOW_MS values")
+    args = parser.parse_args()
+
+    print(
+        f"{args.activities} activities x {args.calls} calls x {args.texts} texts, "
+        f"{args.request_ms:g} ms + {args.per_text_ms:g} ms/text per request, {args.concurrency} at a time"
+    )
+    print(f"{'window':>8}  {'requests':>8}  {'embeddings/s':>12}  {'p50 added':>10}  {'p99 added':>10}")
+    windows: list[float | None] = [None, *(float(w) for w in args.window_ms.split(","))]
+    for window_ms in windows:
+        rate, added, requests = await _measure(args, window_ms)
+        label = "off" if window_ms is None else f"{window_ms:g} ms"
+        p50, p99 = _percentile(added, 50) * 1000, _percentile(added, 99) * 1000
+        print(f"{label:>8}  {requests:>8}  {rate:>12.0f}  {p50:>8.1f}ms  {p99:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,117 @@
+"""Benchmark submit-to-complete latency of inline vs stored conversations.
+
+Runs the API's ``_submit_memorize`` and the worker's ``task_memorize`` back
+to back in one process. Temporal is replaced by a client that hands the spec
+straight to the activity, and memu by a service whose ``memorize`` only
+ingests the resource with memu's own LocalFS (the copy-and-read it does
+before any LLM call). What is left is the conversation's trip from request
+to memu: JSON encoding, the STORAGE_PATH write and read (or the inline
+encoding and the worker-local temp file), and spec handling.
+
+Point ``--storage`` at the shared volume (e.g. an NFS mount) to see the
+round trip the inline path avoids; the default is a local temp directory.
+
+Usage:
+    uv run python -m benchmarks.bench_inline_submit [--messages 5,50,500] [--storage /mnt/memu]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from memu.blob.local_fs import LocalFS  # noqa: E402
+
+from app import main as api  # noqa: E402
+from app.schemas.memory import MemorizeRequest  # noqa: E402
+from app.workers import memorize_activity  # noqa: E402
+from config.settings import Settings  # noqa: E402
+
+
+class IngestOnlyService:
+    """Stands in for MemoryService; ingests the resource like memu does, then stops."""
+
+    def __init__(self, blob_dir: str) -> None:
+        self.fs = LocalFS(blob_dir)
+
+    async def memorize(self, *, resource_url: str, modality: str, user: dict[str, Any]) -> dict[str, Any]:
+        await self.fs.fetch(resource_url, modality)
+        return {"items": [], "categories": [], "relations": []}
+
+    def intercept_after_workflow_step(self, fn: Any, *, name: str | None = None) -> Any:
+        return self
+
+    def dispose(self) -> bool:
+        return True
+
+
+class DirectTemporal:
+    """Temporal client stand-in that runs the memorize activity on submit."""
+
+    async def start_workflow(self, workflow: Any, spec: dict, **kwargs: Any) -> None:
+        await memorize_activity.task_memorize(spec)
+
+
+def _conversation(messages: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": {"text": f"message {i} " + "lorem ipsum " * 20}}
+        for i in range(messages)
+    ]
+
+
+async def measure(body: MemorizeRequest, runs: int) -> list[float]:
+    temporal = DirectTemporal()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await api._submit_memorize(temporal, body)  # type: ignore[arg-type]
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _fmt(samples: list[float]) -> str:
+    p95 = statistics.quantiles(samples, n=20)[-1]
+    return f"p50={statistics.median(samples):8.3f}ms  p95={p95:8.3f}ms"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", default="5,50,500")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--storage", default="")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        storage = Path(args.storage or Path(scratch) / "storage")
+        storage.mkdir(parents=True, exist_ok=True)
+        worker_settings = Settings(STORAGE_PATH=str(storage))
+        service = IngestOnlyService(str(Path(scratch) / "blobs"))
+        modes = [
+            ("stored", {"MEMORIZE_INLINE_MAX_BYTES": 0}),
+            ("inline", {"MEMORIZE_INLINE_MAX_BYTES": 1 << 30}),
+            ("inline+zlib", {"MEMORIZE_INLINE_MAX_BYTES": 1 << 30, "MEMORIZE_INLINE_COMPRESS": True}),
+        ]
+        print(f"{'messages':>8}  {'bytes':>9}  {'path':<12}  latency")
+        with (
+            patch.object(api, "storage_dir", storage),
+            patch.object(memorize_activity, "Settings", return_value=worker_settings),
+            patch.object(memorize_activity, "create_memory_service", return_value=service),
+        ):
+            for messages in (int(m) for m in args.messages.split(",")):
+                body = MemorizeRequest(conversation=_conversation(messages), user_id="bench")
+                size = len(body.model_dump_json(include={"conversation"}))
+                for name, overrides in modes:
+                    with patch.multiple(api.settings, **overrides):
+                        samples = await measure(body, args.runs)
+                    print(f"{messages:>8}  {size:>9}  {name:<12}  {_fmt(samples)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
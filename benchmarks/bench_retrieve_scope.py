@@ -0,0 +1,101 @@
+"""Benchmark retrieve latency against store size, unscoped vs tenant-scoped.
+
+Runs memu-py's retrieve workflow against its in-memory store with a fake
+embedding client, so only the vector search and filtering are measured (no
+network, no Postgres). With pgvector the absolute numbers differ, but the
+shape is the same: an unscoped search scans every tenant's items, a scoped
+one scans only the caller's.
+
+Usage:
+    uv run python -m benchmarks.bench_retrieve_scope [--tenants 100] [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any
+
+from memu.app import MemoryService
+
+from config.memu import MemUUser
+
+DIM = 256
+
+
+class FakeEmbeddingClient:
+    """Deterministic embedding client; returns a random unit vector per text."""
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        return [_vector(random.Random(t)) for t in texts]
+
+
+def _vector(rng: random.Random) -> list[float]:
+    vec = [rng.gauss(0, 1) for _ in range(DIM)]
+    norm = sum(v * v for v in vec) ** 0.5
+    return [v / norm for v in vec]
+
+
+def build_service(size: int, tenants: int) -> MemoryService:
+    service = MemoryService(
+        llm_profiles={"default": {"api_key": "bench"}, "embedding": {"api_key": "bench"}},
+        database_config={"metadata_store": {"provider": "inmemory"}},
+        user_config={"model": MemUUser},
+        retrieve_config={
+            "route_intention": False,
+            "sufficiency_check": False,
+            "category": {"enabled": False},
+            "resource": {"enabled": False},
+            "item": {"top_k": 5},
+        },
+    )
+    fake = FakeEmbeddingClient()
+    service._llm_clients["default"] = fake
+    service._llm_clients["embedding"] = fake
+
+    rng = random.Random(0)
+    repo = service.database.memory_item_repo
+    for i in range(size):
+        repo.create_item(
+            resource_id="bench",
+            memory_type="profile",
+            summary=f"memory {i}",
+            embedding=_vector(rng),
+            user_data={"user_id": f"user-{i % tenants}", "agent_id": None},
+        )
+    return service
+
+
+async def measure(service: MemoryService, where: dict[str, Any] | None, runs: int) -> list[float]:
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        await service.retrieve([f"query {i}"], where=where)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _fmt(samples: list[float]) -> str:
+    p95 = statistics.quantiles(samples, n=20)[-1]
+    return f"p50={statistics.median(samples):8.2f}ms  p95={p95:8.2f}ms"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'items':>8}  {'scope':<10}  latency")
+    for size in (int(s) for s in args.sizes.split(",")):
+        service = build_service(size, args.tenants)
+        unscoped = await measure(service, None, args.runs)
+        scoped = await measure(service, {"user_id": "user-0"}, args.runs)
+        print(f"{size:>8}  {'unscoped':<10}  {_fmt(unscoped)}")
+        print(f"{size:>8}  {'user_id':<10}  {_fmt(scoped)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
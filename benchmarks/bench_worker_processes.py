@@ -0,0 +1,132 @@
+"""Benchmark activity throughput against the number of worker processes.
+
+Starts 1, 2, 4, ... worker processes under ``WorkerSupervisor`` (as
+WORKER_PROCESSES does), each a Temporal worker with the configured
+WORKER_MAX_* limits on a throwaway task queue, then runs ``--tasks``
+workflows of one activity each and reports completed activities per second.
+
+The activity stands in for a memorize activity: ``--cpu-ms`` of JSON work
+(what holds the event loop: encoding, decoding and copying conversations and
+results) followed by ``--io-ms`` of waiting (the LLM calls). The I/O part
+overlaps within one process; the CPU part only spreads over processes, which
+is what the extra processes buy.
+
+Needs a Temporal server (``--target``, default TEMPORAL_HOST:TEMPORAL_PORT),
+e.g. ``temporal server start-dev``.
+
+Usage:
+    uv run python -m benchmarks.bench_worker_processes [--processes 1,2,4] [--tasks 400] [--cpu-ms 20] [--io-ms 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import timedelta
+from functools import partial
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from temporalio import activity, workflow  # noqa: E402
+from temporalio.client import Client  # noqa: E402
+from temporalio.worker import UnsandboxedWorkflowRunner, Worker  # noqa: E402
+
+from app.workers.supervisor import WorkerSupervisor  # noqa: E402
+from app.workers.worker import worker_tuning  # noqa: E402
+from config.settings import Settings  # noqa: E402
+
+CONVERSATION = [{"role": "user", "content": {"text": f"message {i} " + "lorem ipsum " * 40}} for i in range(50)]
+
+
+@activity.defn(name="bench_activity")
+async def bench_activity(cpu_ms: float, io_ms: float) -> int:
+    deadline = time.perf_counter() + cpu_ms / 1000
+    rounds = 0
+    while time.perf_counter() < deadline:
+        json.loads(json.dumps(CONVERSATION))
+        rounds += 1
+    await asyncio.sleep(io_ms / 1000)
+    return rounds
+
+
+@workflow.defn(name="BenchWorkflow")
+class BenchWorkflow:
+    @workflow.run
+    async def run(self, cpu_ms: float, io_ms: float) -> int:
+        return await workflow.execute_activity(
+            "bench_activity",
+            args=[cpu_ms, io_ms],
+            start_to_close_timeout=timedelta(minutes=5),
+            result_type=int,
+        )
+
+
+async def _serve(target: str, namespace: str, task_queue: str) -> None:
+    client = await Client.connect(target, namespace=namespace)
+    worker = Worker(
+        client,
+        task_queue=task_queue,
+        workflows=[BenchWorkflow],
+        activities=[bench_activity],
+        workflow_runner=UnsandboxedWorkflowRunner(),
+        **worker_tuning(Settings()),
+    )
+    await worker.run()
+
+
+def _worker_process(target: str, namespace: str, task_queue: str, _index: int) -> None:
+    asyncio.run(_serve(target, namespace, task_queue))
+
+
+async def _run_tasks(client: Client, task_queue: str, tasks: int, cpu_ms: float, io_ms: float) -> float:
+    started = time.perf_counter()
+    handles = await asyncio.gather(
+        *(
+            client.start_workflow(
+                BenchWorkflow.run, args=[cpu_ms, io_ms], id=f"bench-{uuid.uuid4().hex}", task_queue=task_queue
+            )
+            for _ in range(tasks)
+        )
+    )
+    await asyncio.gather(*(handle.result() for handle in handles))
+    return time.perf_counter() - started
+
+
+async def _measure(args: argparse.Namespace, processes: int) -> float:
+    task_queue = f"memu-bench-{uuid.uuid4().hex[:8]}"
+    supervisor = WorkerSupervisor(partial(_worker_process, args.target, args.namespace, task_queue), processes)
+    supervisor.start()
+    try:
+        client = await Client.connect(args.target, namespace=args.namespace)
+        # Warm up until every process polls and has its imports done.
+        await _run_tasks(client, task_queue, processes * 4, args.cpu_ms, 0)
+        elapsed = await _run_tasks(client, task_queue, args.tasks, args.cpu_ms, args.io_ms)
+    finally:
+        await asyncio.to_thread(supervisor.stop)
+    return args.tasks / elapsed
+
+
+async def _main() -> None:
+    settings = Settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--tasks", type=int, default=400, help="activities per measurement")
+    parser.add_argument("--cpu-ms", type=float, default=20.0, help="CPU time per activity")
+    parser.add_argument("--io-ms", type=float, default=200.0, help="simulated LLM wait per activity")
+    parser.add_argument("--target", default=settings.temporal_url, help="Temporal frontend host:port")
+    parser.add_argument("--namespace", default=settings.TEMPORAL_NAMESPACE)
+    args = parser.parse_args()
+
+    print(f"{args.tasks} activities, {args.cpu_ms:g} ms CPU + {args.io_ms:g} ms I/O each, cores={os.cpu_count()}")
+    print(f"{'processes':>9}  {'activities/s':>12}  {'speedup':>7}")
+    baseline: float | None = None
+    for processes in (int(p) for p in args.processes.split(",")):
+        rate = await _measure(args, processes)
+        baseline = baseline or rate
+        print(f"{processes:>9}  {rate:>12.1f}  {rate / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
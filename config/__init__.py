@@ -1,6 +1,6 @@
 """Configuration management for memu-server."""
 
-from .memu import MemUUser, build_memu_config, build_memu_llm_profiles
+from .memu import MemUUser, build_memu_config, build_memu_llm_profiles, build_memu_retrieve_config
 from .settings import Settings
 
 __all__ = [
@@ -8,4 +8,5 @@ __all__ = [
     "MemUUser",
     "build_memu_config",
     "build_memu_llm_profiles",
+    "build_memu_retrieve_config",
 ]
@@ -26,10 +26,43 @@ def build_memu_llm_profiles(settings: Settings) -> dict[str, Any]:
             "api_key": settings.EMBEDDING_API_KEY or settings.OPENAI_API_KEY,
             "base_url": settings.EMBEDDING_BASE_URL,
             "embed_model": settings.EMBEDDING_MODEL,
+            "embed_batch_size": settings.EMBEDDING_BATCH_MAX_SIZE,
         },
     }
 
 
+def build_memu_rate_limits(settings: Settings) -> dict[str, dict[str, int]]:
+    """Requests and tokens per minute allowed per LLM profile.
+
+    Keys match ``build_memu_llm_profiles``; profiles without limits are left out.
+    """
+    limits = {
+        "default": {
+            "requests_per_minute": settings.LLM_RATE_LIMIT_RPM,
+            "tokens_per_minute": settings.LLM_RATE_LIMIT_TPM,
+        },
+        "embedding": {
+            "requests_per_minute": settings.EMBEDDING_RATE_LIMIT_RPM,
+            "tokens_per_minute": settings.EMBEDDING_RATE_LIMIT_TPM,
+        },
+    }
+    return {profile: limit for profile, limit in limits.items() if any(value > 0 for value in limit.values())}
+
+
+def build_memu_retrieve_config(settings: Settings) -> dict[str, Any]:
+    """Build the memu-py retrieve config used by the API server.
+
+    Every tier fetches RETRIEVE_MAX_TOP_K hits so a request can ask for
+    any top_k up to that cap; results are trimmed per request afterwards.
+    """
+    top_k = settings.RETRIEVE_MAX_TOP_K
+    return {
+        "category": {"top_k": top_k},
+        "item": {"top_k": top_k},
+        "resource": {"top_k": top_k},
+    }
+
+
 def build_memu_config(settings: Settings) -> dict[str, Any]:
     """Build memu-py core configuration.
 
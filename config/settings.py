@@ -1,5 +1,6 @@
 """Application settings for memu-server."""
 
+from typing import Literal
 from urllib.parse import quote
 
 from pydantic import ValidationInfo, field_validator
@@ -34,13 +35,198 @@ class Settings(BaseSettings):
     EMBEDDING_BASE_URL: str = "https://api.voyageai.com/v1"
     EMBEDDING_MODEL: str = "voyage-3.5-lite"
 
+    # Query-embedding cache used by the API server. EMBEDDING_CACHE_SIZE bounds
+    # the in-process LRU (0 disables it); a TTL of 0 means entries never expire.
+    # Point EMBEDDING_CACHE_SHARED_PATH at one SQLite file to share cached
+    # vectors between all worker processes on a host; empty disables it.
+    EMBEDDING_CACHE_SIZE: int = 4096
+    EMBEDDING_CACHE_TTL_SECONDS: float = 3600.0
+    EMBEDDING_CACHE_SHARED_PATH: str = ""
+    EMBEDDING_CACHE_SHARED_MAX_ENTRIES: int = 100_000
+
+    # ── Rate limits ──
+    # Requests and tokens per minute each process (or, with the postgres
+    # backend, all processes together) may send to the chat and embedding
+    # providers; 0 disables a limit. Calls wait for budget instead of drawing
+    # 429s. A 429 that still arrives pauses the profile for Retry-After (or a
+    # doubling backoff up to RATE_LIMIT_MAX_BACKOFF_SECONDS), halves its rate
+    # until calls succeed again, and is retried up to RATE_LIMIT_MAX_RETRIES.
+    LLM_RATE_LIMIT_RPM: int = 0
+    LLM_RATE_LIMIT_TPM: int = 0
+    EMBEDDING_RATE_LIMIT_RPM: int = 0
+    EMBEDDING_RATE_LIMIT_TPM: int = 0
+    RATE_LIMIT_BACKEND: Literal["local", "postgres"] = "local"
+    RATE_LIMIT_MAX_RETRIES: int = 3
+    RATE_LIMIT_MAX_BACKOFF_SECONDS: float = 60.0
+
+    # Each process gathers the embedding calls of all in-flight activities
+    # (or requests) for up to EMBEDDING_BATCH_WINDOW_MS and sends them as one
+    # request (0 disables).
+    # EMBEDDING_BATCH_MAX_SIZE is the provider's limit on texts per request;
+    # memu's client also splits larger embedding calls at this size.
+    EMBEDDING_BATCH_WINDOW_MS: float = 0.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 128
+
+    # ── LLM cache ──
+    # Opt-in cache of chat completions keyed by (model, base_url, temperature,
+    # prompt), so re-running memorization over conversations seen before
+    # (reprocessing, replays) answers from the cache instead of the provider.
+    # "disk" keeps a SQLite file at LLM_CACHE_PATH per host, "postgres" a table
+    # shared by every worker; least recently used responses are evicted beyond
+    # LLM_CACHE_MAX_BYTES. Cached answers are replayed verbatim, so leave
+    # LLM_CACHE_ENABLED off in production.
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_BACKEND: Literal["disk", "postgres"] = "disk"
+    LLM_CACHE_PATH: str = "./data/llm-cache.sqlite3"
+    LLM_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+
     # ── Temporal ──
     TEMPORAL_HOST: str = "localhost"
     TEMPORAL_PORT: int = 7233
     TEMPORAL_NAMESPACE: str = "default"
+    # zlib-compress workflow inputs, results and signals of at least this many
+    # bytes in Temporal history (0 disables). Every process can always decode
+    # compressed payloads, so enable it on the workers first, then the API.
+    TEMPORAL_PAYLOAD_COMPRESSION_MIN_BYTES: int = 0
 
     # ── Storage ──
+    # Where conversation files and stored results live: plain files in
+    # STORAGE_PATH ("local"), content-addressed gzip objects in STORAGE_PATH
+    # ("compressed"), or an S3-compatible bucket ("s3"), which lets API and
+    # worker replicas run without a shared volume.
+    STORAGE_BACKEND: Literal["local", "compressed", "s3"] = "local"
     STORAGE_PATH: str = "./data/storage"
+    STORAGE_S3_ENDPOINT_URL: str = ""
+    STORAGE_S3_BUCKET: str = ""
+    STORAGE_S3_PREFIX: str = ""
+    STORAGE_S3_REGION: str = "us-east-1"
+    STORAGE_S3_ACCESS_KEY_ID: str = ""
+    STORAGE_S3_SECRET_ACCESS_KEY: str = ""
+    # Uploads larger than this go to S3 as multipart uploads of parts this
+    # size (at least 5 MiB), which bounds the memory a stream needs.
+    STORAGE_S3_PART_BYTES: int = 8 * 1024 * 1024
+    # Write new files into hashed subdirectories (<aa>/<bb>/<name>) instead of
+    # one flat directory. Readers find files in either layout, so enable it
+    # once every worker runs a version that does.
+    STORAGE_SHARDING: bool = False
+    # What happens to a task's conversation files once its workflow finishes
+    # (completed or failed): kept, deleted, or gzip-archived as <name>.gz.
+    STORAGE_RETENTION_MODE: Literal["keep", "delete", "archive"] = "keep"
+    # Workers sweep STORAGE_PATH every STORAGE_SWEEP_INTERVAL_SECONDS and
+    # remove conversation and result files older than
+    # STORAGE_ORPHAN_RETENTION_SECONDS (0 disables; must exceed the longest
+    # task, including coalescing windows and result polling) and archives
+    # older than STORAGE_ARCHIVE_RETENTION_SECONDS (0 keeps them).
+    STORAGE_ORPHAN_RETENTION_SECONDS: float = 0.0
+    STORAGE_ARCHIVE_RETENTION_SECONDS: float = 0.0
+    STORAGE_SWEEP_INTERVAL_SECONDS: float = 3600.0
+
+    # ── Memorize ──
+    # Upper bound on items per POST /memorize/batch and on how many of them
+    # are written and submitted to Temporal concurrently.
+    MEMORIZE_BATCH_MAX_ITEMS: int = 1000
+    MEMORIZE_BATCH_CONCURRENCY: int = 32
+    # Derive task IDs from (user_id, agent_id, override_config, conversation)
+    # so resubmitting an identical conversation returns the existing task.
+    # An Idempotency-Key header does the same per request regardless.
+    MEMORIZE_DEDUPE_BY_CONTENT: bool = False
+    # Conversations whose JSON is at most this many bytes travel inline in the
+    # workflow spec instead of through STORAGE_PATH (0 disables), optionally
+    # zlib-compressed. Workers must run a version that understands inline
+    # specs before this is enabled on the API.
+    MEMORIZE_INLINE_MAX_BYTES: int = 0
+    MEMORIZE_INLINE_COMPRESS: bool = False
+    # Return counts and a result_ref from memorize activities and store the
+    # full memu result in STORAGE_PATH (GET /memorize/result/{task_id}),
+    # instead of carrying it in Temporal history.
+    MEMORIZE_COMPACT_RESULTS: bool = False
+    # Largest single message accepted by PUT /memorize/stream; the transcript
+    # as a whole is unbounded since it is never held in memory.
+    MEMORIZE_STREAM_MAX_MESSAGE_BYTES: int = 1024 * 1024
+    # Longest ?wait= accepted by GET /memorize/status/{task_id}.
+    MEMORIZE_STATUS_MAX_WAIT_SECONDS: float = 60.0
+    # Task IDs per POST /memorize/status, and how many are resolved concurrently.
+    MEMORIZE_STATUS_BATCH_MAX_IDS: int = 100
+    MEMORIZE_STATUS_BATCH_CONCURRENCY: int = 16
+    # Terminal task statuses remembered per API process (0 disables).
+    MEMORIZE_STATUS_CACHE_SIZE: int = 10_000
+    # Coalescing: a user's conversations submitted within this window are
+    # memorized together as one merged resource (0 disables), at most
+    # MEMORIZE_COALESCE_MAX_ITEMS per merged call. Each keeps its own task ID.
+    MEMORIZE_COALESCE_WINDOW_SECONDS: float = 0.0
+    MEMORIZE_COALESCE_MAX_ITEMS: int = 20
+    # Chunking: conversations estimated above this many tokens are split into
+    # parts memorized in parallel (0 disables), at most
+    # MEMORIZE_CHUNK_MAX_PARALLEL parts of one task at a time.
+    MEMORIZE_CHUNK_TOKENS: int = 0
+    MEMORIZE_CHUNK_MAX_PARALLEL: int = 8
+    # Seconds between worker heartbeats during a memorize activity. Must stay
+    # well below the workflow's 30s heartbeat timeout.
+    MEMORIZE_HEARTBEAT_INTERVAL_SECONDS: float = 10.0
+
+    # ── Retrieve ──
+    # Default and maximum number of hits returned per tier (categories, items, resources).
+    RETRIEVE_DEFAULT_TOP_K: int = 5
+    RETRIEVE_MAX_TOP_K: int = 20
+    # Upper bound on queries per POST /retrieve/batch request.
+    RETRIEVE_BATCH_MAX_QUERIES: int = 32
+
+    # ── Response cache ──
+    # Cache of /retrieve and /categories results in each API process (0 disables).
+    RESPONSE_CACHE_SIZE: int = 10_000
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+
+    # ── Notifications ──
+    # How API processes hear about writes and finished tasks elsewhere.
+    # "postgres" uses LISTEN/NOTIFY, so cache invalidations and task events
+    # from any replica or worker reach every replica; "local" only sees what
+    # happens in this process and is meant for single-process deployments.
+    NOTIFICATIONS_BACKEND: Literal["postgres", "local"] = "postgres"
+    # Keep-alive comment interval and per-subscriber buffer for
+    # GET /memorize/events.
+    TASK_EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    TASK_EVENTS_QUEUE_SIZE: int = 100
+
+    # ── Webhooks ──
+    # callback_url deliveries are signed with HMAC-SHA256 of
+    # "<timestamp>.<body>" when a secret is set (X-Memu-Signature header).
+    WEBHOOK_SIGNING_SECRET: str = ""
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    # Deliveries to hosts resolving to private, loopback, link-local or other
+    # non-public addresses are refused. Comma-separated host names listed
+    # here (internal receivers) skip that check.
+    WEBHOOK_ALLOWED_HOSTS: str = ""
+
+    # ── Worker ──
+    # Warm MemoryService instances kept per worker, one per distinct override_config.
+    MEMU_SERVICE_CACHE_SIZE: int = 8
+    # host:port for the worker's Prometheus endpoint; empty disables it. With
+    # several worker processes, process N serves on the port plus N.
+    WORKER_METRICS_BIND_ADDRESS: str = ""
+    # Worker processes per container, each an independent Temporal worker
+    # with its own identity; above 1 the entrypoint supervises them.
+    WORKER_PROCESSES: int = 1
+    # Slots and pollers per worker process (0 keeps the SDK default: 100
+    # concurrent activities and workflow tasks, 5 pollers of each, 1000 cached
+    # workflows). Memorize activities mostly wait on the LLM, so activity
+    # slots are bounded by provider rate limits rather than CPU.
+    WORKER_MAX_CONCURRENT_ACTIVITIES: int = 0
+    WORKER_MAX_CONCURRENT_WORKFLOW_TASKS: int = 0
+    WORKER_MAX_ACTIVITY_TASK_POLLS: int = 0
+    WORKER_MAX_WORKFLOW_TASK_POLLS: int = 0
+    WORKER_MAX_CACHED_WORKFLOWS: int = 0
+    # How long running activities may finish when a worker is stopped before
+    # they are cancelled (and retried elsewhere).
+    WORKER_GRACEFUL_SHUTDOWN_SECONDS: float = 0.0
+    # Memorize tasks run on the interactive (memu-worker) or bulk
+    # (memu-worker-bulk) task queue by their priority. Each process polls
+    # both and splits its slots and pollers between them by these weights;
+    # a weight of 0 stops polling that queue (e.g. dedicated bulk workers).
+    WORKER_INTERACTIVE_QUEUE_WEIGHT: int = 3
+    WORKER_BULK_QUEUE_WEIGHT: int = 1
+    # Seconds between backlog samples of both task queues by worker process 0
+    # (0 disables).
+    TASK_QUEUE_BACKLOG_INTERVAL_SECONDS: float = 30.0
 
     @field_validator("DATABASE_URL", mode="after")
     @classmethod
@@ -74,6 +260,16 @@ class Settings(BaseSettings):
     def temporal_url(self) -> str:
         return f"{self.TEMPORAL_HOST}:{self.TEMPORAL_PORT}"
 
+    @property
+    def webhook_allowed_hosts(self) -> frozenset[str]:
+        """WEBHOOK_ALLOWED_HOSTS as a set of lower-cased host names."""
+        return frozenset(host.strip().lower() for host in self.WEBHOOK_ALLOWED_HOSTS.split(",") if host.strip())
+
+    @property
+    def postgres_dsn(self) -> str:
+        """DATABASE_URL in the plain ``postgresql://`` form psycopg connects with."""
+        return self.DATABASE_URL.replace("postgresql+psycopg://", "postgresql://", 1)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
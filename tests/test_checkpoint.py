@@ -0,0 +1,287 @@
+"""Tests for memorize heartbeats and checkpointed resume."""
+
+import asyncio
+import dataclasses
+import functools
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from memu.app import MemoryService
+from temporalio.testing import ActivityEnvironment
+
+from app.services.checkpoint import (
+    STAGE_EXTRACTED,
+    STAGE_PERSISTED,
+    MemorizeCheckpointer,
+    memorize_with_checkpoints,
+)
+from app.services.memu import MemoryServiceCache
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.memorize_activity import task_memorize
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
+
+class _Model:
+    def __init__(self, **data):
+        self.data = data
+
+    def model_dump(self, exclude=None):
+        return {k: v for k, v in self.data.items() if k not in (exclude or set())}
+
+
+def _service() -> MagicMock:
+    service = MagicMock()
+    service._model_dump_without_embeddings = lambda obj: obj.model_dump(exclude={"embedding"})
+    service._ensure_categories_ready = AsyncMock()
+    service._update_category_summaries = AsyncMock()
+    service._get_context.return_value = SimpleNamespace(category_ids=["prefs"])
+    service.user_model = lambda **user: SimpleNamespace(model_dump=lambda: dict(user))
+    return service
+
+
+def _step(step_id: str, workflow_name: str = "memorize") -> SimpleNamespace:
+    return SimpleNamespace(workflow_name=workflow_name, step_id=step_id)
+
+
+PLANS = [{"resource_url": "conv.json", "text": "x" * 1000, "caption": "c", "entries": [["profile", "likes tea"]]}]
+PERSISTED = {
+    "stage": STAGE_PERSISTED,
+    "category_updates": {"prefs": ["likes tea"]},
+    "resources": [{"id": "r1"}],
+    "items": [{"id": "i1", "summary": "likes tea"}],
+    "relations": [{"item_id": "i1", "category_id": "prefs"}],
+}
+
+
+# ── Checkpointer ──
+
+
+def test_checkpointer_records_extraction_without_segment_text():
+    beats = []
+    checkpointer = MemorizeCheckpointer(_service(), "/data/conv.json", beats.append)
+    state = {"resource_url": "/data/conv.json", "local_path": "/data/conv.json", "resource_plans": PLANS}
+    checkpointer.after_step(_step("preprocess_multimodal"), state)
+    assert beats[-1] == {"step": "preprocess_multimodal"}
+    checkpointer.after_step(_step("extract_items"), state)
+    assert beats[-1]["stage"] == STAGE_EXTRACTED
+    assert beats[-1]["resource_plans"] == [{"caption": "c", "entries": PLANS[0]["entries"]}]
+    assert "local_path" not in beats[-1]
+    checkpointer.after_step(_step("dedupe_merge"), state)
+    assert beats[-1]["step"] == "dedupe_merge"
+    assert beats[-1]["stage"] == STAGE_EXTRACTED
+
+
+def test_checkpointer_records_persisted_items_without_embeddings():
+    beats = []
+    checkpointer = MemorizeCheckpointer(_service(), "/data/conv.json", beats.append)
+    state = {
+        "resource_url": "/data/conv.json",
+        "category_updates": {"prefs": ["likes tea"]},
+        "resources": [_Model(id="r1", embedding=[0.1])],
+        "items": [_Model(id="i1", summary="likes tea", embedding=[0.2])],
+        "relations": [_Model(item_id="i1", category_id="prefs")],
+    }
+    checkpointer.after_step(_step("categorize_items"), state)
+    assert beats[-1] == {"step": "categorize_items", **PERSISTED}
+    json.dumps(beats[-1])
+
+
+def test_checkpointer_ignores_other_calls_on_the_shared_service():
+    beats = []
+    checkpointer = MemorizeCheckpointer(_service(), "/data/mine.json", beats.append)
+    checkpointer.after_step(_step("extract_items"), {"resource_url": "/data/other.json"})
+    checkpointer.after_step(_step("rag_route", "retrieve_rag"), {"resource_url": "/data/mine.json"})
+    assert beats == []
+
+
+def test_oversized_checkpoint_reports_progress_only():
+    beats = []
+    checkpointer = MemorizeCheckpointer(_service(), "/data/conv.json", beats.append, max_bytes=100)
+    plans = [{"resource_url": "conv.json", "entries": [["profile", "x" * 500]]}]
+    checkpointer.after_step(_step("extract_items"), {"resource_url": "/data/conv.json", "resource_plans": plans})
+    assert beats[-1] == {"step": "extract_items"}
+
+
+# ── Resume ──
+
+
+@pytest.mark.asyncio
+async def test_fresh_run_memorizes_and_removes_interceptor():
+    service = _service()
+    service.memorize = AsyncMock(return_value={"items": []})
+    beats = []
+    response = await memorize_with_checkpoints(
+        service, resource_url="/data/conv.json", user={"user_id": "u1"}, heartbeat=beats.append, heartbeat_interval=0.01
+    )
+    assert response == {"items": []}
+    service.memorize.assert_awaited_once_with(
+        resource_url="/data/conv.json", modality="conversation", user={"user_id": "u1"}
+    )
+    service.intercept_after_workflow_step.return_value.dispose.assert_called_once()
+    assert beats
+
+
+@pytest.mark.asyncio
+async def test_timer_heartbeats_while_a_step_runs():
+    service = _service()
+
+    async def _slow_memorize(**kwargs):
+        await asyncio.sleep(0.2)
+        return {}
+
+    service.memorize = _slow_memorize
+    beats = []
+    await memorize_with_checkpoints(
+        service, resource_url="/data/conv.json", user={"user_id": "u1"}, heartbeat=beats.append, heartbeat_interval=0.02
+    )
+    assert len(beats) >= 5
+
+
+@pytest.mark.asyncio
+async def test_resume_after_extraction_skips_the_llm_steps():
+    service = _service()
+    service.memorize = AsyncMock()
+    names = ["ingest_resource", "preprocess_multimodal", "extract_items", "dedupe_merge", "categorize_items"]
+    service._pipelines.build.return_value = [SimpleNamespace(step_id=n) for n in names]
+    service._workflow_runner.run = AsyncMock(return_value={"response": {"items": [1]}})
+    service.fs.fetch = AsyncMock(return_value=("/resources/conv.json", "[]"))
+    service._segment_resource_url = functools.partial(MemoryService._segment_resource_url, service)
+    entries = PLANS[0]["entries"]
+    old_copy, new_copy = "/inline/attempt-1/conv.json", "/inline/attempt-2/conv.json"
+    # Written by an earlier worker version, with the previous attempt's (deleted) file.
+    checkpoint = {
+        "stage": STAGE_EXTRACTED,
+        "local_path": old_copy,
+        "resource_plans": [{"resource_url": old_copy, "caption": "c", "entries": entries}],
+    }
+
+    response = await memorize_with_checkpoints(
+        service, resource_url=new_copy, user={"user_id": "u1"}, checkpoint=checkpoint
+    )
+
+    assert response == {"items": [1]}
+    service.memorize.assert_not_awaited()
+    service.fs.fetch.assert_awaited_once_with(new_copy, "conversation")
+    _, steps, state, *_ = service._workflow_runner.run.await_args.args
+    assert [s.step_id for s in steps] == ["dedupe_merge", "categorize_items"]
+    assert state["local_path"] == "/resources/conv.json"
+    assert state["resource_plans"] == [{"resource_url": new_copy, "caption": "c", "entries": entries}]
+    assert state["user"] == {"user_id": "u1"}
+    assert metrics.counter("memu_memorize_resumed", {"stage": STAGE_EXTRACTED}) == 1
+
+
+@pytest.mark.asyncio
+async def test_resume_after_extraction_rebuilds_segment_urls_from_this_attempts_file():
+    service = _service()
+    service._pipelines.build.return_value = [SimpleNamespace(step_id="dedupe_merge")]
+    service._workflow_runner.run = AsyncMock(return_value={"response": {}})
+    service.fs.fetch = AsyncMock(return_value=("/resources/conv.json", "[]"))
+    service._segment_resource_url = functools.partial(MemoryService._segment_resource_url, service)
+    plans = [{"caption": None, "entries": []}, {"caption": None, "entries": []}]
+
+    await memorize_with_checkpoints(
+        service,
+        resource_url="/data/conv.json",
+        user={"user_id": "u1"},
+        checkpoint={"stage": STAGE_EXTRACTED, "resource_plans": plans},
+    )
+
+    state = service._workflow_runner.run.await_args.args[2]
+    urls = [plan["resource_url"] for plan in state["resource_plans"]]
+    assert urls == ["conv_#segment_0.json", "conv_#segment_1.json"]
+
+
+@pytest.mark.asyncio
+async def test_resume_after_persist_only_updates_categories():
+    service = _service()
+    service.memorize = AsyncMock()
+    store = service._get_database.return_value
+    store.memory_category_repo.categories = {"prefs": _Model(id="prefs", summary="likes tea")}
+
+    response = await memorize_with_checkpoints(
+        service, resource_url="/data/conv.json", user={"user_id": "u1"}, checkpoint=PERSISTED
+    )
+
+    service.memorize.assert_not_awaited()
+    assert service._update_category_summaries.await_args.args[0] == {"prefs": ["likes tea"]}
+    assert response == {
+        "resource": {"id": "r1"},
+        "items": PERSISTED["items"],
+        "categories": [{"id": "prefs", "summary": "likes tea"}],
+        "relations": PERSISTED["relations"],
+    }
+    assert metrics.counter("memu_memorize_resumed", {"stage": STAGE_PERSISTED}) == 1
+
+
+@pytest.mark.asyncio
+async def test_chunk_part_resume_after_persist_leaves_summaries_alone():
+    service = _service()
+    store = service._get_database.return_value
+    store.memory_category_repo.categories = {}
+
+    response = await memorize_with_checkpoints(
+        service,
+        resource_url="/data/conv.json",
+        user={"user_id": "u1"},
+        checkpoint=PERSISTED,
+        update_summaries=False,
+    )
+
+    service._update_category_summaries.assert_not_awaited()
+    assert response["items"] == PERSISTED["items"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_checkpoint_starts_over():
+    service = _service()
+    service.memorize = AsyncMock(return_value={})
+    await memorize_with_checkpoints(
+        service, resource_url="/data/conv.json", user={"user_id": "u1"}, checkpoint={"step": "ingest_resource"}
+    )
+    service.memorize.assert_awaited_once()
+
+
+# ── Activity ──
+
+
+@pytest.mark.asyncio
+async def test_activity_resumes_from_heartbeat_details(tmp_path):
+    (tmp_path / "conversation-abc.json").write_text("[]", "utf-8")
+    service = _service()
+    service.memorize = AsyncMock()
+    store = service._get_database.return_value
+    store.memory_category_repo.categories = {"prefs": _Model(id="prefs")}
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(env.info, attempt=2, heartbeat_details=[PERSISTED])
+    beats = []
+    env.on_heartbeat = lambda *details: beats.append(details)
+    settings = MagicMock(
+        MEMORIZE_COMPACT_RESULTS=False,
+        STORAGE_SHARDING=False,
+        STORAGE_RETENTION_MODE="keep",
+        STORAGE_PATH=str(tmp_path),
+        MEMORIZE_HEARTBEAT_INTERVAL_SECONDS=0.01,
+    )
+    with (
+        patch("app.workers.memorize_activity.Settings", return_value=settings),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await env.run(
+            task_memorize, {"task_id": "t1", "resource_url": "conversation-abc.json", "user_id": "u1"}
+        )
+
+    assert result["status"] == "SUCCESS"
+    assert result["result"]["items"] == PERSISTED["items"]
+    service.memorize.assert_not_awaited()
+    # The previous attempt's checkpoint is re-sent so a further retry can still resume.
+    assert beats[0] == (PERSISTED,)
@@ -0,0 +1,315 @@
+"""Tests for chunked memorization of long conversations."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from memu.app import MemoryService
+from temporalio.exceptions import ApplicationError
+
+from app.services.chunking import (
+    category_updates,
+    consolidate_categories,
+    estimate_tokens,
+    merge_category_updates,
+    needs_chunking,
+    skip_category_summaries,
+    split_messages,
+)
+from app.services.memu import MemoryServiceCache
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.memorize_activity import task_consolidate_categories, task_memorize_chunk, task_split_conversation
+from tests.test_memu_service import linked_category_owners, memorizing_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
+
+def _message(text: str) -> dict:
+    return {"role": "user", "content": {"text": text}}
+
+
+def _conversation(n: int, size: int = 100) -> list[dict]:
+    return [_message(f"{i:04d} " + "x" * size) for i in range(n)]
+
+
+# ── Splitting ──
+
+
+def test_split_respects_token_limit_and_order():
+    messages = _conversation(20)
+    limit = estimate_tokens(messages[0]) * 3
+    parts = split_messages(messages, limit)
+    assert [m for part in parts for m in part] == messages
+    assert all(sum(estimate_tokens(m) for m in part) <= limit for part in parts)
+    assert len(parts) == 7
+
+
+def test_oversized_message_gets_its_own_part():
+    messages = [_message("a"), _message("x" * 4000), _message("b")]
+    parts = split_messages(messages, 50)
+    assert [len(p) for p in parts] == [1, 1, 1]
+
+
+def test_needs_chunking():
+    conversation = _conversation(10)
+    total = sum(estimate_tokens(m) for m in conversation)
+    assert needs_chunking(conversation, total - 1)
+    assert needs_chunking({"content": conversation}, total - 1)
+    assert not needs_chunking(conversation, total)
+    assert not needs_chunking(conversation, 0)
+    assert not needs_chunking({"text": "x" * 100_000}, 10)
+
+
+# ── Category consolidation ──
+
+
+MEMORIZE_RESULT = {
+    "items": [{"id": "i1", "summary": "likes tea"}, {"id": "i2", "summary": "lives in Berlin"}, {"id": "i3"}],
+    "relations": [
+        {"item_id": "i1", "category_id": "prefs"},
+        {"item_id": "i2", "category_id": "profile"},
+        {"item_id": "i2", "category_id": "prefs"},
+        {"item_id": "i3", "category_id": "prefs"},
+    ],
+}
+
+
+def test_category_updates_from_result():
+    assert category_updates(MEMORIZE_RESULT) == {
+        "prefs": ["likes tea", "lives in Berlin"],
+        "profile": ["lives in Berlin"],
+    }
+    assert category_updates("not a dict") == {}
+
+
+def test_merge_category_updates():
+    merged = merge_category_updates([{"a": ["x"]}, {"a": ["y"], "b": ["z"]}])
+    assert merged == {"a": ["x", "y"], "b": ["z"]}
+
+
+@pytest.mark.asyncio
+async def test_consolidate_reloads_then_resummarizes():
+    store = MagicMock()
+    store.memory_category_repo.categories = {"prefs": object()}
+    service = MagicMock()
+    service._get_database.return_value = store
+    service._update_category_summaries = AsyncMock()
+    updated = await consolidate_categories(service, "u1", {"prefs": ["likes tea"], "gone": ["x"]})
+    store.memory_category_repo.list_categories.assert_called_once_with({"user_id": "u1"})
+    updates = service._update_category_summaries.await_args.args[0]
+    assert updates == {"prefs": ["likes tea"], "gone": ["x"]}
+    assert updated == 1
+    # The same model as the summary step of unchunked tasks.
+    service._get_llm_client.assert_called_once_with(service.memorize_config.category_update_llm_profile)
+    assert service._update_category_summaries.await_args.kwargs["llm_client"] is service._get_llm_client.return_value
+
+
+@pytest.mark.asyncio
+async def test_consolidate_skips_empty_updates():
+    service = MagicMock()
+    assert await consolidate_categories(service, "u1", {}) == 0
+    service._get_database.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_consolidate_fails_clearly_without_memus_summary_update():
+    service = MagicMock()
+    del service._update_category_summaries
+    with pytest.raises(RuntimeError, match="_update_category_summaries"):
+        await consolidate_categories(service, "u1", {"prefs": ["x"]})
+
+
+def test_skip_category_summaries_replaces_only_that_services_persist_step():
+    def _service() -> MemoryService:
+        return MemoryService(
+            llm_profiles={"default": {"api_key": "test"}},
+            database_config={"metadata_store": {"provider": "inmemory"}},
+        )
+
+    regular, part = _service(), skip_category_summaries(_service())
+    persist = {s.step_id: s for s in part._pipelines.build("memorize")}["persist_index"]
+    state = {"category_updates": {"prefs": ["likes tea"]}}
+    assert persist.handler(state, None) is state
+    assert "llm" not in persist.capabilities
+    regular_persist = {s.step_id: s for s in regular._pipelines.build("memorize")}["persist_index"]
+    assert regular_persist.handler == regular._memorize_persist_and_index
+
+
+# ── Activities ──
+
+
+def _spec(tmp_path, conversation, max_tokens: int) -> dict:
+    name = "conversation-" + "a" * 32 + ".json"
+    (tmp_path / name).write_text(json.dumps(conversation), "utf-8")
+    return {
+        "task_id": "a" * 32,
+        "resource_url": name,
+        "user_id": "u1",
+        "agent_id": "",
+        "chunking": {"max_tokens": max_tokens, "max_parallel": 4},
+    }
+
+
+@pytest.mark.asyncio
+async def test_split_activity_writes_parts(tmp_path):
+    conversation = _conversation(10)
+    spec = _spec(tmp_path, conversation, estimate_tokens(conversation[0]) * 4)
+    with patch(
+        "app.workers.memorize_activity.Settings",
+        return_value=MagicMock(
+            MEMORIZE_COMPACT_RESULTS=False,
+            STORAGE_SHARDING=False,
+            STORAGE_RETENTION_MODE="keep",
+            STORAGE_PATH=str(tmp_path),
+        ),
+    ):
+        names = await task_split_conversation(spec)
+    assert names == [f"conversation-{'a' * 32}-part-{i:03d}.json" for i in range(3)]
+    parts = [json.loads((tmp_path / n).read_text("utf-8")) for n in names]
+    assert [m for part in parts for m in part] == conversation
+
+
+@pytest.mark.asyncio
+async def test_split_activity_keeps_small_conversations_whole(tmp_path):
+    spec = _spec(tmp_path, _conversation(2), 100_000)
+    with patch(
+        "app.workers.memorize_activity.Settings",
+        return_value=MagicMock(
+            MEMORIZE_COMPACT_RESULTS=False,
+            STORAGE_SHARDING=False,
+            STORAGE_RETENTION_MODE="keep",
+            STORAGE_PATH=str(tmp_path),
+        ),
+    ):
+        assert await task_split_conversation(spec) == []
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.asyncio
+async def test_split_activity_missing_file_is_not_retried(tmp_path):
+    spec = {"task_id": "t", "resource_url": "conversation-missing.json", "chunking": {"max_tokens": 10}}
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        pytest.raises(ApplicationError) as exc_info,
+    ):
+        await task_split_conversation(spec)
+    assert exc_info.value.non_retryable
+
+
+@pytest.mark.asyncio
+async def test_chunk_activity_returns_compact_result(tmp_path):
+    spec = _spec(tmp_path, _conversation(1), 10)
+    service = MagicMock()
+    service.memorize = AsyncMock(return_value=MEMORIZE_RESULT)
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize_chunk(spec)
+    assert result["items"] == 3
+    assert result["category_updates"] == category_updates(MEMORIZE_RESULT)
+    assert "result" not in result
+    service.replace_step.assert_called_once()
+    assert service.replace_step.call_args.kwargs["target_step_id"] == "persist_index"
+
+
+@pytest.mark.asyncio
+async def test_chunk_parts_of_different_users_keep_to_their_own_categories(tmp_path):
+    conversation = tmp_path / "conversation.json"
+    conversation.write_text("[]")
+    service = memorizing_service(tmp_path / "resources")
+    with patch("app.workers.memorize_activity.create_memory_service", return_value=service):
+        for user_id in ("u1", "u2"):
+            await memorize_activity._memorize_resource(
+                MagicMock(), {"user_id": user_id}, str(conversation), 0.0, f"{user_id}-part-000", chunk_part=True
+            )
+    assert linked_category_owners(service, "u1") == {"u1"}
+    assert linked_category_owners(service, "u2") == {"u2"}
+
+
+def test_chunk_parts_lease_their_own_service():
+    regular, part = MagicMock(), MagicMock()
+    settings = MagicMock()
+    with patch("app.workers.memorize_activity.create_memory_service", side_effect=[regular, part]):
+        with memorize_activity._lease_service(settings, None) as leased:
+            assert leased is regular
+        with memorize_activity._lease_service(settings, None, chunk_part=True) as leased:
+            assert leased is part
+    regular.replace_step.assert_not_called()
+    part.replace_step.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_consolidate_activity_uses_leased_service():
+    service = MagicMock()
+    with (
+        patch("app.workers.memorize_activity.Settings", return_value=MagicMock()),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+        patch("app.workers.memorize_activity.consolidate_categories", AsyncMock(return_value=2)) as consolidate,
+    ):
+        updated = await task_consolidate_categories({"task_id": "t", "user_id": "u1"}, {"prefs": ["x"]})
+    assert updated == 2
+    consolidate.assert_awaited_once_with(service, "u1", {"prefs": ["x"]})
+
+
+# ── API ──
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def test_long_conversations_are_marked_for_chunking(client):
+    from app.main import settings
+
+    with (
+        patch.object(settings, "MEMORIZE_CHUNK_TOKENS", 200),
+        patch.object(settings, "MEMORIZE_COALESCE_WINDOW_SECONDS", 2.0),
+    ):
+        client.post("/memorize", json={"conversation": _conversation(20), "user_id": "u1"})
+        spec = client.app.state.temporal.start_workflow.call_args.args[1]
+        assert spec["chunking"] == {"max_tokens": 200, "max_parallel": settings.MEMORIZE_CHUNK_MAX_PARALLEL}
+        assert "coalesce" not in spec
+
+        client.post("/memorize", json={"conversation": _conversation(1), "user_id": "u1"})
+        spec = client.app.state.temporal.start_workflow.call_args.args[1]
+        assert "chunking" not in spec
+        assert "coalesce" in spec
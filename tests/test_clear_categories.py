@@ -213,36 +213,38 @@ def test_categories_whitespace_user_id_rejected(client):
 
 
 def test_retrieve_missing_query_rejected(client):
-    """POST /retrieve without 'query' key → 400."""
-    response = client.post("/retrieve", json={"other": "value"})
-    assert response.status_code == 400
-    assert "Missing 'query'" in response.json()["detail"]
+    """POST /retrieve without 'query' key → 422."""
+    response = client.post("/retrieve", json={"user_id": "user123"})
+    assert response.status_code == 422
 
 
 def test_retrieve_empty_query_rejected(client):
-    """POST /retrieve with empty string query → 400."""
-    response = client.post("/retrieve", json={"query": ""})
-    assert response.status_code == 400
-    assert "'query' must be a non-empty string" in response.json()["detail"]
+    """POST /retrieve with empty string query → 422."""
+    response = client.post("/retrieve", json={"query": "", "user_id": "user123"})
+    assert response.status_code == 422
 
 
 def test_retrieve_whitespace_query_rejected(client):
-    """POST /retrieve with whitespace-only query → 400."""
-    response = client.post("/retrieve", json={"query": "   "})
-    assert response.status_code == 400
-    assert "'query' must be a non-empty string" in response.json()["detail"]
+    """POST /retrieve with whitespace-only query → 422."""
+    response = client.post("/retrieve", json={"query": "   ", "user_id": "user123"})
+    assert response.status_code == 422
 
 
 def test_retrieve_non_string_query_rejected(client):
-    """POST /retrieve with non-string query → 400."""
-    response = client.post("/retrieve", json={"query": 123})
-    assert response.status_code == 400
-    assert "'query' must be a non-empty string" in response.json()["detail"]
+    """POST /retrieve with non-string query → 422."""
+    response = client.post("/retrieve", json={"query": 123, "user_id": "user123"})
+    assert response.status_code == 422
+
+
+def test_retrieve_missing_user_id_rejected(client):
+    """POST /retrieve without user_id → 422 (searches are always tenant-scoped)."""
+    response = client.post("/retrieve", json={"query": "hello"})
+    assert response.status_code == 422
 
 
 def test_retrieve_valid_query_strips_whitespace(mock_service, client):
     """POST /retrieve with valid padded query → stripped value passed to service."""
-    mock_service.retrieve = AsyncMock(return_value=[{"memory": "test"}])
-    response = client.post("/retrieve", json={"query": "  hello world  "})
+    mock_service.retrieve = AsyncMock(return_value={"items": []})
+    response = client.post("/retrieve", json={"query": "  hello world  ", "user_id": "user123"})
     assert response.status_code == 200
-    mock_service.retrieve.assert_called_once_with(["hello world"])
+    mock_service.retrieve.assert_called_once_with(["hello world"], where={"user_id": "user123"})
@@ -0,0 +1,322 @@
+"""Tests for coalescing a user's memorize tasks into merged batches."""
+
+import dataclasses
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from temporalio.exceptions import ApplicationError
+from temporalio.service import RPCError, RPCStatusCode
+from temporalio.testing import ActivityEnvironment
+
+from app.services.coalescing import (
+    COALESCE_WORKFLOW_PREFIX,
+    coalesce_group_key,
+    coalesce_workflow_id,
+    conversation_messages,
+    merge_conversations,
+)
+from app.services.memu import MemoryServiceCache
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.coalesce_activity import task_enqueue_coalesced
+from app.workers.coalesce_workflow import MemorizeCoalesceWorkflow
+from app.workers.memorize_activity import task_memorize_merged
+from app.workers.memorize_workflow import MemorizeWorkflow
+from tests.test_memu_service import linked_category_owners, memorizing_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
+
+def _message(text: str) -> dict:
+    return {"role": "user", "content": {"text": text}}
+
+
+# ── Helpers ──
+
+
+def test_conversation_messages_accepts_memu_formats():
+    assert conversation_messages([_message("a")]) == [_message("a")]
+    assert conversation_messages({"content": [_message("a")]}) == [_message("a")]
+    assert conversation_messages({"text": "hello"}) is None
+    assert conversation_messages(["not a message"]) is None
+
+
+def test_merge_conversations_keeps_order():
+    merged = merge_conversations([[_message("a")], {"content": [_message("b"), _message("c")]}])
+    assert [m["content"]["text"] for m in merged] == ["a", "b", "c"]
+    assert merge_conversations([[_message("a")], {"summary": "x"}]) is None
+
+
+def test_coalesce_workflow_id_is_stable_and_not_a_task_id():
+    from app.main import _MEMORIZE_WORKFLOW_ID_RE
+
+    workflow_id = coalesce_workflow_id("user/with spaces")
+    assert workflow_id == coalesce_workflow_id("user/with spaces")
+    assert workflow_id != coalesce_workflow_id("other")
+    assert workflow_id.startswith(COALESCE_WORKFLOW_PREFIX)
+    assert not _MEMORIZE_WORKFLOW_ID_RE.match(workflow_id)
+    # Bulk tasks have a coalescer of their own.
+    assert coalesce_workflow_id("user/with spaces", "interactive") == workflow_id
+    assert coalesce_workflow_id("user/with spaces", "bulk") != workflow_id
+    assert not _MEMORIZE_WORKFLOW_ID_RE.match(coalesce_workflow_id("user/with spaces", "bulk"))
+
+
+def test_group_key_separates_agents_and_configs():
+    base = {"user_id": "u1", "agent_id": "a"}
+    assert coalesce_group_key(base) == coalesce_group_key({**base, "override_config": None})
+    assert coalesce_group_key(base) != coalesce_group_key({**base, "agent_id": "b"})
+    assert coalesce_group_key(base) != coalesce_group_key({**base, "override_config": {"x": 1}})
+
+
+# ── Activities ──
+
+
+def _write_specs(tmp_path, conversations: list) -> list[dict]:
+    specs = []
+    for i, conversation in enumerate(conversations):
+        name = f"conversation-{i:032x}.json"
+        (tmp_path / name).write_text(json.dumps(conversation), "utf-8")
+        specs.append({"task_id": f"{i:032x}", "resource_url": name, "user_id": "u1", "agent_id": "a"})
+    return specs
+
+
+@pytest.mark.asyncio
+async def test_merged_activity_memorizes_once(tmp_path):
+    specs = _write_specs(tmp_path, [[_message("a")], [_message("b")], {"content": [_message("c")]}])
+    service = MagicMock()
+    service.memorize = AsyncMock(return_value={"items": 2})
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize_merged(specs)
+
+    service.memorize.assert_awaited_once()
+    kwargs = service.memorize.await_args.kwargs
+    assert kwargs["user"] == {"user_id": "u1", "agent_id": "a"}
+    merged = json.loads((tmp_path / result["resource_url"]).read_text("utf-8"))
+    assert [m["content"]["text"] for m in merged] == ["a", "b", "c"]
+    assert kwargs["resource_url"] == str((tmp_path / result["resource_url"]).resolve())
+    assert result["task_ids"] == [s["task_id"] for s in specs]
+    assert result["status"] == "SUCCESS"
+    assert metrics.counter("memu_memorize_coalesced_batches") == 1
+    assert metrics.counter("memu_memorize_coalesced_tasks") == 3
+
+
+@pytest.mark.asyncio
+async def test_merged_batch_after_another_users_batch_keeps_to_its_own_categories(tmp_path):
+    service = memorizing_service(tmp_path / "resources")
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        for user_id in ("u1", "u2"):
+            specs = _write_specs(tmp_path, [[_message("a")], [_message("b")]])
+            await task_memorize_merged([{**spec, "user_id": user_id} for spec in specs])
+    assert linked_category_owners(service, "u1") == {"u1"}
+    assert linked_category_owners(service, "u2") == {"u2"}
+
+
+@pytest.mark.asyncio
+async def test_merged_activity_rejects_mixed_groups(tmp_path):
+    specs = _write_specs(tmp_path, [[_message("a")], [_message("b")]])
+    specs[1]["agent_id"] = "other"
+    with pytest.raises(ApplicationError, match="share") as exc_info:
+        await task_memorize_merged(specs)
+    assert exc_info.value.non_retryable
+
+
+@pytest.mark.asyncio
+async def test_merged_activity_rejects_unmergeable_conversations(tmp_path):
+    specs = _write_specs(tmp_path, [[_message("a")], {"summary": "no messages"}])
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        pytest.raises(ApplicationError, match="cannot be merged") as exc_info,
+    ):
+        await task_memorize_merged(specs)
+    assert exc_info.value.non_retryable
+
+
+@pytest.mark.asyncio
+async def test_merged_activity_hides_failure_details(tmp_path):
+    specs = _write_specs(tmp_path, [[_message("a")]])
+    service = MagicMock()
+    service.memorize = AsyncMock(side_effect=RuntimeError("password=hunter2"))
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+        pytest.raises(ApplicationError) as exc_info,
+    ):
+        await task_memorize_merged(specs)
+    assert "hunter2" not in str(exc_info.value)
+    assert not exc_info.value.non_retryable
+
+
+@pytest.mark.asyncio
+async def test_enqueue_uses_signal_with_start():
+    client = MagicMock()
+    client.start_workflow = AsyncMock()
+    item = {"workflow_id": "memorize-" + "a" * 32, "user_id": "u1"}
+    workflow_id = await ActivityEnvironment(client=client).run(task_enqueue_coalesced, item)
+    assert workflow_id == coalesce_workflow_id("u1")
+    args, kwargs = client.start_workflow.await_args
+    assert args[0] == "MemorizeCoalesceWorkflow"
+    assert kwargs["id"] == workflow_id
+    assert kwargs["start_signal"] == "enqueue"
+    assert kwargs["start_signal_args"] == [item]
+
+
+def _retry_env(client: MagicMock) -> ActivityEnvironment:
+    env = ActivityEnvironment(client=client)
+    env.info = dataclasses.replace(env.info, attempt=2)
+    return env
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("query", "queued"),
+    [
+        (AsyncMock(return_value=True), False),
+        (AsyncMock(return_value=False), True),
+        (AsyncMock(side_effect=RPCError("unavailable", RPCStatusCode.UNAVAILABLE, b"")), True),
+    ],
+)
+async def test_enqueue_retry_skips_tasks_already_reported(query, queued):
+    client = MagicMock()
+    client.start_workflow = AsyncMock()
+    client.get_workflow_handle.return_value.query = query
+    item = {"workflow_id": "memorize-" + "a" * 32, "user_id": "u1"}
+
+    assert await _retry_env(client).run(task_enqueue_coalesced, item) == coalesce_workflow_id("u1")
+
+    client.get_workflow_handle.assert_called_once_with(item["workflow_id"])
+    query.assert_awaited_once_with("batch_reported")
+    assert client.start_workflow.await_count == int(queued)
+
+
+# ── Workflows ──
+
+
+def _item(n: int) -> dict:
+    return {"workflow_id": f"memorize-{n}", "user_id": "u1", "coalesce": {"window_seconds": 1, "max_items": 10}}
+
+
+def test_coalescer_ignores_tasks_seen_by_earlier_runs():
+    coalescer = MemorizeCoalesceWorkflow({"pending": [_item(2)], "seen": ["memorize-1"]})
+    for n in (1, 2, 3, 3):
+        coalescer.enqueue(_item(n))
+    assert [item["workflow_id"] for item in coalescer._pending] == ["memorize-2", "memorize-3"]
+
+
+@pytest.mark.asyncio
+async def test_coalescer_carries_recently_seen_tasks_into_the_next_run():
+    coalescer = MemorizeCoalesceWorkflow({"pending": [_item(n) for n in range(12)], "seen": ["memorize-old"]})
+    with (
+        patch("app.workers.coalesce_workflow.MAX_SEEN_CARRIED", 5),
+        patch("app.workers.coalesce_workflow.workflow.wait_condition", AsyncMock()),
+        patch("app.workers.coalesce_workflow.workflow.info") as info,
+        patch("app.workers.coalesce_workflow.workflow.continue_as_new", side_effect=SystemExit) as continue_as_new,
+        patch.object(coalescer, "_memorize", AsyncMock()),
+        pytest.raises(SystemExit),
+    ):
+        info.return_value.is_continue_as_new_suggested.return_value = True
+        await coalescer.run({})
+
+    state = continue_as_new.call_args.args[0]
+    assert [item["workflow_id"] for item in state["pending"]] == ["memorize-10", "memorize-11"]
+    assert state["seen"] == [f"memorize-{n}" for n in range(7, 12)]
+
+
+def test_task_keeps_the_first_batch_outcome():
+    task = MemorizeWorkflow()
+    assert not task.batch_reported()
+    task.batch_finished({"result": {"items": 1}})
+    task.batch_finished({"error": "Task execution failed"})
+    assert task.batch_reported()
+    assert task._batch_outcome == {"result": {"items": 1}}
+
+
+# ── API ──
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def _submitted_spec(client) -> dict:
+    return client.app.state.temporal.start_workflow.call_args.args[1]
+
+
+def test_coalescing_disabled_by_default(client):
+    client.post("/memorize", json={"conversation": [_message("a")], "user_id": "u1"})
+    assert "coalesce" not in _submitted_spec(client)
+
+
+def test_coalescing_marks_mergeable_conversations(client):
+    from app.main import settings
+
+    with (
+        patch.object(settings, "MEMORIZE_COALESCE_WINDOW_SECONDS", 2.0),
+        patch.object(settings, "MEMORIZE_COALESCE_MAX_ITEMS", 5),
+    ):
+        response = client.post("/memorize", json={"conversation": [_message("a")], "user_id": "u1"})
+        assert response.status_code == 200
+        assert response.json()["result"]["task_id"].startswith("memorize-")
+        assert _submitted_spec(client)["coalesce"] == {"window_seconds": 2.0, "max_items": 5}
+
+        client.post("/memorize", json={"conversation": {"summary": "x"}, "user_id": "u1"})
+        assert "coalesce" not in _submitted_spec(client)
@@ -0,0 +1,138 @@
+"""Tests for coalescing embedding calls across concurrent activities."""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import embedding
+from app.services.embedding import BatchingEmbeddingClient, EmbeddingBatcher, install_embedding_batching
+from app.utils.metrics import metrics
+from config.memu import build_memu_llm_profiles
+from config.settings import Settings
+
+
+class RecordingEmbeddingClient:
+    def __init__(self, fail: bool = False) -> None:
+        self.calls: list[list[str]] = []
+        self.fail = fail
+
+    async def embed(self, inputs: list[str]):
+        self.calls.append(list(inputs))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(text)), 0.5] for text in inputs], {"usage": {"total_tokens": len(inputs)}}
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    metrics.reset()
+    embedding._batchers.clear()
+    yield
+    embedding._batchers.clear()
+
+
+async def test_concurrent_calls_share_one_request():
+    inner = RecordingEmbeddingClient()
+    batcher = EmbeddingBatcher(inner, max_batch=100, window_seconds=0.01)
+
+    results = await asyncio.gather(
+        batcher.embed(["a", "bb"]),
+        batcher.embed(["ccc"]),
+        batcher.embed(["bb", "dddd"]),
+    )
+
+    assert inner.calls == [["a", "bb", "ccc", "dddd"]]  # shared texts embedded once
+    assert results == [[[1.0, 0.5], [2.0, 0.5]], [[3.0, 0.5]], [[2.0, 0.5], [4.0, 0.5]]]
+    assert metrics.counter("memu_embedding_batched_calls") == 3
+    assert metrics.timing("memu_embedding_batch_size").max == 4
+
+
+async def test_full_batch_is_sent_without_waiting_out_the_window():
+    inner = RecordingEmbeddingClient()
+    batcher = EmbeddingBatcher(inner, max_batch=3, window_seconds=60)
+
+    results = await asyncio.wait_for(asyncio.gather(batcher.embed(["a", "b"]), batcher.embed(["c"])), timeout=5)
+
+    assert inner.calls == [["a", "b", "c"]]
+    assert results == [[[1.0, 0.5], [1.0, 0.5]], [[1.0, 0.5]]]
+
+
+async def test_large_calls_are_split_at_max_batch():
+    inner = RecordingEmbeddingClient()
+    batcher = EmbeddingBatcher(inner, max_batch=2, window_seconds=0.01)
+
+    vectors = await batcher.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert inner.calls == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+async def test_failed_request_fails_every_caller():
+    batcher = EmbeddingBatcher(RecordingEmbeddingClient(fail=True), max_batch=10, window_seconds=0.01)
+
+    results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+async def test_cancelled_caller_does_not_break_the_batch():
+    inner = RecordingEmbeddingClient()
+    batcher = EmbeddingBatcher(inner, max_batch=10, window_seconds=0.01)
+
+    cancelled = asyncio.create_task(batcher.embed(["a"]))
+    kept = asyncio.create_task(batcher.embed(["b"]))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == [[1.0, 0.5]]
+    assert inner.calls == [["a", "b"]]
+
+
+async def test_empty_call_returns_immediately():
+    inner = RecordingEmbeddingClient()
+    assert await EmbeddingBatcher(inner, 10, 60).embed([]) == []
+    assert inner.calls == []
+
+
+def _service(base_url: str = "https://embed.example/v1", model: str = "embed-small"):
+    service = MagicMock()
+    service.llm_profiles.profiles = {"embedding": SimpleNamespace(base_url=base_url, embed_model=model)}
+    service._llm_clients = {"embedding": RecordingEmbeddingClient()}
+    service._get_llm_base_client = lambda profile: service._llm_clients[profile]
+    return service
+
+
+async def test_services_of_a_process_share_the_batcher():
+    first, second, other = _service(), _service(), _service(model="embed-large")
+    for service in (first, second, other):
+        install_embedding_batching(service, 16, 0.01)
+        install_embedding_batching(service, 16, 0.01)  # idempotent
+
+    clients = [s._llm_clients["embedding"] for s in (first, second, other)]
+    assert all(isinstance(c, BatchingEmbeddingClient) for c in clients)
+    assert clients[0].batcher is clients[1].batcher
+    assert clients[0].batcher is not clients[2].batcher
+
+    results = await asyncio.gather(clients[0].embed(["x"]), clients[1].embed(["yy"]))
+    assert results == [([[1.0, 0.5]], None), ([[2.0, 0.5]], None)]
+
+
+def test_create_memory_service_installs_batching_when_enabled():
+    from app.services.memu import create_memory_service
+
+    settings = Settings(OPENAI_API_KEY="sk-test", EMBEDDING_BATCH_WINDOW_MS=5, EMBEDDING_BATCH_MAX_SIZE=64)
+    with patch("app.services.memu.MemoryService", return_value=_service()) as service_cls:
+        create_memory_service(settings)
+
+    client = service_cls.return_value._llm_clients["embedding"]
+    assert isinstance(client, BatchingEmbeddingClient)
+    assert client.batcher.max_batch == 64
+    assert client.batcher.window_seconds == pytest.approx(0.005)
+
+
+def test_embedding_profile_batches_provider_requests():
+    profiles = build_memu_llm_profiles(Settings(OPENAI_API_KEY="sk-test", EMBEDDING_BATCH_MAX_SIZE=64))
+    assert profiles["embedding"]["embed_batch_size"] == 64
@@ -0,0 +1,154 @@
+"""Tests for the query-embedding cache and its client wrapper."""
+
+import asyncio
+from array import array
+from unittest.mock import patch
+
+import pytest
+
+from app.services.embedding import CachingEmbeddingClient
+from app.services.embedding_cache import (
+    EmbeddingCache,
+    SqliteEmbeddingStore,
+    build_embedding_cache,
+    cache_key,
+    normalize_text,
+)
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+
+class CountingEmbeddingClient:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def embed(self, inputs: list[str]):
+        self.calls.append(list(inputs))
+        return [[float(len(text)), 0.5] for text in inputs], {"usage": {}}
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+# ── Keys ──
+
+
+def test_normalize_text_collapses_whitespace():
+    assert normalize_text("  what are\n the   user's  prefs? ") == "what are the user's prefs?"
+    assert normalize_text("a \t\n b") == normalize_text("a b")
+
+
+def test_cache_key_varies_by_model_and_base_url():
+    base = cache_key("m1", "https://api.example.com/v1", "hello")
+    assert cache_key("m1", "https://api.example.com/v1/", "  hello ") == base
+    assert cache_key("m2", "https://api.example.com/v1", "hello") != base
+    assert cache_key("m1", "https://other.example.com/v1", "hello") != base
+
+
+# ── In-process tier ──
+
+
+def test_local_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2, ttl_seconds=0)
+
+    async def _run():
+        await cache.set_many({"a": [1.0], "b": [2.0]})
+        await cache.get_many(["a"])  # a is now most recently used
+        await cache.set_many({"c": [3.0]})
+        return await cache.get_many(["a", "b", "c"])
+
+    assert asyncio.run(_run()) == {"a": [1.0], "c": [3.0]}
+    assert metrics.counter("memu_embedding_cache_evictions") == 1
+    assert len(cache) == 2
+
+
+def test_local_entries_expire_after_ttl():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60)
+    with patch("app.services.embedding_cache.time.time", return_value=1000.0):
+        asyncio.run(cache.set_many({"a": [1.0]}))
+        assert asyncio.run(cache.get_many(["a"])) == {"a": [1.0]}
+    with patch("app.services.embedding_cache.time.time", return_value=1061.0):
+        assert asyncio.run(cache.get_many(["a"])) == {}
+    assert len(cache) == 0
+
+
+def test_hit_and_miss_counters():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=0)
+    asyncio.run(cache.set_many({"a": [1.0]}))
+    asyncio.run(cache.get_many(["a", "b"]))
+    assert metrics.counter("memu_embedding_cache_hits", {"tier": "local"}) == 1
+    assert metrics.counter("memu_embedding_cache_misses") == 1
+
+
+def test_negative_size_rejected():
+    with pytest.raises(ValueError, match="max_entries"):
+        EmbeddingCache(max_entries=-1, ttl_seconds=0)
+
+
+# ── Shared tier ──
+
+
+def test_shared_store_visible_across_caches(tmp_path):
+    """Two caches (as in two gunicorn workers) see each other's vectors."""
+    path = tmp_path / "embeddings.sqlite3"
+    writer = EmbeddingCache(max_entries=10, ttl_seconds=60, shared=SqliteEmbeddingStore(path, max_entries=100))
+    reader = EmbeddingCache(max_entries=10, ttl_seconds=60, shared=SqliteEmbeddingStore(path, max_entries=100))
+    try:
+        asyncio.run(writer.set_many({"k": [0.25, -1.5]}))
+        assert asyncio.run(reader.get_many(["k"])) == {"k": [0.25, -1.5]}
+        assert metrics.counter("memu_embedding_cache_hits", {"tier": "shared"}) == 1
+        # Promoted into the reader's local tier
+        assert len(reader) == 1
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_shared_store_trims_oldest_and_expired(tmp_path):
+    store = SqliteEmbeddingStore(tmp_path / "e.sqlite3", max_entries=2)
+    try:
+        store.set_many({"a": array("d", [1.0])}, expires_at=200.0, now=1.0)
+        store.set_many({"b": array("d", [2.0])}, expires_at=200.0, now=2.0)
+        store.set_many({"c": array("d", [3.0])}, expires_at=200.0, now=3.0)
+        assert set(store.get_many(["a", "b", "c"], now=10.0)) == {"b", "c"}
+        assert store.get_many(["b"], now=300.0) == {}
+    finally:
+        store.close()
+
+
+def test_build_embedding_cache_from_settings(tmp_path):
+    assert build_embedding_cache(Settings(EMBEDDING_CACHE_SIZE=0)) is None
+    cache = build_embedding_cache(Settings(EMBEDDING_CACHE_SIZE=5, EMBEDDING_CACHE_TTL_SECONDS=30))
+    assert cache is not None
+    assert cache.max_entries == 5
+    assert cache.shared is None
+    shared = build_embedding_cache(
+        Settings(EMBEDDING_CACHE_SIZE=0, EMBEDDING_CACHE_SHARED_PATH=str(tmp_path / "c" / "e.sqlite3"))
+    )
+    assert shared is not None
+    assert shared.shared is not None
+    shared.close()
+
+
+# ── Client wrapper ──
+
+
+def test_caching_client_embeds_only_misses():
+    inner = CountingEmbeddingClient()
+    client = CachingEmbeddingClient(inner, EmbeddingCache(max_entries=10, ttl_seconds=0), "m", "https://x")
+
+    first, raw = asyncio.run(client.embed(["hello", "hi"]))
+    assert raw == {"usage": {}}
+    second, raw = asyncio.run(client.embed(["  hello ", "new", "new"]))
+    assert raw == {"usage": {}}
+    assert inner.calls == [["hello", "hi"], ["new"]]
+    assert second == [first[0], [3.0, 0.5], [3.0, 0.5]]
+
+    third, raw = asyncio.run(client.embed(["hi"]))
+    assert third == [first[1]]
+    assert raw is None
+    assert len(inner.calls) == 2
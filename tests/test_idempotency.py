@@ -0,0 +1,139 @@
+"""Tests for idempotent memorize submissions."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from temporalio.common import WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from app.schemas.memory import TaskStatusResponse
+from app.services.idempotency import content_task_id, key_task_id
+from app.utils.metrics import metrics
+
+CONVERSATION = [{"role": "user", "content": {"text": "I like tea"}}]
+
+
+def test_content_task_id_ignores_key_order():
+    a = content_task_id("u1", "", [{"role": "user", "content": {"text": "x"}}], None)
+    b = content_task_id("u1", "", [{"content": {"text": "x"}, "role": "user"}], {})
+    assert a == b
+    assert len(a) == 32
+    assert int(a, 16) >= 0
+
+
+def test_content_task_id_separates_scopes():
+    base = content_task_id("u1", "", CONVERSATION, None)
+    assert base != content_task_id("u2", "", CONVERSATION, None)
+    assert base != content_task_id("u1", "agent", CONVERSATION, None)
+    assert base != content_task_id("u1", "", CONVERSATION, {"x": 1})
+    assert base != content_task_id("u1", "", CONVERSATION + CONVERSATION, None)
+
+
+def test_key_task_id_is_scoped_to_user():
+    assert key_task_id("u1", "k") == key_task_id("u1", "k")
+    assert key_task_id("u1", "k") != key_task_id("u2", "k")
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    metrics.reset()
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def _reject_second_start(temporal):
+    started: set[str] = set()
+
+    async def _start(workflow, spec, *, id, **kwargs):
+        if id in started:
+            raise WorkflowAlreadyStartedError(id, "MemorizeWorkflow")
+        started.add(id)
+
+    temporal.start_workflow.side_effect = _start
+
+
+def test_random_ids_without_idempotency(client):
+    first = client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}).json()["result"]
+    second = client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}).json()["result"]
+    assert first["task_id"] != second["task_id"]
+    assert not first["deduplicated"]
+    assert "id_reuse_policy" not in client.app.state.temporal.start_workflow.call_args.kwargs
+
+
+def test_idempotency_key_returns_existing_task(client, tmp_path):
+    _reject_second_start(client.app.state.temporal)
+    headers = {"Idempotency-Key": "order-42"}
+    first = client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}, headers=headers)
+    second = client.post("/memorize", json={"conversation": [], "user_id": "u1"}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    first_result, second_result = first.json()["result"], second.json()["result"]
+    assert second_result["task_id"] == first_result["task_id"] == f"memorize-{key_task_id('u1', 'order-42')}"
+    assert not first_result["deduplicated"]
+    assert second_result["deduplicated"]
+    # Only the first submission's conversation file is kept.
+    assert len(list(tmp_path.iterdir())) == 1
+    kwargs = client.app.state.temporal.start_workflow.call_args.kwargs
+    assert kwargs["id_reuse_policy"] == WorkflowIDReusePolicy.ALLOW_DUPLICATE_FAILED_ONLY
+    assert metrics.counter("memu_memorize_deduplicated", {"source": "key"}) == 1
+
+
+@pytest.mark.parametrize("key", ["", "   ", "k" * 256])
+def test_invalid_idempotency_key_is_rejected(client, key):
+    response = client.post(
+        "/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}, headers={"Idempotency-Key": key}
+    )
+    assert response.status_code == 422
+    client.app.state.temporal.start_workflow.assert_not_called()
+
+
+def test_content_dedupe_covers_batches(client):
+    from app.main import settings
+
+    _reject_second_start(client.app.state.temporal)
+    items = [
+        {"conversation": CONVERSATION, "user_id": "u1"},
+        {"conversation": CONVERSATION, "user_id": "u2"},
+    ]
+    with patch.object(settings, "MEMORIZE_DEDUPE_BY_CONTENT", True):
+        single = client.post("/memorize", json=items[0]).json()["result"]
+        batch = client.post("/memorize/batch", json={"items": items}).json()["result"]
+    assert single["task_id"] == f"memorize-{content_task_id('u1', '', CONVERSATION, None)}"
+    assert batch["submitted"] == 2
+    assert batch["results"][0]["task_id"] == single["task_id"]
+    assert batch["results"][0]["deduplicated"]
+    assert not batch["results"][1]["deduplicated"]
+
+
+def test_restarting_a_failed_task_forgets_its_cached_status(client):
+    task_id = f"memorize-{key_task_id('u1', 'retry-me')}"
+    cache = client.app.state.status_cache
+    cache.put(TaskStatusResponse(task_id=task_id, status="FAILED", detail="boom"))
+    response = client.post(
+        "/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}, headers={"Idempotency-Key": "retry-me"}
+    )
+    assert response.json()["result"]["task_id"] == task_id
+    assert cache.get(task_id) is None
+
+
+def test_incremental_content_digest_matches_content_task_id():
+    from app.services.idempotency import ContentDigest
+
+    conversation = [*CONVERSATION, {"role": "assistant", "content": {"text": "Noted ☕"}}]
+    digest = ContentDigest("u1", "a1", {"k": 1})
+    for message in conversation:
+        digest.update(message)
+    assert digest.task_id() == content_task_id("u1", "a1", conversation, {"k": 1})
+    assert ContentDigest("u1", "").task_id() == content_task_id("u1", "", [], None)
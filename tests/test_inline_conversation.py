@@ -0,0 +1,215 @@
+"""Tests for conversations carried inline in the workflow spec."""
+
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from temporalio.exceptions import ApplicationError
+
+from app.services.inline_conversation import ENCODING_JSON, ENCODING_ZLIB, decode_inline, encode_inline
+from app.services.memu import MemoryServiceCache
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.memorize_activity import task_memorize, task_memorize_merged, task_split_conversation
+
+CONVERSATION = [{"role": "user", "content": {"text": "I like green tea " * 10}}]
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
+
+# ── Encoding ──
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_encode_decode_round_trip(compress):
+    data = json.dumps(CONVERSATION)
+    payload = encode_inline(data, compress)
+    assert payload["encoding"] == (ENCODING_ZLIB if compress else ENCODING_JSON)
+    assert decode_inline(payload) == data
+
+
+def test_compression_shrinks_repetitive_conversations():
+    data = json.dumps(CONVERSATION * 20)
+    assert len(encode_inline(data, True)["data"]) < len(data) / 4
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"encoding": "brotli", "data": "[]"},
+        {"encoding": ENCODING_JSON},
+        {"encoding": ENCODING_JSON, "data": "not json"},
+        {"encoding": ENCODING_ZLIB, "data": "@@@"},
+    ],
+)
+def test_decode_rejects_malformed_payloads(payload):
+    with pytest.raises(ValueError):
+        decode_inline(payload)
+
+
+# ── Activities ──
+
+
+def _inline_spec(compress: bool = False) -> dict:
+    return {
+        "task_id": "t1",
+        "conversation": encode_inline(json.dumps(CONVERSATION), compress),
+        "user_id": "u1",
+        "agent_id": "",
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compress", [False, True])
+async def test_task_memorize_materializes_inline_conversation(tmp_path, compress):
+    seen = {}
+
+    async def _memorize(*, resource_url, modality, user):
+        seen["path"] = Path(resource_url)
+        seen["content"] = json.loads(Path(resource_url).read_text("utf-8"))
+        return {"items": []}
+
+    service = MagicMock()
+    service.memorize = _memorize
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize(_inline_spec(compress))
+
+    assert result["status"] == "SUCCESS"
+    assert seen["content"] == CONVERSATION
+    # Nothing touches STORAGE_PATH, and the temporary file is gone afterwards.
+    assert not seen["path"].is_relative_to(tmp_path)
+    assert not seen["path"].exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_invalid_inline_conversation_is_not_retried():
+    spec = {**_inline_spec(), "conversation": {"encoding": "brotli", "data": ""}}
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
+        pytest.raises(ApplicationError, match="Invalid inline conversation") as exc_info,
+    ):
+        await task_memorize(spec)
+    assert exc_info.value.non_retryable
+
+
+@pytest.mark.asyncio
+async def test_merged_activity_mixes_inline_and_stored(tmp_path):
+    (tmp_path / "conversation-stored.json").write_text(json.dumps(CONVERSATION), "utf-8")
+    stored = {"task_id": "t2", "resource_url": "conversation-stored.json", "user_id": "u1", "agent_id": ""}
+    service = MagicMock()
+    service.memorize = AsyncMock(return_value={})
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH=str(tmp_path),
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize_merged([_inline_spec(True), stored])
+    merged = json.loads((tmp_path / result["resource_url"]).read_text("utf-8"))
+    assert merged == CONVERSATION * 2
+
+
+@pytest.mark.asyncio
+async def test_inline_conversations_are_not_split():
+    assert await task_split_conversation({**_inline_spec(), "chunking": {"max_tokens": 1}}) == []
+
+
+# ── API ──
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def _submitted_spec(client) -> dict:
+    return client.app.state.temporal.start_workflow.call_args.args[1]
+
+
+def test_stored_by_default(client, tmp_path):
+    client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"})
+    spec = _submitted_spec(client)
+    assert "conversation" not in spec
+    assert (tmp_path / spec["resource_url"]).exists()
+
+
+def test_small_conversations_travel_inline(client, tmp_path):
+    from app.main import settings
+
+    size = len(json.dumps(CONVERSATION, ensure_ascii=False).encode("utf-8"))
+    with (
+        patch.object(settings, "MEMORIZE_INLINE_MAX_BYTES", size),
+        patch.object(settings, "MEMORIZE_INLINE_COMPRESS", True),
+    ):
+        response = client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"})
+        assert response.status_code == 200
+        spec = _submitted_spec(client)
+        assert "resource_url" not in spec
+        assert json.loads(decode_inline(spec["conversation"])) == CONVERSATION
+        assert list(tmp_path.iterdir()) == []
+
+        client.post("/memorize", json={"conversation": CONVERSATION * 2, "user_id": "u1"})
+        spec = _submitted_spec(client)
+        assert "conversation" not in spec
+        assert (tmp_path / spec["resource_url"]).exists()
+    assert metrics.counter("memu_memorize_inline_submissions") == 1
+
+
+def test_chunked_conversations_are_never_inline(client):
+    from app.main import settings
+
+    with (
+        patch.object(settings, "MEMORIZE_INLINE_MAX_BYTES", 1 << 20),
+        patch.object(settings, "MEMORIZE_CHUNK_TOKENS", 10),
+    ):
+        client.post("/memorize", json={"conversation": CONVERSATION * 5, "user_id": "u1"})
+    spec = _submitted_spec(client)
+    assert "chunking" in spec
+    assert "resource_url" in spec
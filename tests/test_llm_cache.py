@@ -0,0 +1,246 @@
+"""Tests for the LLM response cache."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import llm_cache
+from app.services.llm_cache import (
+    CachingLLMClient,
+    PostgresResponseStore,
+    SqliteResponseStore,
+    install_llm_cache,
+    response_key,
+)
+from app.utils.metrics import metrics
+from config.settings import Settings
+
+
+@pytest.fixture(autouse=True)
+async def reset_state():
+    metrics.reset()
+    yield
+    await llm_cache.close_llm_cache()
+
+
+@pytest.fixture
+async def store(tmp_path):
+    store = SqliteResponseStore(tmp_path / "llm-cache.sqlite3", max_bytes=10_000)
+    yield store
+    await store.close()
+
+
+def _settings(tmp_path, **overrides):
+    return Settings(
+        **{
+            "OPENAI_API_KEY": "sk-test",
+            "LLM_CACHE_ENABLED": True,
+            "LLM_CACHE_PATH": str(tmp_path / "llm-cache.sqlite3"),
+            **overrides,
+        }
+    )
+
+
+def _inner():
+    inner = MagicMock()
+    inner.summarize = AsyncMock(side_effect=lambda text, **kw: (f"summary of {text}", {"usage": {"total_tokens": 9}}))
+    inner.vision = AsyncMock(return_value=("a cat", {"usage": {}}))
+    return inner
+
+
+def test_response_key_covers_model_endpoint_temperature_and_prompt():
+    prompt = {"kind": "summarize", "text": "hello", "max_tokens": None}
+    key = response_key("gpt-4o-mini", "https://api.openai.com/v1", 1.0, prompt)
+
+    assert key == response_key("gpt-4o-mini", "https://api.openai.com/v1/", 1, dict(reversed(prompt.items())))
+    assert key != response_key("gpt-4o", "https://api.openai.com/v1", 1.0, prompt)
+    assert key != response_key("gpt-4o-mini", "https://llm.example/v1", 1.0, prompt)
+    assert key != response_key("gpt-4o-mini", "https://api.openai.com/v1", 0.2, prompt)
+    assert key != response_key("gpt-4o-mini", "https://api.openai.com/v1", 1.0, {**prompt, "max_tokens": 100})
+
+
+async def test_sqlite_store_round_trip(store):
+    assert await store.get("k") is None
+    assert await store.set("k", "response") == 0
+    assert await store.get("k") == "response"
+
+
+async def test_sqlite_store_evicts_least_recently_used_beyond_budget(tmp_path):
+    store = SqliteResponseStore(tmp_path / "cache.sqlite3", max_bytes=2500)
+    try:
+        await store.set("a", "x" * 1000)
+        await store.set("b", "x" * 1000)
+        assert await store.get("a")  # a is now more recently used than b
+        assert await store.set("c", "x" * 1000) == 1
+        assert await store.get("b") is None
+        assert await store.get("a") and await store.get("c")
+    finally:
+        await store.close()
+
+
+async def test_repeated_prompt_is_served_from_the_cache(store):
+    inner = _inner()
+    client = CachingLLMClient(inner, store, "gpt-4o-mini", "https://api.openai.com/v1", 1.0)
+
+    first = await client.summarize("conversation", system_prompt="extract")
+    second = await client.summarize("conversation", system_prompt="extract")
+
+    assert first == ("summary of conversation", {"usage": {"total_tokens": 9}})
+    assert second == ("summary of conversation", None)
+    assert inner.summarize.await_count == 1
+    assert metrics.counter("memu_llm_cache_hits", {"kind": "summarize"}) == 1
+    assert metrics.counter("memu_llm_cache_misses", {"kind": "summarize"}) == 1
+
+    await client.summarize("conversation", system_prompt="extract", max_tokens=50)
+    await client.summarize("conversation", system_prompt="other")
+    assert inner.summarize.await_count == 3
+
+
+async def test_vision_is_keyed_on_image_contents(store, tmp_path):
+    inner = _inner()
+    client = CachingLLMClient(inner, store, "gpt-4o-mini", "https://api.openai.com/v1", 1.0)
+    image = tmp_path / "frame.png"
+    copy = tmp_path / "copy.png"
+    image.write_bytes(b"png-1")
+    copy.write_bytes(b"png-1")
+
+    await client.vision("describe", str(image))
+    assert await client.vision("describe", str(copy)) == ("a cat", None)
+    image.write_bytes(b"png-2")
+    await client.vision("describe", str(image))
+
+    assert inner.vision.await_count == 2
+
+
+async def test_failing_store_falls_back_to_the_provider():
+    failing = MagicMock()
+    failing.get = AsyncMock(side_effect=OSError("disk full"))
+    failing.set = AsyncMock(side_effect=OSError("disk full"))
+    inner = _inner()
+    client = CachingLLMClient(inner, failing, "gpt-4o-mini", "https://api.openai.com/v1", 1.0)
+
+    assert await client.summarize("hi") == ("summary of hi", {"usage": {"total_tokens": 9}})
+
+
+async def test_sqlite_store_keeps_a_running_total(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    store = SqliteResponseStore(path, max_bytes=10_000)
+    try:
+        await store.set("a", "x" * 1000)
+        await store.set("a", "x" * 500)  # replacing counts the new size only
+        await store.set("b", "x" * 200)
+        assert store._conn.execute("SELECT total FROM llm_responses_total").fetchone() == (1 + 500 + 1 + 200,)
+    finally:
+        await store.close()
+
+    # A cache created before the running total existed starts from its contents.
+    store = SqliteResponseStore(path, max_bytes=10_000)
+    try:
+        store._conn.execute("DROP TABLE llm_responses_total")
+        await store.close()
+        store = SqliteResponseStore(path, max_bytes=10_000)
+        assert store._conn.execute("SELECT total FROM llm_responses_total").fetchone() == (702,)
+    finally:
+        await store.close()
+
+
+async def test_sqlite_store_evicts_in_batches_down_to_the_target(tmp_path):
+    store = SqliteResponseStore(tmp_path / "cache.sqlite3", max_bytes=20_000)
+    try:
+        for i in range(199):
+            assert await store.set(f"k{i:03d}", "x" * 96) == 0  # 100 bytes each
+        # Going over the budget evicts the oldest entries, a batch at a time, down to 90% of it.
+        with patch("app.services.llm_cache._EVICT_BATCH", 10):
+            assert await store.set("k199", "x" * 196) == 21
+        assert await store.get("k000") is None and await store.get("k020") is None
+        assert await store.get("k021") and await store.get("k199")
+        (total,) = store._conn.execute("SELECT total FROM llm_responses_total").fetchone()
+        assert total == store._conn.execute("SELECT SUM(size) FROM llm_responses").fetchone()[0] <= 18_000
+        # Back under budget, the next writes evict nothing.
+        assert await store.set("k200", "x" * 96) == 0
+    finally:
+        await store.close()
+
+
+def _pg_store(fetchone: list, fetchall: list | None = None) -> tuple[PostgresResponseStore, MagicMock]:
+    conn = MagicMock(closed=False)
+    cursor = MagicMock()
+    cursor.fetchone = AsyncMock(side_effect=fetchone)
+    cursor.fetchall = AsyncMock(side_effect=fetchall or [])
+    conn.execute = AsyncMock(return_value=cursor)
+    store = PostgresResponseStore("postgresql://unused", max_bytes=1000)
+    store._conn = conn
+    return store, conn
+
+
+async def test_postgres_store_touches_on_read_and_tracks_the_total_on_write():
+    store, conn = _pg_store(fetchone=[("cached",), (4,), (900,)])
+
+    assert await store.get("k") == "cached"
+    assert await store.set("k", "value") == 0
+
+    queries = [call.args for call in conn.execute.call_args_list]
+    assert "SET used_at" in queries[0][0] and queries[0][1] == ("k",)
+    assert queries[1][1] == ("k",)
+    assert "ON CONFLICT" in queries[2][0] and queries[2][1] == ("k", "value", 6)
+    # Replacing a 4-byte entry with a 6-byte one adds 2; under budget, nothing else runs.
+    assert "total + %s" in queries[3][0] and queries[3][1] == (2,)
+    assert len(queries) == 4
+
+
+async def test_postgres_store_evicts_oldest_over_budget():
+    store, conn = _pg_store(
+        fetchone=[None, (1206,), (1206,)],
+        fetchall=[[("a", 200), ("b", 200), ("c", 200)]],
+    )
+
+    assert await store.set("k", "value") == 2
+
+    queries = [call.args for call in conn.execute.call_args_list]
+    assert "SUM(size)" in queries[3][0]
+    assert "ORDER BY used_at" in queries[4][0]
+    assert "ANY" in queries[5][0] and queries[5][1] == (["a", "b"],)
+    assert queries[6][1] == (806,)
+
+
+def _service():
+    service = MagicMock()
+    service.llm_profiles.profiles = {
+        "default": SimpleNamespace(chat_model="gpt-4o-mini", base_url="https://api.openai.com/v1", client_backend="sdk")
+    }
+    service._llm_clients = {"default": _inner()}
+    service._get_llm_base_client = lambda profile: service._llm_clients[profile]
+    return service
+
+
+def test_install_is_opt_in(tmp_path):
+    service = _service()
+    install_llm_cache(service, _settings(tmp_path, LLM_CACHE_ENABLED=False))
+    assert not isinstance(service._llm_clients["default"], CachingLLMClient)
+
+
+def test_install_shares_one_store_per_process(tmp_path):
+    settings = _settings(tmp_path)
+    first, second = _service(), _service()
+    for service in (first, second):
+        install_llm_cache(service, settings)
+        install_llm_cache(service, settings)  # idempotent
+
+    client = first._llm_clients["default"]
+    assert isinstance(client, CachingLLMClient)
+    assert not isinstance(client._inner, CachingLLMClient)
+    assert client.store is second._llm_clients["default"].store
+    assert isinstance(client.store, SqliteResponseStore)
+    assert client._temperature == 1.0
+
+
+def test_create_memory_service_installs_the_cache(tmp_path):
+    from app.services.memu import create_memory_service
+
+    with patch("app.services.memu.MemoryService", return_value=_service()) as service_cls:
+        create_memory_service(_settings(tmp_path, LLM_CACHE_BACKEND="postgres"))
+
+    client = service_cls.return_value._llm_clients["default"]
+    assert isinstance(client, CachingLLMClient)
+    assert isinstance(client.store, PostgresResponseStore)
@@ -0,0 +1,139 @@
+"""Tests for the POST /memorize/batch endpoint and related schemas."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.schemas.memory import MemorizeBatchRequest
+
+
+@pytest.fixture
+def mock_temporal():
+    """Create a mock Temporal client for endpoint tests."""
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    return temporal
+
+
+@pytest.fixture
+def client(mock_temporal, tmp_path):
+    """Create FastAPI test client with mocked service and Temporal."""
+    from app.main import app
+
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+    ):
+        with TestClient(app) as test_client:
+            prev = getattr(test_client.app.state, "temporal", None)
+            test_client.app.state.temporal = mock_temporal
+            try:
+                yield test_client
+            finally:
+                test_client.app.state.temporal = prev
+
+
+def _items(n: int) -> list[dict]:
+    return [{"conversation": [{"role": "user", "content": f"msg {i}"}], "user_id": f"u{i}"} for i in range(n)]
+
+
+# ── Schema tests ──
+
+
+def test_batch_request_requires_items():
+    with pytest.raises(ValidationError, match="items"):
+        MemorizeBatchRequest(items=[])
+
+
+def test_batch_request_validates_each_item():
+    with pytest.raises(ValidationError, match="user_id"):
+        MemorizeBatchRequest(items=[{"conversation": {}, "user_id": "  "}])
+
+
+# ── Endpoint tests ──
+
+
+def test_batch_submits_all_items(client, mock_temporal, tmp_path):
+    """Every item gets its own workflow, conversation file and task ID."""
+    response = client.post("/memorize/batch", json={"items": _items(5)})
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["submitted"] == 5
+    assert result["failed"] == 0
+    assert [r["index"] for r in result["results"]] == [0, 1, 2, 3, 4]
+    task_ids = {r["task_id"] for r in result["results"]}
+    assert len(task_ids) == 5
+    assert all(t.startswith("memorize-") for t in task_ids)
+    assert mock_temporal.start_workflow.call_count == 5
+    assert len(list(tmp_path.glob("conversation-*.json"))) == 5
+
+
+def test_batch_preserves_item_spec(client, mock_temporal):
+    """Each workflow spec carries the matching item's user_id."""
+    client.post("/memorize/batch", json={"items": _items(3)})
+    user_ids = sorted(call.args[1]["user_id"] for call in mock_temporal.start_workflow.call_args_list)
+    assert user_ids == ["u0", "u1", "u2"]
+
+
+def test_batch_partial_failure(client, mock_temporal, tmp_path):
+    """A failed item is reported per item; other items still succeed."""
+    calls = 0
+
+    async def _start(*_args, **_kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("temporal unavailable")
+
+    mock_temporal.start_workflow = AsyncMock(side_effect=_start)
+    response = client.post("/memorize/batch", json={"items": _items(3)})
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["submitted"] == 2
+    assert result["failed"] == 1
+    errors = [r for r in result["results"] if r["status"] == "ERROR"]
+    assert len(errors) == 1
+    assert errors[0]["task_id"] is None
+    assert errors[0]["error"] == "Failed to submit memorization task"
+    # The failed item's conversation file is cleaned up
+    assert len(list(tmp_path.glob("conversation-*.json"))) == 2
+
+
+def test_batch_bounded_concurrency(client, mock_temporal):
+    """No more than MEMORIZE_BATCH_CONCURRENCY submissions run at once."""
+    from app.main import settings
+
+    in_flight = 0
+    peak = 0
+
+    async def _start(*_args, **_kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    mock_temporal.start_workflow = AsyncMock(side_effect=_start)
+    with patch.object(settings, "MEMORIZE_BATCH_CONCURRENCY", 2):
+        response = client.post("/memorize/batch", json={"items": _items(6)})
+    assert response.status_code == 200
+    assert response.json()["result"]["submitted"] == 6
+    assert peak == 2
+
+
+def test_batch_rejects_too_many_items(client, mock_temporal):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_BATCH_MAX_ITEMS", 2):
+        response = client.post("/memorize/batch", json={"items": _items(3)})
+    assert response.status_code == 422
+    assert "at most 2" in response.json()["detail"]
+    mock_temporal.start_workflow.assert_not_called()
+
+
+def test_batch_rejects_empty_items(client):
+    response = client.post("/memorize/batch", json={"items": []})
+    assert response.status_code == 422
@@ -1,13 +1,16 @@
 """Tests for /memorize and /memorize/status/{task_id} endpoints and related schemas."""
 
+import asyncio
 from enum import Enum
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 from pydantic import ValidationError
+from temporalio.client import WorkflowFailureError
 
 from app.schemas.memory import MemorizeRequest, MemorizeResponse, TaskStatusResponse
+from app.services.task_status import RESTARTABLE_STATUS_TTL_SECONDS, TerminalStatusCache, WorkflowWaiters
 
 # A valid memorize workflow ID for tests (memorize- + 32 hex chars)
 _VALID_TASK_ID = "memorize-aabbccdd11223344aabbccdd11223344"
@@ -253,6 +256,23 @@ def test_memorize_uses_correct_task_queue(client, mock_temporal):
     client.post("/memorize", json={"conversation": {}, "user_id": "u1"})
     call_kwargs = mock_temporal.start_workflow.call_args.kwargs
     assert call_kwargs["task_queue"] == TASK_QUEUE
+    assert "priority" not in mock_temporal.start_workflow.call_args.args[1]
+
+
+def test_bulk_memorize_uses_the_bulk_task_queue(client, mock_temporal):
+    from app.workers.worker import BULK_TASK_QUEUE
+
+    response = client.post("/memorize", json={"conversation": {}, "user_id": "u1", "priority": "bulk"})
+
+    assert response.status_code == 200
+    assert mock_temporal.start_workflow.call_args.kwargs["task_queue"] == BULK_TASK_QUEUE
+    assert mock_temporal.start_workflow.call_args.args[1]["priority"] == "bulk"
+
+
+def test_unknown_priority_rejected(client, mock_temporal):
+    response = client.post("/memorize", json={"conversation": {}, "user_id": "u1", "priority": "urgent"})
+    assert response.status_code == 422
+    mock_temporal.start_workflow.assert_not_called()
 
 
 def test_memorize_workflow_id_format(client, mock_temporal):
@@ -428,3 +448,249 @@ def test_status_rejects_invalid_task_id(client, bad_id):
     response = client.get(f"/memorize/status/{bad_id}")
     assert response.status_code == 422
     assert "task_id must match" in response.json()["detail"]
+
+
+# ── Long-poll (?wait=) tests ──
+
+
+def _running_handle(result=None, delay: float = 0.01):
+    """Handle that describes as RUNNING and whose result() resolves after ``delay``."""
+    handle = MagicMock()
+    handle.describe = AsyncMock(return_value=_make_workflow_description("RUNNING"))
+
+    async def _result():
+        await asyncio.sleep(delay)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    handle.result = AsyncMock(side_effect=_result)
+    return handle
+
+
+def test_status_wait_returns_when_workflow_completes(client, mock_temporal):
+    handle = _running_handle(result={"status": "SUCCESS"})
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}?wait=5s")
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["status"] == "COMPLETED"
+    assert result["detail"] == "SUCCESS"
+    assert handle.describe.await_count == 1
+    assert handle.result.await_count == 1
+
+
+def test_status_wait_times_out_with_current_status(client, mock_temporal):
+    handle = _running_handle(delay=10)
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}?wait=50ms")
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "RUNNING"
+    # The abandoned long-poll is cleaned up
+    assert len(client.app.state.status_waiters) == 0
+
+
+def test_status_wait_reports_failure(client, mock_temporal):
+    handle = _running_handle(result=WorkflowFailureError(cause=RuntimeError("boom")))
+    handle.describe = AsyncMock(
+        side_effect=[_make_workflow_description("RUNNING"), _make_workflow_description("FAILED")]
+    )
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}?wait=5")
+    result = response.json()["result"]
+    assert result["status"] == "FAILED"
+    assert result["detail"] == "Task execution failed"
+
+
+def test_status_wait_skipped_for_terminal_task(client, mock_temporal):
+    handle = MagicMock()
+    handle.describe = AsyncMock(return_value=_make_workflow_description("COMPLETED"))
+    handle.result = AsyncMock(return_value={"status": "SUCCESS"})
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}?wait=30s")
+    assert response.json()["result"]["status"] == "COMPLETED"
+    assert handle.result.await_count == 1
+    assert len(client.app.state.status_waiters) == 0
+
+
+@pytest.mark.parametrize("wait", ["soon", "-1", "10h", "61s"])
+def test_status_wait_rejects_bad_durations(client, wait):
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}?wait={wait}")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_long_poll():
+    """Concurrent waiters for one workflow share a single result() call."""
+    waiters = WorkflowWaiters()
+    temporal = MagicMock()
+    handle = _running_handle(result={"status": "SUCCESS"}, delay=0.05)
+    temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    results = await asyncio.gather(*(waiters.wait(temporal, _VALID_TASK_ID, 5) for _ in range(5)))
+    assert {r.status for r in results} == {"COMPLETED"}
+    assert handle.result.await_count == 1
+    assert len(waiters) == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_keep_long_poll_while_any_caller_waits():
+    waiters = WorkflowWaiters()
+    temporal = MagicMock()
+    handle = _running_handle(result={"status": "SUCCESS"}, delay=0.1)
+    temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    short, long = await asyncio.gather(
+        waiters.wait(temporal, _VALID_TASK_ID, 0.01),
+        waiters.wait(temporal, _VALID_TASK_ID, 5),
+    )
+    assert short is None
+    assert long.status == "COMPLETED"
+    assert handle.result.await_count == 1
+
+
+# ── Terminal-status cache and bulk lookup tests ──
+
+_TASK_IDS = [f"memorize-{i:032x}" for i in range(4)]
+
+
+def _completed_handle():
+    handle = MagicMock()
+    handle.describe = AsyncMock(return_value=_make_workflow_description("COMPLETED"))
+    handle.result = AsyncMock(return_value={"status": "SUCCESS"})
+    return handle
+
+
+def test_terminal_status_cache_only_keeps_terminal_states():
+    cache = TerminalStatusCache(max_entries=2)
+    cache.put(TaskStatusResponse(task_id="a", status="RUNNING"))
+    assert cache.get("a") is None
+    for task_id in ("a", "b", "c"):
+        cache.put(TaskStatusResponse(task_id=task_id, status="COMPLETED", detail="SUCCESS"))
+    assert cache.get("a") is None
+    assert cache.get("c").detail == "SUCCESS"
+    assert len(cache) == 2
+
+
+def test_status_cache_expires_restartable_statuses():
+    """A failed idempotent task may be restarted through another replica, so FAILED is not kept for long."""
+    cache = TerminalStatusCache(max_entries=10)
+    now = 1000.0
+    with patch("app.services.task_status.time.monotonic", side_effect=lambda: now):
+        for task_id, status in (("done", "COMPLETED"), ("failed", "FAILED"), ("killed", "TERMINATED")):
+            cache.put(TaskStatusResponse(task_id=task_id, status=status))
+        assert cache.get("failed").status == "FAILED"
+        now += RESTARTABLE_STATUS_TTL_SECONDS
+        assert cache.get("failed") is None
+        assert cache.get("killed") is None
+        assert cache.get("done").status == "COMPLETED"
+    assert len(cache) == 1
+
+
+def test_repeated_status_of_finished_task_makes_no_rpcs(client, mock_temporal):
+    handle = _completed_handle()
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    for _ in range(3):
+        response = client.get(f"/memorize/status/{_VALID_TASK_ID}")
+        assert response.json()["result"]["status"] == "COMPLETED"
+    assert handle.describe.await_count == 1
+    assert handle.result.await_count == 1
+
+
+def test_running_status_is_not_cached(client, mock_temporal):
+    handle = _running_handle()
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    client.get(f"/memorize/status/{_VALID_TASK_ID}")
+    client.get(f"/memorize/status/{_VALID_TASK_ID}")
+    assert handle.describe.await_count == 2
+
+
+def test_long_poll_outcome_is_cached(client, mock_temporal):
+    handle = _running_handle(result={"status": "SUCCESS"})
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    client.get(f"/memorize/status/{_VALID_TASK_ID}?wait=5s")
+    response = client.get(f"/memorize/status/{_VALID_TASK_ID}")
+    assert response.json()["result"]["status"] == "COMPLETED"
+    assert handle.describe.await_count == 1
+
+
+def test_bulk_status_resolves_each_task(client, mock_temporal):
+    from temporalio.service import RPCError, RPCStatusCode
+
+    missing = MagicMock()
+    missing.describe = AsyncMock(side_effect=RPCError("workflow not found", RPCStatusCode.NOT_FOUND, b""))
+    broken = MagicMock()
+    broken.describe = AsyncMock(side_effect=RuntimeError("unexpected"))
+    handles = {
+        _TASK_IDS[0]: _completed_handle(),
+        _TASK_IDS[1]: _running_handle(),
+        _TASK_IDS[2]: missing,
+        _TASK_IDS[3]: broken,
+    }
+    mock_temporal.get_workflow_handle = MagicMock(side_effect=lambda task_id: handles[task_id])
+
+    response = client.post("/memorize/status", json={"task_ids": [*_TASK_IDS, _TASK_IDS[0]]})
+    assert response.status_code == 200
+    results = response.json()["result"]["results"]
+    assert [r["task_id"] for r in results] == [*_TASK_IDS, _TASK_IDS[0]]
+    assert [r["status"] for r in results] == ["COMPLETED", "RUNNING", "NOT_FOUND", "ERROR", "COMPLETED"]
+    # Duplicates are looked up once
+    assert handles[_TASK_IDS[0]].describe.await_count == 1
+
+
+def test_bulk_status_uses_terminal_cache(client, mock_temporal):
+    handle = _completed_handle()
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+
+    client.post("/memorize/status", json={"task_ids": _TASK_IDS[:2]})
+    client.post("/memorize/status", json={"task_ids": _TASK_IDS[:2]})
+    assert handle.describe.await_count == 2
+
+
+def test_bulk_status_bounded_concurrency(client, mock_temporal):
+    from app.main import settings
+
+    in_flight = 0
+    peak = 0
+
+    async def _describe():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return _make_workflow_description("RUNNING")
+
+    handle = MagicMock()
+    handle.describe = AsyncMock(side_effect=_describe)
+    mock_temporal.get_workflow_handle = MagicMock(return_value=handle)
+    with patch.object(settings, "MEMORIZE_STATUS_BATCH_CONCURRENCY", 2):
+        response = client.post("/memorize/status", json={"task_ids": _TASK_IDS})
+    assert response.status_code == 200
+    assert peak == 2
+
+
+def test_bulk_status_rejects_invalid_ids(client, mock_temporal):
+    response = client.post("/memorize/status", json={"task_ids": [_TASK_IDS[0], "not-a-task"]})
+    assert response.status_code == 422
+    assert "not-a-task" in response.json()["detail"]
+    mock_temporal.get_workflow_handle.assert_not_called()
+
+
+def test_bulk_status_rejects_too_many_ids(client):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_STATUS_BATCH_MAX_IDS", 2):
+        response = client.post("/memorize/status", json={"task_ids": _TASK_IDS[:3]})
+    assert response.status_code == 422
+
+
+def test_bulk_status_rejects_empty_list(client):
+    assert client.post("/memorize/status", json={"task_ids": []}).status_code == 422
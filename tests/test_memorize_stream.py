@@ -0,0 +1,310 @@
+"""Tests for streamed conversation uploads (PUT /memorize/stream)."""
+
+import asyncio
+import json
+import tracemalloc
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from app.services.conversation_stream import (
+    JSON_ARRAY,
+    NDJSON,
+    ConversationStreamError,
+    iter_messages,
+    stream_format,
+)
+from app.services.idempotency import content_task_id, key_task_id
+from app.utils.metrics import metrics
+
+CONVERSATION = [
+    {"role": "user", "content": {"text": 'braces {"in"} strings \\ and "quotes" ]'}},
+    {"role": "assistant", "content": "plain text", "created_at": "2024-01-01T00:00:00"},
+    {"role": "user", "content": {"text": "naïve café ☕", "extra": [{"nested": {}}]}},
+]
+
+
+def _ndjson(messages: list) -> bytes:
+    return b"".join(json.dumps(m).encode() + b"\n" for m in messages)
+
+
+async def _chunks(data: bytes, size: int) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def _parse(data: bytes, fmt: str, size: int = 7, max_bytes: int = 10_000) -> list[dict]:
+    async def _collect() -> list[dict]:
+        return [m async for m in iter_messages(_chunks(data, size), fmt, max_bytes)]
+
+    return asyncio.run(_collect())
+
+
+# ── Parsing ──
+
+
+@pytest.mark.parametrize("size", [1, 3, 64, 100_000])
+def test_json_array_split_at_any_chunk_boundary(size):
+    assert _parse(json.dumps(CONVERSATION, indent=2).encode(), JSON_ARRAY, size) == CONVERSATION
+
+
+@pytest.mark.parametrize("size", [1, 5, 100_000])
+def test_ndjson_split_at_any_chunk_boundary(size):
+    data = _ndjson(CONVERSATION).replace(b"\n", b"\r\n\n")  # CRLF and blank lines
+    assert _parse(data, NDJSON, size) == CONVERSATION
+
+
+def test_ndjson_without_trailing_newline():
+    assert _parse(_ndjson(CONVERSATION).rstrip(), NDJSON) == CONVERSATION
+
+
+def test_empty_array():
+    assert _parse(b" [ ] ", JSON_ARRAY) == []
+
+
+@pytest.mark.parametrize(
+    ("data", "error"),
+    [
+        (b'{"role": "user"}', "must be a JSON array"),
+        (b'[{"role": "user", "content": "a"} {}]', "expected ',' or ']' after message 0"),
+        (b'[{"role": "user", "content": "a"}, 1]', "message 1 must be a JSON object"),
+        (b'[{"role": "user", "content": "a"}', "ended before the end"),
+        (b'[{"role": "user", "content": }]', "message 0 is not valid JSON"),
+        (b'[{"role": "", "content": "a"}]', "non-empty string 'role'"),
+        (b'[{"role": "user", "content": 5}]', "'content' string or object"),
+        (b'[{"role": "user", "content": "a"}] []', "after the end of the array"),
+    ],
+)
+def test_json_array_errors(data, error):
+    with pytest.raises(ConversationStreamError, match=error):
+        _parse(data, JSON_ARRAY)
+
+
+def test_ndjson_errors_name_the_message():
+    data = _ndjson(CONVERSATION[:2]) + b"[1, 2]\n"
+    with pytest.raises(ConversationStreamError, match="message 2 must be a JSON object") as exc_info:
+        _parse(data, NDJSON)
+    assert exc_info.value.index == 2
+
+
+@pytest.mark.parametrize("fmt", [NDJSON, JSON_ARRAY])
+def test_oversized_message_rejected_before_it_is_buffered(fmt):
+    huge = {"role": "user", "content": "x" * 5000}
+
+    async def _body() -> AsyncIterator[bytes]:
+        yield b"[" if fmt == JSON_ARRAY else b""
+        yield json.dumps(huge).encode()[:2000]
+        yield json.dumps(huge).encode()[2000:]
+        raise AssertionError("read past the oversized message")
+
+    async def _collect() -> list[dict]:
+        return [m async for m in iter_messages(_body(), fmt, 1000)]
+
+    with pytest.raises(ConversationStreamError, match="message 0 exceeds 1000 bytes"):
+        asyncio.run(_collect())
+
+
+@pytest.mark.parametrize("fmt", [NDJSON, JSON_ARRAY])
+def test_memory_use_does_not_grow_with_the_transcript(fmt):
+    message = json.dumps({"role": "user", "content": {"text": "y" * 1000}}).encode()
+    count = 20_000  # ~20 MB
+
+    async def _body() -> AsyncIterator[bytes]:
+        yield b"[" if fmt == JSON_ARRAY else b""
+        separator = b"," if fmt == JSON_ARRAY else b"\n"
+        for i in range(0, count, 64):
+            yield separator.join([message] * min(64, count - i)) + separator
+        yield b"{}]" if fmt == JSON_ARRAY else b""
+
+    async def _count() -> int:
+        n = 0
+        try:
+            async for _ in iter_messages(_body(), fmt, 10_000):
+                n += 1
+        except ConversationStreamError:
+            pass  # the closing {} has no role
+        return n
+
+    tracemalloc.start()
+    try:
+        assert asyncio.run(_count()) == count
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 * 1024 * 1024
+
+
+def test_stream_format_from_content_type():
+    assert stream_format("application/x-ndjson") == NDJSON
+    assert stream_format("application/jsonl; charset=utf-8") == NDJSON
+    assert stream_format("application/json") == JSON_ARRAY
+    assert stream_format(None) == JSON_ARRAY
+    assert stream_format("text/plain") is None
+
+
+# ── Endpoint ──
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    metrics.reset()
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def _put(client, data: bytes, content_type: str = "application/x-ndjson", headers: dict | None = None, **params):
+    params.setdefault("user_id", "u1")
+    return client.put(
+        "/memorize/stream",
+        params=params,
+        content=iter([data[i : i + 10] for i in range(0, len(data), 10)]),
+        headers={"Content-Type": content_type, **(headers or {})},
+    )
+
+
+def _submitted_spec(client) -> dict:
+    return client.app.state.temporal.start_workflow.call_args.args[1]
+
+
+def _stored_files(tmp_path) -> list:
+    return [p for p in tmp_path.rglob("conversation-*") if p.is_file()]
+
+
+@pytest.mark.parametrize(
+    ("data", "content_type"),
+    [
+        (_ndjson(CONVERSATION), "application/x-ndjson"),
+        (json.dumps(CONVERSATION, indent=2).encode(), "application/json"),
+    ],
+)
+def test_streamed_conversation_stored_like_post(client, tmp_path, data, content_type):
+    response = _put(client, data, content_type, agent_id="a1", callback_url="https://example.com/hook")
+
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["status"] == "PENDING"
+    assert not result["deduplicated"]
+    spec = _submitted_spec(client)
+    assert result["task_id"] == f"memorize-{spec['task_id']}"
+    assert spec["user_id"] == "u1"
+    assert spec["agent_id"] == "a1"
+    assert spec["callback_url"] == "https://example.com/hook"
+    assert "conversation" not in spec
+    stored = tmp_path / spec["resource_url"]
+    # Byte-identical to what POST /memorize writes for the same conversation.
+    assert stored.read_text(encoding="utf-8") == json.dumps(CONVERSATION, ensure_ascii=False)
+    assert metrics.counter("memu_memorize_stream_bytes") == stored.stat().st_size
+
+
+def test_invalid_stream_rejected_without_leftovers(client, tmp_path):
+    data = _ndjson(CONVERSATION) + b'{"role": "user"}\n' + _ndjson(CONVERSATION)
+
+    response = _put(client, data)
+
+    assert response.status_code == 422
+    assert "message 3" in response.json()["detail"]
+    assert _stored_files(tmp_path) == []
+    assert list(tmp_path.rglob("*.tmp")) == []
+    client.app.state.temporal.start_workflow.assert_not_called()
+    assert metrics.counter("memu_memorize_stream_rejected") == 1
+
+
+def test_empty_stream_rejected(client, tmp_path):
+    response = _put(client, b"\n\n")
+    assert response.status_code == 422
+    assert _stored_files(tmp_path) == []
+
+
+def test_oversized_message_rejected(client):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_STREAM_MAX_MESSAGE_BYTES", 50):
+        response = _put(client, _ndjson(CONVERSATION))
+    assert response.status_code == 422
+    assert "exceeds 50 bytes" in response.json()["detail"]
+
+
+def test_unsupported_content_type(client):
+    assert _put(client, b"hello", "text/plain").status_code == 415
+
+
+def test_blank_user_id_rejected(client):
+    assert _put(client, _ndjson(CONVERSATION), user_id="  ").status_code == 422
+
+
+def test_long_streams_are_marked_for_chunking(client):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_CHUNK_TOKENS", 20):
+        _put(client, _ndjson(CONVERSATION))
+    assert _submitted_spec(client)["chunking"]["max_tokens"] == 20
+
+    with patch.object(settings, "MEMORIZE_CHUNK_TOKENS", 100_000):
+        _put(client, _ndjson(CONVERSATION))
+    assert "chunking" not in _submitted_spec(client)
+
+
+def test_streams_coalesce_when_enabled(client):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_COALESCE_WINDOW_SECONDS", 5.0):
+        _put(client, _ndjson(CONVERSATION))
+    assert _submitted_spec(client)["coalesce"]["window_seconds"] == 5.0
+
+
+def test_bulk_streams_use_the_bulk_task_queue(client):
+    from app.workers.worker import BULK_TASK_QUEUE
+
+    assert _put(client, _ndjson(CONVERSATION), priority="bulk").status_code == 200
+    assert _submitted_spec(client)["priority"] == "bulk"
+    assert client.app.state.temporal.start_workflow.call_args.kwargs["task_queue"] == BULK_TASK_QUEUE
+
+
+def test_content_dedupe_matches_post(client):
+    from app.main import settings
+
+    with patch.object(settings, "MEMORIZE_DEDUPE_BY_CONTENT", True):
+        response = _put(client, _ndjson(CONVERSATION), agent_id="a1")
+    expected = content_task_id("u1", "a1", CONVERSATION, None)
+    assert response.json()["result"]["task_id"] == f"memorize-{expected}"
+
+
+def test_duplicate_stream_returns_existing_task(client, tmp_path):
+    started: set[str] = set()
+
+    async def _start(workflow, spec, *, id, **kwargs):
+        if id in started:
+            raise WorkflowAlreadyStartedError(id, "MemorizeWorkflow")
+        started.add(id)
+
+    client.app.state.temporal.start_workflow.side_effect = _start
+    headers = {"Idempotency-Key": "upload-1"}
+
+    first = _put(client, _ndjson(CONVERSATION), headers=headers).json()["result"]
+    second = _put(client, _ndjson(CONVERSATION), headers=headers).json()["result"]
+
+    assert first["task_id"] == second["task_id"] == f"memorize-{key_task_id('u1', 'upload-1')}"
+    assert second["deduplicated"]
+    assert len(_stored_files(tmp_path)) == 1
+
+
+def test_failed_start_removes_the_stream(client, tmp_path):
+    client.app.state.temporal.start_workflow.side_effect = RuntimeError("temporal down")
+    response = _put(client, _ndjson(CONVERSATION))
+    assert response.status_code == 500
+    assert _stored_files(tmp_path) == []
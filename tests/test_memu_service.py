@@ -1,8 +1,14 @@
 """Tests for the MemoryService factory."""
 
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from app.services.memu import create_memory_service
+import pytest
+from memu.app import MemoryService
+from memu.workflow import WorkflowStep
+
+from app.services.memu import MemoryServiceCache, config_cache_key, create_memory_service, install_lease_context
+from config.memu import MemUUser
 from config.settings import Settings
 
 
@@ -38,3 +44,124 @@ def test_create_memory_service_with_overrides(mock_cls):
     call_kwargs = mock_cls.call_args.kwargs
     assert call_kwargs["memorize_config"] == {"some_option": True}
     assert call_kwargs["retrieve_config"] == {"another_option": 42}
+
+
+# ── MemoryServiceCache ──
+
+
+def test_config_cache_key_is_stable():
+    assert config_cache_key({"a": 1, "b": [1, 2]}) == config_cache_key({"b": [1, 2], "a": 1})
+    assert config_cache_key(None) == config_cache_key({})
+    assert config_cache_key({"a": 1}) != config_cache_key({"a": 2})
+
+
+def test_service_cache_builds_once_per_key():
+    cache = MemoryServiceCache(max_size=2)
+    factory = MagicMock(side_effect=lambda: MagicMock())
+    with cache.lease("k1", factory) as first:
+        pass
+    with cache.lease("k1", factory) as second:
+        pass
+    assert first is second
+    factory.assert_called_once()
+
+
+def test_service_cache_lru_eviction_order():
+    """The least recently leased entry is evicted first."""
+    cache = MemoryServiceCache(max_size=2)
+    services = {k: MagicMock() for k in ("a", "b", "c")}
+    for key in ("a", "b", "a", "c"):
+        with cache.lease(key, lambda key=key: services[key]):
+            pass
+    services["b"].database.close.assert_called_once()
+    services["a"].database.close.assert_not_called()
+    assert len(cache) == 2
+
+
+def test_service_cache_defers_close_while_leased():
+    """An evicted service stays open until its in-flight lease is released."""
+    cache = MemoryServiceCache(max_size=1)
+    busy = MagicMock()
+    with cache.lease("busy", lambda: busy):
+        with cache.lease("other", MagicMock):
+            pass
+        busy.database.close.assert_not_called()
+    busy.database.close.assert_called_once()
+
+
+def test_service_cache_close_releases_all():
+    cache = MemoryServiceCache(max_size=4)
+    services = [MagicMock() for _ in range(3)]
+    for i, svc in enumerate(services):
+        with cache.lease(str(i), lambda svc=svc: svc):
+            pass
+    cache.close()
+    assert len(cache) == 0
+    for svc in services:
+        svc.database.close.assert_called_once()
+
+
+def test_service_cache_rejects_invalid_size():
+    with pytest.raises(ValueError, match="max_size"):
+        MemoryServiceCache(max_size=0)
+
+
+# ── Category context per lease ──
+
+
+class _FakeLLM:
+    async def embed(self, texts):
+        return [[1.0, float(i)] for i, _ in enumerate(texts)]
+
+    async def summarize(self, prompt, **kwargs):
+        return "summary"
+
+
+def _step(step_id: str, produces: set[str], handler) -> WorkflowStep:
+    return WorkflowStep(step_id=step_id, role=step_id, handler=handler, produces=produces)
+
+
+def memorizing_service(resources_dir: Path) -> MemoryService:
+    """An in-memory MemoryService whose memorize stores one "preferences" memory per call, without chat LLMs."""
+    service = MemoryService(
+        llm_profiles={"default": {"api_key": "test"}, "embedding": {"api_key": "test"}},
+        blob_config={"resources_dir": str(resources_dir)},
+        database_config={"metadata_store": {"provider": "inmemory"}},
+        user_config={"model": MemUUser},
+    )
+    install_lease_context(service)
+    service._llm_clients.update(default=_FakeLLM(), embedding=_FakeLLM())
+
+    def _extract(state, step_context):
+        entries = [("profile", f"{state['user']['user_id']} likes tea", ["preferences"])]
+        state["resource_plans"] = [{"resource_url": state["resource_url"], "caption": None, "entries": entries}]
+        return state
+
+    service.replace_step(
+        target_step_id="preprocess_multimodal",
+        new_step=_step("preprocess_multimodal", {"preprocessed_resources"}, lambda state, _: state),
+    )
+    service.replace_step(target_step_id="extract_items", new_step=_step("extract_items", {"resource_plans"}, _extract))
+    return service
+
+
+def linked_category_owners(service: MemoryService, user_id: str) -> set[str]:
+    """User IDs owning the categories that ``user_id``'s memories are linked to."""
+    database = service.database
+    return {
+        database.memory_category_repo.categories[relation.category_id].user_id
+        for relation in database.category_item_repo.relations
+        if database.memory_item_repo.items[relation.item_id].user_id == user_id
+    }
+
+
+@pytest.mark.asyncio
+async def test_each_lease_maps_memories_onto_its_own_users_categories(tmp_path):
+    conversation = tmp_path / "conversation.json"
+    conversation.write_text("[]")
+    cache = MemoryServiceCache(max_size=1)
+    for user_id in ("u1", "u2"):
+        with cache.lease("k", lambda: memorizing_service(tmp_path / "resources")) as service:
+            await service.memorize(resource_url=str(conversation), modality="conversation", user={"user_id": user_id})
+    assert linked_category_owners(service, "u1") == {"u1"}
+    assert linked_category_owners(service, "u2") == {"u2"}
@@ -0,0 +1,50 @@
+"""Tests for the in-process metrics registry."""
+
+from unittest.mock import MagicMock
+
+from app.utils.metrics import MetricsRegistry
+
+
+def test_counters_and_attributes():
+    registry = MetricsRegistry()
+    registry.inc("requests")
+    registry.inc("requests", 2)
+    registry.inc("requests", attributes={"queue": "bulk"})
+    assert registry.counter("requests") == 3
+    assert registry.counter("requests", {"queue": "bulk"}) == 1
+    assert registry.counter("missing") == 0
+
+
+def test_timing_summary():
+    registry = MetricsRegistry()
+    for value in (0.5, 0.1, 0.3):
+        registry.observe("latency", value)
+    summary = registry.timing("latency")
+    assert summary.count == 3
+    assert summary.min == 0.1
+    assert summary.max == 0.5
+    assert abs(summary.as_dict()["avg"] - 0.3) < 1e-9
+
+
+def test_snapshot_and_reset():
+    registry = MetricsRegistry()
+    registry.inc("hits")
+    registry.set_gauge("backlog", 7, {"queue": "interactive"})
+    registry.observe("latency", 1.0)
+    snap = registry.snapshot()
+    assert snap["counters"] == {"hits": 1}
+    assert snap["gauges"] == {"backlog{queue=interactive}": 7}
+    assert snap["timings"]["latency"]["count"] == 1
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "gauges": {}, "timings": {}}
+
+
+def test_forwards_to_attached_meter():
+    registry = MetricsRegistry()
+    meter = MagicMock()
+    registry.attach_meter(meter)
+    registry.inc("hits", attributes={"a": "b"})
+    registry.observe("latency", 0.2)
+    meter.create_counter.assert_called_once_with("hits")
+    meter.create_counter.return_value.add.assert_called_once_with(1, {"a": "b"})
+    meter.create_histogram_float.return_value.record.assert_called_once_with(0.2, {})
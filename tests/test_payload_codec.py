@@ -0,0 +1,50 @@
+"""Tests for the compressing Temporal payload codec."""
+
+import os
+
+import pytest
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+
+from app.services.payload_codec import ENCODING, CompressionCodec, build_data_converter
+from app.utils.metrics import metrics
+
+RESULT = {"task_id": "t1", "status": "SUCCESS", "result": {"items": [{"summary": "likes tea"}] * 200}}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_compressed_and_round_trip():
+    converter = build_data_converter(1024)
+    payloads = await converter.encode([RESULT, "small"])
+    assert payloads[0].metadata["encoding"] == ENCODING
+    assert payloads[1].metadata["encoding"] == b"json/plain"
+    assert await converter.decode(payloads, [dict, str]) == [RESULT, "small"]
+    assert metrics.counter("memu_payloads_compressed") == 1
+    assert metrics.counter("memu_payload_bytes_saved") > 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_codec_still_decodes_compressed_payloads():
+    compressed = await build_data_converter(1).encode([RESULT])
+    reader = build_data_converter(0)
+    assert (await reader.encode([RESULT]))[0].metadata["encoding"] == b"json/plain"
+    assert await reader.decode(compressed, [dict]) == [RESULT]
+
+
+@pytest.mark.asyncio
+async def test_uncompressed_history_payloads_decode_unchanged():
+    # Payloads recorded before the codec was installed carry no zlib marker.
+    old = await temporalio.converter.default().encode([RESULT])
+    assert await build_data_converter(1024).decode(old, [dict]) == [RESULT]
+
+
+@pytest.mark.asyncio
+async def test_incompressible_payloads_are_left_alone():
+    payload = Payload(metadata={"encoding": b"binary/plain"}, data=os.urandom(1024))
+    codec = CompressionCodec(min_bytes=1)
+    assert await codec.encode([payload]) == [payload]
@@ -0,0 +1,259 @@
+"""Tests for the LLM/embedding rate limiter."""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import psycopg
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import (
+    PostgresBuckets,
+    RateLimit,
+    RateLimitedClient,
+    RateLimiter,
+    TokenBucket,
+    install_rate_limits,
+    is_rate_limited,
+    retry_after,
+)
+from app.utils.metrics import metrics
+from config.memu import build_memu_rate_limits
+from config.settings import Settings
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    metrics.reset()
+    rate_limit._limiters.clear()
+    yield
+    rate_limit._limiters.clear()
+    rate_limit._shared = None
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+
+    async def _sleep(seconds: float) -> None:
+        fake.now += seconds
+
+    with patch("app.services.rate_limit.asyncio.sleep", side_effect=_sleep):
+        yield fake
+
+
+def _rate_limited(retry: str | None = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://llm.example/v1/chat/completions")
+    headers = {"retry-after": retry} if retry is not None else {}
+    response = httpx.Response(429, headers=headers, request=request)
+    return httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+
+
+# ── Buckets ──
+
+
+def test_bucket_allows_a_burst_then_spaces_reservations(clock):
+    bucket = TokenBucket(capacity=2, clock=clock)
+    assert bucket.reserve(1, rate=1.0) == 0
+    assert bucket.reserve(1, rate=1.0) == 0
+    # Overdrawn: later callers queue behind earlier ones.
+    assert bucket.reserve(1, rate=1.0) == pytest.approx(1.0)
+    assert bucket.reserve(1, rate=1.0) == pytest.approx(2.0)
+    clock.now += 10
+    assert bucket.reserve(1, rate=1.0) == 0
+
+
+def test_bucket_adjust_charges_or_refunds(clock):
+    bucket = TokenBucket(capacity=100, clock=clock)
+    bucket.reserve(100, rate=10.0)
+    bucket.adjust(-50)
+    assert bucket.reserve(50, rate=10.0) == 0
+
+
+# ── Limiter ──
+
+
+async def test_limiter_enforces_requests_per_minute(clock):
+    limiter = RateLimiter("default", RateLimit(requests_per_minute=60), clock=clock)
+    started = clock.now
+    for _ in range(20):
+        await limiter.acquire(0)
+    # 10 requests of burst, then one per second.
+    assert clock.now - started == pytest.approx(10.0)
+    waits = metrics.timing("memu_llm_rate_limit_wait_seconds", {"profile": "default"})
+    assert waits.count == 20
+    assert waits.max == pytest.approx(1.0)
+
+
+async def test_limiter_enforces_tokens_per_minute(clock):
+    limiter = RateLimiter("default", RateLimit(tokens_per_minute=6000), clock=clock)  # 100/s, burst 1000
+    assert await limiter.acquire(1000) == 0
+    assert await limiter.acquire(500) == pytest.approx(5.0)
+
+
+async def test_settle_corrects_the_estimate(clock):
+    limiter = RateLimiter("default", RateLimit(tokens_per_minute=6000), clock=clock)
+    await limiter.acquire(1000)
+    await limiter.settle(1000, 200)  # used far less than reserved
+    assert await limiter.acquire(800) == 0
+
+
+async def test_penalize_pauses_and_halves_the_rate(clock):
+    limiter = RateLimiter("default", RateLimit(requests_per_minute=60), max_backoff=8, clock=clock)
+    assert await limiter.penalize(None) == 1
+    assert await limiter.penalize(None) == 2
+    assert await limiter.penalize(30) == 8  # capped
+    assert limiter.rate_factor == pytest.approx(0.125)
+    assert await limiter.acquire(0) == pytest.approx(8)
+    assert metrics.counter("memu_llm_rate_limited", {"profile": "default"}) == 3
+
+    limiter.succeeded()
+    assert limiter.rate_factor == pytest.approx(0.125 * 1.1)
+    assert await limiter.penalize(None) == 1  # backoff reset
+
+
+async def test_unreachable_shared_store_falls_back_to_local(clock):
+    shared = PostgresBuckets("postgresql://memu@127.0.0.1:1/memu")
+    limiter = RateLimiter("default", RateLimit(requests_per_minute=6), shared, clock=clock)
+    with patch.object(psycopg.AsyncConnection, "connect", AsyncMock(side_effect=psycopg.OperationalError("down"))):
+        assert await limiter.acquire(0) == 0
+        assert await limiter.acquire(0) == pytest.approx(10.0)
+
+
+async def test_shared_buckets_reserve_in_one_statement():
+    conn = MagicMock(closed=False)
+    cursor = MagicMock(description=[("wait",)])
+    cursor.fetchall = AsyncMock(return_value=[(0.0,), (2.5,)])
+    conn.execute = AsyncMock(return_value=cursor)
+    shared = PostgresBuckets("postgresql://unused")
+    shared._conn = conn
+    limiter = RateLimiter("default", RateLimit(requests_per_minute=60, tokens_per_minute=6000), shared)
+
+    with patch("app.services.rate_limit.asyncio.sleep", AsyncMock()) as sleep:
+        assert await limiter.acquire(42) == 2.5
+
+    sleep.assert_awaited_once_with(2.5)
+    query, params = conn.execute.call_args.args
+    assert "ON CONFLICT" in query
+    assert params == (["default:requests", "default:tokens"], [1.0, 100.0], [10.0, 1000.0], [1, 42])
+
+
+# ── Client wrapper ──
+
+
+def test_rate_limit_detection():
+    assert is_rate_limited(_rate_limited())
+    assert is_rate_limited(SimpleNamespace(status_code=429))  # openai.RateLimitError
+    assert not is_rate_limited(ValueError())
+    assert retry_after(_rate_limited("2.5")) == 2.5
+    assert retry_after(_rate_limited("Wed, 21 Oct 2015 07:28:00 GMT")) is None
+    assert retry_after(ValueError()) is None
+
+
+async def test_client_reserves_estimate_and_settles_usage(clock):
+    inner = MagicMock()
+    inner.summarize = AsyncMock(return_value=("ok", {"usage": {"total_tokens": 30}}))
+    limiter = RateLimiter("default", RateLimit(tokens_per_minute=60_000), clock=clock)
+    client = RateLimitedClient(inner, limiter)
+
+    assert await client.summarize("x" * 400, max_tokens=100, system_prompt="be brief") == (
+        "ok",
+        {"usage": {"total_tokens": 30}},
+    )
+
+    inner.summarize.assert_awaited_once_with("x" * 400, max_tokens=100, system_prompt="be brief")
+    # Reserved 102 + 100 tokens, then gave back everything but the 30 used.
+    assert limiter._buckets["tokens"].level == pytest.approx(10_000 - 30)
+
+
+async def test_client_backs_off_and_retries_on_429(clock):
+    inner = MagicMock()
+    inner.embed = AsyncMock(side_effect=[_rate_limited("3"), _rate_limited(), ([[0.1]], None)])
+    limiter = RateLimiter("embedding", RateLimit(requests_per_minute=600), clock=clock)
+    client = RateLimitedClient(inner, limiter, max_retries=3)
+    started = clock.now
+
+    assert await client.embed(["hello"]) == ([[0.1]], None)
+
+    assert inner.embed.await_count == 3
+    assert clock.now - started == pytest.approx(3 + 2)  # Retry-After, then the doubled backoff
+    assert limiter.rate_factor == pytest.approx(0.25 * 1.1)
+
+
+async def test_client_gives_up_after_max_retries(clock):
+    inner = MagicMock()
+    inner.embed = AsyncMock(side_effect=_rate_limited())
+    client = RateLimitedClient(inner, RateLimiter("embedding", RateLimit(requests_per_minute=600), clock=clock), 2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.embed(["hello"])
+    assert inner.embed.await_count == 3
+
+
+async def test_client_does_not_retry_other_errors(clock):
+    inner = MagicMock()
+    inner.summarize = AsyncMock(side_effect=RuntimeError("boom"))
+    client = RateLimitedClient(inner, RateLimiter("default", RateLimit(requests_per_minute=60), clock=clock))
+
+    with pytest.raises(RuntimeError):
+        await client.summarize("hi")
+    assert inner.summarize.await_count == 1
+
+
+def test_client_delegates_other_attributes():
+    inner = MagicMock(chat_model="gpt-test")
+    client = RateLimitedClient(inner, RateLimiter("default", RateLimit(requests_per_minute=60)))
+    assert client.chat_model == "gpt-test"
+
+
+# ── Configuration ──
+
+
+def test_rate_limits_per_profile_from_settings():
+    settings = Settings(OPENAI_API_KEY="sk-test", LLM_RATE_LIMIT_TPM=90_000, EMBEDDING_RATE_LIMIT_RPM=3000)
+    assert build_memu_rate_limits(settings) == {
+        "default": {"requests_per_minute": 0, "tokens_per_minute": 90_000},
+        "embedding": {"requests_per_minute": 3000, "tokens_per_minute": 0},
+    }
+    assert build_memu_rate_limits(Settings(OPENAI_API_KEY="sk-test")) == {}
+
+
+def test_install_wraps_limited_profiles_with_one_limiter_per_process():
+    settings = Settings(OPENAI_API_KEY="sk-test", LLM_RATE_LIMIT_RPM=500)
+    services = []
+    for _ in range(2):
+        service = MagicMock()
+        service._llm_clients = {"default": MagicMock(), "embedding": MagicMock()}
+        service._get_llm_base_client = lambda profile, s=service: s._llm_clients[profile]
+        install_rate_limits(service, settings)
+        install_rate_limits(service, settings)  # idempotent
+        services.append(service)
+
+    first, second = (s._llm_clients["default"] for s in services)
+    assert isinstance(first, RateLimitedClient)
+    assert not isinstance(first._inner, RateLimitedClient)
+    assert first.limiter is second.limiter
+    assert not isinstance(services[0]._llm_clients["embedding"], RateLimitedClient)
+
+
+def test_create_memory_service_installs_limits():
+    from app.services.memu import create_memory_service
+
+    settings = Settings(OPENAI_API_KEY="sk-test", EMBEDDING_RATE_LIMIT_TPM=1_000_000)
+    with patch("app.services.memu.MemoryService") as service_cls:
+        service = service_cls.return_value
+        service._llm_clients = {}
+        service._get_llm_base_client = lambda profile: service._llm_clients.setdefault(profile, MagicMock())
+        create_memory_service(settings)
+
+    assert isinstance(service._llm_clients["embedding"], RateLimitedClient)
+    assert "default" not in service._llm_clients
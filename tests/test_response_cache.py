@@ -0,0 +1,286 @@
+"""Tests for the /retrieve and /categories response cache and its invalidation."""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.cache_invalidation import (
+    INVALIDATION_CHANNEL,
+    apply_invalidation,
+    parse_invalidation,
+    publish_invalidation,
+)
+from app.services.notifications import PostgresListener
+from app.services.response_cache import GenerationTracker, ResponseCache
+from app.utils.metrics import metrics
+from app.workers.invalidation_activity import task_invalidate_cache
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+# ── Generation tracker ──
+
+
+def test_tracker_bumps_one_user_or_everyone():
+    tracker = GenerationTracker()
+    before_u1, before_u2 = tracker.token("u1"), tracker.token("u2")
+    tracker.bump("u1")
+    assert tracker.token("u1") != before_u1
+    assert tracker.token("u2") == before_u2
+    tracker.bump(None)
+    assert tracker.token("u2") != before_u2
+
+
+def test_tracker_bounds_its_counters_without_reviving_stale_tokens():
+    tracker = GenerationTracker(max_users=3)
+    users = [f"u{i}" for i in range(10)]
+    read: dict[str, set] = {user: set() for user in users}
+    for _ in range(3):
+        for i, user in enumerate(users):
+            for other in users[: i + 1]:
+                read[other].add(tracker.token(other))
+            tracker.bump(user)
+            # Nothing cached under a token read before the bump is reachable again.
+            assert tracker.token(user) not in read[user]
+    assert len(tracker._users) == 3
+
+
+def test_tracker_unavailable_hands_out_no_tokens():
+    tracker = GenerationTracker(available=False)
+    assert tracker.token("u1") is None
+    tracker.mark_available()
+    first = tracker.token("u1")
+    assert first is not None
+    tracker.mark_unavailable()
+    assert tracker.token("u1") is None
+    # Reconnecting invalidates everything cached before the gap
+    tracker.mark_available()
+    assert tracker.token("u1") != first
+
+
+# ── Response cache ──
+
+
+def test_response_cache_lru_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+    with patch("app.services.response_cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a", "retrieve") == 1
+        cache.set("c", 3)
+        assert cache.get("b", "retrieve") is None
+    with patch("app.services.response_cache.time.monotonic", return_value=111.0):
+        assert cache.get("a", "retrieve") is None
+    assert metrics.counter("memu_response_cache_hits", {"kind": "retrieve"}) == 1
+    assert metrics.counter("memu_response_cache_misses", {"kind": "retrieve"}) == 2
+
+
+def test_response_cache_key_depends_on_token():
+    assert ResponseCache.key("retrieve", (0, 0), user_id="u1", query="q") != ResponseCache.key(
+        "retrieve", (0, 1), user_id="u1", query="q"
+    )
+
+
+# ── Endpoints ──
+
+
+@pytest.fixture
+def mock_service():
+    service = MagicMock()
+    service.retrieve = AsyncMock(return_value={"items": [{"id": "m1", "score": 0.9}]})
+    service.list_memory_categories = AsyncMock(
+        return_value={"categories": [{"name": "work", "description": "d", "user_id": "u1", "agent_id": None}]}
+    )
+    service.clear_memory = AsyncMock(
+        return_value={"deleted_categories": [], "deleted_items": [], "deleted_resources": []}
+    )
+    return service
+
+
+@pytest.fixture
+def client(mock_service):
+    from app.main import app
+
+    with patch("app.main.create_memory_service", return_value=mock_service):
+        with TestClient(app) as test_client:
+            yield test_client
+
+
+def test_repeated_retrieve_served_from_cache(client, mock_service):
+    body = {"query": "prefs", "user_id": "u1"}
+    first = client.post("/retrieve", json=body)
+    second = client.post("/retrieve", json={**body, "top_k": 1})
+    assert first.json() == second.json()
+    assert mock_service.retrieve.await_count == 1
+    assert metrics.counter("memu_response_cache_hits", {"kind": "retrieve"}) == 1
+
+
+def test_retrieve_cache_is_scoped_per_user_and_agent(client, mock_service):
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u2"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1", "agent_id": "a1"})
+    assert mock_service.retrieve.await_count == 3
+
+
+def test_clear_invalidates_user(client, mock_service):
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u2"})
+    client.post("/clear", json={"user_id": "u1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u2"})
+    assert mock_service.retrieve.await_count == 3
+
+
+def test_agent_only_clear_invalidates_everyone(client, mock_service):
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    client.post("/clear", json={"agent_id": "a1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    assert mock_service.retrieve.await_count == 2
+
+
+def test_categories_cached_until_invalidated(client, mock_service):
+    body = {"user_id": "u1"}
+    assert client.post("/categories", json=body).json() == client.post("/categories", json=body).json()
+    assert mock_service.list_memory_categories.await_count == 1
+    client.app.state.generations.bump("u1")
+    client.post("/categories", json=body)
+    assert mock_service.list_memory_categories.await_count == 2
+
+
+def test_unavailable_tracker_bypasses_cache(client, mock_service):
+    client.app.state.generations.mark_unavailable()
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    client.post("/retrieve", json={"query": "prefs", "user_id": "u1"})
+    assert mock_service.retrieve.await_count == 2
+    assert metrics.counter("memu_response_cache_bypassed", {"kind": "retrieve"}) == 2
+
+
+def test_clear_publishes_invalidation_in_postgres_mode(client):
+    from app.main import settings
+
+    with (
+        patch.object(settings, "NOTIFICATIONS_BACKEND", "postgres"),
+        patch("app.main.publish_invalidation", AsyncMock()) as publish,
+    ):
+        response = client.post("/clear", json={"user_id": "u1"})
+    assert response.status_code == 200
+    publish.assert_awaited_once_with(settings.postgres_dsn, "u1")
+
+
+def test_clear_succeeds_when_publish_fails(client):
+    from app.main import settings
+
+    with (
+        patch.object(settings, "NOTIFICATIONS_BACKEND", "postgres"),
+        patch("app.main.publish_invalidation", AsyncMock(side_effect=OSError("pg down"))),
+    ):
+        response = client.post("/clear", json={"user_id": "u1"})
+    assert response.status_code == 200
+    assert metrics.counter("memu_cache_invalidation_failures") == 1
+
+
+# ── Postgres LISTEN/NOTIFY ──
+
+
+def test_parse_invalidation():
+    assert parse_invalidation('{"user_id": "u1"}') == "u1"
+    assert parse_invalidation('{"user_id": null}') is None
+    assert parse_invalidation("garbage") is None
+
+
+def _fake_connection(notifications: list[str] | None = None):
+    conn = MagicMock()
+    conn.execute = AsyncMock()
+    conn.__aenter__ = AsyncMock(return_value=conn)
+    conn.__aexit__ = AsyncMock(return_value=False)
+
+    async def _notifies():
+        for payload in notifications or []:
+            yield SimpleNamespace(channel=INVALIDATION_CHANNEL, payload=payload)
+        await asyncio.Event().wait()
+
+    conn.notifies = _notifies
+    return conn
+
+
+def _invalidation_listener(tracker: GenerationTracker, retry_seconds: float = 1.0) -> PostgresListener:
+    return PostgresListener(
+        "postgresql://x",
+        {INVALIDATION_CHANNEL: lambda payload: apply_invalidation(tracker, payload)},
+        on_subscribed=tracker.mark_available,
+        on_lost=tracker.mark_unavailable,
+        retry_seconds=retry_seconds,
+    )
+
+
+@pytest.mark.asyncio
+async def test_publish_invalidation_sends_pg_notify():
+    conn = _fake_connection()
+    with patch("app.services.notifications.psycopg.AsyncConnection.connect", AsyncMock(return_value=conn)):
+        await publish_invalidation("postgresql://x", "u1")
+    conn.execute.assert_awaited_once_with("SELECT pg_notify(%s, %s)", (INVALIDATION_CHANNEL, '{"user_id": "u1"}'))
+
+
+@pytest.mark.asyncio
+async def test_listener_applies_notifications():
+    tracker = GenerationTracker(available=False)
+    conn = _fake_connection(['{"user_id": "u1"}'])
+    with patch("app.services.notifications.psycopg.AsyncConnection.connect", AsyncMock(return_value=conn)):
+        listener = _invalidation_listener(tracker)
+        listener.start()
+        for _ in range(50):
+            if metrics.counter("memu_notifications_received", {"channel": INVALIDATION_CHANNEL}):
+                break
+            await asyncio.sleep(0.01)
+        assert tracker.available
+        assert tracker.token("u1")[1] == 1
+        await listener.stop()
+    assert not tracker.available
+    conn.execute.assert_awaited_once_with(f"LISTEN {INVALIDATION_CHANNEL}")
+
+
+@pytest.mark.asyncio
+async def test_listener_stays_unavailable_while_disconnected():
+    tracker = GenerationTracker(available=False)
+    with patch(
+        "app.services.notifications.psycopg.AsyncConnection.connect",
+        AsyncMock(side_effect=OSError("refused")),
+    ):
+        listener = _invalidation_listener(tracker, retry_seconds=0.01)
+        listener.start()
+        await asyncio.sleep(0.05)
+        assert tracker.token("u1") is None
+        await listener.stop()
+
+
+# ── Worker activity ──
+
+
+@pytest.mark.asyncio
+async def test_invalidate_activity_publishes_for_user():
+    settings = SimpleNamespace(NOTIFICATIONS_BACKEND="postgres", postgres_dsn="postgresql://x")
+    with (
+        patch("app.workers.invalidation_activity.Settings", return_value=settings),
+        patch("app.workers.invalidation_activity.publish_invalidation", AsyncMock()) as publish,
+    ):
+        await task_invalidate_cache("u1")
+    publish.assert_awaited_once_with("postgresql://x", "u1")
+
+
+@pytest.mark.asyncio
+async def test_invalidate_activity_noop_in_local_mode():
+    settings = SimpleNamespace(NOTIFICATIONS_BACKEND="local", postgres_dsn="postgresql://x")
+    with (
+        patch("app.workers.invalidation_activity.Settings", return_value=settings),
+        patch("app.workers.invalidation_activity.publish_invalidation", AsyncMock()) as publish,
+    ):
+        await task_invalidate_cache("u1")
+    publish.assert_not_awaited()
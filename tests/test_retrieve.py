@@ -0,0 +1,137 @@
+"""Tests for the scoped POST /retrieve endpoint and its helpers."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.schemas.memory import RetrieveRequest
+from app.services.retrieve import apply_retrieve_options, scope_filter
+from app.utils.metrics import metrics
+from config.memu import build_memu_retrieve_config
+from config.settings import Settings
+
+
+def _hits(*scores: float) -> list[dict]:
+    return [{"id": f"h{i}", "score": s} for i, s in enumerate(scores)]
+
+
+@pytest.fixture
+def mock_service():
+    service = MagicMock()
+    service.retrieve = AsyncMock(
+        return_value={
+            "needs_retrieval": True,
+            "categories": _hits(0.9, 0.5),
+            "items": _hits(0.95, 0.8, 0.6, 0.4, 0.3, 0.2, 0.1),
+            "resources": [],
+            "next_step_query": None,
+        }
+    )
+    return service
+
+
+@pytest.fixture
+def client(mock_service):
+    from app.main import app
+
+    with patch("app.main.create_memory_service", return_value=mock_service) as factory:
+        with TestClient(app) as test_client:
+            test_client.factory = factory
+            yield test_client
+
+
+# ── Schema / helper tests ──
+
+
+def test_retrieve_request_strips_and_normalizes():
+    body = RetrieveRequest(query="  q  ", user_id=" u1 ", agent_id="  ")
+    assert body.query == "q"
+    assert body.user_id == "u1"
+    assert body.agent_id is None
+
+
+def test_retrieve_request_rejects_bad_top_k():
+    with pytest.raises(ValidationError, match="top_k"):
+        RetrieveRequest(query="q", user_id="u1", top_k=0)
+
+
+def test_scope_filter_includes_agent_only_when_given():
+    assert scope_filter(RetrieveRequest(query="q", user_id="u1")) == {"user_id": "u1"}
+    assert scope_filter(RetrieveRequest(query="q", user_id="u1", agent_id="a1")) == {
+        "user_id": "u1",
+        "agent_id": "a1",
+    }
+
+
+def test_apply_retrieve_options_trims_and_filters():
+    result = {"items": _hits(0.9, 0.7, 0.5, 0.3), "categories": _hits(0.2), "next_step_query": None}
+    out = apply_retrieve_options(result, top_k=2, min_score=0.4)
+    assert [h["score"] for h in out["items"]] == [0.9, 0.7]
+    assert out["categories"] == []
+    assert out["next_step_query"] is None
+    # Input is not mutated
+    assert len(result["items"]) == 4
+
+
+def test_build_memu_retrieve_config_uses_max_top_k():
+    config = build_memu_retrieve_config(Settings(RETRIEVE_MAX_TOP_K=12))
+    assert config == {"category": {"top_k": 12}, "item": {"top_k": 12}, "resource": {"top_k": 12}}
+
+
+# ── Endpoint tests ──
+
+
+def test_service_built_with_max_top_k(client):
+    from app.main import settings
+
+    kwargs = client.factory.call_args.kwargs
+    assert kwargs["retrieve_config"]["item"]["top_k"] == settings.RETRIEVE_MAX_TOP_K
+
+
+def test_retrieve_scopes_search_to_user_and_agent(client, mock_service):
+    response = client.post("/retrieve", json={"query": "coffee", "user_id": "u1", "agent_id": "a1"})
+    assert response.status_code == 200
+    mock_service.retrieve.assert_called_once_with(["coffee"], where={"user_id": "u1", "agent_id": "a1"})
+
+
+def test_retrieve_applies_default_top_k(client):
+    from app.main import settings
+
+    response = client.post("/retrieve", json={"query": "coffee", "user_id": "u1"})
+    items = response.json()["result"]["items"]
+    assert len(items) == settings.RETRIEVE_DEFAULT_TOP_K
+
+
+def test_retrieve_applies_top_k_and_min_score(client):
+    response = client.post("/retrieve", json={"query": "coffee", "user_id": "u1", "top_k": 3, "min_score": 0.7})
+    result = response.json()["result"]
+    assert [h["score"] for h in result["items"]] == [0.95, 0.8]
+    assert [h["score"] for h in result["categories"]] == [0.9]
+
+
+def test_retrieve_rejects_top_k_above_max(client, mock_service):
+    from app.main import settings
+
+    response = client.post(
+        "/retrieve",
+        json={"query": "coffee", "user_id": "u1", "top_k": settings.RETRIEVE_MAX_TOP_K + 1},
+    )
+    assert response.status_code == 422
+    mock_service.retrieve.assert_not_called()
+
+
+def test_retrieve_records_latency(client):
+    metrics.reset()
+    client.post("/retrieve", json={"query": "coffee", "user_id": "u1"})
+    assert metrics.timing("memu_retrieve_seconds").count == 1
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "memu_retrieve_seconds" in response.json()["result"]["timings"]
+
+
+def test_retrieve_service_error_returns_500(client, mock_service):
+    mock_service.retrieve = AsyncMock(side_effect=RuntimeError("db down"))
+    response = client.post("/retrieve", json={"query": "coffee", "user_id": "u1"})
+    assert response.status_code == 500
@@ -0,0 +1,233 @@
+"""Tests for POST /retrieve/batch and the embedding prefetch client."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from memu.app import MemoryService
+from pydantic import ValidationError
+
+from app.schemas.memory import RetrieveBatchRequest
+from app.services.embedding import (
+    PrefetchingEmbeddingClient,
+    embed_texts,
+    install_embedding_prefetch,
+    prefetched_embeddings,
+)
+from app.services.retrieve import retrieve_many
+from app.utils.metrics import metrics
+from config.memu import MemUUser, build_memu_retrieve_config
+from config.settings import Settings
+
+
+class CountingEmbeddingClient:
+    """Fake base embedding client returning (vectors, raw) like memu-py's SDK client."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def embed(self, inputs: list[str]):
+        self.calls.append(list(inputs))
+        return [[float(len(text)), 1.0] for text in inputs], {"usage": {}}
+
+
+def _inmemory_service(embedder: CountingEmbeddingClient, retrieve_config: dict | None = None) -> MemoryService:
+    service = MemoryService(
+        llm_profiles={"default": {"api_key": "test"}, "embedding": {"api_key": "test"}},
+        database_config={"metadata_store": {"provider": "inmemory"}},
+        user_config={"model": MemUUser},
+        retrieve_config=retrieve_config
+        or {
+            "route_intention": False,
+            "sufficiency_check": False,
+            "category": {"enabled": False},
+            "resource": {"enabled": False},
+        },
+    )
+    service._llm_clients["embedding"] = embedder
+    repo = service.database.memory_item_repo
+    for i in range(4):
+        repo.create_item(
+            resource_id="r",
+            memory_type="profile",
+            summary=f"memory {i}",
+            embedding=[float(i), 1.0],
+            user_data={"user_id": "u1", "agent_id": None},
+        )
+    categories = service.database.memory_category_repo
+    for name in ("work", "hobbies"):
+        category = categories.get_or_create_category(
+            name=name, description=name, embedding=[1.0, 1.0], user_data={"user_id": "u1", "agent_id": None}
+        )
+        categories.update_category(category_id=category.id, summary=f"The user's {name}")
+    return service
+
+
+# ── Prefetch client tests ──
+
+
+def test_prefetch_client_serves_published_vectors():
+    inner = CountingEmbeddingClient()
+    client = PrefetchingEmbeddingClient(inner)
+
+    async def _run():
+        with prefetched_embeddings({"a": [9.0, 9.0]}):
+            return await client.embed(["a"])
+
+    vectors, raw = asyncio.run(_run())
+    assert vectors == [[9.0, 9.0]]
+    assert raw is None
+    assert inner.calls == []
+
+
+def test_prefetch_client_forwards_only_missing_texts():
+    inner = CountingEmbeddingClient()
+    client = PrefetchingEmbeddingClient(inner)
+
+    async def _run():
+        with prefetched_embeddings({"a": [9.0, 9.0]}):
+            return await client.embed(["a", "bbb"])
+
+    vectors, _raw = asyncio.run(_run())
+    assert vectors == [[9.0, 9.0], [3.0, 1.0]]
+    assert inner.calls == [["bbb"]]
+
+
+def test_prefetch_client_passes_through_without_prefetch():
+    inner = CountingEmbeddingClient()
+    client = PrefetchingEmbeddingClient(inner)
+    vectors, raw = asyncio.run(client.embed(["ab"]))
+    assert vectors == [[2.0, 1.0]]
+    assert raw == {"usage": {}}
+
+
+def test_install_embedding_prefetch_is_idempotent():
+    service = _inmemory_service(CountingEmbeddingClient())
+    install_embedding_prefetch(service)
+    first = service._llm_clients["embedding"]
+    install_embedding_prefetch(service)
+    assert isinstance(first, PrefetchingEmbeddingClient)
+    assert service._llm_clients["embedding"] is first
+
+
+def test_batched_retrieve_makes_one_embedding_call():
+    """N queries through the real retrieve workflow cost exactly one embed call."""
+    embedder = CountingEmbeddingClient()
+    service = _inmemory_service(embedder)
+    install_embedding_prefetch(service)
+    queries = ["x", "yy", "zzz"]
+
+    async def _run():
+        vectors = await embed_texts(service, queries)
+        with prefetched_embeddings(dict(zip(queries, vectors, strict=True))):
+            return await asyncio.gather(*(service.retrieve([q], where={"user_id": "u1"}) for q in queries))
+
+    results = asyncio.run(_run())
+    assert embedder.calls == [queries]
+    assert all(r["items"] for r in results)
+
+
+def test_retrieve_many_makes_one_embedding_call_with_the_server_retrieve_config():
+    """Intention routing, sufficiency checks and category ranking embed nothing beyond the one call."""
+    embedder = CountingEmbeddingClient()
+    service = _inmemory_service(embedder, build_memu_retrieve_config(Settings(OPENAI_API_KEY="sk-test")))
+    chat = MagicMock()
+    chat.chat = AsyncMock(side_effect=AssertionError("no chat calls expected"))
+    chat.summarize = AsyncMock(side_effect=AssertionError("no chat calls expected"))
+    service._llm_clients["default"] = chat
+    install_embedding_prefetch(service)
+    queries = ["x", "yy", "zzz"]
+
+    results = asyncio.run(retrieve_many(service, queries, {"user_id": "u1"}))
+
+    assert embedder.calls == [[*queries, "The user's work", "The user's hobbies"]]
+    assert all(r["items"] and r["categories"] for r in results)
+    assert [r["original_query"] for r in results] == queries
+    # The shared service keeps its own retrieve config.
+    assert service.retrieve_config.route_intention and service.retrieve_config.sufficiency_check
+
+
+# ── Schema tests ──
+
+
+def test_batch_request_rejects_blank_queries():
+    with pytest.raises(ValidationError, match="blank"):
+        RetrieveBatchRequest(queries=["ok", "  "], user_id="u1")
+
+
+def test_batch_request_requires_queries():
+    with pytest.raises(ValidationError, match="queries"):
+        RetrieveBatchRequest(queries=[], user_id="u1")
+
+
+# ── Endpoint tests ──
+
+
+@pytest.fixture
+def mock_service():
+    service = MagicMock()
+
+    async def _retrieve(queries, where=None):
+        return {"items": [{"id": queries[0], "score": 0.9}, {"id": "low", "score": 0.1}]}
+
+    service.retrieve = AsyncMock(side_effect=_retrieve)
+    return service
+
+
+@pytest.fixture
+def client(mock_service):
+    from app.main import app
+
+    with (
+        patch("app.main.create_memory_service", return_value=mock_service),
+        patch("app.main.install_embedding_prefetch"),
+    ):
+        with TestClient(app) as test_client:
+            yield test_client
+
+
+def _searching_each_query():
+    async def _retrieve_many(service, queries, where):
+        return [await service.retrieve([q], where=where) for q in queries]
+
+    return patch("app.main.retrieve_many", AsyncMock(side_effect=_retrieve_many))
+
+
+def test_batch_returns_results_in_query_order(client, mock_service):
+    metrics.reset()
+    with _searching_each_query() as many:
+        response = client.post(
+            "/retrieve/batch",
+            json={"queries": [" first ", "second", "first"], "user_id": "u1", "min_score": 0.5},
+        )
+    assert response.status_code == 200
+    results = response.json()["result"]["results"]
+    assert [r["query"] for r in results] == ["first", "second", "first"]
+    assert [r["result"]["items"] for r in results] == [
+        [{"id": "first", "score": 0.9}],
+        [{"id": "second", "score": 0.9}],
+        [{"id": "first", "score": 0.9}],
+    ]
+    # Duplicates are searched once
+    many.assert_awaited_once()
+    assert many.call_args.args[1] == ["first", "second"]
+    assert mock_service.retrieve.await_count == 2
+    assert mock_service.retrieve.call_args.kwargs["where"] == {"user_id": "u1"}
+    assert metrics.counter("memu_retrieve_batch_queries") == 3
+
+
+def test_batch_rejects_too_many_queries(client, mock_service):
+    from app.main import settings
+
+    with patch.object(settings, "RETRIEVE_BATCH_MAX_QUERIES", 2):
+        response = client.post("/retrieve/batch", json={"queries": ["a", "b", "c"], "user_id": "u1"})
+    assert response.status_code == 422
+    mock_service.retrieve.assert_not_called()
+
+
+def test_batch_embedding_failure_returns_500(client, mock_service):
+    with patch("app.main.retrieve_many", AsyncMock(side_effect=RuntimeError("provider down"))):
+        response = client.post("/retrieve/batch", json={"queries": ["a"], "user_id": "u1"})
+    assert response.status_code == 500
+    mock_service.retrieve.assert_not_called()
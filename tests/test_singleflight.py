@@ -0,0 +1,135 @@
+"""Tests for single-flight coalescing of identical concurrent requests."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def _work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    results = await asyncio.gather(*(flight.do("k", _work) for _ in range(5)))
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+    assert metrics.counter("memu_coalesced_requests", {"kind": "test"}) == 4
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    work = AsyncMock(return_value=1)
+    await asyncio.gather(flight.do("a", work), flight.do("b", work))
+    assert work.await_count == 2
+    assert metrics.counter("memu_coalesced_requests", {"kind": "test"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight("test")
+    work = AsyncMock(return_value=1)
+    await flight.do("k", work)
+    await flight.do("k", work)
+    assert work.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def _fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("k", _fail), flight.do("k", _fail), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def _work():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("k", _work))
+    second = asyncio.create_task(flight.do("k", _work))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_retrieves_hit_service_once():
+    """Identical /retrieve requests arriving together share one service.retrieve call."""
+    from app.main import app, lifespan
+
+    service = MagicMock()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def _retrieve(queries, where=None):
+        started.set()
+        await release.wait()
+        return {"items": [{"id": "m1", "score": 0.9}, {"id": "m2", "score": 0.8}]}
+
+    service.retrieve = AsyncMock(side_effect=_retrieve)
+    with patch("app.main.create_memory_service", return_value=service):
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = {"query": "prefs", "user_id": "u1"}
+                requests = [asyncio.create_task(client.post("/retrieve", json={**body, "top_k": k})) for k in (1, 2, 2)]
+                await started.wait()
+                await asyncio.sleep(0.01)
+                release.set()
+                responses = await asyncio.gather(*requests)
+
+    assert service.retrieve.await_count == 1
+    assert [len(r.json()["result"]["items"]) for r in responses] == [1, 2, 2]
+    assert metrics.counter("memu_coalesced_requests", {"kind": "retrieve"}) == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieves_are_not_coalesced_without_a_generation_token():
+    """Without a token a request could join a search that started before an invalidation."""
+    from app.main import app, lifespan
+
+    service = MagicMock()
+    service.retrieve = AsyncMock(return_value={"items": []})
+    with patch("app.main.create_memory_service", return_value=service):
+        async with lifespan(app):
+            app.state.generations.mark_unavailable()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = {"query": "prefs", "user_id": "u1"}
+                with patch.object(app.state.retrieve_flights, "do", AsyncMock()) as do:
+                    responses = await asyncio.gather(*(client.post("/retrieve", json=body) for _ in range(2)))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    do.assert_not_awaited()
+    assert service.retrieve.await_count == 2
@@ -0,0 +1,204 @@
+"""Tests for the STORAGE_PATH layout, task file retention and the orphan sweep."""
+
+import asyncio
+import gzip
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.blob_store import LocalBlobStore, release_files
+from app.services.storage import locate, shard_dir, storage_path, sweep
+from app.services.task_results import load_result, store_result
+from app.utils.metrics import metrics
+from app.workers.memorize_activity import task_split_conversation
+from app.workers.storage_activity import task_release_storage
+
+CONVERSATION = [{"role": "user", "content": {"text": f"message {i} " * 20}} for i in range(6)]
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+def _write(path, text="[]", age=0.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, "utf-8")
+    if age:
+        mtime = path.stat().st_mtime - age
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+# ── Layout ──
+
+
+def test_sharded_paths_are_stable_two_level_hex(tmp_path):
+    directory = shard_dir(tmp_path, "conversation-abc.json")
+    assert directory == shard_dir(tmp_path, "conversation-abc.json")
+    relative = directory.relative_to(tmp_path).parts
+    assert len(relative) == 2
+    assert all(len(part) == 2 and int(part, 16) >= 0 for part in relative)
+
+
+def test_storage_path_creates_the_shard(tmp_path):
+    assert storage_path(tmp_path, "a.json", sharded=False) == tmp_path / "a.json"
+    path = storage_path(tmp_path, "a.json", sharded=True)
+    assert path == shard_dir(tmp_path, "a.json") / "a.json"
+    assert path.parent.is_dir()
+
+
+def test_locate_finds_sharded_and_flat_files(tmp_path):
+    flat = _write(tmp_path / "old.json")
+    sharded = _write(storage_path(tmp_path, "new.json", sharded=True))
+    assert locate(tmp_path, "old.json") == flat
+    assert locate(tmp_path, "new.json") == sharded
+    assert locate(tmp_path, "missing.json") == tmp_path / "missing.json"
+
+
+@pytest.mark.asyncio
+async def test_sharded_results_round_trip(tmp_path):
+    ref = await store_result(LocalBlobStore(tmp_path, sharded=True), "abc", {"items": []})
+    assert not (tmp_path / ref).exists()
+    assert await load_result(LocalBlobStore(tmp_path), ref) == {"items": []}
+
+
+@pytest.mark.asyncio
+async def test_split_writes_sharded_parts(tmp_path):
+    _write(tmp_path / "conversation-abc.json", json.dumps(CONVERSATION))
+    spec = {"task_id": "t1", "resource_url": "conversation-abc.json", "chunking": {"max_tokens": 100}}
+    settings = MagicMock(STORAGE_BACKEND="local", STORAGE_PATH=str(tmp_path), STORAGE_SHARDING=True)
+    with patch("app.workers.memorize_activity.Settings", return_value=settings):
+        parts = await task_split_conversation(spec)
+    assert len(parts) > 1
+    for name in parts:
+        assert locate(tmp_path, name) == shard_dir(tmp_path, name) / name
+        assert locate(tmp_path, name).exists()
+
+
+# ── Retention ──
+
+
+@pytest.mark.asyncio
+async def test_release_deletes_files(tmp_path):
+    _write(tmp_path / "conversation-a.json", "x" * 100)
+    _write(storage_path(tmp_path, "conversation-b.json", sharded=True), "y" * 50)
+    names = ["conversation-a.json", "conversation-b.json", "gone.json"]
+    assert await release_files(LocalBlobStore(tmp_path), names, "delete") == 150
+    assert not locate(tmp_path, "conversation-a.json").exists()
+    assert not locate(tmp_path, "conversation-b.json").exists()
+    assert metrics.counter("memu_storage_bytes_reclaimed", {"reason": "completed"}) == 150
+    assert metrics.counter("memu_storage_files_removed", {"reason": "completed"}) == 2
+
+
+@pytest.mark.asyncio
+async def test_release_archives_files(tmp_path):
+    text = json.dumps(CONVERSATION)
+    _write(tmp_path / "conversation-a.json", text)
+    reclaimed = await release_files(LocalBlobStore(tmp_path), ["conversation-a.json"], "archive")
+    assert not (tmp_path / "conversation-a.json").exists()
+    archived = tmp_path / "conversation-a.json.gz"
+    assert gzip.decompress(archived.read_bytes()).decode("utf-8") == text
+    assert reclaimed == len(text) - archived.stat().st_size > 0
+    assert metrics.counter("memu_storage_files_archived") == 1
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_files_and_ignores_paths(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    _write(tmp_path / "conversation-a.json")
+    assert await release_files(store, ["conversation-a.json"], "keep") == 0
+    assert await release_files(store, ["../conversation-a.json", ""], "delete") == 0
+    assert (tmp_path / "conversation-a.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_release_activity_uses_the_retention_mode(tmp_path):
+    _write(tmp_path / "conversation-a.json", "x" * 10)
+    settings = MagicMock(
+        STORAGE_BACKEND="local", STORAGE_PATH=str(tmp_path), STORAGE_SHARDING=False, STORAGE_RETENTION_MODE="delete"
+    )
+    with patch("app.workers.storage_activity.Settings", return_value=settings):
+        assert await task_release_storage(["conversation-a.json"]) == 10
+    assert list(tmp_path.iterdir()) == []
+
+
+# ── Sweep ──
+
+
+def test_sweep_removes_old_orphans_and_archives(tmp_path):
+    day = 86400.0
+    old = _write(storage_path(tmp_path, "conversation-old.json", sharded=True), "x" * 10, age=2 * day)
+    fresh = _write(tmp_path / "conversation-new.json", age=60)
+    old_result = _write(tmp_path / "result-old.json", "y" * 5, age=2 * day)
+    old_archive = _write(tmp_path / "conversation-a.json.gz", "z" * 3, age=10 * day)
+    recent_archive = _write(tmp_path / "conversation-b.json.gz", age=2 * day)
+    unmanaged = _write(tmp_path / "notes.txt", age=10 * day)
+
+    swept = sweep(tmp_path, orphan_retention=day, archive_retention=7 * day)
+
+    assert (swept.orphans, swept.archives, swept.bytes_reclaimed) == (2, 1, 18)
+    assert not old.exists() and not old_result.exists() and not old_archive.exists()
+    assert fresh.exists() and recent_archive.exists() and unmanaged.exists()
+    assert metrics.counter("memu_storage_bytes_reclaimed", {"reason": "orphan"}) == 15
+    assert metrics.counter("memu_storage_files_removed", {"reason": "expired_archive"}) == 1
+
+
+def test_sweep_with_zero_retention_keeps_everything(tmp_path):
+    _write(tmp_path / "conversation-old.json", age=10 * 86400)
+    _write(tmp_path / "conversation-a.json.gz", age=10 * 86400)
+    assert sweep(tmp_path, 0, 0).bytes_reclaimed == 0
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+# ── API ──
+
+
+def test_api_writes_sharded_conversations(tmp_path):
+    from app.main import app, settings
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        patch.object(settings, "STORAGE_SHARDING", True),
+        TestClient(app) as client,
+    ):
+        client.app.state.temporal = temporal
+        try:
+            assert client.post("/memorize", json={"conversation": CONVERSATION, "user_id": "u1"}).status_code == 200
+        finally:
+            client.app.state.temporal = None
+    name = temporal.start_workflow.call_args.args[1]["resource_url"]
+    assert "/" not in name
+    assert (shard_dir(tmp_path, name) / name).exists()
+
+
+@pytest.mark.asyncio
+async def test_worker_starts_the_sweeper_only_with_a_retention(tmp_path):
+    from app.workers.worker import start_storage_sweeper
+
+    settings = MagicMock(
+        STORAGE_BACKEND="local",
+        STORAGE_PATH=str(tmp_path),
+        STORAGE_SHARDING=False,
+        STORAGE_ORPHAN_RETENTION_SECONDS=0.0,
+        STORAGE_ARCHIVE_RETENTION_SECONDS=0.0,
+        STORAGE_SWEEP_INTERVAL_SECONDS=3600.0,
+    )
+    assert start_storage_sweeper(settings) is None
+
+    settings.STORAGE_ORPHAN_RETENTION_SECONDS = 60.0
+    _write(tmp_path / "conversation-old.json", age=120)
+    task = start_storage_sweeper(settings)
+    assert task is not None
+    for _ in range(100):
+        if not (tmp_path / "conversation-old.json").exists():
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    assert not (tmp_path / "conversation-old.json").exists()
@@ -0,0 +1,471 @@
+"""Tests for task events: webhooks, the event broker and GET /memorize/events."""
+
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import ActivityEnvironment
+
+from app.services.task_events import (
+    EVENT_COMPLETED,
+    EVENT_FAILED,
+    TASK_EVENTS_CHANNEL,
+    EventBroker,
+    build_task_event,
+    format_sse,
+    publish_task_event,
+    stream_task_events,
+)
+from app.services.webhooks import (
+    WebhookDeliveryError,
+    deliver_webhook,
+    is_public_address,
+    sign_payload,
+    verify_signature,
+)
+from app.utils.metrics import metrics
+from app.workers.notification_activity import task_deliver_webhook, task_publish_event
+from config.settings import Settings
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _event(user_id: str = "u1", agent_id: str = "", status: str = "COMPLETED") -> dict:
+    spec = {"task_id": "abc", "user_id": user_id, "agent_id": agent_id}
+    return build_task_event("memorize-" + "a" * 32, spec, status, "SUCCESS", "2026-01-01T00:00:00+00:00")
+
+
+# ── Local webhook receiver ──
+
+# The receiver listens on loopback, which deliveries refuse unless allowed.
+_LOCAL = frozenset({"127.0.0.1"})
+
+
+class _Receiver:
+    """HTTP server on localhost answering each POST with the next queued status."""
+
+    def __init__(self, statuses: list[int]) -> None:
+        self.statuses = list(statuses)
+        self.requests: list[tuple[dict[str, str], bytes]] = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((dict(self.headers), body))
+                self.send_response(receiver.statuses.pop(0) if receiver.statuses else 200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True)
+
+    def __enter__(self) -> "_Receiver":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ── Webhook delivery ──
+
+
+def test_build_task_event_names_outcome():
+    assert _event(status="COMPLETED")["event"] == EVENT_COMPLETED
+    failed = _event(status="FAILED")
+    assert failed["event"] == EVENT_FAILED
+    assert failed["task_id"] == "memorize-" + "a" * 32
+    assert failed["user_id"] == "u1"
+
+
+@pytest.mark.asyncio
+async def test_webhook_is_signed():
+    event = _event()
+    with _Receiver([204]) as receiver:
+        status = await deliver_webhook(receiver.url, event, secret="s3cret", allowed_hosts=_LOCAL)
+    assert status == 204
+    headers, body = receiver.requests[0]
+    assert json.loads(body) == event
+    assert headers["X-Memu-Event"] == EVENT_COMPLETED
+    assert headers["X-Memu-Delivery"] == event["task_id"]
+    assert verify_signature("s3cret", headers["X-Memu-Timestamp"], body, headers["X-Memu-Signature"])
+    assert not verify_signature("other", headers["X-Memu-Timestamp"], body, headers["X-Memu-Signature"])
+
+
+@pytest.mark.asyncio
+async def test_webhook_unsigned_without_secret():
+    with _Receiver([200]) as receiver:
+        await deliver_webhook(receiver.url, _event(), allowed_hosts=_LOCAL)
+    assert "X-Memu-Signature" not in receiver.requests[0][0]
+
+
+def test_sign_payload_covers_timestamp():
+    assert sign_payload("k", "1", b"{}") != sign_payload("k", "2", b"{}")
+    assert sign_payload("k", "1", b"{}").startswith("sha256=")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("status", "retryable"),
+    [(500, True), (503, True), (429, True), (408, True), (400, False), (404, False), (410, False)],
+)
+async def test_webhook_error_classification(status, retryable):
+    with _Receiver([status]) as receiver:
+        with pytest.raises(WebhookDeliveryError) as exc_info:
+            await deliver_webhook(receiver.url, _event(), allowed_hosts=_LOCAL)
+    assert exc_info.value.retryable is retryable
+
+
+@pytest.mark.asyncio
+async def test_webhook_connection_error_is_retryable():
+    with _Receiver([]) as receiver:
+        url = receiver.url
+    with pytest.raises(WebhookDeliveryError) as exc_info:
+        await deliver_webhook(url, _event(), timeout=1.0, allowed_hosts=_LOCAL)
+    assert exc_info.value.retryable
+
+
+@pytest.mark.parametrize(
+    ("address", "public"),
+    [
+        ("93.184.216.34", True),
+        ("2606:4700::1111", True),
+        ("127.0.0.1", False),
+        ("10.1.2.3", False),
+        ("192.168.0.10", False),
+        ("169.254.169.254", False),
+        ("100.100.100.200", False),
+        ("0.0.0.0", False),
+        ("224.0.0.1", False),
+        ("::1", False),
+        ("fe80::1%eth0", False),
+        ("fd00:ec2::254", False),
+        ("::ffff:127.0.0.1", False),
+    ],
+)
+def test_is_public_address(address, public):
+    assert is_public_address(address) is public
+
+
+@pytest.mark.asyncio
+async def test_webhook_to_loopback_is_refused_unless_allowed():
+    with _Receiver([200]) as receiver:
+        with pytest.raises(WebhookDeliveryError) as exc_info:
+            await deliver_webhook(receiver.url, _event())
+    assert not exc_info.value.retryable
+    assert receiver.requests == []
+
+
+def _resolving(*addresses: str):
+    infos = [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, 443)) for a in addresses]
+    return patch("socket.getaddrinfo", return_value=infos)
+
+
+@pytest.mark.asyncio
+async def test_webhook_connects_to_the_checked_address():
+    sent: list[httpx.Request] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return httpx.Response(200)
+
+    with _resolving("93.184.216.34"):
+        await deliver_webhook("https://hooks.example:8443/done", _event(), transport=httpx.MockTransport(_handler))
+
+    assert sent[0].url == "https://93.184.216.34:8443/done"
+    assert sent[0].headers["Host"] == "hooks.example:8443"
+    assert sent[0].extensions["sni_hostname"] == "hooks.example"
+
+
+@pytest.mark.asyncio
+async def test_webhook_host_with_any_private_address_is_refused():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    with _resolving("93.184.216.34", "169.254.169.254"), pytest.raises(WebhookDeliveryError) as exc_info:
+        await deliver_webhook("http://metadata.example/latest", _event(), transport=transport)
+    assert not exc_info.value.retryable
+    assert "169.254.169.254" in str(exc_info.value)
+
+
+@pytest.mark.asyncio
+async def test_webhook_host_that_does_not_resolve_is_retryable():
+    with (
+        patch("socket.getaddrinfo", side_effect=socket.gaierror("temporary failure")),
+        pytest.raises(WebhookDeliveryError) as exc_info,
+    ):
+        await deliver_webhook("https://hooks.example/done", _event())
+    assert exc_info.value.retryable
+
+
+def test_webhook_allowed_hosts_setting():
+    settings = Settings(OPENAI_API_KEY="sk-test", WEBHOOK_ALLOWED_HOSTS=" Hooks.Internal ,127.0.0.1,")
+    assert settings.webhook_allowed_hosts == {"hooks.internal", "127.0.0.1"}
+
+
+def _worker_settings(**overrides) -> SimpleNamespace:
+    values = {
+        "NOTIFICATIONS_BACKEND": "postgres",
+        "postgres_dsn": "postgresql://x",
+        "WEBHOOK_SIGNING_SECRET": "s3cret",
+        "WEBHOOK_TIMEOUT_SECONDS": 1.0,
+        "webhook_allowed_hosts": _LOCAL,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.asyncio
+async def test_deliver_webhook_activity_succeeds():
+    with (
+        patch("app.workers.notification_activity.Settings", return_value=_worker_settings()),
+        _Receiver([200]) as receiver,
+    ):
+        status = await ActivityEnvironment().run(task_deliver_webhook, _event(), receiver.url)
+    assert status == 200
+    assert metrics.counter("memu_webhook_deliveries") == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("status", "non_retryable"), [(500, False), (422, True)])
+async def test_deliver_webhook_activity_marks_permanent_failures(status, non_retryable):
+    with (
+        patch("app.workers.notification_activity.Settings", return_value=_worker_settings()),
+        _Receiver([status]) as receiver,
+    ):
+        with pytest.raises(ApplicationError) as exc_info:
+            await ActivityEnvironment().run(task_deliver_webhook, _event(), receiver.url)
+    assert exc_info.value.non_retryable is non_retryable
+    assert exc_info.value.type == "WebhookDeliveryError"
+
+
+def _retried_by(policy, failure: ApplicationError, attempt: int) -> bool:
+    """Temporal's retry decision for an activity failing with ``failure`` on ``attempt``."""
+    if failure.non_retryable or failure.type in (policy.non_retryable_error_types or ()):
+        return False
+    return not policy.maximum_attempts or attempt < policy.maximum_attempts
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("status", "retried"), [(503, True), (429, True), (404, False)])
+async def test_webhook_retry_policy_retries_transient_failures(status, retried):
+    from app.workers.webhook_workflow import WEBHOOK_RETRY_POLICY
+
+    with (
+        patch("app.workers.notification_activity.Settings", return_value=_worker_settings()),
+        _Receiver([status]) as receiver,
+    ):
+        with pytest.raises(ApplicationError) as exc_info:
+            await ActivityEnvironment().run(task_deliver_webhook, _event(), receiver.url)
+
+    assert _retried_by(WEBHOOK_RETRY_POLICY, exc_info.value, attempt=1) is retried
+
+
+@pytest.mark.asyncio
+async def test_notify_hands_the_webhook_to_an_abandoned_child_workflow():
+    from temporalio.workflow import ParentClosePolicy
+
+    from app.workers.memorize_workflow import MemorizeWorkflow
+    from app.workers.webhook_workflow import WebhookDeliveryWorkflow
+
+    spec = {"task_id": "abc", "user_id": "u1", "callback_url": "https://hooks.example/done"}
+    info = SimpleNamespace(workflow_id="memorize-abc", run_id="run-1")
+    with (
+        patch("app.workers.memorize_workflow.workflow.info", return_value=info),
+        patch("app.workers.memorize_workflow.workflow.now", return_value=MagicMock(isoformat=lambda: "now")),
+        patch("app.workers.memorize_workflow.workflow.execute_activity", AsyncMock()) as execute_activity,
+        patch("app.workers.memorize_workflow.workflow.start_child_workflow", AsyncMock()) as start_child,
+    ):
+        await MemorizeWorkflow()._notify(spec, "COMPLETED", "SUCCESS")
+
+    # Only the event is published by the task itself; the webhook is not awaited.
+    assert [call.args[0] for call in execute_activity.call_args_list] == [task_publish_event]
+    start_child.assert_awaited_once()
+    assert start_child.call_args.args == (WebhookDeliveryWorkflow.run,)
+    kwargs = start_child.call_args.kwargs
+    assert kwargs["args"][1] == "https://hooks.example/done"
+    assert kwargs["id"] == "memorize-abc-webhook-run-1"
+    assert kwargs["parent_close_policy"] == ParentClosePolicy.ABANDON
+
+
+@pytest.mark.asyncio
+async def test_publish_event_activity_notifies_in_postgres_mode():
+    event = _event()
+    with (
+        patch("app.workers.notification_activity.Settings", return_value=_worker_settings()),
+        patch("app.workers.notification_activity.publish_task_event", AsyncMock()) as publish,
+    ):
+        await task_publish_event(event)
+    publish.assert_awaited_once_with("postgresql://x", event)
+
+
+@pytest.mark.asyncio
+async def test_publish_event_activity_noop_in_local_mode():
+    with (
+        patch(
+            "app.workers.notification_activity.Settings",
+            return_value=_worker_settings(NOTIFICATIONS_BACKEND="local"),
+        ),
+        patch("app.workers.notification_activity.publish_task_event", AsyncMock()) as publish,
+    ):
+        await task_publish_event(_event())
+    publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_publish_task_event_uses_events_channel():
+    with patch("app.services.task_events.notify", AsyncMock()) as notify:
+        await publish_task_event("postgresql://x", _event())
+    channel, payload = notify.await_args.args[1:]
+    assert channel == TASK_EVENTS_CHANNEL
+    assert json.loads(payload) == _event()
+
+
+# ── Broker ──
+
+
+@pytest.mark.asyncio
+async def test_broker_fans_out_per_user():
+    broker = EventBroker()
+    a, b, other = broker.subscribe("u1"), broker.subscribe("u1"), broker.subscribe("u2")
+    broker.publish(_event("u1"))
+    assert a.qsize() == b.qsize() == 1
+    assert other.empty()
+    broker.unsubscribe("u1", a)
+    broker.unsubscribe("u1", b)
+    assert broker.subscriber_count("u1") == 0
+    assert broker.subscriber_count() == 1
+
+
+@pytest.mark.asyncio
+async def test_broker_drops_oldest_when_subscriber_lags():
+    broker = EventBroker(queue_size=2)
+    queue = broker.subscribe("u1")
+    for status in ("COMPLETED", "FAILED", "COMPLETED"):
+        broker.publish(_event(status=status))
+    assert [queue.get_nowait()["event"] for _ in range(2)] == [EVENT_FAILED, EVENT_COMPLETED]
+    assert metrics.counter("memu_task_events_dropped") == 1
+
+
+def test_broker_ignores_malformed_payloads():
+    broker = EventBroker()
+    queue = broker.subscribe("u1")
+    broker.publish_raw("not json")
+    broker.publish_raw("[1, 2]")
+    broker.publish_raw(json.dumps(_event("u1")))
+    assert queue.qsize() == 1
+
+
+# ── SSE stream ──
+
+
+def test_format_sse():
+    frame = format_sse(_event())
+    lines = frame.rstrip("\n").split("\n")
+    assert lines[0] == f"event: {EVENT_COMPLETED}"
+    assert lines[1] == "id: memorize-" + "a" * 32
+    assert json.loads(lines[2].removeprefix("data: ")) == _event()
+    assert frame.endswith("\n\n")
+
+
+@pytest.mark.asyncio
+async def test_stream_filters_by_agent_and_unsubscribes():
+    broker = EventBroker()
+    stream = stream_task_events(broker, "u1", "agent-a", AsyncMock(return_value=False), keepalive_seconds=5)
+    assert await anext(stream) == "retry: 5000\n\n"
+    broker.publish(_event(agent_id="agent-b"))
+    broker.publish(_event(agent_id="agent-a"))
+    frame = await anext(stream)
+    assert '"agent_id":"agent-a"' in frame
+    await stream.aclose()
+    assert broker.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_keepalive_and_stops_on_disconnect():
+    broker = EventBroker()
+    disconnected = AsyncMock(side_effect=[False, True])
+    frames = [frame async for frame in stream_task_events(broker, "u1", None, disconnected, keepalive_seconds=0.01)]
+    assert frames == ["retry: 5000\n\n", ": keepalive\n\n"]
+    assert broker.subscriber_count() == 0
+
+
+# ── Endpoints ──
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    temporal.start_workflow = AsyncMock(return_value=None)
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def test_memorize_passes_callback_url(client):
+    response = client.post(
+        "/memorize",
+        json={"conversation": [], "user_id": "u1", "callback_url": "https://hooks.example.com/memu"},
+    )
+    assert response.status_code == 200
+    spec = client.app.state.temporal.start_workflow.call_args.args[1]
+    assert spec["callback_url"] == "https://hooks.example.com/memu"
+
+
+def test_memorize_without_callback_url_omits_it(client):
+    client.post("/memorize", json={"conversation": [], "user_id": "u1"})
+    assert "callback_url" not in client.app.state.temporal.start_workflow.call_args.args[1]
+
+
+@pytest.mark.parametrize("url", ["ftp://example.com/hook", "not a url"])
+def test_memorize_rejects_non_http_callback_url(client, url):
+    response = client.post("/memorize", json={"conversation": [], "user_id": "u1", "callback_url": url})
+    assert response.status_code == 422
+
+
+def test_events_requires_user_id(client):
+    assert client.get("/memorize/events").status_code == 422
+    assert client.get("/memorize/events", params={"user_id": "  "}).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_events_endpoint_streams_broker_events():
+    from app.main import memorize_events
+
+    broker = EventBroker()
+    request = MagicMock()
+    request.app.state.task_events = broker
+    request.is_disconnected = AsyncMock(return_value=False)
+    response = await memorize_events(request, user_id=" u1 ")
+    assert response.media_type == "text/event-stream"
+    body = response.body_iterator
+    assert await anext(body) == "retry: 5000\n\n"
+    broker.publish(_event("u1"))
+    assert (await asyncio.wait_for(anext(body), 1)).startswith(f"event: {EVENT_COMPLETED}\n")
+    await body.aclose()  # type: ignore[attr-defined]
@@ -0,0 +1,90 @@
+"""Tests for the interactive/bulk task queues and their metrics."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from temporalio.api.enums.v1 import TaskQueueType
+from temporalio.api.taskqueue.v1 import TaskQueueStats
+from temporalio.api.workflowservice.v1 import DescribeTaskQueueResponse
+
+from app.utils.metrics import metrics
+from app.workers.task_queues import (
+    BULK_TASK_QUEUE,
+    TASK_QUEUE,
+    TaskQueueMetricsInterceptor,
+    run_backlog_monitor,
+    sample_backlog,
+    task_queue_for,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_task_queue_for_priority():
+    assert task_queue_for(None) == TASK_QUEUE
+    assert task_queue_for("interactive") == TASK_QUEUE
+    assert task_queue_for("bulk") == BULK_TASK_QUEUE
+
+
+async def test_interceptor_records_queueing_and_run_time_per_queue():
+    info = SimpleNamespace(
+        task_queue=BULK_TASK_QUEUE,
+        activity_type="task_memorize",
+        current_attempt_scheduled_time=datetime.now(UTC) - timedelta(seconds=5),
+    )
+    inner = MagicMock()
+    inner.execute_activity = AsyncMock(return_value="done")
+    interceptor = TaskQueueMetricsInterceptor().intercept_activity(inner)
+
+    with patch("app.workers.task_queues.activity.info", return_value=info):
+        assert await interceptor.execute_activity(MagicMock()) == "done"
+
+    attributes = {"queue": BULK_TASK_QUEUE, "activity": "task_memorize"}
+    waited = metrics.timing("memu_task_queue_schedule_to_start_seconds", attributes)
+    assert waited.count == 1
+    assert waited.max == pytest.approx(5, abs=1)
+    assert metrics.timing("memu_task_queue_activity_seconds", attributes).count == 1
+
+
+async def test_sample_backlog_sets_gauges_per_queue_and_type():
+    def _describe(request):
+        count = 7 if request.task_queue_type == TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY else 2
+        response = DescribeTaskQueueResponse(stats=TaskQueueStats(approximate_backlog_count=count))
+        response.stats.approximate_backlog_age.FromTimedelta(timedelta(seconds=count * 10))
+        return response
+
+    client = MagicMock(namespace="default")
+    client.workflow_service.describe_task_queue = AsyncMock(side_effect=_describe)
+
+    await sample_backlog(client, BULK_TASK_QUEUE)
+
+    request = client.workflow_service.describe_task_queue.call_args.args[0]
+    assert request.task_queue.name == BULK_TASK_QUEUE
+    assert request.report_stats
+    assert metrics.gauge("memu_task_queue_backlog", {"queue": BULK_TASK_QUEUE, "type": "activity"}) == 7
+    assert metrics.gauge("memu_task_queue_backlog", {"queue": BULK_TASK_QUEUE, "type": "workflow"}) == 2
+    assert metrics.gauge("memu_task_queue_backlog_age_seconds", {"queue": BULK_TASK_QUEUE, "type": "activity"}) == 70
+
+
+async def test_backlog_monitor_keeps_going_after_errors():
+    client = MagicMock(namespace="default")
+    client.workflow_service.describe_task_queue = AsyncMock(
+        side_effect=[RuntimeError("unavailable"), DescribeTaskQueueResponse(), DescribeTaskQueueResponse()]
+    )
+    sleep = AsyncMock(side_effect=asyncio.CancelledError)
+
+    with patch("app.workers.task_queues.asyncio.sleep", sleep), pytest.raises(asyncio.CancelledError):
+        await run_backlog_monitor(client, [TASK_QUEUE, BULK_TASK_QUEUE], 30)
+
+    sleep.assert_awaited_once_with(30)
+    # The interactive queue failed; the bulk one was still sampled.
+    assert metrics.gauge("memu_task_queue_backlog", {"queue": BULK_TASK_QUEUE, "type": "activity"}) == 0
+    assert metrics.gauge("memu_task_queue_backlog", {"queue": TASK_QUEUE, "type": "activity"}) is None
@@ -0,0 +1,171 @@
+"""Tests for compact memorize results and GET /memorize/result/{task_id}."""
+
+import json
+from enum import Enum
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.blob_store import LocalBlobStore
+from app.services.memu import MemoryServiceCache
+from app.services.task_results import load_result, result_filename, store_result, summarize_result
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.memorize_activity import task_memorize, task_memorize_merged
+
+TASK_ID = "memorize-aabbccdd11223344aabbccdd11223344"
+MEMU_RESULT = {
+    "resource": {"id": "r1"},
+    "items": [{"id": "i1"}, {"id": "i2"}],
+    "categories": [{"id": "c1"}],
+    "relations": [],
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
+
+# ── Helpers ──
+
+
+def test_summarize_result():
+    assert summarize_result(MEMU_RESULT) == {"items": 2, "categories": 1, "resources": 1}
+    assert summarize_result({"resources": [{}, {}], "items": []}) == {"items": 0, "categories": 0, "resources": 2}
+    assert summarize_result("not a dict") == {"items": 0, "categories": 0, "resources": 0}
+
+
+@pytest.mark.asyncio
+async def test_store_and_load_round_trip(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    ref = await store_result(store, "abc", MEMU_RESULT)
+    assert ref == "result-abc.json"
+    assert await load_result(store, ref) == MEMU_RESULT
+    assert [p.name for p in tmp_path.iterdir()] == [ref]
+
+
+@pytest.mark.parametrize("bad", ["../x", "a/b", ""])
+def test_result_ids_cannot_escape_storage(bad):
+    with pytest.raises(ValueError):
+        result_filename(bad)
+
+
+@pytest.mark.asyncio
+async def test_load_rejects_foreign_references(tmp_path):
+    with pytest.raises(ValueError):
+        await load_result(LocalBlobStore(tmp_path), "../conversation-x.json")
+
+
+# ── Activities ──
+
+
+def _settings(tmp_path, compact: bool) -> MagicMock:
+    return MagicMock(
+        MEMORIZE_COMPACT_RESULTS=compact,
+        STORAGE_SHARDING=False,
+        STORAGE_RETENTION_MODE="keep",
+        STORAGE_PATH=str(tmp_path),
+    )
+
+
+@pytest.mark.asyncio
+async def test_compact_task_memorize_offloads_the_result(tmp_path):
+    (tmp_path / "conversation-abc.json").write_text("[]", "utf-8")
+    service = MagicMock()
+    service.memorize = AsyncMock(return_value=MEMU_RESULT)
+    with (
+        patch("app.workers.memorize_activity.Settings", return_value=_settings(tmp_path, True)),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize({"task_id": "abc", "resource_url": "conversation-abc.json", "user_id": "u1"})
+
+    assert "result" not in result
+    assert result["summary"] == {"items": 2, "categories": 1, "resources": 1}
+    assert result["result_ref"] == "result-abc.json"
+    assert result["duration_seconds"] >= 0
+    assert json.loads((tmp_path / "result-abc.json").read_text("utf-8")) == MEMU_RESULT
+    assert len(json.dumps(result)) < 300
+
+
+@pytest.mark.asyncio
+async def test_compact_merged_result_is_stored_once(tmp_path):
+    (tmp_path / "conversation-a.json").write_text("[]", "utf-8")
+    (tmp_path / "conversation-b.json").write_text("[]", "utf-8")
+    specs = [
+        {"task_id": "a", "resource_url": "conversation-a.json", "user_id": "u1"},
+        {"task_id": "b", "resource_url": "conversation-b.json", "user_id": "u1"},
+    ]
+    service = MagicMock()
+    service.memorize = AsyncMock(return_value=MEMU_RESULT)
+    with (
+        patch("app.workers.memorize_activity.Settings", return_value=_settings(tmp_path, True)),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=service),
+    ):
+        result = await task_memorize_merged(specs)
+    assert result["result_ref"].startswith("result-merged-")
+    assert await load_result(LocalBlobStore(tmp_path), result["result_ref"]) == MEMU_RESULT
+
+
+# ── API ──
+
+
+class _FakeStatus(Enum):
+    RUNNING = 1
+    COMPLETED = 2
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.main import app
+
+    temporal = MagicMock()
+    with (
+        patch("app.main.create_memory_service", return_value=MagicMock()),
+        patch("app.main.storage_dir", tmp_path),
+        TestClient(app) as test_client,
+    ):
+        test_client.app.state.temporal = temporal
+        try:
+            yield test_client
+        finally:
+            test_client.app.state.temporal = None
+
+
+def _workflow(client, status: str, outcome: object = None) -> MagicMock:
+    handle = MagicMock()
+    handle.describe = AsyncMock(return_value=MagicMock(status=getattr(_FakeStatus, status)))
+    handle.result = AsyncMock(return_value=outcome)
+    client.app.state.temporal.get_workflow_handle.return_value = handle
+    return handle
+
+
+def test_result_endpoint_reads_offloaded_result(client, tmp_path):
+    (tmp_path / "result-abc.json").write_text(json.dumps(MEMU_RESULT), "utf-8")
+    _workflow(client, "COMPLETED", {"status": "SUCCESS", "result_ref": "result-abc.json"})
+    response = client.get(f"/memorize/result/{TASK_ID}")
+    assert response.status_code == 200
+    assert response.json()["result"] == {"task_id": TASK_ID, "result": MEMU_RESULT}
+
+
+def test_result_endpoint_serves_full_results(client):
+    _workflow(client, "COMPLETED", {"status": "SUCCESS", "result": MEMU_RESULT})
+    assert client.get(f"/memorize/result/{TASK_ID}").json()["result"]["result"] == MEMU_RESULT
+
+
+def test_result_endpoint_errors(client):
+    _workflow(client, "RUNNING")
+    assert client.get(f"/memorize/result/{TASK_ID}").status_code == 409
+
+    _workflow(client, "COMPLETED", {"status": "SUCCESS", "chunks": 3})
+    client.app.state.status_cache.discard(TASK_ID)
+    assert client.get(f"/memorize/result/{TASK_ID}").status_code == 404
+
+    _workflow(client, "COMPLETED", {"status": "SUCCESS", "result_ref": "result-gone.json"})
+    assert client.get(f"/memorize/result/{TASK_ID}").status_code == 410
+
+    assert client.get("/memorize/result/not-a-task").status_code == 422
@@ -6,9 +6,35 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.workers.memorize_activity import task_memorize
+from app.services.memu import MemoryServiceCache
+from app.services.payload_codec import CompressionCodec
+from app.utils.metrics import metrics
+from app.workers import memorize_activity
+from app.workers.coalesce_activity import task_enqueue_coalesced
+from app.workers.coalesce_workflow import MemorizeCoalesceWorkflow
+from app.workers.invalidation_activity import task_invalidate_cache
+from app.workers.memorize_activity import (
+    task_consolidate_categories,
+    task_memorize,
+    task_memorize_chunk,
+    task_memorize_merged,
+    task_split_conversation,
+)
 from app.workers.memorize_workflow import MemorizeWorkflow
-from app.workers.worker import TASK_QUEUE, create_temporal_client, run_worker
+from app.workers.notification_activity import task_deliver_webhook, task_publish_event
+from app.workers.storage_activity import task_release_storage
+from app.workers.webhook_workflow import WebhookDeliveryWorkflow
+from app.workers.worker import BULK_TASK_QUEUE, TASK_QUEUE, create_temporal_client, run_worker
+
+
+@pytest.fixture(autouse=True)
+def fresh_service_cache():
+    """Give each test its own MemoryService cache so mocks don't leak between tests."""
+    memorize_activity._service_cache = MemoryServiceCache(max_size=2)
+    metrics.reset()
+    yield
+    memorize_activity.close_service_cache()
+
 
 # ── Activity tests ──
 
@@ -29,6 +55,7 @@ async def test_task_memorize_success():
 
     mock_settings = MagicMock()
     mock_settings.STORAGE_PATH = "/data/storage"
+    mock_settings.MEMORIZE_COMPACT_RESULTS = False
 
     with (
         patch("app.workers.memorize_activity.Settings", return_value=mock_settings),
@@ -57,6 +84,7 @@ async def test_task_memorize_with_override_config():
     mock_service.memorize = AsyncMock(return_value={})
     mock_settings = MagicMock()
     mock_settings.STORAGE_PATH = "/data/storage"
+    mock_settings.MEMORIZE_COMPACT_RESULTS = False
 
     spec_with_override = {
         **SAMPLE_SPEC,
@@ -84,7 +112,15 @@ async def test_task_memorize_failure():
     mock_service.memorize = AsyncMock(side_effect=RuntimeError("DB connection failed"))
 
     with (
-        patch("app.workers.memorize_activity.Settings", return_value=MagicMock(STORAGE_PATH="/data/storage")),
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
         patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service),
         pytest.raises(ApplicationError, match="Memorize activity failed for task"),
     ):
@@ -182,7 +218,15 @@ async def test_task_memorize_default_task_id():
     spec_no_id = {k: v for k, v in SAMPLE_SPEC.items() if k != "task_id"}
 
     with (
-        patch("app.workers.memorize_activity.Settings", return_value=MagicMock(STORAGE_PATH="/data/storage")),
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
         patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service),
     ):
         result = await task_memorize(spec_no_id)
@@ -200,7 +244,15 @@ async def test_task_memorize_default_agent_id():
     spec_no_agent = {k: v for k, v in SAMPLE_SPEC.items() if k != "agent_id"}
 
     with (
-        patch("app.workers.memorize_activity.Settings", return_value=MagicMock(STORAGE_PATH="/data/storage")),
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
         patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service),
     ):
         await task_memorize(spec_no_agent)
@@ -210,6 +262,89 @@ async def test_task_memorize_default_agent_id():
     assert call_kwargs["user"]["agent_id"] == ""
 
 
+# ── MemoryService cache tests ──
+
+
+@pytest.mark.asyncio
+async def test_task_memorize_reuses_cached_service():
+    """Tasks with the same override_config share one MemoryService."""
+    mock_service = MagicMock()
+    mock_service.memorize = AsyncMock(return_value={})
+
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service) as mock_create,
+    ):
+        await task_memorize(SAMPLE_SPEC)
+        await task_memorize({**SAMPLE_SPEC, "task_id": "test-task-002"})
+
+    mock_create.assert_called_once()
+    assert mock_service.memorize.call_count == 2
+    assert metrics.counter("memu_service_cache_hits") == 1
+    assert metrics.counter("memu_service_cache_misses") == 1
+    assert metrics.timing("memu_memorize_setup_seconds").count == 2
+
+
+@pytest.mark.asyncio
+async def test_task_memorize_separate_service_per_override_config():
+    """Different override_config values get different services; key order does not matter."""
+    services = [MagicMock(memorize=AsyncMock(return_value={})) for _ in range(2)]
+
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", side_effect=services) as mock_create,
+    ):
+        await task_memorize({**SAMPLE_SPEC, "override_config": {"a": 1, "b": 2}})
+        await task_memorize({**SAMPLE_SPEC, "override_config": {"b": 2, "a": 1}})
+        await task_memorize(SAMPLE_SPEC)
+
+    assert mock_create.call_count == 2
+    assert services[0].memorize.call_count == 2
+    assert services[1].memorize.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_task_memorize_evicted_service_is_closed():
+    """LRU eviction closes the evicted service's database engine."""
+    services = [MagicMock(memorize=AsyncMock(return_value={})) for _ in range(3)]
+
+    with (
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
+        patch("app.workers.memorize_activity.create_memory_service", side_effect=services),
+    ):
+        for i in range(3):
+            await task_memorize({**SAMPLE_SPEC, "override_config": {"variant": i}})
+
+    services[0].database.close.assert_called_once()
+    services[1].database.close.assert_not_called()
+    services[2].database.close.assert_not_called()
+    assert metrics.counter("memu_service_cache_evictions") == 1
+
+
 # ── Serialization tests (via public API) ──
 
 
@@ -225,7 +360,15 @@ async def test_task_memorize_serializes_result():
     mock_service.memorize = AsyncMock(return_value=NonSerializable())
 
     with (
-        patch("app.workers.memorize_activity.Settings", return_value=MagicMock(STORAGE_PATH="/data/storage")),
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
         patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service),
     ):
         result = await task_memorize(SAMPLE_SPEC)
@@ -241,7 +384,15 @@ async def test_task_memorize_passes_serializable_result():
     mock_service.memorize = AsyncMock(return_value={"count": 5})
 
     with (
-        patch("app.workers.memorize_activity.Settings", return_value=MagicMock(STORAGE_PATH="/data/storage")),
+        patch(
+            "app.workers.memorize_activity.Settings",
+            return_value=MagicMock(
+                MEMORIZE_COMPACT_RESULTS=False,
+                STORAGE_SHARDING=False,
+                STORAGE_RETENTION_MODE="keep",
+                STORAGE_PATH="/data/storage",
+            ),
+        ),
         patch("app.workers.memorize_activity.create_memory_service", return_value=mock_service),
     ):
         result = await task_memorize(SAMPLE_SPEC)
@@ -276,14 +427,17 @@ async def test_create_temporal_client():
         settings = MagicMock()
         settings.temporal_url = "localhost:7233"
         settings.TEMPORAL_NAMESPACE = "test-ns"
+        settings.TEMPORAL_PAYLOAD_COMPRESSION_MIN_BYTES = 1024
 
         client = await create_temporal_client(settings)
 
     assert client == mock_client
-    mock_client_cls.connect.assert_called_once_with(
-        "localhost:7233",
-        namespace="test-ns",
-    )
+    mock_client_cls.connect.assert_called_once()
+    args, kwargs = mock_client_cls.connect.call_args
+    assert args == ("localhost:7233",)
+    assert kwargs["namespace"] == "test-ns"
+    assert isinstance(kwargs["data_converter"].payload_codec, CompressionCodec)
+    assert kwargs["data_converter"].payload_codec.min_bytes == 1024
 
 
 @pytest.mark.asyncio
@@ -307,12 +461,50 @@ async def test_run_worker_registers_workflow_and_activities():
         with pytest.raises(asyncio.CancelledError):
             await run_worker(mock_client)
 
-    mock_worker_cls.assert_called_once()
-    call_kwargs = mock_worker_cls.call_args[1]
-    assert call_kwargs["task_queue"] == TASK_QUEUE
-    assert MemorizeWorkflow in call_kwargs["workflows"]
-    assert task_memorize in call_kwargs["activities"]
-    assert call_kwargs["identity"].startswith(f"{TASK_QUEUE}@")
+    # One worker per task queue, each running everything.
+    assert [c.kwargs["task_queue"] for c in mock_worker_cls.call_args_list] == [TASK_QUEUE, BULK_TASK_QUEUE]
+    for call in mock_worker_cls.call_args_list:
+        call_kwargs = call.kwargs
+        assert MemorizeWorkflow in call_kwargs["workflows"]
+        assert task_memorize in call_kwargs["activities"]
+        assert task_invalidate_cache in call_kwargs["activities"]
+        assert task_publish_event in call_kwargs["activities"]
+        assert task_deliver_webhook in call_kwargs["activities"]
+        assert task_release_storage in call_kwargs["activities"]
+        assert task_memorize_merged in call_kwargs["activities"]
+        assert task_enqueue_coalesced in call_kwargs["activities"]
+        for chunk_activity in (task_split_conversation, task_memorize_chunk, task_consolidate_categories):
+            assert chunk_activity in call_kwargs["activities"]
+        assert MemorizeCoalesceWorkflow in call_kwargs["workflows"]
+        assert WebhookDeliveryWorkflow in call_kwargs["workflows"]
+        assert call_kwargs["identity"].startswith(f"{call_kwargs['task_queue']}@")
+
+
+@pytest.mark.asyncio
+async def test_run_worker_closes_service_cache_on_shutdown():
+    """Cached MemoryService engines are released when the worker stops."""
+    cached = MagicMock()
+    memorize_activity._service_cache = MemoryServiceCache()
+    with memorize_activity._service_cache.lease("k", lambda: cached):
+        pass
+
+    mock_future = asyncio.Future()
+    mock_future.cancel()
+
+    with (
+        patch("app.workers.worker.Worker") as mock_worker_cls,
+        patch("asyncio.Future", return_value=mock_future),
+    ):
+        mock_worker_instance = MagicMock()
+        mock_worker_instance.__aenter__ = AsyncMock(return_value=mock_worker_instance)
+        mock_worker_instance.__aexit__ = AsyncMock(return_value=False)
+        mock_worker_cls.return_value = mock_worker_instance
+
+        with pytest.raises(asyncio.CancelledError):
+            await run_worker(MagicMock())
+
+    cached.database.close.assert_called_once()
+    assert memorize_activity._service_cache is None
 
 
 @pytest.mark.asyncio
@@ -328,3 +520,136 @@ async def test_async_main_validates_openai_api_key():
         pytest.raises(SystemExit, match="OPENAI_API_KEY"),
     ):
         await async_main()
+
+
+def _settings(**overrides):
+    from config.settings import Settings
+
+    return Settings(**{"OPENAI_API_KEY": "sk-test", **overrides})
+
+
+def test_worker_tuning_keeps_sdk_defaults_when_unset():
+    from app.workers.worker import worker_tuning
+
+    assert worker_tuning(_settings()) == {}
+
+
+def test_worker_tuning_from_settings():
+    from datetime import timedelta
+
+    from app.workers.worker import worker_tuning
+
+    tuning = worker_tuning(
+        _settings(
+            WORKER_MAX_CONCURRENT_ACTIVITIES=40,
+            WORKER_MAX_CONCURRENT_WORKFLOW_TASKS=20,
+            WORKER_MAX_ACTIVITY_TASK_POLLS=8,
+            WORKER_MAX_WORKFLOW_TASK_POLLS=4,
+            WORKER_MAX_CACHED_WORKFLOWS=500,
+            WORKER_GRACEFUL_SHUTDOWN_SECONDS=30,
+        )
+    )
+
+    assert tuning == {
+        "max_concurrent_activities": 40,
+        "max_concurrent_workflow_tasks": 20,
+        "max_concurrent_activity_task_polls": 8,
+        "max_concurrent_workflow_task_polls": 4,
+        "max_cached_workflows": 500,
+        "graceful_shutdown_timeout": timedelta(seconds=30),
+    }
+
+
+@pytest.mark.asyncio
+async def test_run_worker_applies_tuning():
+    mock_future = asyncio.Future()
+    mock_future.cancel()
+
+    with (
+        patch("app.workers.worker.Worker") as mock_worker_cls,
+        patch("asyncio.Future", return_value=mock_future),
+    ):
+        mock_worker_instance = MagicMock()
+        mock_worker_instance.__aenter__ = AsyncMock(return_value=mock_worker_instance)
+        mock_worker_instance.__aexit__ = AsyncMock(return_value=False)
+        mock_worker_cls.return_value = mock_worker_instance
+
+        with pytest.raises(asyncio.CancelledError):
+            await run_worker(MagicMock(), _settings(WORKER_MAX_CONCURRENT_ACTIVITIES=7, WORKER_BULK_QUEUE_WEIGHT=0))
+
+    mock_worker_cls.assert_called_once()
+    assert mock_worker_cls.call_args[1]["task_queue"] == TASK_QUEUE
+    assert mock_worker_cls.call_args[1]["max_concurrent_activities"] == 7
+    assert "max_concurrent_workflow_tasks" not in mock_worker_cls.call_args[1]
+
+
+def test_queue_tuning_splits_slots_by_weight():
+    from app.workers.worker import queue_tuning
+
+    tuning = queue_tuning(_settings(WORKER_MAX_CONCURRENT_ACTIVITIES=40, WORKER_GRACEFUL_SHUTDOWN_SECONDS=5))
+
+    interactive, bulk = tuning[TASK_QUEUE], tuning[BULK_TASK_QUEUE]
+    assert (interactive["max_concurrent_activities"], bulk["max_concurrent_activities"]) == (30, 10)
+    # Unset limits split the SDK defaults.
+    assert (interactive["max_concurrent_workflow_tasks"], bulk["max_concurrent_workflow_tasks"]) == (75, 25)
+    assert (interactive["max_concurrent_activity_task_polls"], bulk["max_concurrent_activity_task_polls"]) == (4, 1)
+    assert bulk["max_concurrent_workflow_task_polls"] == 2  # at least 2 with a workflow cache
+    assert interactive["graceful_shutdown_timeout"] == bulk["graceful_shutdown_timeout"]
+
+
+def test_queue_tuning_polls_only_weighted_queues():
+    from app.workers.worker import queue_tuning
+
+    assert list(queue_tuning(_settings(WORKER_INTERACTIVE_QUEUE_WEIGHT=0))) == [BULK_TASK_QUEUE]
+    with pytest.raises(ValueError, match="WEIGHT"):
+        queue_tuning(_settings(WORKER_INTERACTIVE_QUEUE_WEIGHT=0, WORKER_BULK_QUEUE_WEIGHT=0))
+
+
+def test_metrics_bind_address_offset_per_process():
+    from app.workers.worker import metrics_bind_address
+
+    assert metrics_bind_address("0.0.0.0:9464", 0) == "0.0.0.0:9464"
+    assert metrics_bind_address("0.0.0.0:9464", 3) == "0.0.0.0:9467"
+    assert metrics_bind_address("[::]:9464", 1) == "[::]:9465"
+    assert metrics_bind_address("", 2) == ""
+
+
+def test_main_runs_single_process_by_default():
+    from app.workers import worker
+
+    with (
+        patch("app.workers.worker.Settings", return_value=_settings()),
+        patch("app.workers.worker.async_main", new=MagicMock()) as async_main,
+        patch("app.workers.worker.asyncio.run") as run,
+        patch("app.workers.worker.WorkerSupervisor") as supervisor_cls,
+    ):
+        worker.main()
+
+    run.assert_called_once_with(async_main.return_value)
+    supervisor_cls.assert_not_called()
+
+
+def test_main_supervises_several_processes():
+    from app.workers import worker
+
+    with (
+        patch("app.workers.worker.Settings", return_value=_settings(WORKER_PROCESSES=4)),
+        patch("app.workers.worker.WorkerSupervisor") as supervisor_cls,
+    ):
+        worker.main()
+
+    args, _ = supervisor_cls.call_args
+    assert args == (worker.run_worker_process, 4)
+    supervisor_cls.return_value.run.assert_called_once()
+
+
+def test_main_supervisor_validates_openai_api_key():
+    from app.workers import worker
+
+    with (
+        patch("app.workers.worker.Settings", return_value=_settings(WORKER_PROCESSES=2, OPENAI_API_KEY=" ")),
+        patch("app.workers.worker.WorkerSupervisor") as supervisor_cls,
+        pytest.raises(SystemExit, match="OPENAI_API_KEY"),
+    ):
+        worker.main()
+    supervisor_cls.assert_not_called()
@@ -0,0 +1,84 @@
+"""Tests for the multi-process worker supervisor."""
+
+import signal
+import time
+
+import pytest
+
+from app.workers import supervisor as supervisor_module
+from app.workers.supervisor import WorkerSupervisor
+
+# Targets run in spawned processes, so they must be importable module-level functions.
+
+
+def _sleep(_index: int) -> None:
+    time.sleep(60)
+
+
+def _exit_at_once(index: int) -> None:
+    raise SystemExit(3 + index)
+
+
+def _ignore_sigterm(_index: int) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(60)
+
+
+def _wait_dead(supervisor: WorkerSupervisor, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while any(p.is_alive() for p in supervisor.children.values()):
+        assert time.monotonic() < deadline, "worker processes did not exit"
+        time.sleep(0.05)
+
+
+def test_starts_one_process_per_index_and_stops_them():
+    supervisor = WorkerSupervisor(_sleep, 2, stop_timeout=10.0)
+    supervisor.start()
+    try:
+        children = supervisor.children
+        assert sorted(children) == [0, 1]
+        assert all(p.is_alive() for p in children.values())
+        assert len({p.pid for p in children.values()}) == 2
+    finally:
+        supervisor.stop()
+    assert all(p.exitcode == -signal.SIGTERM for p in children.values())
+
+
+def test_exited_process_is_restarted(monkeypatch):
+    monkeypatch.setattr(supervisor_module, "MIN_UPTIME_SECONDS", 0.0)
+    supervisor = WorkerSupervisor(_exit_at_once, 1)
+    supervisor.start()
+    try:
+        first = supervisor.children[0]
+        _wait_dead(supervisor)
+        assert first.exitcode == 3
+
+        supervisor.check()
+
+        assert supervisor.children[0] is not first
+    finally:
+        supervisor.stop()
+
+
+def test_crash_loop_restart_is_delayed():
+    supervisor = WorkerSupervisor(_exit_at_once, 1)
+    supervisor.start()
+    try:
+        first = supervisor.children[0]
+        _wait_dead(supervisor)
+
+        supervisor.check()
+
+        # Exited right after starting: restarted only after a delay.
+        assert supervisor.children[0] is first
+    finally:
+        supervisor.stop()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="POSIX only")
+def test_processes_ignoring_sigterm_are_killed():
+    supervisor = WorkerSupervisor(_ignore_sigterm, 1, stop_timeout=1.0)
+    supervisor.start()
+    time.sleep(1.0)  # let the child install its handler
+    supervisor.stop()
+    assert supervisor.children[0].exitcode == -signal.SIGKILL